@@ -209,9 +209,86 @@ class PythonBridge {
         return String(data: outputData, encoding: .utf8) ?? ""
     }
     
+    // MARK: - Servidor RAG persistente
+    
+    /// URL del servidor RAG local (servidor_rag.py). Se puede cambiar con SCRIPTORIUM_SERVIDOR.
+    private var servidorURL: String {
+        ProcessInfo.processInfo.environment["SCRIPTORIUM_SERVIDOR"] ?? "http://127.0.0.1:8765"
+    }
+    
+    /// Secreto que el servidor RAG exige en cada petición: SCRIPTORIUM_SECRETO o el archivo
+    /// ~/.scriptorium/servidor.secreto que escribe servidor_rag.py (igual que rag/cliente.py).
+    private var servidorSecreto: String? {
+        if let secreto = ProcessInfo.processInfo.environment["SCRIPTORIUM_SECRETO"], !secreto.isEmpty {
+            return secreto
+        }
+        let ruta = FileManager.default.homeDirectoryForCurrentUser
+            .appendingPathComponent(".scriptorium/servidor.secreto")
+        guard let contenido = try? String(contentsOf: ruta, encoding: .utf8) else { return nil }
+        let secreto = contenido.trimmingCharacters(in: .whitespacesAndNewlines)
+        return secreto.isEmpty ? nil : secreto
+    }
+    
+    /// Envía la petición al servidor RAG si está en ejecución.
+    /// Devuelve nil cuando no hay servidor escuchando, para usar el script Python como respaldo.
+    private func llamarServidor(ruta: String, cuerpo: [String: Any]) async throws -> String? {
+        guard let url = URL(string: servidorURL + ruta) else { return nil }
+        
+        var request = URLRequest(url: url)
+        request.httpMethod = "POST"
+        request.setValue("application/json", forHTTPHeaderField: "Content-Type")
+        if let secreto = servidorSecreto {
+            request.setValue(secreto, forHTTPHeaderField: "X-Scriptorium-Secreto")
+        }
+        request.httpBody = try JSONSerialization.data(withJSONObject: cuerpo)
+        request.timeoutInterval = 600
+        
+        let data: Data
+        let response: URLResponse
+        do {
+            (data, response) = try await URLSession.shared.data(for: request)
+        } catch let error as URLError where error.code == .cannotConnectToHost || error.code == .cannotFindHost {
+            return nil
+        }
+        
+        let json = try? JSONSerialization.jsonObject(with: data) as? [String: Any]
+        guard let httpResponse = response as? HTTPURLResponse, httpResponse.statusCode == 200 else {
+            let mensaje = json?["error"] as? String ?? "Error desconocido del servidor RAG"
+            throw PythonBridgeError.pythonError(mensaje)
+        }
+        guard let resultado = json?["resultado"] as? String else {
+            throw PythonBridgeError.invalidResponse
+        }
+        return resultado
+    }
+    
     // MARK: - Generación RAG (Llamada al script Python)
     
     func generarDocumento(parametros: ParametrosGeneracion) async throws -> String {
+        // Intentar primero con el servidor RAG persistente
+        var parametrosServidor: [String: Any] = [
+            "temperatura": parametros.temperatura,
+            "max_tokens": parametros.maxTokens,
+            "top_p": parametros.topP,
+            "frequency_penalty": parametros.frequencyPenalty,
+            "presence_penalty": parametros.presencePenalty
+        ]
+        if let tipo = parametros.tipo, !tipo.isEmpty {
+            parametrosServidor["tipo"] = tipo
+        }
+        if let contexto = parametros.contextoAdicional, !contexto.isEmpty {
+            parametrosServidor["contexto_adicional"] = contexto
+        }
+        if let prompt = parametros.promptPersonalizado, !prompt.isEmpty {
+            parametrosServidor["prompt_personalizado"] = prompt
+        }
+        if let resultado = try await llamarServidor(
+            ruta: "/generar",
+            cuerpo: ["tema": parametros.tema, "parametros": parametrosServidor]
+        ) {
+            return resultado
+        }
+        
         // Obtener token
         guard let token = KeychainService.shared.getToken(for: "github_ai") ??
               ProcessInfo.processInfo.environment["GITHUB_TOKEN"],
@@ -306,6 +383,18 @@ class PythonBridge {
     // MARK: - Transformación
     
     func transformarTexto(texto: String, contextoAdicional: String?, temperatura: Double) async throws -> String {
+        // Intentar primero con el servidor RAG persistente
+        var parametrosServidor: [String: Any] = ["temperatura": temperatura]
+        if let contexto = contextoAdicional, !contexto.isEmpty {
+            parametrosServidor["contexto_adicional"] = contexto
+        }
+        if let resultado = try await llamarServidor(
+            ruta: "/transformar",
+            cuerpo: ["texto": texto, "parametros": parametrosServidor]
+        ) {
+            return resultado
+        }
+        
         // Obtener token
         guard let token = KeychainService.shared.getToken(for: "github_ai") ??
               ProcessInfo.processInfo.environment["GITHUB_TOKEN"],
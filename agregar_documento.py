@@ -1,59 +1,196 @@
 import os
 import argparse
-import re
+import glob
+import json
+import time
+from typing import Dict, Any, List, Tuple
+from rag.cliente import ClienteRAG
 from rag.documentos_manager import DocumentosManager
+from rag.secciones import CAMPOS_SECCION, parsear_secciones
 
-def parsear_documento_txt(contenido: str) -> dict:
+def validar_documento(doc_dict: dict) -> Tuple[List[str], List[str]]:
     """
-    Parsea un archivo de texto plano y extrae las secciones del documento.
+    Comprobar que un documento parseado se puede usar como ejemplo.
     
     Args:
-        contenido (str): Contenido del archivo .txt
-        
+        doc_dict (dict): Documento devuelto por parsear_secciones
+    
     Returns:
-        dict: Diccionario con la estructura del documento
+        Tuple[List[str], List[str]]: (errores, advertencias). Un documento con errores no se guarda
     """
-    doc_dict = {}
-    
-    patrones = {
-        'titulo': r'T[ií]tulo:?\s*(.+?)(?:\n|$)',
-        'tipo': r'Tipo:?\s*(.+?)(?:\n|$)',
-        'materia': r'Materia:?\s*(.+?)(?:\n|$)',
-        'presenta': r'Presenta:?\s*(.+?)(?:\n|$)',
-        'profesor': r'Profesor:?\s*(.+?)(?:\n|$)',
-        'introduccion': r'Introducci[oó]n:?\s*([\s\S]+?)(?=Desarrollo:|Conclusi[oó]n:|$)',
-        'desarrollo': r'Desarrollo:?\s*([\s\S]+?)(?=Conclusi[oó]n:|$)',
-        'conclusion': r'Conclusi[oó]n:?\s*([\s\S]+?)(?=\n\n[A-Z]|$)'
-    }
-    
-    for campo, patron in patrones.items():
-        match = re.search(patron, contenido, re.IGNORECASE | re.MULTILINE)
-        if match:
-            doc_dict[campo] = match.group(1).strip()
-        else:
-            doc_dict[campo] = ""
+    errores, advertencias = [], []
+    if not any(doc_dict.get(seccion) for seccion in CAMPOS_SECCION):
+        errores.append("no se encontró ninguna sección (Introducción, Desarrollo o Conclusión)")
+    if not doc_dict.get('titulo'):
+        advertencias.append("sin título")
+    for campo in ('tipo', 'materia') + CAMPOS_SECCION:
+        if not doc_dict.get(campo) and not errores:
+            advertencias.append(f"sin {campo}")
+    return errores, advertencias
+
+def procesar_archivo(ruta: str) -> Dict[str, Any]:
+    """
+    Leer, parsear y validar un archivo .txt (se ejecuta en los procesos de la importación masiva).
     
-    return doc_dict
+    Returns:
+        Dict: ruta, documento (None si no se pudo leer), errores y advertencias
+    """
+    try:
+        with open(ruta, 'r', encoding='utf-8') as f:
+            contenido = f.read()
+    except (OSError, UnicodeDecodeError) as e:
+        return {'ruta': ruta, 'documento': None, 'errores': [f"no se pudo leer: {e}"], 'advertencias': []}
+    
+    if not contenido.strip():
+        return {'ruta': ruta, 'documento': None, 'errores': ["el archivo está vacío"], 'advertencias': []}
+    
+    doc_dict = parsear_secciones(contenido)
+    errores, advertencias = validar_documento(doc_dict)
+    return {'ruta': ruta, 'documento': doc_dict, 'errores': errores, 'advertencias': advertencias}
 
-def main():
-    parser = argparse.ArgumentParser(description='Agregar un documento desde un archivo .txt al sistema RAG')
-    parser.add_argument('archivo', type=str, help='Archivo .txt con el documento a agregar')
-    parser.add_argument('--nombre', type=str, default=None,
-                        help='Nombre personalizado para el archivo JSON (sin extensión)')
-    parser.add_argument('--sobrescribir', action='store_true',
-                        help='Sobrescribir el archivo si ya existe')
+def expandir_rutas(entradas: List[str]) -> List[str]:
+    """
+    Convertir archivos, directorios (se recorren recursivamente) y patrones glob en una lista de archivos .txt.
     
-    args = parser.parse_args()
+    Returns:
+        List[str]: Rutas sin repetir, en el orden en que se indicaron
+    """
+    rutas = []
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            rutas.extend(sorted(glob.glob(os.path.join(entrada, '**', '*.txt'), recursive=True)))
+        elif glob.has_magic(entrada):
+            rutas.extend(sorted(ruta for ruta in glob.glob(entrada, recursive=True) if os.path.isfile(ruta)))
+        else:
+            rutas.append(entrada)
+    vistas = set()
+    return [ruta for ruta in rutas if not (os.path.abspath(ruta) in vistas or vistas.add(os.path.abspath(ruta)))]
+
+def _firma_contenido(doc_dict: dict) -> str:
+    """Representación canónica de un documento para detectar duplicados (sin su id)."""
+    return json.dumps({k: v for k, v in doc_dict.items() if k != 'id'}, sort_keys=True, ensure_ascii=False)
+
+def importar_en_lote(rutas: List[str], args) -> None:
+    """
+    Importar muchos archivos sin preguntas por archivo.
+    
+    Los archivos se parsean y validan en un pool de procesos, se guardan con
+    DocumentosManager.guardar_documento (sin sobrescribir documentos con el mismo nombre;
+    en una sola transacción si el corpus está empaquetado) y al final se indexan todos en
+    una sola pasada por lotes. Si hay un servidor RAG en marcha, el indexado lo hace el
+    servidor, que es quien tiene los índices abiertos.
+    """
+    inicio = time.perf_counter()
+    procesos = max(1, min(args.procesos or os.cpu_count() or 1, len(rutas)))
+    print(f"Parseando {len(rutas)} archivos con {procesos} proceso(s)...")
+    if procesos > 1:
+        # multiprocessing solo se importa si hace falta (no en --help ni con un solo proceso)
+        from concurrent.futures import ProcessPoolExecutor
+        
+        with ProcessPoolExecutor(max_workers=procesos) as executor:
+            resultados = list(executor.map(procesar_archivo, rutas, chunksize=max(1, len(rutas) // (procesos * 4))))
+    else:
+        resultados = [procesar_archivo(ruta) for ruta in rutas]
+    tiempo_parseo = time.perf_counter() - inicio
+    
+    validos = [r for r in resultados if not r['errores']]
+    invalidos = [r for r in resultados if r['errores']]
+    for r in invalidos:
+        print(f"❌ {r['ruta']}: {'; '.join(r['errores'])}")
+    for r in validos:
+        if r['advertencias']:
+            print(f"⚠️ {r['ruta']}: {', '.join(r['advertencias'])}")
     
-    if not os.path.exists(args.archivo):
-        print(f"Error: El archivo {args.archivo} no existe")
+    if not validos:
+        print("\nNingún archivo contiene un documento válido")
         return
     
-    if not args.archivo.endswith('.txt'):
-        print(f"Advertencia: El archivo {args.archivo} no tiene extensión .txt")
+    if not args.yes:
+        respuesta = input(f"\n¿Deseas guardar {len(validos)} documentos ({len(invalidos)} con errores se omitirán)? (s/n): ")
+        if respuesta.lower() != 's':
+            print("Operación cancelada")
+            return
+    
+    inicio = time.perf_counter()
+    manager = DocumentosManager()
+    # Los documentos idénticos a uno ya guardado (p. ej. al repetir la importación) se omiten
+    existentes = {_firma_contenido(doc) for doc in manager.cargar_documentos()}
+    guardados, duplicados, renombrados, fallidos = 0, [], [], []
+    # Con corpus empaquetado todos los documentos se guardan en una sola transacción
+    with manager.lote():
+        for r in validos:
+            doc_dict = r['documento']
+            firma = _firma_contenido(doc_dict)
+            if firma in existentes:
+                duplicados.append(r['ruta'])
+                continue
+            try:
+                archivo_guardado = manager.guardar_documento(doc_dict, evitar_colision=not args.sobrescribir)
+            except OSError as e:
+                fallidos.append(r['ruta'])
+                print(f"❌ {r['ruta']}: no se pudo guardar: {e}")
+                continue
+            existentes.add(firma)
+            guardados += 1
+            if os.path.basename(archivo_guardado) != manager.nombre_archivo_para(doc_dict):
+                renombrados.append((r['ruta'], os.path.basename(archivo_guardado)))
+    tiempo_guardado = time.perf_counter() - inicio
+    
+    indexados = None
+    tiempo_indexado = 0.0
+    cliente = ClienteRAG.desde_entorno(args.servidor, modo_busqueda=args.modo_busqueda,
+                                       modelo_embeddings=args.modelo_embeddings)
+    if guardados and not args.sin_indexar and cliente and cliente.disponible():
+        inicio = time.perf_counter()
+        print(f"\nIndexando el corpus en el servidor RAG: {cliente.url}")
+        try:
+            indexados = cliente.indexar(compactar=args.compactar_cache)
+        except Exception as e:
+            print(f"Error al indexar (se reintentará en la próxima búsqueda): {e}")
+        tiempo_indexado = time.perf_counter() - inicio
+    elif guardados and not args.sin_indexar:
+        token = os.environ.get("GITHUB_TOKEN", "")
+        if args.modelo_embeddings and not token:
+            print("Advertencia: --modelo-embeddings requiere GITHUB_TOKEN; los documentos se indexarán en la próxima búsqueda")
+        else:
+            from rag.rag_sistema import RAGSistema
+            inicio = time.perf_counter()
+            print("\nIndexando el corpus...")
+            try:
+                rag = RAGSistema(token=token, modelo_embeddings=args.modelo_embeddings,
+                                 modo_busqueda=args.modo_busqueda or 'vectorial')
+                indexados = rag.indexar(compactar=args.compactar_cache)
+            except Exception as e:
+                print(f"Error al indexar (se reintentará en la próxima búsqueda): {e}")
+            tiempo_indexado = time.perf_counter() - inicio
+    
+    print("\n📊 Resumen de la importación")
+    print(f"  Archivos procesados: {len(rutas)}")
+    print(f"  Guardados: {guardados}")
+    if renombrados:
+        print(f"  Renombrados por coincidir con un nombre existente: {len(renombrados)}")
+        for origen, nombre in renombrados[:10]:
+            print(f"    {origen} → {nombre}")
+        if len(renombrados) > 10:
+            print(f"    ... y {len(renombrados) - 10} más")
+    print(f"  Duplicados omitidos: {len(duplicados)}")
+    print(f"  Con errores: {len(invalidos) + len(fallidos)}")
+    print(f"  Con advertencias: {sum(1 for r in validos if r['advertencias'])}")
+    if indexados:
+        print(f"  Corpus indexado: {indexados[0]} documentos, {indexados[1]} pasajes")
+    print(f"  Tiempo: parseo {tiempo_parseo:.1f}s, guardado {tiempo_guardado:.1f}s, indexado {tiempo_indexado:.1f}s")
+
+def agregar_un_documento(ruta: str, args) -> None:
+    """Agregar un único archivo mostrando el documento parseado y pidiendo confirmación (salvo con --yes)."""
+    if not os.path.exists(ruta):
+        print(f"Error: El archivo {ruta} no existe")
+        return
+    
+    if not ruta.endswith('.txt'):
+        print(f"Advertencia: El archivo {ruta} no tiene extensión .txt")
     
     try:
-        with open(args.archivo, 'r', encoding='utf-8') as f:
+        with open(ruta, 'r', encoding='utf-8') as f:
             contenido = f.read()
     except Exception as e:
         print(f"Error al leer el archivo: {e}")
@@ -63,10 +200,10 @@ def main():
         print("Error: El archivo está vacío")
         return
     
-    print(f"Parseando documento desde: {args.archivo}")
-    doc_dict = parsear_documento_txt(contenido)
+    print(f"Parseando documento desde: {ruta}")
+    doc_dict = parsear_secciones(contenido)
     
-    if not doc_dict.get('titulo'):
+    if not doc_dict.get('titulo') and not args.yes:
         print("Advertencia: No se encontró un título en el documento")
         respuesta = input("¿Deseas continuar de todas formas? (s/n): ")
         if respuesta.lower() != 's':
@@ -82,10 +219,11 @@ def main():
     print(f"  Desarrollo: {'✓' if doc_dict.get('desarrollo') else '✗'}")
     print(f"  Conclusión: {'✓' if doc_dict.get('conclusion') else '✗'}")
     
-    respuesta = input("\n¿Deseas guardar este documento? (s/n): ")
-    if respuesta.lower() != 's':
-        print("Operación cancelada")
-        return
+    if not args.yes:
+        respuesta = input("\n¿Deseas guardar este documento? (s/n): ")
+        if respuesta.lower() != 's':
+            print("Operación cancelada")
+            return
     
     manager = DocumentosManager()
     
@@ -94,19 +232,64 @@ def main():
     else:
         nombre_archivo = None
     
-    ruta_archivo = os.path.join(manager.directorio_base, nombre_archivo) if nombre_archivo else None
-    
-    if ruta_archivo and os.path.exists(ruta_archivo) and not args.sobrescribir:
+    if nombre_archivo and manager.existe_documento(nombre_archivo) and not args.sobrescribir:
         print(f"Error: El archivo {nombre_archivo} ya existe. Usa --sobrescribir para reemplazarlo")
         return
     
     try:
-        archivo_guardado = manager.guardar_documento(doc_dict, nombre_archivo)
+        # Con el nombre derivado del título, otro documento con un título parecido no se sobrescribe
+        archivo_guardado = manager.guardar_documento(
+            doc_dict, nombre_archivo, evitar_colision=nombre_archivo is None and not args.sobrescribir
+        )
         print(f"\n✅ Documento guardado exitosamente en: {archivo_guardado}")
         print(f"El documento ahora está disponible para el sistema RAG")
     except Exception as e:
         print(f"Error al guardar el documento: {e}")
 
+def main():
+    parser = argparse.ArgumentParser(description='Agregar documentos desde archivos .txt al sistema RAG')
+    parser.add_argument('archivos', type=str, nargs='+',
+                        help='Archivos .txt, directorios o patrones (p. ej. "semestre/**/*.txt") con los documentos')
+    parser.add_argument('--nombre', type=str, default=None,
+                        help='Nombre personalizado para el archivo JSON (sin extensión; solo con un archivo)')
+    parser.add_argument('--sobrescribir', action='store_true',
+                        help='Sobrescribir el archivo si ya existe')
+    parser.add_argument('-y', '--yes', action='store_true',
+                        help='No pedir confirmación')
+    parser.add_argument('--procesos', type=int, default=None,
+                        help='Procesos para parsear en la importación masiva (por defecto: número de CPUs)')
+    parser.add_argument('--sin-indexar', action='store_true',
+                        help='No generar embeddings al terminar la importación masiva (se harán en la próxima búsqueda)')
+    parser.add_argument('--compactar-cache', action='store_true',
+                        help='Al indexar, eliminar de la caché de embeddings los vectores de pasajes que ya no '
+                             'existen (p. ej. tras --sobrescribir); solo los del modelo de embeddings en uso')
+    parser.add_argument('--modelo-embeddings', type=str, default=None,
+                        help='Modelo de embeddings del endpoint con el que indexar; debe ser el mismo que usen '
+                             'las búsquedas (por defecto se usa el embedder local)')
+    parser.add_argument('--modo-busqueda', type=str, choices=['vectorial', 'lexico', 'hibrido'], default=None,
+                        help='Índices que se actualizan al terminar: vectorial, lexico (BM25) o hibrido (ambos); '
+                             'por defecto vectorial, o el modo del servidor')
+    parser.add_argument('--servidor', type=str, default=None,
+                        help='URL del servidor RAG que indexa al terminar la importación masiva. Por defecto '
+                             'se usa SCRIPTORIUM_SERVIDOR si está definida')
+    
+    args = parser.parse_args()
+    
+    # Un único archivo mantiene el flujo interactivo; directorios, patrones o varios archivos van en lote
+    masiva = len(args.archivos) > 1 or any(os.path.isdir(a) or glob.has_magic(a) for a in args.archivos)
+    if not masiva:
+        agregar_un_documento(args.archivos[0], args)
+        return
+    
+    if args.nombre:
+        print("Error: --nombre solo se puede usar con un único archivo")
+        return
+    
+    rutas = expandir_rutas(args.archivos)
+    if not rutas:
+        print("Error: No se encontraron archivos .txt")
+        return
+    importar_en_lote(rutas, args)
+
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1 @@
+# Este archivo está vacío y solo sirve para ejecutar los benchmarks con python -m benchmarks.<nombre>
@@ -0,0 +1,103 @@
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, List, Set, Tuple
+
+# Presupuesto de arranque: milisegundos de importación que puede añadir cada script (sobre el
+# arranque del propio intérprete) antes de llegar a --help o a un error de argumentos. La GUI
+# lanza un proceso por clic, así que este coste se paga en cada acción.
+PRESUPUESTO_MS = 25.0
+
+# Módulos que no deben cargarse en esos caminos: solo hacen falta para indexar o llamar al modelo
+MODULOS_PROHIBIDOS = ("numpy", "requests", "urllib3", "sklearn", "scipy", "sqlite3", "multiprocessing",
+                      "urllib.request", "http.server")
+
+# (script, argumentos) de cada camino que se mide; se ejecutan sin GITHUB_TOKEN ni servidor
+CASOS: List[Tuple[str, List[str]]] = [
+    ("generar_documento.py", ["--help"]),
+    ("generar_documento.py", ["Tema de prueba"]),
+    ("transformar_texto.py", ["--help"]),
+    ("transformar_texto.py", ["--texto", "Texto de prueba"]),
+    ("agregar_documento.py", ["--help"]),
+    ("agregar_documento.py", ["no_existe.txt"]),
+    ("servidor_rag.py", ["--help"]),
+    ("servidor_rag.py", []),
+    ("evaluar_indice.py", ["--help"]),
+    ("empaquetar_documentos.py", ["--help"]),
+]
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def importaciones(argumentos: List[str]) -> Dict[str, Tuple[int, int]]:
+    """
+    Ejecutar Python con -X importtime y leer el informe.
+
+    Args:
+        argumentos (List[str]): Argumentos del intérprete tras -X importtime
+
+    Returns:
+        Dict[str, Tuple[int, int]]: Módulo -> (µs acumulados, nivel de anidamiento)
+    """
+    entorno = {k: v for k, v in os.environ.items() if k not in ("GITHUB_TOKEN", "SCRIPTORIUM_SERVIDOR")}
+    proceso = subprocess.run([sys.executable, "-X", "importtime", *argumentos], cwd=RAIZ, env=entorno,
+                             stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    modulos = {}
+    for linea in proceso.stderr.splitlines():
+        if not linea.startswith("import time:") or "[us]" in linea:
+            continue
+        _, acumulado, nombre = linea[len("import time:"):].split("|")
+        modulos[nombre.strip()] = (int(acumulado), (len(nombre) - len(nombre.lstrip()) - 1) // 2)
+    return modulos
+
+
+def medir_caso(script: str, args: List[str], base: Set[str], repeticiones: int) -> Tuple[float, List[str]]:
+    """
+    Medir las importaciones que añade un script sobre el arranque del intérprete.
+
+    Returns:
+        Tuple[float, List[str]]: (mejor tiempo en ms, módulos prohibidos que se importaron)
+    """
+    mejor = float("inf")
+    prohibidos: Set[str] = set()
+    for _ in range(repeticiones):
+        modulos = importaciones([script, *args])
+        # Solo cuentan los módulos de primer nivel que no importa ya el intérprete al arrancar
+        total = sum(us for nombre, (us, nivel) in modulos.items() if nivel == 0 and nombre not in base)
+        mejor = min(mejor, total / 1000)
+        prohibidos.update(
+            prohibido for prohibido in MODULOS_PROHIBIDOS for nombre in modulos
+            if nombre not in base and (nombre == prohibido or nombre.startswith(prohibido + "."))
+        )
+    return mejor, sorted(prohibidos)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Comprobar el tiempo de importación de los scripts en --help y en los errores de argumentos'
+    )
+    parser.add_argument('--presupuesto-ms', type=float, default=PRESUPUESTO_MS,
+                        help=f'Máximo de ms de importación por script (por defecto: {PRESUPUESTO_MS})')
+    parser.add_argument('--repeticiones', type=int, default=5, help='Ejecuciones por caso (se toma la mejor)')
+
+    args = parser.parse_args()
+
+    base = set(importaciones(["-c", "pass"]))
+    fallos = 0
+    print(f"{'caso':<48} {'ms':>8}  módulos prohibidos")
+    for script, argumentos in CASOS:
+        ms, prohibidos = medir_caso(script, argumentos, base, args.repeticiones)
+        correcto = ms <= args.presupuesto_ms and not prohibidos
+        fallos += not correcto
+        nombre = " ".join([script, *argumentos])
+        print(f"{'✅' if correcto else '❌'} {nombre:<46} {ms:>8.1f}  {', '.join(prohibidos) or '-'}")
+
+    if fallos:
+        print(f"\n❌ {fallos} caso(s) superan el presupuesto de {args.presupuesto_ms:.0f} ms o importan módulos pesados")
+        sys.exit(1)
+    print(f"\n✅ Todos los casos dentro del presupuesto de {args.presupuesto_ms:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
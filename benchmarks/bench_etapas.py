@@ -0,0 +1,231 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks.corpus_sintetico import escribir_corpus
+
+# Consultas de búsqueda y temas de generación: términos del vocabulario del corpus sintético
+CONSULTAS = (
+    "rendimiento del servidor IIS con consultas SQL",
+    "eventos de ventana con ActionListener en Java Swing",
+    "algoritmo de ordenamiento sobre una lista",
+    "configuración de red TCP en Linux",
+    "diseño de la interfaz con JMenuBar y botón",
+    "pruebas de calidad del sistema",
+    "concurrencia con hilos y memoria compartida",
+    "índice de una tabla en la base de datos",
+)
+
+ETAPAS = ("cargar_documentos", "procesar_documentos", "indexar", "buscar_documentos_similares",
+          "construir_prompt", "parsear_secciones")
+
+
+def _rss_max_mb() -> Optional[float]:
+    """Máximo de memoria residente del proceso hasta ahora (MB), o None si no se puede medir."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux lo da en KB y macOS en bytes
+    return round(maximo / (1024 * 1024) if sys.platform == "darwin" else maximo / 1024, 1)
+
+
+class _Medidor:
+    """Mide cada etapa en frío (primera llamada) y en tibio (llamadas siguientes con las cachés llenas)."""
+
+    def __init__(self, repeticiones: int, memoria_python: bool):
+        self.repeticiones = repeticiones
+        self.memoria_python = memoria_python
+        self.etapas: Dict[str, Dict[str, Any]] = {}
+
+    def _ejecutar(self, funcion: Callable[[], Any]) -> float:
+        inicio = time.perf_counter()
+        funcion()
+        return (time.perf_counter() - inicio) * 1000
+
+    def medir(self, etapa: str, frio: Callable[[], Any], tibio: Optional[Callable[[], Any]] = None,
+              unidades: int = 1):
+        """
+        Medir una etapa.
+
+        Args:
+            etapa (str): Nombre de la etapa en el informe
+            frio (Callable): Primera ejecución, con las cachés del proceso vacías
+            tibio (Callable, optional): Ejecución repetida con las cachés llenas (por defecto, `frio` otra vez)
+            unidades (int): Elementos procesados por ejecución (consultas, documentos...), para el tiempo unitario
+        """
+        if self.memoria_python:
+            tracemalloc.start()
+        ms_frio = self._ejecutar(frio)
+        tiempos = [self._ejecutar(tibio or frio) for _ in range(self.repeticiones)]
+        resultado = {
+            "frio_ms": round(ms_frio, 3),
+            "tibio_ms": round(statistics.median(tiempos), 3),
+            "tibio_min_ms": round(min(tiempos), 3),
+            "unidades": unidades,
+            "rss_max_mb": _rss_max_mb(),
+        }
+        if self.memoria_python:
+            resultado["pico_python_mb"] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 2)
+            tracemalloc.stop()
+        self.etapas[etapa] = resultado
+
+
+def medir_tamano(documentos: int, semilla: int, repeticiones: int, modo_busqueda: str,
+                 memoria_python: bool, directorio_trabajo: Optional[str]) -> Dict[str, Any]:
+    """
+    Generar un corpus de `documentos` documentos y medir cada etapa sobre él.
+
+    Se ejecuta en un proceso propio por tamaño, para que las cachés del proceso empiecen vacías
+    y el máximo de memoria residente corresponda solo a ese tamaño.
+    """
+    from rag.documentos_manager import DocumentosManager
+    from rag.rag_sistema import RAGSistema
+    from rag.secciones import parsear_secciones
+
+    raiz = tempfile.mkdtemp(prefix=f"scriptorium_bench_{documentos}_", dir=directorio_trabajo)
+    # Los avisos de progreso del sistema RAG no forman parte de la medida
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            inicio = time.perf_counter()
+            directorio_docs = escribir_corpus(os.path.join(raiz, "documentos"), documentos, semilla)
+            directorio_indices = os.path.join(raiz, "indices")
+            generacion_s = time.perf_counter() - inicio
+
+            def sistema() -> RAGSistema:
+                # Sin token ni endpoint: ninguna etapa llama al modelo
+                return RAGSistema(token="", doc_manager=DocumentosManager(directorio_docs, buscar_en_rag=False),
+                                  directorio_indices=directorio_indices, modo_busqueda=modo_busqueda)
+
+            medidor = _Medidor(repeticiones, memoria_python)
+
+            # Frío: leer y parsear todos los JSON; tibio: solo comprobar que no cambiaron
+            manager = DocumentosManager(directorio_docs, buscar_en_rag=False)
+            medidor.medir("cargar_documentos", manager.cargar_corpus, unidades=documentos)
+
+            # Fragmentar en pasajes e indexar sus metadatos (con los documentos ya cargados)
+            rag = sistema()
+            rag.doc_manager.cargar_corpus()
+            medidor.medir("procesar_documentos", rag._obtener_corpus_indexado, unidades=documentos)
+            fragmentos, textos, version = rag._obtener_corpus()
+
+            # Frío: embeddings e índices desde cero; tibio: un sistema nuevo (como al reiniciar)
+            # que los reutiliza del disco
+            medidor.medir("indexar", rag.indexar, lambda: sistema().indexar(), unidades=len(fragmentos))
+
+            # Frío: primera consulta de un sistema recién abierto; tibio: consultas siguientes
+            rag = sistema()
+            rag.indexar()
+            gestor = rag.embeddings_manager
+            consultas = iter(CONSULTAS * (repeticiones + 1))
+
+            def buscar():
+                gestor.buscar_documentos_similares(next(consultas), fragmentos, textos, top_k=8,
+                                                   version_corpus=version)
+
+            medidor.medir("buscar_documentos_similares", buscar)
+
+            docs_similares = rag._agrupar_pasajes(CONSULTAS[0], num_documentos=3)
+            medidor.medir("construir_prompt",
+                          lambda: rag._construir_prompt_con_contexto(CONSULTAS[0], docs_similares, "practica"))
+
+            textos_completos = [manager.get_documento_completo(doc) for doc in manager.cargar_documentos()]
+            medidor.medir("parsear_secciones", lambda: [parsear_secciones(texto) for texto in textos_completos],
+                          unidades=len(textos_completos))
+
+            return {
+                "documentos": documentos,
+                "pasajes": len(fragmentos),
+                "mb_en_disco": round(sum(e.stat().st_size for e in os.scandir(directorio_docs)) / 2 ** 20, 2),
+                "generacion_corpus_s": round(generacion_s, 2),
+                "etapas": medidor.etapas,
+            }
+        finally:
+            shutil.rmtree(raiz, ignore_errors=True)
+
+
+def entorno() -> Dict[str, Any]:
+    """Datos de la máquina y las versiones, para comparar ejecuciones."""
+    import numpy as np
+    from rag.tokens import contador_tokens
+
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "contador_tokens": contador_tokens(),
+    }
+
+
+def imprimir_tabla(resultados: List[Dict[str, Any]]):
+    print(f"\n{'docs':>7} {'pasajes':>8}  {'etapa':<28} {'frío ms':>10} {'tibio ms':>10} {'RSS máx MB':>11}")
+    for resultado in resultados:
+        for etapa in ETAPAS:
+            datos = resultado["etapas"][etapa]
+            rss = datos["rss_max_mb"]
+            print(f"{resultado['documentos']:>7} {resultado['pasajes']:>8}  {etapa:<28} {datos['frio_ms']:>10.2f} "
+                  f"{datos['tibio_ms']:>10.2f} {rss if rss is not None else '-':>11}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Medir cada etapa del sistema RAG (carga, fragmentación, índice, búsqueda, prompt y parseo) '
+                    'sobre corpus sintéticos, sin conexión'
+    )
+    parser.add_argument('--documentos', type=int, nargs='+', default=[100, 1000, 10000],
+                        help='Tamaños de corpus a medir (por defecto: 100 1000 10000; se admite hasta 100000)')
+    parser.add_argument('--repeticiones', type=int, default=5, help='Ejecuciones en tibio por etapa (se toma la mediana)')
+    parser.add_argument('--modo-busqueda', type=str, choices=['vectorial', 'lexico', 'hibrido'], default='vectorial',
+                        help='Modo de búsqueda del sistema medido')
+    parser.add_argument('--memoria-python', action='store_true',
+                        help='Medir también el pico de memoria de Python por etapa con tracemalloc (ralentiza las medidas)')
+    parser.add_argument('--directorio', type=str, default=None,
+                        help='Directorio para los corpus temporales (por defecto, el temporal del sistema)')
+    parser.add_argument('--semilla', type=int, default=0, help='Semilla del corpus sintético')
+    parser.add_argument('--salida', type=str, default=None,
+                        help='Archivo JSON donde guardar los resultados para compararlos entre ejecuciones')
+
+    args = parser.parse_args()
+
+    resultados = []
+    for documentos in sorted(args.documentos):
+        print(f"⏱️  Midiendo un corpus de {documentos} documentos...", flush=True)
+        # Un proceso por tamaño: cachés vacías y máximo de memoria propio
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            resultados.append(executor.submit(
+                medir_tamano, documentos, args.semilla, args.repeticiones, args.modo_busqueda,
+                args.memoria_python, args.directorio
+            ).result())
+
+    imprimir_tabla(resultados)
+
+    if args.salida:
+        informe = {
+            "benchmark": "etapas",
+            "fecha": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "entorno": entorno(),
+            "parametros": {"repeticiones": args.repeticiones, "modo_busqueda": args.modo_busqueda,
+                           "memoria_python": args.memoria_python, "semilla": args.semilla},
+            "resultados": resultados,
+        }
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(informe, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Resultados guardados en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
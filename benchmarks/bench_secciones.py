@@ -0,0 +1,89 @@
+import argparse
+import random
+import re
+import time
+from typing import Callable, Dict, List
+
+from rag.secciones import parsear_secciones
+
+# Parser anterior (un re.search por campo), para comparar
+_PATRONES_ANTERIORES = {
+    'titulo': r'T[ií]tulo:?\s*(.+?)(?:\n|$)',
+    'tipo': r'Tipo:?\s*(.+?)(?:\n|$)',
+    'materia': r'Materia:?\s*(.+?)(?:\n|$)',
+    'presenta': r'Presenta:?\s*(.+?)(?:\n|$)',
+    'profesor': r'Profesor:?\s*(.+?)(?:\n|$)',
+    'introduccion': r'Introducci[oó]n:?\s*([\s\S]+?)(?=Desarrollo:|Conclusi[oó]n:|$)',
+    'desarrollo': r'Desarrollo:?\s*([\s\S]+?)(?=Conclusi[oó]n:|$)',
+    'conclusion': r'Conclusi[oó]n:?\s*([\s\S]+)$'
+}
+
+
+def parsear_anterior(texto: str) -> Dict[str, str]:
+    doc_dict = {}
+    for campo, patron in _PATRONES_ANTERIORES.items():
+        match = re.search(patron, texto, re.IGNORECASE)
+        doc_dict[campo] = match.group(1).strip() if match else ""
+    return doc_dict
+
+
+def generar_texto(tamano: int, rng: random.Random) -> str:
+    """Simular una respuesta larga y desordenada de un modelo: Markdown, encabezados repetidos
+    y palabras clave (desarrollo, conclusión, tipo...) en medio de la prosa."""
+    palabras = ("el desarrollo de la práctica muestra que el tipo de prueba y la materia influyen en la "
+                "conclusión final del proyecto cuando se presenta al profesor con el prototipo").split()
+    partes: List[str] = [
+        "**Título:** Reporte generado\n**Tipo:** practica\n**Materia:** programacion visual\n"
+        "**Presenta:** Alumno\n**Profesor:** Docente\n\n"
+    ]
+    total = len(partes[0])
+    secciones = ["## Introducción\n", "## Desarrollo\n", "Desarrollo:\n", "**Conclusión:**\n"]
+    while total < tamano:
+        if rng.random() < 0.02:
+            parte = rng.choice(secciones)
+        else:
+            parte = " ".join(rng.choices(palabras, k=rng.randint(20, 120))) + ".\n\n"
+        partes.append(parte)
+        total += len(parte)
+    return "".join(partes)
+
+
+def medir(parser: Callable[[str], Dict[str, str]], texto: str, repeticiones: int) -> float:
+    """Mejor tiempo (segundos) de varias ejecuciones."""
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        parser(texto)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Medir el parser de secciones con entradas de varios megabytes')
+    parser.add_argument('--tamanos', type=float, nargs='+', default=[0.5, 1, 2, 4, 8],
+                        help='Tamaños de entrada en MB (por defecto: 0.5 1 2 4 8)')
+    parser.add_argument('--repeticiones', type=int, default=3, help='Ejecuciones por medida (se toma la mejor)')
+    parser.add_argument('--sin-anterior', action='store_true', help='No medir el parser anterior')
+    parser.add_argument('--semilla', type=int, default=0, help='Semilla del texto generado')
+
+    args = parser.parse_args()
+
+    rng = random.Random(args.semilla)
+    print(f"{'MB':>6} {'nuevo ms':>10} {'ms/MB':>8} {'anterior ms':>12} {'ms/MB':>8}")
+    base = None
+    for mb in args.tamanos:
+        texto = generar_texto(int(mb * 1024 * 1024), rng)
+        nuevo = medir(parsear_secciones, texto, args.repeticiones)
+        fila = f"{mb:>6g} {nuevo * 1000:>10.1f} {nuevo * 1000 / mb:>8.1f}"
+        if not args.sin_anterior:
+            anterior = medir(parsear_anterior, texto, args.repeticiones)
+            fila += f" {anterior * 1000:>12.1f} {anterior * 1000 / mb:>8.1f}"
+        print(fila)
+        base = base or nuevo / mb
+    # Con coste lineal, ms/MB se mantiene constante al crecer la entrada
+    print(f"\nCrecimiento de ms/MB del parser nuevo entre el menor y el mayor tamaño: "
+          f"{(nuevo / args.tamanos[-1]) / base:.2f}x (1.00x = lineal)")
+
+
+if __name__ == "__main__":
+    main()
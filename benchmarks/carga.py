@@ -0,0 +1,254 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from benchmarks.bench_etapas import CONSULTAS
+from benchmarks.corpus_sintetico import escribir_corpus
+from benchmarks.servidor_stub import agregar_argumentos_stub, crear_stub
+
+OPERACIONES = ("generar", "transformar", "mixta")
+
+
+def _percentil(valores: List[float], p: float) -> Optional[float]:
+    """Percentil p (0-100) con interpolación lineal, o None si no hay valores."""
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    posicion = (len(ordenados) - 1) * p / 100
+    inferior = int(posicion)
+    superior = min(inferior + 1, len(ordenados) - 1)
+    return ordenados[inferior] + (ordenados[superior] - ordenados[inferior]) * (posicion - inferior)
+
+
+def resumir(muestras: List[Dict[str, Any]], segundos: float) -> Dict[str, Any]:
+    """
+    Resumir las peticiones de una prueba de carga.
+
+    Args:
+        muestras (List[Dict]): Una entrada por petición con 'latencia_ms', 'ttft_ms' (en streaming)
+            y 'error' (nombre de la excepción, o None si fue correcta)
+        segundos (float): Duración total de la prueba
+
+    Returns:
+        Dict: Peticiones, errores por tipo, tasa de error, throughput y percentiles de latencia (ms)
+    """
+    correctas = [m for m in muestras if m["error"] is None]
+    latencias = [m["latencia_ms"] for m in correctas]
+    ttfts = [m["ttft_ms"] for m in correctas if m.get("ttft_ms") is not None]
+    resumen = {
+        "peticiones": len(muestras),
+        "correctas": len(correctas),
+        "errores": dict(Counter(m["error"] for m in muestras if m["error"] is not None)),
+        "tasa_error": round(1 - len(correctas) / len(muestras), 4) if muestras else 0.0,
+        "throughput_rps": round(len(correctas) / segundos, 3) if segundos > 0 else None,
+        "latencia_ms": {nombre: None if _percentil(latencias, p) is None else round(_percentil(latencias, p), 1)
+                        for nombre, p in (("p50", 50), ("p95", 95), ("p99", 99), ("max", 100))},
+    }
+    if ttfts:
+        resumen["primer_fragmento_ms"] = {nombre: round(_percentil(ttfts, p), 1)
+                                          for nombre, p in (("p50", 50), ("p95", 95), ("p99", 99))}
+    return resumen
+
+
+def ejecutar_usuario(rag, indice: int, args: argparse.Namespace, textos: List[str], barrera: threading.Barrier,
+                     muestras: List[Dict[str, Any]], lock: threading.Lock):
+    """Bucle de un usuario: lanza peticiones una tras otra hasta completar su cuota o agotar el tiempo."""
+    rng = random.Random(args.semilla + indice)
+    barrera.wait()
+    fin = time.monotonic() + (args.duracion or 0)
+    hechas = 0
+    while (time.monotonic() < fin) if args.duracion else (hechas < args.peticiones):
+        operacion = args.operacion if args.operacion != "mixta" else rng.choice(("generar", "transformar"))
+        muestra: Dict[str, Any] = {"usuario": indice, "operacion": operacion, "error": None, "ttft_ms": None}
+        inicio = time.perf_counter()
+        try:
+            if operacion == "generar":
+                resultado = rag.generar_documento(rng.choice(CONSULTAS), {}, stream=args.stream)
+            else:
+                resultado = rag.transformar_texto(rng.choice(textos), {}, stream=args.stream)
+            if args.stream:
+                for _ in resultado:
+                    if muestra["ttft_ms"] is None:
+                        muestra["ttft_ms"] = (time.perf_counter() - inicio) * 1000
+        except Exception as e:
+            muestra["error"] = type(e).__name__
+        muestra["latencia_ms"] = (time.perf_counter() - inicio) * 1000
+        with lock:
+            muestras.append(muestra)
+        hechas += 1
+
+
+async def ejecutar_usuario_async(rag, indice: int, args: argparse.Namespace, textos: List[str], fin: float,
+                                 muestras: List[Dict[str, Any]]):
+    """Como ejecutar_usuario, con agenerar_documento/atransformar_texto: cada usuario es una corrutina."""
+    rng = random.Random(args.semilla + indice)
+    hechas = 0
+    while (time.monotonic() < fin) if args.duracion else (hechas < args.peticiones):
+        operacion = args.operacion if args.operacion != "mixta" else rng.choice(("generar", "transformar"))
+        muestra: Dict[str, Any] = {"usuario": indice, "operacion": operacion, "error": None, "ttft_ms": None}
+        inicio = time.perf_counter()
+        try:
+            if operacion == "generar":
+                resultado = await rag.agenerar_documento(rng.choice(CONSULTAS), {}, stream=args.stream)
+            else:
+                resultado = await rag.atransformar_texto(rng.choice(textos), {}, stream=args.stream)
+            if args.stream:
+                async for _ in resultado:
+                    if muestra["ttft_ms"] is None:
+                        muestra["ttft_ms"] = (time.perf_counter() - inicio) * 1000
+        except Exception as e:
+            muestra["error"] = type(e).__name__
+        muestra["latencia_ms"] = (time.perf_counter() - inicio) * 1000
+        muestras.append(muestra)
+        hechas += 1
+
+
+async def ejecutar_usuarios_async(rag, args: argparse.Namespace, textos: List[str],
+                                  muestras: List[Dict[str, Any]]) -> float:
+    """Lanzar todos los usuarios en un solo bucle de eventos; devuelve la duración en segundos."""
+    inicio = time.perf_counter()
+    fin = time.monotonic() + (args.duracion or 0)
+    await asyncio.gather(*(ejecutar_usuario_async(rag, i, args, textos, fin, muestras) for i in range(args.usuarios)))
+    segundos = time.perf_counter() - inicio
+    await rag.cliente_http_async.cerrar()
+    return segundos
+
+
+def imprimir_resumen(nombre: str, resumen: Dict[str, Any]):
+    latencia = resumen["latencia_ms"]
+    formato = lambda valor: "-" if valor is None else f"{valor:.0f}"
+    print(f"{nombre:<12} {resumen['peticiones']:>6} {resumen['tasa_error']:>8.1%} {resumen['throughput_rps'] or 0:>8.2f} "
+          f"{formato(latencia['p50']):>8} {formato(latencia['p95']):>8} {formato(latencia['p99']):>8}"
+          f"  {', '.join(f'{k}: {v}' for k, v in resumen['errores'].items()) or '-'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Prueba de carga de RAGSistema con N usuarios concurrentes contra un endpoint stub local'
+    )
+    parser.add_argument('--usuarios', type=int, default=8, help='Usuarios concurrentes (por defecto: 8)')
+    parser.add_argument('--peticiones', type=int, default=5, help='Peticiones por usuario (por defecto: 5)')
+    parser.add_argument('--duracion', type=float, default=None,
+                        help='Segundos de prueba; si se indica, cada usuario repite peticiones hasta agotarlos')
+    parser.add_argument('--operacion', type=str, choices=list(OPERACIONES), default='mixta',
+                        help='generar_documento, transformar_texto o una mezcla al azar (por defecto: mixta)')
+    parser.add_argument('--stream', action='store_true',
+                        help='Usar streaming y medir también el tiempo hasta el primer fragmento')
+    parser.add_argument('--endpoint', type=str, default=None,
+                        help='Endpoint ya en marcha (p. ej. python -m benchmarks.servidor_stub); '
+                             'sin él se arranca un stub en este proceso con las opciones de abajo')
+    parser.add_argument('--documentos', type=int, default=200,
+                        help='Documentos del corpus sintético de ejemplos (por defecto: 200)')
+    parser.add_argument('--max-reintentos', type=int, default=3, help='Reintentos del cliente HTTP ante 429/5xx')
+    parser.add_argument('--asincrono', action='store_true',
+                        help='Usar agenerar_documento/atransformar_texto: todos los usuarios en un solo bucle de '
+                             'eventos en lugar de un hilo por usuario')
+    parser.add_argument('--max-concurrencia-endpoint', type=int, default=16,
+                        help='Con --asincrono, peticiones simultáneas al endpoint (por defecto: 16)')
+    parser.add_argument('--semilla', type=int, default=0, help='Semilla del corpus, el stub y los usuarios')
+    parser.add_argument('--salida', type=str, default=None, help='Archivo JSON donde guardar los resultados')
+    agregar_argumentos_stub(parser)
+
+    args = parser.parse_args()
+
+    from rag.cliente_http import ClienteHTTPModelo
+    from rag.cliente_http_async import ClienteHTTPAsync
+    from rag.documentos_manager import DocumentosManager
+    from rag.rag_sistema import RAGSistema
+
+    stub = None
+    if args.endpoint:
+        endpoint = args.endpoint.rstrip("/")
+    else:
+        stub = crear_stub(args, semilla=args.semilla)
+        threading.Thread(target=stub.serve_forever, daemon=True).start()
+        endpoint = stub.url
+
+    raiz = tempfile.mkdtemp(prefix="scriptorium_carga_")
+    try:
+        print(f"Preparando un corpus sintético de {args.documentos} documentos...")
+        directorio_docs = escribir_corpus(os.path.join(raiz, "documentos"), args.documentos, args.semilla)
+        doc_manager = DocumentosManager(directorio_docs, buscar_en_rag=False)
+        # Un sistema compartido por todos los usuarios, como en servidor_rag.py, sin caché de respuestas
+        rag = RAGSistema(token="stub", endpoint=endpoint,
+                         cliente_http=ClienteHTTPModelo(pool_size=args.usuarios, max_reintentos=args.max_reintentos),
+                         cliente_http_async=ClienteHTTPAsync(max_concurrencia_endpoint=args.max_concurrencia_endpoint,
+                                                             pool_size=args.max_concurrencia_endpoint,
+                                                             max_reintentos=args.max_reintentos),
+                         doc_manager=doc_manager, directorio_indices=os.path.join(raiz, "indices"))
+        with contextlib.redirect_stdout(io.StringIO()):
+            rag.indexar()
+        textos = [doc_manager.get_documento_completo(doc) for doc in doc_manager.cargar_documentos()[:50]]
+
+        print(f"🚀 {args.usuarios} usuarios, {f'{args.duracion:g} s' if args.duracion else f'{args.peticiones} peticiones cada uno'}, "
+              f"operación {args.operacion}{' en streaming' if args.stream else ''}"
+              f"{' (asyncio)' if args.asincrono else ''} contra {endpoint}")
+        muestras: List[Dict[str, Any]] = []
+        if args.asincrono:
+            with contextlib.redirect_stdout(io.StringIO()):
+                segundos = asyncio.run(ejecutar_usuarios_async(rag, args, textos, muestras))
+        else:
+            lock = threading.Lock()
+            barrera = threading.Barrier(args.usuarios + 1)
+            hilos = [
+                threading.Thread(target=ejecutar_usuario,
+                                 args=(rag, i, args, textos, barrera, muestras, lock), daemon=True)
+                for i in range(args.usuarios)
+            ]
+            for hilo in hilos:
+                hilo.start()
+            # Los avisos de cada prompt se descartan para no mezclar la salida de los usuarios
+            with contextlib.redirect_stdout(io.StringIO()):
+                barrera.wait()
+                inicio = time.perf_counter()
+                for hilo in hilos:
+                    hilo.join()
+                segundos = time.perf_counter() - inicio
+    finally:
+        shutil.rmtree(raiz, ignore_errors=True)
+
+    reintentos = rag.cliente_http_async.reintentos if args.asincrono else rag.cliente_http.reintentos
+    resultados = {"total": resumir(muestras, segundos)}
+    for operacion in ("generar", "transformar"):
+        propias = [m for m in muestras if m["operacion"] == operacion]
+        if propias and args.operacion == "mixta":
+            resultados[operacion] = resumir(propias, segundos)
+
+    print(f"\n{'operación':<12} {'total':>6} {'errores':>8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}  errores por tipo")
+    for nombre, resumen in resultados.items():
+        imprimir_resumen(nombre, resumen)
+    if "primer_fragmento_ms" in resultados["total"]:
+        print(f"\nPrimer fragmento (ms): {resultados['total']['primer_fragmento_ms']}")
+    print(f"Reintentos del cliente HTTP: {reintentos} en {segundos:.1f} s")
+    if stub is not None:
+        print(f"Stub: {stub.estadisticas()}")
+        stub.shutdown()
+
+    if args.salida:
+        informe = {
+            "benchmark": "carga",
+            "fecha": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "parametros": {clave: valor for clave, valor in vars(args).items() if clave != "salida"},
+            "duracion_s": round(segundos, 3),
+            "reintentos": reintentos,
+            "stub": stub.estadisticas() if stub is not None else None,
+            "resultados": resultados,
+        }
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(informe, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Resultados guardados en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
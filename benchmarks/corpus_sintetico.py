@@ -0,0 +1,110 @@
+import argparse
+import math
+import os
+import random
+from typing import Any, Dict, Iterator, List
+
+from rag.documentos_manager import DocumentosManager
+
+# Valores de los campos de encabezado: pocos tipos, decenas de materias y profesores, como un
+# corpus real acumulado durante varios semestres
+TIPOS = ("practica", "investigacion", "ensayo", "reporte", "manual", "otro")
+MATERIAS = tuple(f"{area} {nivel}" for area in (
+    "Programación Visual", "Bases de Datos", "Redes", "Sistemas Operativos", "Ingeniería de Software",
+    "Estructuras de Datos", "Calidad del Software", "Administración de Servidores", "Inteligencia Artificial",
+    "Arquitectura de Computadoras"
+) for nivel in ("I", "II", "III"))
+PROFESORES = tuple(f"Mtro. {nombre} {apellido}" for nombre in ("Luis", "Ana", "Jorge", "María", "Carlos")
+                   for apellido in ("Pérez", "García", "Hernández"))
+
+_VOCABULARIO = (
+    "el la los las de del en con para por que se una un como sistema datos proceso usuario aplicación "
+    "servidor cliente interfaz evento clase objeto método función variable resultado práctica análisis "
+    "implementación diseño prueba configuración red archivo consulta tabla índice memoria rendimiento "
+    "seguridad calidad requisito componente módulo ventana botón menú Java Swing JMenuBar ActionListener "
+    "SQL IIS TCP Linux algoritmo ordenamiento árbol grafo pila cola lista hilo concurrencia desarrollo "
+    "conclusión introducción se observa permite muestra obtiene realiza mediante cada también además"
+).split()
+
+# Longitudes en caracteres (mediana, dispersión lognormal), ajustadas a los documentos de ejemplo
+_LONGITUDES = {
+    "introduccion": (450, 0.5),
+    "desarrollo": (1900, 0.7),
+    "conclusion": (600, 0.5),
+}
+
+
+def _texto(rng: random.Random, mediana: int, sigma: float) -> str:
+    """Párrafos de prosa con una longitud aleatoria (lognormal) alrededor de `mediana` caracteres."""
+    objetivo = max(80, int(rng.lognormvariate(math.log(mediana), sigma)))
+    parrafos: List[List[str]] = [[]]
+    total = 0
+    while total < objetivo:
+        if len(parrafos[-1]) >= rng.randint(2, 6):
+            parrafos.append([])
+        frase = " ".join(rng.choices(_VOCABULARIO, k=rng.randint(8, 24)))
+        frase = frase[0].upper() + frase[1:] + "."
+        parrafos[-1].append(frase)
+        total += len(frase) + 1
+    return "\n\n".join(" ".join(frases) for frases in parrafos)
+
+
+def generar_documentos(n: int, semilla: int = 0) -> Iterator[Dict[str, Any]]:
+    """
+    Generar documentos sintéticos con la forma de los del usuario.
+
+    Args:
+        n (int): Número de documentos
+        semilla (int): Semilla del generador (el mismo valor da el mismo corpus)
+
+    Yields:
+        Dict[str, Any]: Documento con titulo, tipo, materia, presenta, profesor, introduccion,
+        desarrollo y conclusion
+    """
+    rng = random.Random(semilla)
+    for i in range(n):
+        documento = {
+            "titulo": f"{' '.join(rng.choices(_VOCABULARIO, k=rng.randint(3, 8))).capitalize()} {i}",
+            "tipo": rng.choice(TIPOS),
+            "materia": rng.choice(MATERIAS),
+            "presenta": "Alumno de Prueba",
+            "profesor": rng.choice(PROFESORES),
+        }
+        for campo, (mediana, sigma) in _LONGITUDES.items():
+            documento[campo] = _texto(rng, mediana, sigma)
+        yield documento
+
+
+def escribir_corpus(directorio: str, n: int, semilla: int = 0) -> str:
+    """
+    Escribir un corpus sintético con el formato de documentos/ (un JSON por documento).
+
+    Args:
+        directorio (str): Directorio de destino (se crea si no existe)
+        n (int): Número de documentos
+        semilla (int): Semilla del generador
+
+    Returns:
+        str: Ruta absoluta del directorio
+    """
+    directorio = os.path.abspath(directorio)
+    manager = DocumentosManager(directorio, buscar_en_rag=False)
+    for i, documento in enumerate(generar_documentos(n, semilla)):
+        manager.guardar_documento(documento, f"doc_{i:06d}.json")
+    return directorio
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generar un corpus sintético de documentos JSON para benchmarks')
+    parser.add_argument('directorio', type=str, help='Directorio donde escribir los documentos')
+    parser.add_argument('--documentos', type=int, default=1000, help='Número de documentos (por defecto: 1000)')
+    parser.add_argument('--semilla', type=int, default=0, help='Semilla del generador')
+
+    args = parser.parse_args()
+
+    directorio = escribir_corpus(args.directorio, args.documentos, args.semilla)
+    print(f"✅ {args.documentos} documentos sintéticos en {directorio}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+
+# Distribuciones de la latencia hasta el primer token
+DISTRIBUCIONES = ("fija", "uniforme", "lognormal")
+
+_PALABRAS = ("el desarrollo de la práctica muestra que la interfaz responde a cada evento del usuario y que el "
+             "servidor procesa las consultas con un rendimiento estable durante las pruebas").split()
+
+
+class ServidorStub(ThreadingHTTPServer):
+    """
+    Servidor local que imita /v1/chat/completions para pruebas de carga sin conexión.
+
+    Cada petición espera una latencia aleatoria hasta el primer token y después entrega
+    `tokens_respuesta` tokens al ritmo de `tokens_por_segundo` (en streaming, uno a uno como
+    server-sent events). Una fracción de las peticiones puede responder 429 con Retry-After
+    o 500, para probar los reintentos y las tasas de error.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", puerto: int = 0, latencia_ms: float = 300.0,
+                 dispersion: float = 0.5, distribucion: str = "lognormal", tokens_por_segundo: float = 80.0,
+                 tokens_respuesta: int = 400, tasa_429: float = 0.0, retry_after: float = 0.5,
+                 tasa_500: float = 0.0, semilla: int = None):
+        """
+        Inicializar el servidor.
+
+        Args:
+            host (str): Dirección en la que escuchar
+            puerto (int): Puerto TCP (0 elige uno libre; ver `url`)
+            latencia_ms (float): Latencia hasta el primer token: valor fijo, centro de la uniforme
+                o mediana de la lognormal
+            dispersion (float): Semiancho relativo de la uniforme o sigma de la lognormal
+            distribucion (str): "fija", "uniforme" o "lognormal"
+            tokens_por_segundo (float): Ritmo de generación tras el primer token
+            tokens_respuesta (int): Tokens de cada respuesta
+            tasa_429 (float): Fracción de peticiones que responden 429 (límite de tasa)
+            retry_after (float): Segundos de la cabecera Retry-After de las respuestas 429
+            tasa_500 (float): Fracción de peticiones que responden 500
+            semilla (int, optional): Semilla de las latencias y los errores
+        """
+        if distribucion not in DISTRIBUCIONES:
+            raise ValueError(f"Distribución desconocida: {distribucion} (opciones: {', '.join(DISTRIBUCIONES)})")
+        super().__init__((host, puerto), _ManejadorStub)
+        self.latencia_ms = latencia_ms
+        self.dispersion = dispersion
+        self.distribucion = distribucion
+        self.tokens_por_segundo = tokens_por_segundo
+        self.tokens_respuesta = tokens_respuesta
+        self.tasa_429 = tasa_429
+        self.retry_after = retry_after
+        self.tasa_500 = tasa_500
+        self._rng = random.Random(semilla)
+        self._lock = threading.Lock()
+        self._estadisticas = {"peticiones": 0, "correctas": 0, "errores_429": 0, "errores_500": 0,
+                              "en_curso": 0, "max_en_curso": 0}
+
+    @property
+    def url(self) -> str:
+        """URL base para usar como endpoint de RAGSistema."""
+        host, puerto = self.server_address[:2]
+        return f"http://{host}:{puerto}"
+
+    def sortear(self) -> Dict[str, Any]:
+        """Elegir el resultado de una petición: error inyectado o latencia hasta el primer token."""
+        with self._lock:
+            azar = self._rng.random()
+            if azar < self.tasa_429:
+                return {"error": 429}
+            if azar < self.tasa_429 + self.tasa_500:
+                return {"error": 500}
+            if self.distribucion == "fija":
+                latencia = self.latencia_ms
+            elif self.distribucion == "uniforme":
+                latencia = self.latencia_ms * self._rng.uniform(1 - self.dispersion, 1 + self.dispersion)
+            else:
+                latencia = self._rng.lognormvariate(math.log(self.latencia_ms), self.dispersion)
+            return {"latencia_s": max(0.0, latencia) / 1000}
+
+    def contar(self, campo: str, delta: int = 1):
+        with self._lock:
+            self._estadisticas[campo] += delta
+            if campo == "en_curso":
+                self._estadisticas["max_en_curso"] = max(self._estadisticas["max_en_curso"],
+                                                         self._estadisticas["en_curso"])
+
+    def estadisticas(self) -> Dict[str, int]:
+        """Peticiones recibidas, correctas, errores inyectados y máxima concurrencia observada."""
+        with self._lock:
+            return dict(self._estadisticas)
+
+
+def texto_respuesta(tokens: int) -> List[str]:
+    """Documento con la estructura que espera parsear_secciones, en `tokens` fragmentos (~1 token cada uno)."""
+    encabezado = ["Título: Documento de prueba\n", "Tipo: practica\n", "Materia: Pruebas de carga\n",
+                  "Presenta: Alumno\n", "Profesor: Docente\n\n", "Introducción:\n"]
+    cuerpo = [f"{_PALABRAS[i % len(_PALABRAS)]} " for i in range(max(0, tokens - len(encabezado) - 2))]
+    mitad = len(cuerpo) // 2
+    return encabezado + cuerpo[:mitad] + ["\n\nDesarrollo:\n"] + cuerpo[mitad:] + ["\n\nConclusión:\nfin."]
+
+
+class _ManejadorStub(BaseHTTPRequestHandler):
+    """Atiende POST /v1/chat/completions y GET /estadisticas."""
+
+    server: ServidorStub
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path == "/estadisticas":
+            self._responder(200, self.server.estadisticas())
+        else:
+            self._responder(404, {"error": {"message": f"Ruta no encontrada: {self.path}"}})
+
+    def do_POST(self):
+        longitud = int(self.headers.get("Content-Length", 0))
+        cuerpo = self.rfile.read(longitud)
+        if self.path != "/v1/chat/completions":
+            self._responder(404, {"error": {"message": f"Ruta no encontrada: {self.path}"}})
+            return
+        try:
+            peticion = json.loads(cuerpo or b"{}")
+            mensajes = peticion["messages"]
+        except (ValueError, KeyError) as e:
+            self._responder(400, {"error": {"message": f"Petición inválida: {e}"}})
+            return
+
+        servidor = self.server
+        servidor.contar("peticiones")
+        sorteo = servidor.sortear()
+        if sorteo.get("error") == 429:
+            servidor.contar("errores_429")
+            self._responder(429, {"error": {"message": "Rate limit exceeded (stub)"}},
+                            {"Retry-After": f"{servidor.retry_after:g}"})
+            return
+        if sorteo.get("error") == 500:
+            servidor.contar("errores_500")
+            self._responder(500, {"error": {"message": "Internal error (stub)"}})
+            return
+
+        servidor.contar("en_curso")
+        try:
+            tokens = texto_respuesta(servidor.tokens_respuesta)
+            inicio = time.monotonic() + sorteo["latencia_s"]
+            intervalo = 1.0 / servidor.tokens_por_segundo if servidor.tokens_por_segundo > 0 else 0.0
+            if peticion.get("stream"):
+                self._responder_stream(tokens, inicio, intervalo)
+            else:
+                time.sleep(max(0.0, inicio + intervalo * len(tokens) - time.monotonic()))
+                tokens_prompt = sum(len(str(m.get("content", ""))) for m in mensajes) // 4
+                self._responder(200, {
+                    "id": "stub", "object": "chat.completion", "model": peticion.get("model", "stub"),
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": "".join(tokens)}}],
+                    "usage": {"prompt_tokens": tokens_prompt, "completion_tokens": len(tokens),
+                              "total_tokens": tokens_prompt + len(tokens)},
+                })
+            servidor.contar("correctas")
+        except (BrokenPipeError, ConnectionResetError):
+            # El cliente abandonó la petición (p. ej. por timeout)
+            self.close_connection = True
+        finally:
+            servidor.contar("en_curso", -1)
+
+    def _responder(self, estado: int, datos: Dict[str, Any], cabeceras: Dict[str, str] = None):
+        cuerpo = json.dumps(datos, ensure_ascii=False).encode("utf-8")
+        self.send_response(estado)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        for nombre, valor in (cabeceras or {}).items():
+            self.send_header(nombre, valor)
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def _responder_stream(self, tokens: List[str], inicio: float, intervalo: float):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i, token in enumerate(tokens):
+            # Los tiempos se calculan desde el inicio para que las esperas no acumulen deriva
+            time.sleep(max(0.0, inicio + intervalo * i - time.monotonic()))
+            evento = {"choices": [{"index": 0, "delta": {"content": token}}]}
+            self._enviar_bloque(f"data: {json.dumps(evento, ensure_ascii=False)}\n\n".encode("utf-8"))
+        self._enviar_bloque(b"data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _enviar_bloque(self, datos: bytes):
+        self.wfile.write(f"{len(datos):X}\r\n".encode("ascii") + datos + b"\r\n")
+        self.wfile.flush()
+
+    def log_message(self, formato, *args):
+        pass
+
+
+def agregar_argumentos_stub(parser: argparse.ArgumentParser):
+    """Añadir a un parser las opciones de configuración del servidor stub."""
+    parser.add_argument('--latencia-ms', type=float, default=300.0,
+                        help='Latencia hasta el primer token en ms (mediana con lognormal; por defecto: 300)')
+    parser.add_argument('--dispersion', type=float, default=0.5,
+                        help='Sigma de la lognormal o semiancho relativo de la uniforme (por defecto: 0.5)')
+    parser.add_argument('--distribucion', type=str, choices=list(DISTRIBUCIONES), default='lognormal',
+                        help='Distribución de la latencia (por defecto: lognormal)')
+    parser.add_argument('--tokens-por-segundo', type=float, default=80.0, help='Ritmo de generación (por defecto: 80)')
+    parser.add_argument('--tokens-respuesta', type=int, default=400, help='Tokens por respuesta (por defecto: 400)')
+    parser.add_argument('--tasa-429', type=float, default=0.0, help='Fracción de peticiones que responden 429')
+    parser.add_argument('--retry-after', type=float, default=0.5, help='Segundos de Retry-After en las respuestas 429')
+    parser.add_argument('--tasa-500', type=float, default=0.0, help='Fracción de peticiones que responden 500')
+
+
+def crear_stub(args: argparse.Namespace, host: str = "127.0.0.1", puerto: int = 0,
+               semilla: int = None) -> ServidorStub:
+    """Crear el servidor stub a partir de las opciones de agregar_argumentos_stub."""
+    return ServidorStub(host=host, puerto=puerto, latencia_ms=args.latencia_ms, dispersion=args.dispersion,
+                        distribucion=args.distribucion, tokens_por_segundo=args.tokens_por_segundo,
+                        tokens_respuesta=args.tokens_respuesta, tasa_429=args.tasa_429,
+                        retry_after=args.retry_after, tasa_500=args.tasa_500, semilla=semilla)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Servidor local que imita /v1/chat/completions (latencia, ritmo de tokens, 429 y streaming)'
+    )
+    parser.add_argument('--host', type=str, default="127.0.0.1", help='Dirección en la que escuchar')
+    parser.add_argument('--puerto', type=int, default=8900, help='Puerto en el que escuchar (por defecto: 8900)')
+    parser.add_argument('--semilla', type=int, default=None, help='Semilla de las latencias y los errores')
+    agregar_argumentos_stub(parser)
+
+    args = parser.parse_args()
+
+    servidor = crear_stub(args, args.host, args.puerto, args.semilla)
+    print(f"🧪 Stub de chat completions escuchando en {servidor.url}")
+    print(f"Para usarlo: GITHUB_TOKEN=stub python generar_documento.py \"tema\" --endpoint {servidor.url}")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\nDeteniendo stub: {servidor.estadisticas()}")
+    finally:
+        servidor.server_close()
+
+
+if __name__ == "__main__":
+    main()
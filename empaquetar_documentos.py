@@ -0,0 +1,168 @@
+import argparse
+import json
+import os
+import time
+from typing import Dict, Any, List, Tuple
+
+from rag.documentos_manager import ARCHIVO_ALMACEN
+
+# La raíz del proyecto: los directorios por defecto son los mismos que usa DocumentosManager
+RAIZ = os.path.dirname(os.path.abspath(__file__))
+
+
+def leer_json(directorios: List[str]) -> Tuple[List[Tuple[str, Dict[str, Any]]], List[str]]:
+    """
+    Leer los documentos JSON sueltos de varios directorios.
+
+    Returns:
+        Tuple[List[Tuple[str, Dict]], List[str]]: ((id, documento) de cada archivo válido,
+        rutas de esos archivos)
+    """
+    documentos, rutas = [], []
+    for directorio in directorios:
+        if not os.path.isdir(directorio):
+            print(f"Advertencia: el directorio {directorio} no existe")
+            continue
+        with os.scandir(directorio) as entradas:
+            for entrada in sorted(entradas, key=lambda e: e.name):
+                if not entrada.name.endswith('.json') or not entrada.is_file():
+                    continue
+                try:
+                    with open(entrada.path, 'r', encoding='utf-8') as f:
+                        documento = json.load(f)
+                except (OSError, UnicodeDecodeError, json.JSONDecodeError) as e:
+                    print(f"❌ {entrada.path}: {e}")
+                    continue
+                if not isinstance(documento, dict):
+                    print(f"❌ {entrada.path}: no contiene un documento (objeto JSON)")
+                    continue
+                documentos.append((entrada.name, documento))
+                rutas.append(entrada.path)
+    return documentos, rutas
+
+
+def importar(args) -> None:
+    """Empaquetar los JSON sueltos en el almacén (los ids existentes se sustituyen)."""
+    from rag.almacen_documentos import AlmacenDocumentos
+
+    inicio = time.perf_counter()
+    documentos, rutas = leer_json(args.origen)
+    if not documentos:
+        print("No se encontraron documentos JSON que importar")
+        return
+    repetidos = len(documentos) - len({id_documento for id_documento, _ in documentos})
+    if repetidos:
+        print(f"Advertencia: {repetidos} archivos repiten el nombre de otro; se conserva el último leído")
+
+    almacen = AlmacenDocumentos(args.almacen)
+    total = almacen.importar(documentos)
+    print(f"✅ {total} documentos importados en {args.almacen} ({len(almacen)} en total) "
+          f"en {time.perf_counter() - inicio:.2f}s")
+
+    # Los JSON solo se borran tras confirmar la transacción
+    if args.eliminar_json:
+        for ruta in rutas:
+            os.remove(ruta)
+        print(f"🗑️ {len(rutas)} archivos JSON eliminados")
+    almacen.cerrar()
+
+
+def exportar(args) -> None:
+    """Escribir cada documento del almacén como un JSON suelto con su id como nombre de archivo."""
+    from rag.almacen_documentos import AlmacenDocumentos
+
+    if not os.path.exists(args.almacen):
+        print(f"Error: el almacén {args.almacen} no existe")
+        return
+
+    almacen = AlmacenDocumentos(args.almacen)
+    documentos, _, _ = almacen.cambios()
+    almacen.cerrar()
+    os.makedirs(args.destino, exist_ok=True)
+    escritos, omitidos = 0, 0
+    for documento in documentos:
+        ruta = os.path.join(args.destino, documento.pop('id'))
+        if os.path.exists(ruta) and not args.sobrescribir:
+            omitidos += 1
+            continue
+        with open(ruta, 'w', encoding='utf-8') as f:
+            json.dump(documento, f, ensure_ascii=False, indent=2)
+        escritos += 1
+    print(f"✅ {escritos} documentos exportados a {args.destino}")
+    if omitidos:
+        print(f"⚠️ {omitidos} ya existían y no se sobrescribieron (usa --sobrescribir)")
+
+
+def listar(args) -> None:
+    """Listar los documentos del almacén sin leer su contenido."""
+    from rag.almacen_documentos import AlmacenDocumentos
+
+    if not os.path.exists(args.almacen):
+        print(f"Error: el almacén {args.almacen} no existe")
+        return
+
+    almacen = AlmacenDocumentos(args.almacen)
+    filas = almacen.listar(tipo=args.tipo, materia=args.materia, profesor=args.profesor)
+    almacen.cerrar()
+    for fila in filas:
+        print(f"{fila['id']}\t{fila['tipo'] or '-'}\t{fila['materia'] or '-'}\t{fila['titulo']}")
+    print(f"\n📚 {len(filas)} documentos")
+
+
+def respaldar(args) -> None:
+    """Copiar el almacén a un archivo aparte (una sola copia, aunque haya escrituras en curso)."""
+    from rag.almacen_documentos import AlmacenDocumentos
+
+    if not os.path.exists(args.almacen):
+        print(f"Error: el almacén {args.almacen} no existe")
+        return
+
+    inicio = time.perf_counter()
+    almacen = AlmacenDocumentos(args.almacen)
+    almacen.respaldar(args.destino)
+    print(f"✅ {len(almacen)} documentos copiados a {args.destino} en {time.perf_counter() - inicio:.2f}s")
+    almacen.cerrar()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Empaquetar el corpus en un único archivo SQLite (arranque y copias de seguridad más rápidos '
+                    'con miles de documentos) o volver a exportarlo como un JSON por documento'
+    )
+    parser.add_argument('--almacen', type=str, default=os.path.join(RAIZ, 'documentos', ARCHIVO_ALMACEN),
+                        help=f'Archivo del corpus empaquetado (por defecto: documentos/{ARCHIVO_ALMACEN}, '
+                             'que el sistema RAG usa automáticamente si existe)')
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+
+    parser_importar = subparsers.add_parser('importar', help='Añadir los JSON sueltos al almacén')
+    parser_importar.add_argument('--origen', type=str, nargs='+',
+                                 default=[os.path.join(RAIZ, 'documentos'), os.path.join(RAIZ, 'rag')],
+                                 help='Directorios con los JSON (por defecto: documentos/ y rag/)')
+    parser_importar.add_argument('--eliminar-json', action='store_true',
+                                 help='Borrar los JSON importados (si no, se siguen leyendo en cada arranque '
+                                      'aunque el almacén tenga prioridad)')
+    parser_importar.set_defaults(funcion=importar)
+
+    parser_exportar = subparsers.add_parser('exportar', help='Escribir un JSON por documento del almacén')
+    parser_exportar.add_argument('--destino', type=str, default=os.path.join(RAIZ, 'documentos'),
+                                 help='Directorio de salida (por defecto: documentos/)')
+    parser_exportar.add_argument('--sobrescribir', action='store_true',
+                                 help='Sobrescribir los JSON que ya existan')
+    parser_exportar.set_defaults(funcion=exportar)
+
+    parser_listar = subparsers.add_parser('listar', help='Listar id, tipo, materia y título de los documentos')
+    parser_listar.add_argument('--tipo', type=str, default=None, help='Solo documentos de este tipo')
+    parser_listar.add_argument('--materia', type=str, default=None, help='Solo documentos de esta materia')
+    parser_listar.add_argument('--profesor', type=str, default=None, help='Solo documentos de este profesor')
+    parser_listar.set_defaults(funcion=listar)
+
+    parser_respaldar = subparsers.add_parser('respaldar', help='Copiar el almacén a otro archivo')
+    parser_respaldar.add_argument('destino', type=str, help='Archivo de la copia de seguridad')
+    parser_respaldar.set_defaults(funcion=respaldar)
+
+    args = parser.parse_args()
+    args.funcion(args)
+
+
+if __name__ == "__main__":
+    main()
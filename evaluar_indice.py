@@ -0,0 +1,162 @@
+import argparse
+import tempfile
+from typing import TYPE_CHECKING
+
+# numpy y los índices se importan dentro de las funciones para que --help sea inmediato
+if TYPE_CHECKING:
+    import numpy as np
+    from rag.indice_vectorial import IndiceVectorial
+
+
+def cargar_indice_corpus() -> "IndiceVectorial":
+    """Sincronizar y devolver el índice de pasajes del corpus del usuario."""
+    from rag.rag_sistema import RAGSistema
+
+    # No se llama al modelo: el token no hace falta para indexar
+    rag = RAGSistema(token="")
+    rag.indexar()
+    return rag.embeddings_manager.indice
+
+
+def crear_indice_sintetico(directorio: str, filas: int, dim: int, grupos: int, semilla: int) -> "IndiceVectorial":
+    """Crear un índice con vectores agrupados al azar, para probar configuraciones sin corpus grande."""
+    import numpy as np
+    from rag.indice_vectorial import IndiceVectorial
+
+    rng = np.random.default_rng(semilla)
+    centros = rng.standard_normal((grupos, dim)).astype(np.float32)
+    indice = IndiceVectorial(directorio)
+    claves = [str(i) for i in range(filas)]
+    vectores = np.empty((filas, dim), dtype=np.float32)
+    for inicio in range(0, filas, 8192):
+        n = min(8192, filas - inicio)
+        vectores[inicio:inicio + n] = centros[rng.integers(0, grupos, n)] + 0.6 * rng.standard_normal((n, dim))
+    indice.construir("sintetico", claves, claves, vectores)
+    return indice
+
+
+def informe_ivf(args, indice: "IndiceVectorial", directorio: str, consultas: "np.ndarray"):
+    """Entrenar un IVF de evaluación e imprimir recall y latencia por nprobe."""
+    from rag.indice_ivf import IndiceIVF, medir_recall
+
+    # El IVF de evaluación se guarda aparte para no tocar el del sistema
+    ivf = IndiceIVF(directorio, nombre="evaluacion")
+    print(f"Entrenando IVF sobre {len(indice)} filas...")
+    ivf.entrenar(indice.matriz, indice.generacion, num_listas=args.listas, semilla=args.semilla)
+
+    informe = medir_recall(indice, ivf, consultas, top_k=args.top_k, nprobes=args.nprobe)
+
+    print(f"\n📊 {len(indice)} filas, {ivf.centroides.shape[0]} listas, {len(consultas)} consultas, recall@{args.top_k}\n")
+    print(f"{'nprobe':>8} {'recall':>8} {'ms media':>10} {'ms p95':>10} {'explorado':>10}")
+    for fila in informe:
+        nombre = "exacto" if fila["nprobe"] is None else str(fila["nprobe"])
+        print(f"{nombre:>8} {fila['recall']:>8.3f} {fila['ms_media']:>10.3f} {fila['ms_p95']:>10.3f} "
+              f"{fila['fraccion_explorada']:>9.1%}")
+    print("\nUsa el menor nprobe con un recall aceptable: python servidor_rag.py --nprobe N")
+
+
+def informe_cuantizado(args, indice: "IndiceVectorial", directorio: str, consultas: "np.ndarray"):
+    """Cuantizar el índice con cada tipo e imprimir recall, latencia y memoria por factor de candidatos."""
+    from rag.indice_cuantizado import IndiceCuantizado, medir_recall_cuantizado
+
+    cuantizados = []
+    for tipo in args.cuantizacion:
+        # Las copias de evaluación se guardan aparte para no tocar las del sistema
+        cuantizado = IndiceCuantizado(directorio, nombre="evaluacion", tipo=tipo)
+        print(f"Cuantizando {len(indice)} filas a {tipo}...")
+        cuantizado.sincronizar(indice.instantanea())
+        cuantizados.append(cuantizado)
+
+    informe = medir_recall_cuantizado(indice, cuantizados, consultas, top_k=args.top_k,
+                                      factores=args.factor_candidatos)
+
+    print(f"\n📊 {len(indice)} filas, {len(consultas)} consultas, recall@{args.top_k}\n")
+    print(f"{'tipo':>8} {'factor':>7} {'recall':>8} {'sin rerank':>11} {'ms media':>10} {'ms p95':>10} "
+          f"{'bytes/vec':>10} {'memoria':>8}")
+    for fila in informe:
+        factor = "-" if fila["factor"] is None else str(fila["factor"])
+        print(f"{fila['tipo']:>8} {factor:>7} {fila['recall']:>8.3f} {fila['recall_sin_reranking']:>11.3f} "
+              f"{fila['ms_media']:>10.3f} {fila['ms_p95']:>10.3f} {fila['bytes_por_vector']:>10} "
+              f"{fila['memoria_relativa']:>7.0%}")
+    print("\nUsa el tipo más pequeño con un recall aceptable: python servidor_rag.py --cuantizacion TIPO")
+
+
+def informe_paralelo(args, indice: "IndiceVectorial", consultas: "np.ndarray"):
+    """Imprimir la latencia de la búsqueda exacta repartida entre distintos números de procesos."""
+    import numpy as np
+    from rag.busqueda_paralela import BuscadorParalelo
+    from rag.indice_vectorial import cronometrar_busquedas
+
+    exactos, tiempos = cronometrar_busquedas(lambda q: indice.buscar(q, args.top_k), consultas)
+    print(f"\n📊 {len(indice)} filas, {len(consultas)} consultas, top-{args.top_k}\n")
+    print(f"{'procesos':>8} {'iguales':>8} {'ms media':>10} {'ms p95':>10} {'aceleración':>12}")
+    print(f"{'exacto':>8} {'-':>8} {tiempos.mean():>10.3f} {np.percentile(tiempos, 95):>10.3f} {'1.00x':>12}")
+    base = tiempos.mean()
+    for procesos in args.procesos:
+        buscador = BuscadorParalelo(procesos)
+        instantanea = indice.instantanea()
+        # La primera búsqueda arranca los procesos y mapea la matriz: no se cronometra
+        buscador.buscar(instantanea, consultas[0], args.top_k)
+        resultados, tiempos = cronometrar_busquedas(lambda q: buscador.buscar(instantanea, q, args.top_k),
+                                                    consultas)
+        buscador.cerrar()
+        iguales = np.mean([r == e for r, e in zip(resultados, exactos)])
+        print(f"{procesos:>8} {iguales:>8.1%} {tiempos.mean():>10.3f} {np.percentile(tiempos, 95):>10.3f} "
+              f"{base / tiempos.mean():>11.2f}x")
+    print("\nUsa tantos procesos como mejoren la latencia: python servidor_rag.py --procesos-busqueda N")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Medir recall@k y latencia del índice aproximado IVF, de la búsqueda cuantizada '
+                    'o de la búsqueda en varios procesos frente a la búsqueda exacta'
+    )
+    parser.add_argument('--top-k', type=int, default=10, help='k del recall@k (por defecto: 10)')
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32],
+                        help='Valores de nprobe a evaluar')
+    parser.add_argument('--listas', type=int, default=None, help='Número de listas IVF (por defecto: √n)')
+    parser.add_argument('--cuantizacion', type=str, nargs='+', choices=['float16', 'int8'], default=None,
+                        help='Evaluar la búsqueda cuantizada con estos tipos en lugar del IVF')
+    parser.add_argument('--factor-candidatos', type=int, nargs='+', default=[1, 2, 4, 8],
+                        help='Candidatos re-puntuados por resultado a evaluar con --cuantizacion')
+    parser.add_argument('--procesos', type=int, nargs='+', default=None,
+                        help='Medir la búsqueda exacta repartida entre estos números de procesos en lugar del IVF')
+    parser.add_argument('--consultas', type=int, default=200, help='Número de consultas de prueba')
+    parser.add_argument('--sintetico', type=int, default=None,
+                        help='Evaluar sobre N vectores sintéticos en lugar del corpus del usuario')
+    parser.add_argument('--dim', type=int, default=1536, help='Dimensión de los vectores sintéticos')
+    parser.add_argument('--semilla', type=int, default=0, help='Semilla para el muestreo y los datos sintéticos')
+
+    args = parser.parse_args()
+
+    import numpy as np
+
+    if args.sintetico:
+        directorio = tempfile.mkdtemp(prefix="scriptorium_indice_")
+        print(f"Generando {args.sintetico} vectores sintéticos de dimensión {args.dim}...")
+        indice = crear_indice_sintetico(directorio, args.sintetico, args.dim, grupos=max(1, args.sintetico // 500),
+                                        semilla=args.semilla)
+    else:
+        indice = cargar_indice_corpus()
+        directorio = tempfile.mkdtemp(prefix="scriptorium_indice_")
+
+    if len(indice) == 0:
+        print("Error: el índice está vacío. Agrega documentos primero.")
+        return
+
+    # Consultas: filas del índice con algo de ruido, para no buscar exactamente un vector existente
+    rng = np.random.default_rng(args.semilla + 1)
+    filas = rng.choice(len(indice), size=min(args.consultas, len(indice)), replace=False)
+    consultas = np.asarray(indice.matriz[np.sort(filas)], dtype=np.float32)
+    consultas += 0.3 * rng.standard_normal(consultas.shape).astype(np.float32) / np.sqrt(consultas.shape[1])
+
+    if args.procesos:
+        informe_paralelo(args, indice, consultas)
+    elif args.cuantizacion:
+        informe_cuantizado(args, indice, directorio, consultas)
+    else:
+        informe_ivf(args, indice, directorio, consultas)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,47 @@
 import os
 import argparse
-from rag.rag_sistema import RAGSistema
+from rag.cliente import ClienteRAG
+from rag.metricas import FORMATOS as FORMATOS_METRICAS, activar_salida as activar_salida_metricas
+from rag.secciones import parsear_secciones
+from rag.tokens import PRESUPUESTO_ENTRADA, resumen_informe
+
+def guardar_documento_generado(documento_generado: str, tema: str, tipo: str = None):
+    """
+    Parsear un documento generado y guardarlo como JSON de ejemplo.
+    
+    Args:
+        documento_generado (str): Texto devuelto por el modelo
+        tema (str): Tema usado como título si no se encuentra uno
+        tipo (str, optional): Tipo a usar si el texto no lo incluye
+    """
+    from rag.documentos_manager import DocumentosManager
+    
+    # Intentar parsear el documento generado
+    doc_dict = parsear_secciones(documento_generado)
+    
+    # Si no se pudo extraer el título, usar el tema
+    if not doc_dict['titulo']:
+        doc_dict['titulo'] = tema
+        
+    # Si se especificó un tipo y no se pudo extraer del texto, usarlo
+    if tipo and not doc_dict['tipo']:
+        doc_dict['tipo'] = tipo
+    
+    # Guardar documento
+    manager = DocumentosManager()
+    archivo = manager.guardar_documento(doc_dict)
+    print(f"Documento guardado en: {archivo}")
 
 def main():
     parser = argparse.ArgumentParser(description='Generar documentos con mi estilo de escritura')
     parser.add_argument('tema', type=str, help='Tema del documento a generar')
     parser.add_argument('--tipo', type=str, default=None, 
-                        help='Tipo de documento (practica, investigacion, ensayo, etc.)')
+                        help='Tipo de documento (practica, investigacion, ensayo, etc.); los ejemplos se toman '
+                             'de documentos de ese tipo si los hay')
+    parser.add_argument('--materia', type=str, default=None,
+                        help='Usar como ejemplos solo documentos de esta materia')
+    parser.add_argument('--profesor', type=str, default=None,
+                        help='Usar como ejemplos solo documentos de este profesor')
     parser.add_argument('--contexto', type=str, default=None,
                         help='Archivo de texto plano con contexto adicional para el RAG')
     parser.add_argument('--contexto-texto', type=str, default=None,
@@ -19,16 +54,48 @@ def main():
                         help='Endpoint personalizado para la API (por defecto: https://models.github.ai/inference)')
     parser.add_argument('--temperatura', type=float, default=0.7, help='Temperatura para la generación (0.0-1.0)')
     parser.add_argument('--max-tokens', type=int, default=32768, help='Longitud máxima del documento (máximo 32768)')
+    parser.add_argument('--presupuesto-tokens', type=int, default=PRESUPUESTO_ENTRADA,
+                        help='Máximo de tokens de entrada del prompt; se descartan primero los ejemplos menos relevantes')
     parser.add_argument('--top-p', type=float, default=1.0, help='Nucleus sampling (0.0-1.0)')
     parser.add_argument('--frequency-penalty', type=float, default=0.0, help='Penalización de frecuencia (-2.0 a 2.0)')
     parser.add_argument('--presence-penalty', type=float, default=0.0, help='Penalización de presencia (-2.0 a 2.0)')
     parser.add_argument('--guardar', action='store_true', help='Guardar el documento generado')
+    parser.add_argument('--variantes', type=int, default=1,
+                        help='Número de versiones a generar en paralelo (2-5) compartiendo la búsqueda de ejemplos')
+    parser.add_argument('--sin-streaming', action='store_true',
+                        help='Esperar la respuesta completa en lugar de mostrarla según se genera')
+    parser.add_argument('--cache', action='store_true',
+                        help='Reutilizar la respuesta guardada si se repite exactamente la misma petición '
+                             '(con servidor, requiere arrancarlo con servidor_rag.py --cache)')
+    parser.add_argument('--refrescar-cache', action='store_true',
+                        help='Ignorar la respuesta en caché y volver a pedirla al modelo')
+    parser.add_argument('--seed', type=int, default=None, help='Semilla para respuestas reproducibles')
+    parser.add_argument('--modelo-embeddings', type=str, default=None,
+                        help='Modelo de embeddings del endpoint (p. ej. openai/text-embedding-3-small); '
+                             'por defecto se usa el embedder local (con servidor, debe ser el suyo)')
+    parser.add_argument('--modo-busqueda', type=str, choices=['vectorial', 'lexico', 'hibrido'], default=None,
+                        help='Búsqueda de ejemplos: vectorial (embeddings), lexico (BM25) o hibrido (ambos fusionados); '
+                             'por defecto vectorial, o el modo del servidor')
+    parser.add_argument('--servidor', type=str, default=None,
+                        help='URL del servidor RAG (servidor_rag.py). Por defecto se usa SCRIPTORIUM_SERVIDOR si está definida')
+    parser.add_argument('--metricas', '--metrics', type=str, choices=list(FORMATOS_METRICAS), default=None,
+                        help='Emitir el tiempo de cada etapa, los aciertos de caché, los tokens y los reintentos '
+                             'como líneas JSON (según ocurren) o en formato Prometheus (al terminar)')
+    parser.add_argument('--archivo-metricas', type=str, default=None,
+                        help='Archivo donde añadir las métricas (por defecto se escriben en stderr)')
     
     args = parser.parse_args()
     
-    # Obtener token desde variable de entorno
+    # Usar el servidor RAG persistente si está configurado y responde
+    cliente = ClienteRAG.desde_entorno(args.servidor, modo_busqueda=args.modo_busqueda,
+                                       modelo_embeddings=args.modelo_embeddings, cache=args.cache)
+    if cliente and not cliente.disponible():
+        print(f"Advertencia: el servidor RAG en {cliente.url} no responde, se usará el sistema local")
+        cliente = None
+    
+    # Obtener token desde variable de entorno (solo necesario sin servidor)
     token = os.environ.get("GITHUB_TOKEN")
-    if not token:
+    if not cliente and not token:
         print("Error: La variable de entorno GITHUB_TOKEN no está configurada")
         return
     
@@ -58,9 +125,29 @@ def main():
             print(f"Error al leer el archivo de prompt: {e}")
             return
     
+    # Métricas por etapa; con servidor, la recuperación y el modelo se miden en el servidor
+    if args.metricas:
+        activar_salida_metricas(args.metricas, args.archivo_metricas)
+        if cliente:
+            print("Aviso: con servidor RAG las etapas de búsqueda y modelo se miden en el servidor "
+                  "(servidor_rag.py --metricas)")
+    
     # Inicializar sistema RAG
     endpoint = args.endpoint if args.endpoint else None
-    rag = RAGSistema(token=token, endpoint=endpoint) if endpoint else RAGSistema(token=token)
+    cache = None
+    if cliente:
+        print(f"Usando servidor RAG: {cliente.url}")
+    else:
+        from rag.cache_respuestas import CacheRespuestas
+        from rag.rag_sistema import RAGSistema
+        cache = CacheRespuestas() if args.cache else None
+        if endpoint:
+            rag = RAGSistema(token=token, endpoint=endpoint, cache_respuestas=cache,
+                             modelo_embeddings=args.modelo_embeddings,
+                             modo_busqueda=args.modo_busqueda or 'vectorial')
+        else:
+            rag = RAGSistema(token=token, cache_respuestas=cache, modelo_embeddings=args.modelo_embeddings,
+                             modo_busqueda=args.modo_busqueda or 'vectorial')
     
     # Generar documento
     print(f"Generando documento sobre: {args.tema}")
@@ -79,57 +166,62 @@ def main():
         'frequency_penalty': args.frequency_penalty,
         'presence_penalty': args.presence_penalty,
         'tipo': args.tipo,
+        'filtros': {'materia': args.materia, 'profesor': args.profesor},
         'contexto_adicional': contexto_adicional,
-        'prompt_personalizado': prompt_personalizado
+        'prompt_personalizado': prompt_personalizado,
+        'presupuesto_tokens': args.presupuesto_tokens,
+        'seed': args.seed,
+        'refrescar_cache': args.refrescar_cache
     }
     
-    documento_generado = rag.generar_documento(args.tema, parametros)
+    if args.variantes > 1:
+        if cliente:
+            variantes = cliente.generar_variantes(args.tema, args.variantes, parametros, endpoint=endpoint)
+        else:
+            variantes = rag.generar_variantes(args.tema, args.variantes, parametros)
+        
+        # Mostrar cada versión en cuanto termina (también con servidor: llegan una a una)
+        for indice, resultado in variantes:
+            if isinstance(resultado, Exception):
+                print(f"\nError en la versión {indice + 1}: {resultado}\n")
+                continue
+            print(f"\n=============== VERSIÓN {indice + 1} ===============\n")
+            print(resultado)
+            print("\n=================================================\n")
+            if args.guardar:
+                guardar_documento_generado(resultado, args.tema, args.tipo)
+        if cache:
+            print(f"💾 {cache.resumen()}")
+        return
     
-    # Mostrar documento generado
+    streaming = not args.sin_streaming
+    informe = {}
+    if cliente:
+        documento_generado = cliente.generar_documento(args.tema, parametros, endpoint=endpoint, stream=streaming,
+                                                       informe=informe)
+    else:
+        documento_generado = rag.generar_documento(args.tema, parametros, stream=streaming, informe=informe)
+    
+    # Mostrar documento generado (fragmento a fragmento en modo streaming)
     print("\n=============== DOCUMENTO GENERADO ===============\n")
-    print(documento_generado)
+    if streaming:
+        fragmentos = []
+        for fragmento in documento_generado:
+            print(fragmento, end="", flush=True)
+            fragmentos.append(fragmento)
+        documento_generado = "".join(fragmentos)
+        print()
+    else:
+        print(documento_generado)
     print("\n=================================================\n")
+    if informe:
+        print(f"🧮 {resumen_informe(informe)}")
+    if cache:
+        print(f"💾 {cache.resumen()}")
     
     # Guardar documento si se solicitó
     if args.guardar:
-        from rag.documentos_manager import DocumentosManager
-        import json
-        import re
-        
-        # Intentar parsear el documento generado
-        doc_dict = {}
-        
-        # Patrones para extraer secciones
-        patrones = {
-            'titulo': r'T[ií]tulo:?\s*(.+?)(?:\n|$)',
-            'tipo': r'Tipo:?\s*(.+?)(?:\n|$)',
-            'materia': r'Materia:?\s*(.+?)(?:\n|$)',
-            'presenta': r'Presenta:?\s*(.+?)(?:\n|$)',
-            'profesor': r'Profesor:?\s*(.+?)(?:\n|$)',
-            'introduccion': r'Introducci[oó]n:?\s*([\s\S]+?)(?=Desarrollo:|Conclusi[oó]n:|$)',
-            'desarrollo': r'Desarrollo:?\s*([\s\S]+?)(?=Conclusi[oó]n:|$)',
-            'conclusion': r'Conclusi[oó]n:?\s*([\s\S]+)$'
-        }
-        
-        for campo, patron in patrones.items():
-            match = re.search(patron, documento_generado, re.IGNORECASE)
-            if match:
-                doc_dict[campo] = match.group(1).strip()
-            else:
-                doc_dict[campo] = ""
-        
-        # Si no se pudo extraer el título, usar el tema
-        if not doc_dict['titulo']:
-            doc_dict['titulo'] = args.tema
-            
-        # Si se especificó un tipo y no se pudo extraer del texto, usarlo
-        if args.tipo and not doc_dict['tipo']:
-            doc_dict['tipo'] = args.tipo
-        
-        # Guardar documento
-        manager = DocumentosManager()
-        archivo = manager.guardar_documento(doc_dict)
-        print(f"Documento guardado en: {archivo}")
+        guardar_documento_generado(documento_generado, args.tema, args.tipo)
 
 if __name__ == "__main__":
     main()
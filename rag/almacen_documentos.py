@@ -0,0 +1,246 @@
+import contextlib
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Campos del documento que se guardan también en columnas propias para listar y filtrar
+# sin leer el contenido
+CAMPOS_INDEXADOS = ("titulo", "tipo", "materia", "profesor")
+
+
+class AlmacenDocumentos:
+    """
+    Corpus empaquetado en un único archivo SQLite, alternativo a un JSON por documento.
+
+    Cada documento es una fila con su id (el nombre de archivo que tendría en documentos/),
+    las columnas indexadas de CAMPOS_INDEXADOS y el documento completo en JSON compacto.
+    Cada transacción que escribe incrementa la versión del almacén y marca con ella las
+    filas que cambia, así que un lector puede pedir solo los cambios desde su última lectura.
+    """
+
+    def __init__(self, ruta: str):
+        """
+        Inicializar el almacén.
+
+        Args:
+            ruta (str): Ruta del archivo SQLite (se crea si no existe)
+        """
+        self.ruta = ruta
+        os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+        # Sin transacciones implícitas: transaccion() las abre y cierra explícitamente
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False, isolation_level=None)
+        self._conexion.execute("PRAGMA journal_mode=WAL")
+        self._conexion.execute(
+            "CREATE TABLE IF NOT EXISTS documentos ("
+            "id TEXT PRIMARY KEY, titulo TEXT NOT NULL, tipo TEXT NOT NULL, materia TEXT NOT NULL, "
+            "profesor TEXT NOT NULL, cambio INTEGER NOT NULL, contenido TEXT NOT NULL)"
+        )
+        for campo in ("titulo", "tipo", "materia", "cambio"):
+            self._conexion.execute(f"CREATE INDEX IF NOT EXISTS documentos_{campo} ON documentos ({campo})")
+        # Ids eliminados (con la versión en que se eliminaron) para las lecturas incrementales
+        self._conexion.execute("CREATE TABLE IF NOT EXISTS eliminados (id TEXT PRIMARY KEY, cambio INTEGER NOT NULL)")
+        self._conexion.execute("CREATE TABLE IF NOT EXISTS meta (clave TEXT PRIMARY KEY, valor INTEGER NOT NULL)")
+        self._conexion.execute("INSERT OR IGNORE INTO meta (clave, valor) VALUES ('version', 0)")
+        self._lock = threading.RLock()
+        self._profundidad = 0
+        self._version_transaccion = 0
+
+    def version(self) -> int:
+        """Versión del almacén: aumenta con cada transacción que escribe (también desde otros procesos)."""
+        with self._lock:
+            return self._conexion.execute("SELECT valor FROM meta WHERE clave = 'version'").fetchone()[0]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conexion.execute("SELECT COUNT(*) FROM documentos").fetchone()[0]
+
+    @contextlib.contextmanager
+    def transaccion(self) -> Iterator[None]:
+        """
+        Agrupar varias escrituras en una sola transacción (y una sola versión).
+
+        Las llamadas a guardar() y eliminar() dentro del bloque se confirman juntas al salir,
+        o no se aplica ninguna si el bloque lanza una excepción. Se puede anidar.
+        """
+        with self._lock:
+            if self._profundidad == 0:
+                # IMMEDIATE toma el bloqueo de escritura al empezar: la versión leída no cambia
+                # hasta el commit aunque otro proceso quiera escribir
+                self._conexion.execute("BEGIN IMMEDIATE")
+                try:
+                    self._conexion.execute("UPDATE meta SET valor = valor + 1 WHERE clave = 'version'")
+                    self._version_transaccion = self._conexion.execute(
+                        "SELECT valor FROM meta WHERE clave = 'version'"
+                    ).fetchone()[0]
+                except BaseException:
+                    self._conexion.execute("ROLLBACK")
+                    raise
+            self._profundidad += 1
+            try:
+                yield
+            except BaseException:
+                self._profundidad -= 1
+                if self._profundidad == 0:
+                    self._conexion.execute("ROLLBACK")
+                raise
+            self._profundidad -= 1
+            if self._profundidad == 0:
+                self._conexion.execute("COMMIT")
+
+    def guardar(self, id_documento: str, documento: Dict[str, Any], evitar_colision: bool = False) -> str:
+        """
+        Guardar un documento.
+
+        Args:
+            id_documento (str): Id del documento (p. ej. "practica_swing.json")
+            documento (Dict[str, Any]): Documento (su campo 'id', si lo tiene, no se guarda)
+            evitar_colision (bool): Si el id ya existe, usar nombre_2.json, nombre_3.json... en lugar
+                de sustituir el documento
+
+        Returns:
+            str: Id con el que se guardó
+        """
+        fila = [documento.get(campo) or "" for campo in CAMPOS_INDEXADOS]
+        contenido = json.dumps({k: v for k, v in documento.items() if k != "id"}, ensure_ascii=False)
+        with self.transaccion():
+            cambio = self._version_transaccion
+            if not evitar_colision:
+                self._conexion.execute(
+                    "INSERT OR REPLACE INTO documentos (id, titulo, tipo, materia, profesor, cambio, contenido) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)", (id_documento, *fila, cambio, contenido)
+                )
+            else:
+                base, extension = os.path.splitext(id_documento)
+                sufijo = 1
+                while True:
+                    try:
+                        self._conexion.execute(
+                            "INSERT INTO documentos (id, titulo, tipo, materia, profesor, cambio, contenido) "
+                            "VALUES (?, ?, ?, ?, ?, ?, ?)", (id_documento, *fila, cambio, contenido)
+                        )
+                        break
+                    except sqlite3.IntegrityError:
+                        sufijo += 1
+                        id_documento = f"{base}_{sufijo}{extension}"
+            self._conexion.execute("DELETE FROM eliminados WHERE id = ?", (id_documento,))
+        return id_documento
+
+    def eliminar(self, id_documento: str) -> bool:
+        """
+        Eliminar un documento.
+
+        Returns:
+            bool: True si existía
+        """
+        with self.transaccion():
+            cursor = self._conexion.execute("DELETE FROM documentos WHERE id = ?", (id_documento,))
+            if cursor.rowcount:
+                self._conexion.execute("INSERT OR REPLACE INTO eliminados (id, cambio) VALUES (?, ?)",
+                                       (id_documento, self._version_transaccion))
+        return bool(cursor.rowcount)
+
+    def obtener(self, id_documento: str) -> Optional[Dict[str, Any]]:
+        """
+        Leer un documento por su id.
+
+        Returns:
+            Dict: Documento con su 'id', o None si no existe
+        """
+        with self._lock:
+            fila = self._conexion.execute("SELECT contenido FROM documentos WHERE id = ?", (id_documento,)).fetchone()
+        return None if fila is None else dict(json.loads(fila[0]), id=id_documento)
+
+    def cambios(self, desde: int = 0) -> Tuple[List[Dict[str, Any]], List[str], int]:
+        """
+        Leer los documentos escritos y los ids eliminados después de una versión.
+
+        Args:
+            desde (int): Última versión leída (0 lee todo el almacén)
+
+        Returns:
+            Tuple[List[Dict], List[str], int]: (documentos nuevos o modificados, ids eliminados,
+            versión leída). Ambas listas salen de la misma instantánea del almacén
+        """
+        with self._lock:
+            # Una transacción de lectura: la versión y las filas corresponden al mismo estado
+            self._conexion.execute("BEGIN")
+            try:
+                version = self._conexion.execute("SELECT valor FROM meta WHERE clave = 'version'").fetchone()[0]
+                filas = self._conexion.execute(
+                    "SELECT id, contenido FROM documentos WHERE cambio > ? ORDER BY id", (desde,)
+                ).fetchall()
+                eliminados = [] if desde == 0 else [
+                    fila[0] for fila in self._conexion.execute("SELECT id FROM eliminados WHERE cambio > ?", (desde,))
+                ]
+            finally:
+                self._conexion.execute("COMMIT")
+        documentos = []
+        for id_documento, contenido in filas:
+            documento = json.loads(contenido)
+            documento["id"] = id_documento
+            documentos.append(documento)
+        return documentos, eliminados, version
+
+    def listar(self, **filtros: str) -> List[Dict[str, str]]:
+        """
+        Listar los documentos sin leer su contenido, usando las columnas indexadas.
+
+        Args:
+            **filtros (str): Valores exactos de titulo, tipo, materia y/o profesor
+
+        Returns:
+            List[Dict[str, str]]: id y campos de CAMPOS_INDEXADOS de cada documento, ordenados por id
+        """
+        desconocidos = set(filtros) - set(CAMPOS_INDEXADOS)
+        if desconocidos:
+            raise ValueError(f"Campos no indexados: {', '.join(sorted(desconocidos))} "
+                             f"(opciones: {', '.join(CAMPOS_INDEXADOS)})")
+        condiciones = [(campo, valor) for campo, valor in filtros.items() if valor]
+        donde = " AND ".join(f"{campo} = ?" for campo, _ in condiciones)
+        columnas = ", ".join(("id",) + CAMPOS_INDEXADOS)
+        with self._lock:
+            filas = self._conexion.execute(
+                f"SELECT {columnas} FROM documentos {'WHERE ' + donde if donde else ''} ORDER BY id",
+                [valor for _, valor in condiciones]
+            ).fetchall()
+        return [dict(zip(("id",) + CAMPOS_INDEXADOS, fila)) for fila in filas]
+
+    def ids(self) -> List[str]:
+        """Ids de todos los documentos, ordenados."""
+        with self._lock:
+            return [fila[0] for fila in self._conexion.execute("SELECT id FROM documentos ORDER BY id")]
+
+    def importar(self, documentos: Iterable[Tuple[str, Dict[str, Any]]]) -> int:
+        """
+        Guardar muchos documentos (id, documento) en una sola transacción, sustituyendo los ids existentes.
+
+        Returns:
+            int: Documentos guardados
+        """
+        total = 0
+        with self.transaccion():
+            for id_documento, documento in documentos:
+                self.guardar(id_documento, documento)
+                total += 1
+        return total
+
+    def respaldar(self, destino: str):
+        """
+        Copiar el almacén a otro archivo de forma consistente, aunque haya escrituras en curso.
+
+        Args:
+            destino (str): Archivo SQLite de la copia (se sustituye si existe)
+        """
+        copia = sqlite3.connect(destino)
+        try:
+            with self._lock:
+                self._conexion.backup(copia)
+        finally:
+            copia.close()
+
+    def cerrar(self):
+        """Cerrar la conexión."""
+        with self._lock:
+            self._conexion.close()
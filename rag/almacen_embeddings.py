@@ -0,0 +1,169 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+
+class AlmacenEmbeddings:
+    """Almacén persistente de embeddings en SQLite, indexado por hash de (modelo, texto)."""
+
+    def __init__(self, ruta: str, max_memoria: int = 10000):
+        """
+        Inicializar el almacén.
+
+        Args:
+            ruta (str): Ruta del archivo SQLite (se crea si no existe)
+            max_memoria (int): Vectores que se conservan en memoria entre lecturas (los usados hace
+                más tiempo se descartan; siguen en disco). Con 1536 dimensiones son unos 6 KB cada uno
+        """
+        self.ruta = ruta
+        os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False)
+        self._conexion.execute("PRAGMA journal_mode=WAL")
+        self._conexion.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "clave TEXT PRIMARY KEY, modelo TEXT NOT NULL, dim INTEGER NOT NULL, vector BLOB NOT NULL)"
+        )
+        self._conexion.commit()
+        self._lock = threading.Lock()
+        # Vectores leídos o generados recientemente (LRU): el índice vectorial ya tiene la
+        # matriz completa, así que la memoria no debe crecer con el corpus
+        self.max_memoria = max_memoria
+        self._memoria: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        # Vectores nuevos pendientes de escribir en disco (nunca se descartan antes de guardar)
+        self._pendientes: Dict[str, tuple] = {}
+
+    @staticmethod
+    def clave(modelo: str, texto: str) -> str:
+        """Calcular la clave de contenido de un texto para un modelo de embeddings."""
+        return hashlib.sha256(f"{modelo}\x00{texto}".encode("utf-8")).hexdigest()
+
+    def obtener(self, clave: str) -> Optional[np.ndarray]:
+        """
+        Recuperar un vector por su clave.
+
+        Returns:
+            np.ndarray: Vector float32, o None si no está almacenado
+        """
+        return self.obtener_varios([clave]).get(clave)
+
+    def obtener_varios(self, claves: Iterable[str]) -> Dict[str, np.ndarray]:
+        """
+        Recuperar varios vectores con el mínimo de consultas a disco.
+
+        Args:
+            claves (Iterable[str]): Claves a buscar
+
+        Returns:
+            Dict[str, np.ndarray]: Vectores encontrados (las claves ausentes se omiten)
+        """
+        encontrados = {}
+        faltantes = []
+        with self._lock:
+            for clave in claves:
+                vector = self._memoria.get(clave)
+                if vector is not None:
+                    self._memoria.move_to_end(clave)
+                    encontrados[clave] = vector
+                elif clave in self._pendientes:
+                    encontrados[clave] = self._pendientes[clave][1]
+                else:
+                    faltantes.append(clave)
+
+            # SQLite limita el número de parámetros por consulta
+            for inicio in range(0, len(faltantes), 500):
+                lote = faltantes[inicio:inicio + 500]
+                marcadores = ",".join("?" * len(lote))
+                filas = self._conexion.execute(
+                    f"SELECT clave, vector FROM embeddings WHERE clave IN ({marcadores})", lote
+                )
+                for clave, blob in filas:
+                    vector = np.frombuffer(blob, dtype=np.float32)
+                    self._recordar(clave, vector)
+                    encontrados[clave] = vector
+        return encontrados
+
+    def _recordar(self, clave: str, vector: np.ndarray):
+        """Guardar un vector en la memoria LRU, descartando los más antiguos (con el bloqueo tomado)."""
+        self._memoria[clave] = vector
+        self._memoria.move_to_end(clave)
+        while len(self._memoria) > self.max_memoria:
+            self._memoria.popitem(last=False)
+
+    def agregar(self, clave: str, modelo: str, vector: np.ndarray):
+        """
+        Añadir un vector. Queda en memoria hasta la siguiente llamada a guardar().
+
+        Args:
+            clave (str): Clave de contenido (ver clave())
+            modelo (str): Modelo con el que se generó el vector
+            vector (np.ndarray): Vector de embedding (se almacena como float32)
+        """
+        vector = np.ascontiguousarray(vector, dtype=np.float32)
+        with self._lock:
+            self._recordar(clave, vector)
+            self._pendientes[clave] = (modelo, vector)
+
+    def guardar(self) -> int:
+        """
+        Escribir en disco los vectores nuevos en una única transacción.
+
+        Returns:
+            int: Número de vectores escritos
+        """
+        with self._lock:
+            if not self._pendientes:
+                return 0
+            filas = [
+                (clave, modelo, int(vector.shape[0]), vector.tobytes())
+                for clave, (modelo, vector) in self._pendientes.items()
+            ]
+            with self._conexion:
+                self._conexion.executemany(
+                    "INSERT OR REPLACE INTO embeddings (clave, modelo, dim, vector) VALUES (?, ?, ?, ?)", filas
+                )
+            self._pendientes.clear()
+            return len(filas)
+
+    def compactar(self, claves_vigentes: Iterable[str], modelo: Optional[str] = None) -> int:
+        """
+        Eliminar los vectores que ya no corresponden a ningún documento y recuperar espacio.
+
+        Args:
+            claves_vigentes (Iterable[str]): Claves que deben conservarse
+            modelo (str, optional): Solo se eliminan vectores de este modelo; los de otros modelos
+                (p. ej. otro --modelo-embeddings que comparte el archivo) se conservan
+
+        Returns:
+            int: Número de vectores eliminados
+        """
+        self.guardar()
+        vigentes = set(claves_vigentes)
+        with self._lock:
+            if modelo is None:
+                filas = self._conexion.execute("SELECT clave FROM embeddings")
+            else:
+                filas = self._conexion.execute("SELECT clave FROM embeddings WHERE modelo = ?", (modelo,))
+            claves = [fila[0] for fila in filas]
+            obsoletas = [clave for clave in claves if clave not in vigentes]
+            with self._conexion:
+                self._conexion.executemany("DELETE FROM embeddings WHERE clave = ?", [(c,) for c in obsoletas])
+            for clave in obsoletas:
+                self._memoria.pop(clave, None)
+            if obsoletas:
+                self._conexion.execute("VACUUM")
+        return len(obsoletas)
+
+    def claves(self) -> List[str]:
+        """Listar todas las claves almacenadas en disco."""
+        with self._lock:
+            return [fila[0] for fila in self._conexion.execute("SELECT clave FROM embeddings")]
+
+    def cerrar(self):
+        """Guardar los pendientes y cerrar la conexión."""
+        self.guardar()
+        self._conexion.close()
@@ -0,0 +1,47 @@
+import contextlib
+import os
+import time
+from typing import Iterator
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+@contextlib.contextmanager
+def bloqueo_archivo(ruta: str, exclusivo: bool = True) -> Iterator[None]:
+    """
+    Bloqueo entre procesos (y entre hilos) sobre un archivo auxiliar.
+
+    Lo usan los índices que varios procesos comparten en disco (p. ej. el servidor RAG y
+    agregar_documento.py): quien escribe toma el bloqueo exclusivo y quien solo necesita
+    leer un estado coherente, el compartido.
+
+    Args:
+        ruta (str): Archivo de bloqueo (se crea si no existe; su contenido no se usa)
+        exclusivo (bool): Bloqueo exclusivo (escritura) o compartido (lectura). En Windows
+            todos los bloqueos son exclusivos
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+    # Cada llamada abre su propio descriptor: flock excluye también a otros hilos del proceso
+    with open(ruta, 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX if exclusivo else fcntl.LOCK_SH)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.05)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
@@ -0,0 +1,125 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .indice_vectorial import IndiceVectorial, InstantaneaIndice
+
+# Índices abiertos en cada proceso de trabajo: ruta de la matriz -> instantánea
+_indices: Dict[str, InstantaneaIndice] = {}
+
+
+def _matriz_compartida(ruta: str, generacion: Optional[str], filas: int) -> np.ndarray:
+    """
+    Mapear (una sola vez por proceso) la matriz del índice.
+
+    El mapeo es de solo lectura sobre el mismo archivo que usa el proceso principal: todos
+    los procesos comparten las páginas de la caché del sistema operativo, sin copias. El
+    índice se abre con su bloqueo de lectura (cabecera y mapa coherentes) y se vuelve a
+    abrir si se reconstruyó o si se le añadieron filas.
+
+    Raises:
+        RuntimeError: Si el índice en disco ya no es la generación pedida
+    """
+    estado = _indices.get(ruta)
+    if estado is None or estado.generacion != generacion or len(estado) < filas:
+        directorio, archivo = os.path.split(ruta)
+        estado = IndiceVectorial(directorio, os.path.splitext(archivo)[0]).instantanea()
+        _indices[ruta] = estado
+    # Al añadir filas la generación no cambia y las existentes no se mueven: las primeras
+    # `filas` son las de la instantánea del proceso principal
+    if estado.generacion != generacion or estado.matriz is None or len(estado) < filas:
+        raise RuntimeError("El índice se reescribió durante la búsqueda")
+    return estado.matriz
+
+
+def _buscar_fragmento(ruta: str, generacion: Optional[str], filas: int, inicio: int, fin: int,
+                      consulta: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Puntuar las filas [inicio, fin) en un proceso de trabajo.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (filas, similitudes) de los top_k mejores del fragmento, sin ordenar
+    """
+    matriz = _matriz_compartida(ruta, generacion, filas)
+    similitudes = matriz[inicio:fin] @ consulta
+    k = min(top_k, similitudes.shape[0])
+    mejores = np.argpartition(-similitudes, k - 1)[:k]
+    return mejores + inicio, similitudes[mejores]
+
+
+class BuscadorParalelo:
+    """
+    Búsqueda exacta repartida entre varios procesos.
+
+    La matriz del índice se divide en tantos fragmentos contiguos como procesos; cada proceso
+    puntúa el suyo sobre su propio mapeo del archivo y devuelve solo su top-k, que el proceso
+    principal fusiona. Solo viajan entre procesos la consulta y los top-k (unos pocos KB),
+    nunca la matriz. Varios procesos frontales (servidor, scripts) que abran el mismo índice
+    comparten igualmente sus páginas en memoria.
+    """
+
+    def __init__(self, procesos: Optional[int] = None):
+        """
+        Inicializar el buscador; los procesos se crean en la primera búsqueda.
+
+        Args:
+            procesos (int, optional): Procesos de trabajo (por defecto, uno por núcleo)
+        """
+        self.procesos = procesos or os.cpu_count() or 1
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: los procesos no heredan los hilos ni los bloqueos del proceso principal
+            # (el servidor atiende cada petición en un hilo)
+            self._pool = ProcessPoolExecutor(max_workers=self.procesos,
+                                             mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def buscar(self, indice: InstantaneaIndice, consulta: np.ndarray, top_k: int = 3) -> List[Tuple[int, float]]:
+        """
+        Buscar las filas más similares a un vector de consulta (el mismo resultado que indice.buscar).
+
+        Args:
+            indice (InstantaneaIndice): Estado del índice sobre cuyo archivo se busca
+                (IndiceVectorial.instantanea())
+            consulta (np.ndarray): Vector de consulta
+            top_k (int): Número de resultados
+
+        Returns:
+            List[Tuple[int, float]]: (fila, similitud) ordenados de mayor a menor
+        """
+        if indice.matriz is None or len(indice) == 0 or top_k <= 0:
+            return []
+        q = np.asarray(consulta, dtype=np.float32)
+        q = q / max(float(np.linalg.norm(q)), 1e-8)
+
+        n = len(indice)
+        limites = np.linspace(0, n, min(self.procesos, n) + 1, dtype=np.int64)
+        futuros = [
+            self.pool.submit(_buscar_fragmento, indice.ruta_matriz, indice.generacion, n,
+                             int(inicio), int(fin), q, top_k)
+            for inicio, fin in zip(limites[:-1], limites[1:])
+        ]
+        try:
+            partes = [futuro.result() for futuro in futuros]
+        except RuntimeError:
+            # Otro proceso reescribió el archivo: la instantánea sigue mapeando el anterior
+            return indice.buscar(q, top_k)
+        filas = np.concatenate([filas for filas, _ in partes])
+        similitudes = np.concatenate([similitudes for _, similitudes in partes])
+
+        k = min(top_k, similitudes.shape[0])
+        mejores = np.argpartition(-similitudes, k - 1)[:k]
+        mejores = mejores[np.argsort(-similitudes[mejores])]
+        return [(int(filas[i]), float(similitudes[i])) for i in mejores]
+
+    def cerrar(self):
+        """Terminar los procesos de trabajo."""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
@@ -0,0 +1,162 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Any, Callable, Optional
+
+RUTA_POR_DEFECTO = os.path.join(os.path.dirname(__file__), "respuestas.sqlite3")
+
+
+class CacheRespuestas:
+    """
+    Caché persistente de respuestas del modelo en SQLite.
+
+    Las entradas caducan tras `ttl` segundos y, cuando el tamaño total supera
+    `max_bytes`, se desalojan las usadas hace más tiempo (LRU).
+    """
+
+    def __init__(
+        self,
+        ruta: str = RUTA_POR_DEFECTO,
+        max_bytes: int = 64 * 1024 * 1024,
+        ttl: float = 7 * 24 * 3600,
+        reloj: Callable[[], float] = time.time
+    ):
+        """
+        Inicializar la caché.
+
+        Args:
+            ruta (str): Ruta del archivo SQLite (se crea si no existe)
+            max_bytes (int): Tamaño máximo de las respuestas almacenadas
+            ttl (float): Segundos que una respuesta sigue siendo válida
+            reloj (Callable): Función que devuelve la hora actual; se puede sustituir en pruebas
+        """
+        self.ruta = ruta
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.reloj = reloj
+        os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False)
+        self._conexion.execute("PRAGMA journal_mode=WAL")
+        self._conexion.execute(
+            "CREATE TABLE IF NOT EXISTS respuestas ("
+            "clave TEXT PRIMARY KEY, respuesta TEXT NOT NULL, tamano INTEGER NOT NULL, "
+            "creada REAL NOT NULL, usada REAL NOT NULL)"
+        )
+        self._conexion.execute("CREATE INDEX IF NOT EXISTS respuestas_usada ON respuestas (usada)")
+        self._conexion.commit()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+
+    @staticmethod
+    def clave(endpoint_url: str, data: Dict[str, Any], variante: Optional[int] = None) -> str:
+        """
+        Calcular la clave de una petición de chat completions.
+
+        Args:
+            endpoint_url (str): URL del endpoint
+            data (Dict): Cuerpo de la petición (modelo, mensajes y parámetros de muestreo);
+                el campo "stream" no forma parte de la clave
+            variante (int, optional): Índice de la versión cuando se piden varias con los
+                mismos parámetros, para que cada una tenga su propia entrada
+
+        Returns:
+            str: Hash SHA-256 en hexadecimal
+        """
+        cuerpo = {k: v for k, v in data.items() if k != "stream"}
+        serializado = json.dumps([endpoint_url, cuerpo, variante], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(serializado.encode("utf-8")).hexdigest()
+
+    def obtener(self, clave: str) -> Optional[str]:
+        """
+        Recuperar una respuesta si existe y no ha caducado.
+
+        Returns:
+            str: Respuesta almacenada, o None
+        """
+        ahora = self.reloj()
+        with self._lock:
+            fila = self._conexion.execute(
+                "SELECT respuesta, creada FROM respuestas WHERE clave = ?", (clave,)
+            ).fetchone()
+            if fila is None or ahora - fila[1] > self.ttl:
+                if fila is not None:
+                    with self._conexion:
+                        self._conexion.execute("DELETE FROM respuestas WHERE clave = ?", (clave,))
+                self.fallos += 1
+                return None
+            with self._conexion:
+                self._conexion.execute("UPDATE respuestas SET usada = ? WHERE clave = ?", (ahora, clave))
+            self.aciertos += 1
+            return fila[0]
+
+    def guardar(self, clave: str, respuesta: str):
+        """
+        Almacenar una respuesta y desalojar las menos usadas si se supera el tamaño máximo.
+
+        Args:
+            clave (str): Clave de la petición (ver clave())
+            respuesta (str): Texto devuelto por el modelo
+        """
+        ahora = self.reloj()
+        tamano = len(respuesta.encode("utf-8"))
+        if tamano > self.max_bytes:
+            return
+        with self._lock, self._conexion:
+            self._conexion.execute(
+                "INSERT OR REPLACE INTO respuestas (clave, respuesta, tamano, creada, usada) VALUES (?, ?, ?, ?, ?)",
+                (clave, respuesta, tamano, ahora, ahora)
+            )
+            total = self._conexion.execute("SELECT COALESCE(SUM(tamano), 0) FROM respuestas").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            obsoletas = []
+            for clave_antigua, tamano_antiguo in self._conexion.execute(
+                "SELECT clave, tamano FROM respuestas ORDER BY usada ASC"
+            ):
+                if total <= self.max_bytes:
+                    break
+                obsoletas.append((clave_antigua,))
+                total -= tamano_antiguo
+            self._conexion.executemany("DELETE FROM respuestas WHERE clave = ?", obsoletas)
+            self.desalojos += len(obsoletas)
+
+    def limpiar(self) -> int:
+        """
+        Eliminar todas las respuestas almacenadas.
+
+        Returns:
+            int: Número de respuestas eliminadas
+        """
+        with self._lock, self._conexion:
+            return self._conexion.execute("DELETE FROM respuestas").rowcount
+
+    def estadisticas(self) -> Dict[str, Any]:
+        """Devolver aciertos, fallos, desalojos, entradas y bytes almacenados."""
+        with self._lock:
+            entradas, total = self._conexion.execute(
+                "SELECT COUNT(*), COALESCE(SUM(tamano), 0) FROM respuestas"
+            ).fetchone()
+        consultas = self.aciertos + self.fallos
+        return {
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "tasa_aciertos": self.aciertos / consultas if consultas else 0.0,
+            "desalojos": self.desalojos,
+            "entradas": entradas,
+            "bytes": total,
+        }
+
+    def resumen(self) -> str:
+        """Describir las estadísticas en una línea."""
+        e = self.estadisticas()
+        return (f"Caché de respuestas: {e['aciertos']} aciertos, {e['fallos']} fallos, {e['desalojos']} desalojos "
+                f"({e['entradas']} entradas, {e['bytes'] / 1024:.0f} KB)")
+
+    def cerrar(self):
+        """Cerrar la conexión."""
+        self._conexion.close()
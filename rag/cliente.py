@@ -0,0 +1,196 @@
+import codecs
+import json
+import os
+from typing import Dict, Any, Iterator, List, Optional, Tuple, Union
+
+# Solo usa la biblioteca estándar: los scripts importan este módulo antes de decidir
+# si necesitan cargar el sistema RAG completo (numpy, requests...). Los módulos HTTP
+# (urllib.request arrastra http.client, email y ssl) se importan al hacer la primera
+# petición, para que --help y los errores de argumentos no los carguen.
+
+VARIABLE_SERVIDOR = "SCRIPTORIUM_SERVIDOR"
+HOST_POR_DEFECTO = "127.0.0.1"
+PUERTO_POR_DEFECTO = 8765
+
+# Secreto compartido que el servidor exige en cada POST: sin él, cualquier proceso local o
+# página web podría usar el token del servidor. Se toma de SCRIPTORIUM_SECRETO o, si no está
+# definida, del archivo que escribe servidor_rag.py al arrancar (la GUI lo lee del mismo sitio)
+VARIABLE_SECRETO = "SCRIPTORIUM_SECRETO"
+RUTA_SECRETO = os.path.join(os.path.expanduser("~"), ".scriptorium", "servidor.secreto")
+CABECERA_SECRETO = "X-Scriptorium-Secreto"
+# En las respuestas en streaming el recuento de tokens del prompt viaja en esta cabecera (JSON)
+CABECERA_INFORME = "X-Scriptorium-Informe"
+
+
+def leer_secreto() -> Optional[str]:
+    """Secreto compartido con el servidor RAG: SCRIPTORIUM_SECRETO o el archivo RUTA_SECRETO."""
+    secreto = os.environ.get(VARIABLE_SECRETO)
+    if secreto:
+        return secreto
+    try:
+        with open(RUTA_SECRETO, "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+class ServidorNoDisponible(Exception):
+    """No se pudo contactar con el servidor RAG local."""
+
+
+class ClienteRAG:
+    """Cliente ligero para el servidor RAG local (ver rag/servidor.py)."""
+
+    def __init__(self, url: str, timeout: float = 600, modo_busqueda: Optional[str] = None,
+                 modelo_embeddings: Optional[str] = None, cache: bool = False, secreto: Optional[str] = None):
+        """
+        Inicializar el cliente.
+
+        Las opciones del sistema RAG viajan en cada petición: el servidor usa el modo de
+        búsqueda pedido y rechaza (error 400) un modelo de embeddings distinto del suyo o la
+        caché si no la tiene activada, en lugar de ignorarlos.
+
+        Args:
+            url (str): URL base del servidor, p. ej. http://127.0.0.1:8765
+            timeout (float): Tiempo máximo de espera por petición en segundos
+            modo_busqueda (str, optional): "vectorial", "lexico" o "hibrido"; sin él, el del servidor
+            modelo_embeddings (str, optional): Modelo de embeddings que debe usar el servidor
+            cache (bool): Exigir que el servidor tenga la caché de respuestas activada
+            secreto (str, optional): Secreto compartido con el servidor; por defecto leer_secreto()
+        """
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.secreto = secreto or leer_secreto()
+        self.opciones: Dict[str, Any] = {}
+        if modo_busqueda:
+            self.opciones["modo_busqueda"] = modo_busqueda
+        if modelo_embeddings:
+            self.opciones["modelo_embeddings"] = modelo_embeddings
+        if cache:
+            self.opciones["cache"] = True
+
+    @classmethod
+    def desde_entorno(cls, url: Optional[str] = None, **opciones) -> Optional["ClienteRAG"]:
+        """
+        Crear un cliente a partir de una URL explícita o de SCRIPTORIUM_SERVIDOR.
+
+        Args:
+            url (str, optional): URL del servidor; por defecto la de SCRIPTORIUM_SERVIDOR
+            **opciones: Opciones del sistema RAG (ver __init__)
+
+        Returns:
+            ClienteRAG o None si no hay servidor configurado
+        """
+        url = url or os.environ.get(VARIABLE_SERVIDOR)
+        return cls(url, **opciones) if url else None
+
+    def _abrir(self, ruta: str, datos: Optional[Dict[str, Any]] = None, timeout: Optional[float] = None):
+        import urllib.error
+        import urllib.request
+
+        cuerpo = None
+        if datos is not None:
+            cuerpo = json.dumps(dict(self.opciones, **datos), ensure_ascii=False).encode("utf-8")
+        cabeceras = {"Content-Type": "application/json"}
+        if self.secreto:
+            cabeceras[CABECERA_SECRETO] = self.secreto
+        peticion = urllib.request.Request(
+            f"{self.url}{ruta}",
+            data=cuerpo,
+            headers=cabeceras,
+            method="POST" if cuerpo is not None else "GET",
+        )
+        try:
+            return urllib.request.urlopen(peticion, timeout=timeout or self.timeout)
+        except urllib.error.HTTPError as e:
+            try:
+                mensaje = json.loads(e.read().decode("utf-8")).get("error", "")
+            except ValueError:
+                mensaje = e.reason
+            raise Exception(f"Error del servidor RAG ({e.code}): {mensaje}")
+        except (urllib.error.URLError, ConnectionError) as e:
+            raise ServidorNoDisponible(f"No se pudo conectar con {self.url}: {e}")
+
+    def _peticion(self, ruta: str, datos: Optional[Dict[str, Any]] = None, timeout: Optional[float] = None) -> Dict[str, Any]:
+        with self._abrir(ruta, datos, timeout) as respuesta:
+            return json.loads(respuesta.read().decode("utf-8"))
+
+    def _peticion_stream(self, ruta: str, datos: Dict[str, Any],
+                         informe: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+        import http.client
+
+        decodificador = codecs.getincrementaldecoder("utf-8")()
+        with self._abrir(ruta, dict(datos, stream=True)) as respuesta:
+            if informe is not None and respuesta.headers.get(CABECERA_INFORME):
+                informe.update(json.loads(respuesta.headers[CABECERA_INFORME]))
+            try:
+                while True:
+                    bloque = respuesta.read1(8192)
+                    if not bloque:
+                        break
+                    texto = decodificador.decode(bloque)
+                    if texto:
+                        yield texto
+            except http.client.IncompleteRead:
+                raise Exception("El servidor RAG interrumpió la respuesta (ver el registro del servidor)")
+
+    def disponible(self) -> bool:
+        """Comprobar si el servidor responde."""
+        try:
+            return self._peticion("/salud", timeout=2).get("estado") == "ok"
+        except Exception:
+            return False
+
+    def generar_documento(self, tema: str, parametros_adicionales: Dict = None, endpoint: str = None,
+                          stream: bool = False, informe: Optional[Dict[str, Any]] = None) -> Union[str, Iterator[str]]:
+        """
+        Equivalente remoto de RAGSistema.generar_documento.
+
+        En modo streaming `informe` se rellena al pedir el primer fragmento (cuando llegan las cabeceras).
+        """
+        datos = {"tema": tema, "parametros": parametros_adicionales or {}, "endpoint": endpoint}
+        if stream:
+            return self._peticion_stream("/generar", datos, informe)
+        return self._resultado(self._peticion("/generar", datos), informe)
+
+    def generar_variantes(self, tema: str, n: int = 3, parametros_adicionales: Union[Dict, List[Dict]] = None,
+                          endpoint: str = None) -> Iterator[Tuple[int, Union[str, Exception]]]:
+        """
+        Equivalente remoto de RAGSistema.generar_variantes.
+
+        El servidor envía una línea JSON por versión en cuanto termina, así que cada una se
+        entrega sin esperar a la más lenta (en orden de finalización).
+        """
+        datos = {"tema": tema, "n": n, "parametros": parametros_adicionales, "endpoint": endpoint}
+        pendiente = ""
+        for texto in self._peticion_stream("/variantes", datos):
+            pendiente += texto
+            *lineas, pendiente = pendiente.split("\n")
+            for linea in lineas:
+                if linea.strip():
+                    r = json.loads(linea)
+                    yield r["indice"], Exception(r["error"]) if "error" in r else r["resultado"]
+
+    def transformar_texto(self, texto_original: str, parametros_adicionales: Dict = None, endpoint: str = None,
+                          stream: bool = False, informe: Optional[Dict[str, Any]] = None) -> Union[str, Iterator[str]]:
+        """Equivalente remoto de RAGSistema.transformar_texto (ver generar_documento)."""
+        datos = {"texto": texto_original, "parametros": parametros_adicionales or {}, "endpoint": endpoint}
+        if stream:
+            return self._peticion_stream("/transformar", datos, informe)
+        return self._resultado(self._peticion("/transformar", datos), informe)
+
+    @staticmethod
+    def _resultado(respuesta: Dict[str, Any], informe: Optional[Dict[str, Any]]) -> str:
+        if informe is not None:
+            informe.update(respuesta.get("informe") or {})
+        return respuesta["resultado"]
+
+    def indexar(self, compactar: bool = False) -> Tuple[int, int]:
+        """Equivalente remoto de RAGSistema.indexar: (documentos, pasajes) indexados por el servidor."""
+        respuesta = self._peticion("/indexar", {"compactar": compactar})
+        return respuesta["documentos"], respuesta["pasajes"]
+
+    def buscar_documentos(self, consulta: str, top_k: int = 3,
+                          filtros: Optional[Dict[str, str]] = None) -> List[Dict[str, Any]]:
+        """Buscar documentos similares; devuelve id, título, tipo, materia y score de cada uno."""
+        return self._peticion("/buscar", {"consulta": consulta, "top_k": top_k, "filtros": filtros})["resultados"]
@@ -0,0 +1,67 @@
+from types import SimpleNamespace
+from typing import List
+
+from .cliente_http import ClienteHTTPModelo, ErrorRespuesta
+from .metricas import metricas
+
+
+class ClienteEmbeddings:
+    """
+    Cliente del endpoint de embeddings compatible con OpenAI (POST /v1/embeddings).
+
+    Expone get_embeddings(input=..., model=...) con la misma forma de respuesta que el
+    SDK de OpenAI (response.data[i].embedding), que es lo que espera EmbeddingsManager.
+    """
+
+    def __init__(self, token: str, endpoint: str = "https://models.github.ai/inference",
+                 cliente_http: ClienteHTTPModelo = None):
+        """
+        Inicializar el cliente.
+
+        Args:
+            token (str): Token de autenticación
+            endpoint (str): URL base del API (sin /v1/embeddings)
+            cliente_http (ClienteHTTPModelo, optional): Cliente HTTP compartido (pool y reintentos)
+        """
+        self.token = token
+        self.endpoint = endpoint
+        self.cliente_http = cliente_http or ClienteHTTPModelo()
+
+    def get_embeddings(self, input: List[str], model: str) -> SimpleNamespace:
+        """
+        Generar los embeddings de un lote de textos en una sola petición.
+
+        Args:
+            input (List[str]): Textos del lote
+            model (str): Modelo de embeddings
+
+        Returns:
+            SimpleNamespace: Respuesta con data[i].embedding en el mismo orden que `input`
+
+        Raises:
+            ErrorModelo: Subclase según el tipo de fallo
+        """
+        endpoint_url = f"{self.endpoint}/v1/embeddings"
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.token}"
+        }
+        response = self.cliente_http.post(endpoint_url, {"model": model, "input": input}, headers)
+
+        try:
+            respuesta = response.json()
+            datos = respuesta["data"]
+        except (ValueError, KeyError):
+            raise ErrorRespuesta(f"Respuesta inesperada del API de embeddings: {response.text[:200]}",
+                                 endpoint_url, response.status_code)
+        if len(datos) != len(input):
+            raise ErrorRespuesta(f"El API devolvió {len(datos)} embeddings para {len(input)} textos",
+                                 endpoint_url, response.status_code)
+
+        uso = respuesta.get("usage") or {}
+        if uso.get("prompt_tokens") is not None:
+            metricas.contar("tokens", uso["prompt_tokens"], tipo="embeddings", modelo=model)
+
+        # El API indica la posición de cada vector; no se garantiza que lleguen en orden
+        datos = sorted(datos, key=lambda d: d.get("index", 0))
+        return SimpleNamespace(data=[SimpleNamespace(embedding=d["embedding"], index=i) for i, d in enumerate(datos)])
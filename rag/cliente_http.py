@@ -0,0 +1,259 @@
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import TYPE_CHECKING, Dict, Any, Iterator, Optional, Tuple, Callable
+
+from .metricas import metricas
+
+# requests se importa al hacer la primera petición: crear el cliente (p. ej. al construir
+# un RAGSistema para indexar o buscar) no paga su coste de importación
+if TYPE_CHECKING:
+    import requests
+
+
+class ErrorModelo(Exception):
+    """Error base de las llamadas al endpoint de chat completions."""
+
+    def __init__(self, mensaje: str, endpoint_url: str = None, status_code: int = None):
+        super().__init__(mensaje)
+        self.endpoint_url = endpoint_url
+        self.status_code = status_code
+
+
+class ErrorAutenticacion(ErrorModelo):
+    """El token no es válido o no tiene permisos (401/403)."""
+
+
+class ErrorEndpoint(ErrorModelo):
+    """El endpoint configurado no existe (404)."""
+
+
+class ErrorPeticion(ErrorModelo):
+    """El API rechazó la petición (otros 4xx: prompt demasiado grande, parámetros inválidos...)."""
+
+
+class ErrorLimiteTasa(ErrorModelo):
+    """Se superó el límite de peticiones (429) tras agotar los reintentos."""
+
+    def __init__(self, mensaje: str, endpoint_url: str = None, status_code: int = 429,
+                 retry_after: Optional[float] = None):
+        super().__init__(mensaje, endpoint_url, status_code)
+        self.retry_after = retry_after
+
+
+class ErrorServidorModelo(ErrorModelo):
+    """El servidor del modelo respondió con un error 5xx tras agotar los reintentos."""
+
+
+class ErrorTimeout(ErrorModelo):
+    """El servidor tardó demasiado en aceptar la conexión o en responder."""
+
+
+class ErrorConexion(ErrorModelo):
+    """No se pudo establecer la conexión con el endpoint."""
+
+
+class ErrorRespuesta(ErrorModelo):
+    """La respuesta del API no tiene el formato esperado."""
+
+
+def _leer_retry_after(valor: Optional[str]) -> Optional[float]:
+    """Interpretar la cabecera Retry-After (segundos o fecha HTTP)."""
+    if not valor:
+        return None
+    try:
+        return max(0.0, float(valor))
+    except ValueError:
+        pass
+    try:
+        fecha = parsedate_to_datetime(valor)
+    except (TypeError, ValueError):
+        return None
+    if fecha.tzinfo is None:
+        fecha = fecha.replace(tzinfo=timezone.utc)
+    return max(0.0, (fecha - datetime.now(timezone.utc)).total_seconds())
+
+
+def error_para_respuesta(response: "requests.Response", endpoint_url: str) -> ErrorModelo:
+    """
+    Convertir una respuesta HTTP distinta de 200 en un error tipado.
+
+    Args:
+        response (requests.Response): Respuesta recibida
+        endpoint_url (str): URL a la que se hizo la petición
+
+    Returns:
+        ErrorModelo: Excepción lista para lanzar
+    """
+    codigo = response.status_code
+    texto = response.text
+    if codigo == 401:
+        return ErrorAutenticacion(f"Error de autenticación (401). Verifica que el token GITHUB_TOKEN sea válido.\n"
+                                  f"Endpoint: {endpoint_url}\n"
+                                  f"Respuesta: {texto[:200]}", endpoint_url, codigo)
+    if codigo == 403:
+        return ErrorAutenticacion(f"Acceso denegado (403). Verifica los permisos del token.\n"
+                                  f"Endpoint: {endpoint_url}\n"
+                                  f"Respuesta: {texto[:200]}", endpoint_url, codigo)
+    if codigo == 404:
+        return ErrorEndpoint(f"Endpoint no encontrado (404). Verifica que el endpoint sea correcto.\n"
+                             f"Endpoint usado: {endpoint_url}\n"
+                             f"Respuesta: {texto[:200]}", endpoint_url, codigo)
+    if codigo == 429:
+        retry_after = _leer_retry_after(response.headers.get("Retry-After"))
+        return ErrorLimiteTasa(f"Límite de peticiones alcanzado (429) para {endpoint_url}.\n"
+                               f"Respuesta: {texto[:200]}", endpoint_url, codigo, retry_after)
+    if codigo >= 500:
+        return ErrorServidorModelo(f"Error del servidor ({codigo}) para {endpoint_url}:\n{texto[:500]}",
+                                   endpoint_url, codigo)
+    return ErrorPeticion(f"Error HTTP {codigo} para {endpoint_url}:\n{texto[:500]}", endpoint_url, codigo)
+
+
+def calcular_espera(intento: int, retry_after: Optional[float], backoff_base: float, backoff_max: float) -> float:
+    """
+    Calcular la espera antes del siguiente intento: Retry-After si el servidor lo indicó
+    (limitado a backoff_max) o backoff exponencial con jitter completo.
+    """
+    if retry_after is not None:
+        return min(retry_after, backoff_max)
+    return random.uniform(0, min(backoff_max, backoff_base * (2 ** intento)))
+
+
+class ClienteHTTPModelo:
+    """Cliente HTTP compartido para el endpoint del modelo, con pool de conexiones y reintentos."""
+
+    def __init__(
+        self,
+        pool_size: int = 10,
+        timeout_conexion: float = 10.0,
+        timeout_lectura: float = 120.0,
+        max_reintentos: int = 3,
+        backoff_base: float = 1.0,
+        backoff_max: float = 30.0,
+        dormir: Callable[[float], None] = time.sleep
+    ):
+        """
+        Inicializar el cliente.
+
+        Args:
+            pool_size (int): Conexiones keep-alive que se mantienen abiertas por host
+            timeout_conexion (float): Segundos máximos para establecer la conexión
+            timeout_lectura (float): Segundos máximos entre bytes recibidos de la respuesta
+            max_reintentos (int): Reintentos ante 429, 5xx, timeouts y errores de conexión
+            backoff_base (float): Espera base del backoff exponencial en segundos
+            backoff_max (float): Espera máxima entre reintentos (también limita Retry-After)
+            dormir (Callable): Función de espera; se puede sustituir en pruebas
+        """
+        self.timeout = (timeout_conexion, timeout_lectura)
+        self.max_reintentos = max_reintentos
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.dormir = dormir
+        self.reintentos = 0
+        self.pool_size = pool_size
+        self._lock = threading.Lock()
+        self._session = None
+
+    @property
+    def session(self) -> "requests.Session":
+        """Sesión de requests con el pool de conexiones; se crea en la primera petición."""
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+
+                    session = requests.Session()
+                    adaptador = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+                    session.mount("https://", adaptador)
+                    session.mount("http://", adaptador)
+                    self._session = session
+        return self._session
+
+    def _espera(self, intento: int, retry_after: Optional[float] = None) -> float:
+        """Calcular la espera antes del siguiente intento (backoff exponencial con jitter completo)."""
+        return calcular_espera(intento, retry_after, self.backoff_base, self.backoff_max)
+
+    def post(self, endpoint_url: str, data: Dict[str, Any], headers: Dict[str, str],
+             stream: bool = False) -> "requests.Response":
+        """
+        Enviar una petición POST reintentando los fallos transitorios.
+
+        Args:
+            endpoint_url (str): URL completa del endpoint
+            data (Dict): Cuerpo JSON de la petición
+            headers (Dict): Cabeceras HTTP
+            stream (bool): No leer el cuerpo de la respuesta por adelantado
+
+        Returns:
+            requests.Response: Respuesta con código 200
+
+        Raises:
+            ErrorModelo: Subclase según el tipo de fallo, si no se pudo completar la petición
+        """
+        intento = 0
+        while True:
+            response, error = self._intentar(endpoint_url, data, headers, stream)
+            if response is not None:
+                return response
+
+            reintentable = isinstance(error, (ErrorLimiteTasa, ErrorServidorModelo, ErrorTimeout, ErrorConexion))
+            if not reintentable or intento >= self.max_reintentos:
+                metricas.contar("errores_http", tipo=type(error).__name__)
+                raise error
+
+            metricas.contar("reintentos_http", motivo=type(error).__name__)
+            self.dormir(self._espera(intento, getattr(error, "retry_after", None)))
+            with self._lock:
+                self.reintentos += 1
+            intento += 1
+
+    def _intentar(self, endpoint_url: str, data: Dict[str, Any], headers: Dict[str, str],
+                  stream: bool) -> Tuple[Optional["requests.Response"], Optional[ErrorModelo]]:
+        """Hacer un único intento; devuelve (respuesta, None) si fue correcto o (None, error)."""
+        import requests
+
+        try:
+            response = self.session.post(endpoint_url, json=data, headers=headers, timeout=self.timeout, stream=stream)
+        except requests.exceptions.Timeout as e:
+            return None, ErrorTimeout(f"Timeout al conectar con el endpoint. El servidor tardó demasiado en responder.\n"
+                                      f"Endpoint: {endpoint_url}\n"
+                                      f"Detalle: {e}", endpoint_url)
+        except requests.exceptions.RequestException as e:
+            return None, ErrorConexion(f"Error de conexión: {str(e)}\n"
+                                       f"Endpoint: {endpoint_url}\n"
+                                       f"Verifica tu conexión a internet y que el servicio esté disponible.",
+                                       endpoint_url)
+
+        if response.status_code == 200:
+            return response, None
+
+        error = error_para_respuesta(response, endpoint_url)
+        response.close()
+        return None, error
+
+    def iterar_lineas(self, response: "requests.Response", endpoint_url: str) -> Iterator[bytes]:
+        """
+        Iterar las líneas de una respuesta en streaming según llegan.
+
+        Los cortes a mitad de respuesta se convierten en ErrorTimeout/ErrorConexion.
+        """
+        import requests
+
+        try:
+            # chunk_size=None entrega los datos según llegan en lugar de esperar bloques fijos
+            yield from response.iter_lines(chunk_size=None)
+        except requests.exceptions.Timeout as e:
+            raise ErrorTimeout(f"Timeout esperando la respuesta en streaming.\n"
+                               f"Endpoint: {endpoint_url}\n"
+                               f"Detalle: {e}", endpoint_url)
+        except requests.exceptions.RequestException as e:
+            raise ErrorConexion(f"Conexión interrumpida durante el streaming: {str(e)}\n"
+                                f"Endpoint: {endpoint_url}", endpoint_url)
+
+    def cerrar(self):
+        """Cerrar las conexiones del pool."""
+        if self._session is not None:
+            self._session.close()
@@ -0,0 +1,522 @@
+import asyncio
+import base64
+import http.client
+import io
+import json
+import re
+import socket
+import ssl
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+from urllib.parse import unquote, urlsplit
+
+from .cliente_http import (ErrorConexion, ErrorLimiteTasa, ErrorModelo, ErrorRespuesta, ErrorServidorModelo,
+                           ErrorTimeout, calcular_espera, error_para_respuesta)
+from .metricas import metricas
+
+# Solo usa la biblioteca estándar (asyncio): no hace falta instalar un cliente HTTP asíncrono.
+
+# (esquema, host, puerto) de un endpoint: las conexiones y el límite de concurrencia son por origen
+Origen = Tuple[str, str, int]
+# (host, puerto, valor de Proxy-Authorization o None) de un proxy HTTP
+Proxy = Tuple[str, int, Optional[str]]
+T = TypeVar("T")
+
+# Nombre de cabecera válido (token de RFC 9110)
+_NOMBRE_CABECERA = re.compile(r"[!#$%&'*+\-.^_`|~0-9A-Za-z]+")
+# Caracteres que permitirían partir la petición o inyectar cabeceras
+_VALOR_PROHIBIDO = re.compile(r"[\r\n\x00]")
+# Caracteres de control y espacios, prohibidos en el destino de la línea de petición
+_DESTINO_PROHIBIDO = re.compile(r"[\x00-\x20\x7f]")
+
+
+def origen_de(url: str) -> Origen:
+    """Origen (esquema, host, puerto) de una URL."""
+    partes = urlsplit(url)
+    puerto = partes.port or (443 if partes.scheme == "https" else 80)
+    return partes.scheme, partes.hostname or "", puerto
+
+
+def validar_peticion(destino: str, cabeceras: Dict[str, str]):
+    """
+    Comprobar que el destino y las cabeceras no pueden alterar la petición HTTP.
+
+    Como requests (InvalidHeader), rechaza los saltos de línea en los valores: un valor
+    como "Bearer x\\r\\nX-Otra: 1" añadiría una cabecera o cortaría la petición.
+
+    Args:
+        destino (str): Destino de la línea de petición (ruta o URL completa)
+        cabeceras (Dict): Cabeceras que se van a enviar
+
+    Raises:
+        ValueError: Si el destino o alguna cabecera contiene caracteres no permitidos
+    """
+    if _DESTINO_PROHIBIDO.search(destino):
+        raise ValueError(f"URL con espacios o caracteres de control: {destino!r}")
+    for clave, valor in cabeceras.items():
+        if not _NOMBRE_CABECERA.fullmatch(str(clave)):
+            raise ValueError(f"Nombre de cabecera no válido: {clave!r}")
+        if _VALOR_PROHIBIDO.search(str(valor)):
+            raise ValueError(f"La cabecera {clave} contiene saltos de línea o caracteres nulos")
+
+
+class _Conexion:
+    """Conexión TCP (o TLS) keep-alive con un origen."""
+
+    __slots__ = ("lector", "escritor", "reutilizada")
+
+    def __init__(self, lector: asyncio.StreamReader, escritor: asyncio.StreamWriter):
+        self.lector = lector
+        self.escritor = escritor
+        self.reutilizada = False
+
+    def abortar(self):
+        """Cerrar la conexión sin esperar: el servidor deja de generar la respuesta en curso."""
+        self.escritor.transport.abort()
+
+
+class RespuestaHTTPAsync:
+    """
+    Respuesta de ClienteHTTPAsync con el cuerpo aún por leer.
+
+    Ocupa una conexión y un hueco del límite de su endpoint hasta que se cierra (con
+    `async with`, o al leerla completa con json()). Si se cierra antes de leer todo el
+    cuerpo, la conexión se corta en lugar de devolverse al pool.
+    """
+
+    def __init__(self, cliente: "ClienteHTTPAsync", origen: Origen, conexion: _Conexion, status_code: int,
+                 headers: http.client.HTTPMessage, endpoint_url: str):
+        self.status_code = status_code
+        self.headers = headers
+        self.endpoint_url = endpoint_url
+        self._cliente = cliente
+        self._origen = origen
+        self._conexion = conexion
+        self._liberar: Optional[Callable[[], None]] = None
+        self._chunked = "chunked" in headers.get("Transfer-Encoding", "").lower()
+        longitud = headers.get("Content-Length")
+        self._restante = int(longitud) if longitud is not None and not self._chunked else None
+        # Solo se puede reutilizar la conexión si se sabe dónde termina el cuerpo
+        self._reutilizable = ((self._chunked or self._restante is not None)
+                              and "close" not in headers.get("Connection", "").lower())
+        self._completa = False
+        self._cerrada = False
+        self._cuerpo = b""
+
+    async def __aenter__(self) -> "RespuestaHTTPAsync":
+        return self
+
+    async def __aexit__(self, tipo_error, error, traza):
+        self.cerrar()
+        return False
+
+    @property
+    def text(self) -> str:
+        """Cuerpo leído con leer(), como texto."""
+        return self._cuerpo.decode("utf-8", errors="replace")
+
+    async def _leer(self, operacion: Awaitable[T]) -> T:
+        """Esperar una lectura del socket convirtiendo cortes y timeouts en ErrorModelo."""
+        try:
+            return await asyncio.wait_for(operacion, self._cliente.timeout_lectura)
+        except asyncio.TimeoutError as e:
+            raise ErrorTimeout(f"Timeout esperando la respuesta del endpoint.\n"
+                               f"Endpoint: {self.endpoint_url}", self.endpoint_url) from e
+        except (asyncio.IncompleteReadError, ConnectionError, OSError) as e:
+            raise ErrorConexion(f"Conexión interrumpida durante la respuesta: {e}\n"
+                                f"Endpoint: {self.endpoint_url}", self.endpoint_url) from e
+
+    async def bloques(self) -> AsyncIterator[bytes]:
+        """Iterar el cuerpo según llega (sin la codificación chunked)."""
+        lector = self._conexion.lector
+        if self._chunked:
+            while True:
+                linea = await self._leer(lector.readline())
+                try:
+                    tamano = int(linea.split(b";")[0], 16)
+                except ValueError:
+                    raise ErrorConexion(f"Respuesta chunked inválida del endpoint: {linea[:50]!r}",
+                                        self.endpoint_url)
+                if tamano == 0:
+                    # Cabeceras finales opcionales hasta la línea vacía
+                    while (await self._leer(lector.readline())).strip():
+                        pass
+                    break
+                datos = await self._leer(lector.readexactly(tamano + 2))
+                yield datos[:-2]
+        elif self._restante is not None:
+            while self._restante > 0:
+                datos = await self._leer(lector.read(min(self._restante, 65536)))
+                if not datos:
+                    raise ErrorConexion(f"Conexión cerrada antes de terminar la respuesta.\n"
+                                        f"Endpoint: {self.endpoint_url}", self.endpoint_url)
+                self._restante -= len(datos)
+                yield datos
+        else:
+            # Sin longitud ni chunked, el cuerpo termina al cerrarse la conexión
+            while True:
+                datos = await self._leer(lector.read(65536))
+                if not datos:
+                    break
+                yield datos
+        self._completa = True
+
+    async def lineas(self) -> AsyncIterator[bytes]:
+        """Iterar las líneas del cuerpo según llegan (sin el salto de línea), como iter_lines de requests."""
+        pendiente = b""
+        async for datos in self.bloques():
+            pendiente += datos
+            *completas, pendiente = pendiente.split(b"\n")
+            for linea in completas:
+                yield linea.rstrip(b"\r")
+        if pendiente:
+            yield pendiente.rstrip(b"\r")
+
+    async def leer(self) -> bytes:
+        """Leer lo que queda del cuerpo."""
+        partes = [datos async for datos in self.bloques()]
+        self._cuerpo = b"".join(partes)
+        return self._cuerpo
+
+    async def json(self) -> Any:
+        """Leer el cuerpo completo como JSON y cerrar la respuesta."""
+        try:
+            cuerpo = await self.leer()
+        finally:
+            self.cerrar()
+        try:
+            return json.loads(cuerpo)
+        except ValueError:
+            raise ErrorRespuesta(f"Respuesta no JSON del API: {self.text[:200]}", self.endpoint_url, self.status_code)
+
+    def cerrar(self):
+        """Devolver la conexión al pool si se leyó todo el cuerpo (si no, cortarla) y liberar el hueco del endpoint."""
+        if self._cerrada:
+            return
+        self._cerrada = True
+        if self._completa and self._reutilizable:
+            self._cliente._devolver(self._origen, self._conexion)
+        else:
+            self._conexion.abortar()
+        if self._liberar is not None:
+            self._liberar()
+
+
+class ClienteHTTPAsync:
+    """
+    Cliente HTTP asíncrono para el endpoint del modelo, con el mismo manejo de errores y
+    reintentos que ClienteHTTPModelo.
+
+    Cada petición en curso es una corrutina, no un hilo: un bucle de eventos puede mantener
+    cientos de generaciones a la vez. Un semáforo por endpoint limita las peticiones
+    simultáneas que llegan a cada uno (las demás esperan su turno sin consumir conexiones).
+    """
+
+    def __init__(
+        self,
+        max_concurrencia_endpoint: int = 16,
+        pool_size: int = 10,
+        timeout_conexion: float = 10.0,
+        timeout_lectura: float = 120.0,
+        max_reintentos: int = 3,
+        backoff_base: float = 1.0,
+        backoff_max: float = 30.0,
+        dormir: Callable[[float], Awaitable[None]] = asyncio.sleep,
+        proxies: Optional[Dict[str, str]] = None
+    ):
+        """
+        Inicializar el cliente.
+
+        Args:
+            max_concurrencia_endpoint (int): Peticiones simultáneas por endpoint (origen); incluye
+                las esperas entre reintentos, así un 429 no deja paso a más peticiones
+            pool_size (int): Conexiones keep-alive que se mantienen abiertas por endpoint
+            timeout_conexion (float): Segundos máximos para establecer la conexión
+            timeout_lectura (float): Segundos máximos entre bytes recibidos de la respuesta
+            max_reintentos (int): Reintentos ante 429, 5xx, timeouts y errores de conexión
+            backoff_base (float): Espera base del backoff exponencial en segundos
+            backoff_max (float): Espera máxima entre reintentos (también limita Retry-After)
+            dormir (Callable): Corrutina de espera; se puede sustituir en pruebas
+            proxies (Dict, optional): Proxy por esquema y exclusiones, con el formato de
+                urllib.request.getproxies() ({"https": "http://proxy:3128", "no": "localhost"}).
+                Por defecto se leen de HTTP_PROXY, HTTPS_PROXY y NO_PROXY, como hace requests
+        """
+        self.max_concurrencia_endpoint = max_concurrencia_endpoint
+        self.pool_size = pool_size
+        self.timeout_conexion = timeout_conexion
+        self.timeout_lectura = timeout_lectura
+        self.max_reintentos = max_reintentos
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.dormir = dormir
+        self.proxies = proxies
+        self.reintentos = 0
+        self._semaforos: Dict[Origen, asyncio.Semaphore] = {}
+        self._libres: Dict[Origen, List[_Conexion]] = {}
+        self._bucle: Optional[asyncio.AbstractEventLoop] = None
+        self._ssl: Optional[ssl.SSLContext] = None
+
+    def _preparar_bucle(self):
+        """Descartar semáforos y conexiones de un bucle anterior (p. ej. tras otro asyncio.run)."""
+        bucle = asyncio.get_running_loop()
+        if bucle is not self._bucle:
+            self._bucle = bucle
+            self._semaforos = {}
+            self._libres = {}
+
+    def semaforo(self, endpoint_url: str) -> asyncio.Semaphore:
+        """Semáforo que limita las peticiones simultáneas al origen de una URL."""
+        self._preparar_bucle()
+        origen = origen_de(endpoint_url)
+        semaforo = self._semaforos.get(origen)
+        if semaforo is None:
+            semaforo = self._semaforos[origen] = asyncio.Semaphore(self.max_concurrencia_endpoint)
+        return semaforo
+
+    async def post(self, endpoint_url: str, data: Dict[str, Any], headers: Dict[str, str]) -> RespuestaHTTPAsync:
+        """
+        Enviar una petición POST reintentando los fallos transitorios.
+
+        Espera un hueco en el límite del endpoint, que se libera al cerrar la respuesta.
+
+        Args:
+            endpoint_url (str): URL completa del endpoint
+            data (Dict): Cuerpo JSON de la petición
+            headers (Dict): Cabeceras HTTP
+
+        Returns:
+            RespuestaHTTPAsync: Respuesta con código 200 y el cuerpo sin leer
+
+        Raises:
+            ErrorModelo: Subclase según el tipo de fallo, si no se pudo completar la petición
+            ValueError: Si la URL o alguna cabecera contiene saltos de línea u otros caracteres no permitidos
+        """
+        semaforo = self.semaforo(endpoint_url)
+        await semaforo.acquire()
+        try:
+            intento = 0
+            while True:
+                response, error = await self._intentar(endpoint_url, data, headers)
+                if response is not None:
+                    response._liberar = semaforo.release
+                    return response
+
+                reintentable = isinstance(error, (ErrorLimiteTasa, ErrorServidorModelo, ErrorTimeout, ErrorConexion))
+                if not reintentable or intento >= self.max_reintentos:
+                    metricas.contar("errores_http", tipo=type(error).__name__)
+                    raise error
+
+                metricas.contar("reintentos_http", motivo=type(error).__name__)
+                await self.dormir(calcular_espera(intento, getattr(error, "retry_after", None),
+                                                  self.backoff_base, self.backoff_max))
+                self.reintentos += 1
+                intento += 1
+        except BaseException:
+            semaforo.release()
+            raise
+
+    async def _intentar(self, endpoint_url: str, data: Dict[str, Any],
+                        headers: Dict[str, str]) -> Tuple[Optional[RespuestaHTTPAsync], Optional[ErrorModelo]]:
+        """Hacer un único intento; devuelve (respuesta, None) si fue correcto o (None, error)."""
+        origen = origen_de(endpoint_url)
+        partes = urlsplit(endpoint_url)
+        proxy = self._proxy_de(origen)
+        cuerpo = json.dumps(data).encode("utf-8")
+        cabeceras = {
+            "Host": partes.netloc,
+            "Accept": "*/*",
+            "Accept-Encoding": "identity",
+            "Connection": "keep-alive",
+            **headers,
+            "Content-Length": str(len(cuerpo)),
+        }
+        destino = f"{partes.path or '/'}{'?' + partes.query if partes.query else ''}"
+        if proxy is not None and origen[0] == "http":
+            # Sin túnel, el proxy recibe la URL completa y sus credenciales en cada petición
+            destino = f"http://{partes.netloc}{destino}"
+            if proxy[2]:
+                cabeceras["Proxy-Authorization"] = proxy[2]
+        validar_peticion(destino, cabeceras)
+        peticion = (
+            f"POST {destino} HTTP/1.1\r\n"
+            + "".join(f"{clave}: {valor}\r\n" for clave, valor in cabeceras.items())
+            + "\r\n"
+        ).encode("latin-1") + cuerpo
+
+        while True:
+            try:
+                conexion = await self._conectar(origen, proxy)
+            except asyncio.TimeoutError:
+                return None, ErrorTimeout(f"Timeout al conectar con el endpoint. El servidor tardó demasiado en responder.\n"
+                                          f"Endpoint: {endpoint_url}", endpoint_url)
+            except OSError as e:
+                return None, ErrorConexion(f"Error de conexión: {str(e)}\n"
+                                           f"Endpoint: {endpoint_url}\n"
+                                           f"Verifica tu conexión a internet y que el servicio esté disponible.",
+                                           endpoint_url)
+            try:
+                conexion.escritor.write(peticion)
+                await asyncio.wait_for(conexion.escritor.drain(), self.timeout_conexion)
+                linea = await asyncio.wait_for(conexion.lector.readline(), self.timeout_lectura)
+                if not linea:
+                    raise ConnectionResetError("el servidor cerró la conexión sin responder")
+                bloque = b""
+                while True:
+                    cabecera = await asyncio.wait_for(conexion.lector.readline(), self.timeout_lectura)
+                    if cabecera in (b"\r\n", b"\n", b""):
+                        break
+                    bloque += cabecera
+            except asyncio.TimeoutError:
+                conexion.abortar()
+                return None, ErrorTimeout(f"Timeout al conectar con el endpoint. El servidor tardó demasiado en responder.\n"
+                                          f"Endpoint: {endpoint_url}", endpoint_url)
+            except OSError as e:
+                conexion.abortar()
+                # Una conexión del pool puede haberla cerrado el servidor mientras estaba libre:
+                # se repite con una nueva sin contar un reintento
+                if conexion.reutilizada:
+                    continue
+                return None, ErrorConexion(f"Error de conexión: {str(e)}\n"
+                                           f"Endpoint: {endpoint_url}\n"
+                                           f"Verifica tu conexión a internet y que el servicio esté disponible.",
+                                           endpoint_url)
+            except BaseException:
+                # Cancelación: cortar la petición para que el servidor no siga generando
+                conexion.abortar()
+                raise
+            break
+
+        try:
+            status_code = int(linea.split()[1])
+        except (IndexError, ValueError):
+            conexion.abortar()
+            return None, ErrorConexion(f"Respuesta HTTP inválida del endpoint: {linea[:80]!r}", endpoint_url)
+        response = RespuestaHTTPAsync(self, origen, conexion, status_code,
+                                      http.client.parse_headers(io.BytesIO(bloque + b"\r\n")), endpoint_url)
+        if status_code == 200:
+            return response, None
+
+        try:
+            await response.leer()
+        except ErrorModelo:
+            pass
+        finally:
+            response.cerrar()
+        return None, error_para_respuesta(response, endpoint_url)
+
+    def _proxy_de(self, origen: Origen) -> Optional[Proxy]:
+        """
+        Proxy por el que se conecta con un origen.
+
+        Args:
+            origen (Origen): Origen del endpoint
+
+        Returns:
+            Proxy: (host, puerto, Proxy-Authorization) del proxy, o None si la conexión es directa
+
+        Raises:
+            ValueError: Si el proxy configurado para el esquema no es un proxy http://
+        """
+        import urllib.request
+
+        if self.proxies is None:
+            self.proxies = urllib.request.getproxies()
+        esquema, host, _ = origen
+        url = self.proxies.get(esquema)
+        if not url or urllib.request.proxy_bypass_environment(host, self.proxies):
+            return None
+        partes = urlsplit(url if "://" in url else f"http://{url}")
+        if partes.scheme != "http" or not partes.hostname:
+            raise ValueError(f"Proxy no soportado para {esquema}: {url} (solo proxies http://)")
+        autorizacion = None
+        if partes.username is not None:
+            credenciales = f"{unquote(partes.username)}:{unquote(partes.password or '')}"
+            autorizacion = "Basic " + base64.b64encode(credenciales.encode("utf-8")).decode("ascii")
+        return partes.hostname, partes.port or 80, autorizacion
+
+    async def _tunel(self, proxy: Proxy, host: str, puerto: int) -> socket.socket:
+        """
+        Abrir un túnel CONNECT hacia host:puerto a través de un proxy HTTP.
+
+        Returns:
+            socket.socket: Socket no bloqueante conectado al destino, listo para el TLS
+
+        Raises:
+            OSError: Si no se pudo conectar con el proxy o este rechazó el túnel
+        """
+        bucle = asyncio.get_running_loop()
+        familia, tipo, protocolo, _, direccion = (
+            await bucle.getaddrinfo(proxy[0], proxy[1], type=socket.SOCK_STREAM)
+        )[0]
+        sock = socket.socket(familia, tipo, protocolo)
+        sock.setblocking(False)
+        try:
+            await bucle.sock_connect(sock, direccion)
+            destino = f"[{host}]:{puerto}" if ":" in host else f"{host}:{puerto}"
+            autorizacion = f"Proxy-Authorization: {proxy[2]}\r\n" if proxy[2] else ""
+            await bucle.sock_sendall(
+                sock, f"CONNECT {destino} HTTP/1.1\r\nHost: {destino}\r\n{autorizacion}\r\n".encode("latin-1")
+            )
+            respuesta = b""
+            while b"\r\n\r\n" not in respuesta:
+                datos = await bucle.sock_recv(sock, 4096)
+                if not datos:
+                    raise ConnectionResetError("el proxy cerró la conexión sin responder al CONNECT")
+                respuesta += datos
+            linea = respuesta.split(b"\r\n", 1)[0]
+            campos = linea.split()
+            if len(campos) < 2 or not campos[1].startswith(b"2"):
+                raise ConnectionRefusedError(f"el proxy rechazó el túnel: {linea[:80].decode('latin-1')}")
+        except BaseException:
+            sock.close()
+            raise
+        return sock
+
+    async def _conectar(self, origen: Origen, proxy: Optional[Proxy] = None) -> _Conexion:
+        """Tomar una conexión libre del pool o abrir una nueva (directa o a través del proxy)."""
+        libres = self._libres.get(origen, [])
+        while libres:
+            conexion = libres.pop()
+            if not conexion.escritor.is_closing() and not conexion.lector.at_eof():
+                conexion.reutilizada = True
+                return conexion
+            conexion.abortar()
+
+        esquema, host, puerto = origen
+        contexto_ssl = None
+        if esquema == "https":
+            if self._ssl is None:
+                self._ssl = ssl.create_default_context()
+            contexto_ssl = self._ssl
+        if proxy is None:
+            conexion = asyncio.open_connection(host, puerto, ssl=contexto_ssl, limit=2 ** 20)
+        elif contexto_ssl is None:
+            conexion = asyncio.open_connection(proxy[0], proxy[1], limit=2 ** 20)
+        else:
+            conexion = self._conectar_por_tunel(proxy, host, puerto, contexto_ssl)
+        lector, escritor = await asyncio.wait_for(conexion, self.timeout_conexion)
+        return _Conexion(lector, escritor)
+
+    async def _conectar_por_tunel(self, proxy: Proxy, host: str, puerto: int,
+                                  contexto_ssl: ssl.SSLContext) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        """Abrir el túnel CONNECT y negociar el TLS con el destino dentro de él."""
+        sock = await self._tunel(proxy, host, puerto)
+        try:
+            return await asyncio.open_connection(sock=sock, ssl=contexto_ssl, server_hostname=host, limit=2 ** 20)
+        except BaseException:
+            sock.close()
+            raise
+
+    def _devolver(self, origen: Origen, conexion: _Conexion):
+        """Guardar una conexión sin respuesta pendiente para la siguiente petición al mismo origen."""
+        libres = self._libres.setdefault(origen, [])
+        if len(libres) < self.pool_size and not conexion.escritor.is_closing():
+            libres.append(conexion)
+        else:
+            conexion.escritor.close()
+
+    async def cerrar(self):
+        """Cerrar las conexiones libres del pool."""
+        for libres in self._libres.values():
+            for conexion in libres:
+                conexion.escritor.close()
+        self._libres = {}
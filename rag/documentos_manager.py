@@ -1,23 +1,52 @@
 import os
 import json
-from typing import List, Dict, Any
+import contextlib
+import threading
+from typing import List, Dict, Any, Iterator, Tuple
+
+from .metricas import metricas
+
+# Nombre del corpus empaquetado (ver almacen_documentos.py); se repite aquí para no importar
+# sqlite3 cuando no existe
+ARCHIVO_ALMACEN = "corpus.sqlite3"
 
 class DocumentosManager:
     """Clase para gestionar los documentos JSON del usuario."""
     
-    def __init__(self, directorio_docs: str = "documentos"):
+    def __init__(self, directorio_docs: str = "documentos", buscar_en_rag: bool = True, almacen: str = None):
         """
         Inicializar el gestor de documentos.
         
         Args:
-            directorio_docs (str): Directorio donde se almacenan los documentos JSON
+            directorio_docs (str): Directorio donde se almacenan los documentos JSON (relativo a
+                la raíz del proyecto, o absoluto)
+            buscar_en_rag (bool): Buscar también documentos JSON en el directorio rag/
+            almacen (str, optional): Corpus empaquetado en SQLite (empaquetar_documentos.py). Por
+                defecto se usa <directorio_docs>/corpus.sqlite3 si existe; con él, los documentos
+                nuevos se guardan en el almacén y los JSON sueltos se siguen leyendo
         """
         # Directorio principal de documentos
         self.directorio_base = os.path.join(os.path.dirname(os.path.dirname(__file__)), directorio_docs)
         os.makedirs(self.directorio_base, exist_ok=True)
         
         # Directorio adicional dentro de rag para buscar documentos
-        self.directorio_rag = os.path.dirname(__file__)
+        self.directorio_rag = os.path.dirname(__file__) if buscar_en_rag else None
+        
+        # Catálogo en memoria: ruta -> ((mtime, tamaño, inodo), documento)
+        self._catalogo: Dict[str, Tuple[Tuple[int, int, int], Dict[str, Any]]] = {}
+        self._documentos: List[Dict[str, Any]] = []
+        self.version = 0
+        self._lock = threading.Lock()
+        
+        # Corpus empaquetado: id -> documento, actualizado con los cambios desde la última versión leída
+        if almacen is None and os.path.exists(os.path.join(self.directorio_base, ARCHIVO_ALMACEN)):
+            almacen = os.path.join(self.directorio_base, ARCHIVO_ALMACEN)
+        self.almacen = None
+        if almacen:
+            from .almacen_documentos import AlmacenDocumentos
+            self.almacen = AlmacenDocumentos(almacen)
+        self._empaquetados: Dict[str, Dict[str, Any]] = {}
+        self._version_almacen = 0
     
     def cargar_documentos(self) -> List[Dict[str, Any]]:
         """
@@ -26,56 +55,163 @@ class DocumentosManager:
         Returns:
             List[Dict[str, Any]]: Lista de documentos como diccionarios
         """
-        documentos = []
-        
-        # Buscar en el directorio principal de documentos
-        self._cargar_desde_directorio(self.directorio_base, documentos)
+        return self.cargar_corpus()[0]
+    
+    def cargar_corpus(self) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Cargar los documentos reutilizando los que no han cambiado desde la última llamada.
         
-        # También buscar en el directorio rag
-        self._cargar_desde_directorio(self.directorio_rag, documentos)
+        Solo se vuelven a leer los archivos cuyo (mtime, tamaño, inodo) cambió, y se
+        descartan los que ya no existen. Si nada cambió, el coste es un recorrido de los
+        directorios. Del corpus empaquetado se leen solo las filas escritas desde la última
+        versión; si un JSON suelto tiene el mismo id que un documento empaquetado, gana este.
         
-        return documentos
-    
-    def _cargar_desde_directorio(self, directorio: str, documentos: List[Dict[str, Any]]):
-        """Carga documentos JSON desde un directorio específico."""
-        if not os.path.exists(directorio):
-            return
+        Returns:
+            Tuple[List[Dict], int]: (documentos, versión del corpus). La versión solo
+            aumenta cuando cambia algún documento, así que sirve de clave para cachés.
+        """
+        with self._lock:
+            vistos = set()
+            leidos = 0
+            
+            # Buscar en el directorio principal de documentos y también en el directorio rag
+            for directorio in (self.directorio_base, self.directorio_rag):
+                if not directorio or not os.path.exists(directorio):
+                    continue
+                with os.scandir(directorio) as entradas:
+                    for entrada in entradas:
+                        if not entrada.name.endswith('.json') or not entrada.is_file():
+                            continue
+                        vistos.add(entrada.path)
+                        info = entrada.stat()
+                        firma = (info.st_mtime_ns, info.st_size, info.st_ino)
+                        anterior = self._catalogo.get(entrada.path)
+                        if anterior is not None and anterior[0] == firma:
+                            continue
+                        # Los archivos con errores se recuerdan como None para no reintentar
+                        # (ni volver a avisar) hasta que se modifiquen
+                        self._catalogo[entrada.path] = (firma, self._leer_documento(entrada.path, entrada.name))
+                        leidos += 1
+            
+            eliminados = [ruta for ruta in self._catalogo if ruta not in vistos]
+            for ruta in eliminados:
+                del self._catalogo[ruta]
+            
+            if self.almacen is not None and self.almacen.version() != self._version_almacen:
+                modificados, ids_eliminados, self._version_almacen = self.almacen.cambios(self._version_almacen)
+                for doc in modificados:
+                    self._empaquetados[doc['id']] = doc
+                for id_documento in ids_eliminados:
+                    if self._empaquetados.pop(id_documento, None) is not None:
+                        eliminados.append(id_documento)
+                leidos += len(modificados)
+            
+            if leidos:
+                metricas.contar("documentos_leidos", leidos)
+            if leidos or eliminados or self.version == 0:
+                self.version += 1
+                empaquetados = self._empaquetados
+                self._documentos = list(empaquetados.values()) + [
+                    doc for _, doc in self._catalogo.values() if doc is not None and doc['id'] not in empaquetados
+                ]
+                if leidos or eliminados:
+                    print(f"✅ Corpus actualizado: {len(self._documentos)} documentos "
+                          f"({leidos} leídos, {len(eliminados)} eliminados)")
             
-        for archivo in os.listdir(directorio):
-            if archivo.endswith('.json'):
-                ruta_completa = os.path.join(directorio, archivo)
-                try:
-                    with open(ruta_completa, 'r', encoding='utf-8') as f:
-                        doc = json.load(f)
-                        doc['id'] = archivo  # Agregar el nombre del archivo como ID
-                        documentos.append(doc)
-                        print(f"✅ Documento cargado: {archivo}")
-                except Exception as e:
-                    print(f"❌ Error al cargar {archivo}: {e}")
+            return list(self._documentos), self.version
     
-    def guardar_documento(self, documento: Dict[str, Any], nombre_archivo: str = None) -> str:
+    def _leer_documento(self, ruta_completa: str, archivo: str) -> Dict[str, Any]:
+        """Leer un documento JSON; devuelve None si no se puede cargar."""
+        try:
+            with open(ruta_completa, 'r', encoding='utf-8') as f:
+                doc = json.load(f)
+            doc['id'] = archivo  # Agregar el nombre del archivo como ID
+            return doc
+        except Exception as e:
+            print(f"❌ Error al cargar {archivo}: {e}")
+            return None
+    
+    def nombre_archivo_para(self, documento: Dict[str, Any]) -> str:
+        """Nombre de archivo por defecto de un documento, basado en su título."""
+        nombre_archivo = documento.get('titulo') or 'documento_sin_titulo'
+        return nombre_archivo.lower().replace(' ', '_')[:50] + '.json'
+    
+    def guardar_documento(self, documento: Dict[str, Any], nombre_archivo: str = None,
+                          evitar_colision: bool = False) -> str:
         """
         Guardar un documento en formato JSON.
         
         Args:
             documento (Dict[str, Any]): El documento a guardar
             nombre_archivo (str, optional): Nombre de archivo. Si es None, se usa el título del documento.
+            evitar_colision (bool): Si el archivo ya existe, guardar como nombre_2.json, nombre_3.json...
+                en lugar de sobrescribirlo (los nombres son títulos recortados y pueden repetirse)
             
         Returns:
-            str: Ruta del archivo guardado
+            str: Ruta del archivo guardado (con corpus empaquetado, <almacén>/<id>)
         """
         if nombre_archivo is None:
-            # Generar nombre de archivo basado en el título
-            nombre_archivo = documento.get('titulo', 'documento_sin_titulo')
-            nombre_archivo = nombre_archivo.lower().replace(' ', '_')[:50]
-            nombre_archivo += '.json'
+            nombre_archivo = self.nombre_archivo_para(documento)
+        
+        if self.almacen is not None:
+            id_documento = self.almacen.guardar(nombre_archivo, documento, evitar_colision=evitar_colision)
+            return os.path.join(self.almacen.ruta, id_documento)
             
         ruta_completa = os.path.join(self.directorio_base, nombre_archivo)
         
-        with open(ruta_completa, 'w', encoding='utf-8') as f:
-            json.dump(documento, f, ensure_ascii=False, indent=2)
+        if not evitar_colision:
+            with open(ruta_completa, 'w', encoding='utf-8') as f:
+                json.dump(documento, f, ensure_ascii=False, indent=2)
+            return ruta_completa
+        
+        # Crear el archivo en modo exclusivo: dos escritores no pueden quedarse con el mismo nombre
+        base, extension = os.path.splitext(ruta_completa)
+        sufijo = 1
+        while True:
+            try:
+                with open(ruta_completa, 'x', encoding='utf-8') as f:
+                    json.dump(documento, f, ensure_ascii=False, indent=2)
+                return ruta_completa
+            except FileExistsError:
+                sufijo += 1
+                ruta_completa = f"{base}_{sufijo}{extension}"
+    
+    def existe_documento(self, nombre_archivo: str) -> bool:
+        """Comprobar si ya hay un documento guardado con ese nombre de archivo (o id en el almacén)."""
+        if self.almacen is not None:
+            return self.almacen.obtener(nombre_archivo) is not None
+        return os.path.exists(os.path.join(self.directorio_base, nombre_archivo))
+    
+    @contextlib.contextmanager
+    def lote(self) -> Iterator[None]:
+        """
+        Agrupar muchas llamadas a guardar_documento: con corpus empaquetado se confirman en una
+        sola transacción (y ninguna si el bloque falla); con JSON sueltos no cambia nada.
+        """
+        if self.almacen is None:
+            yield
+            return
+        with self.almacen.transaccion():
+            yield
+    
+    def get_encabezado(self, doc: Dict[str, Any]) -> str:
+        """
+        Convierte los campos de encabezado de un documento (sin su contenido) en texto.
+        
+        Args:
+            doc (Dict[str, Any]): El documento como diccionario
             
-        return ruta_completa
+        Returns:
+            str: Título, tipo, materia, presenta y profesor del documento
+        """
+        partes = [
+            f"Título: {doc.get('titulo', '')}",
+            f"Tipo: {doc.get('tipo', '')}",
+            f"Materia: {doc.get('materia', '')}",
+            f"Presenta: {doc.get('presenta', '')}",
+            f"Profesor: {doc.get('profesor', '')}"
+        ]
+        return "\n".join(partes)
     
     def get_documento_completo(self, doc: Dict[str, Any]) -> str:
         """
@@ -0,0 +1,168 @@
+import hashlib
+import os
+import re
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Equivale a \b\w+\b (los tokens que usaba el embedder anterior) pero es más rápido
+_PATRON_TOKEN = re.compile(r'\w+')
+# Tokens cuyo hash se memoriza; al superarse se vacía el vocabulario (el hash se recalcula)
+_MAX_VOCABULARIO = 1_000_000
+
+
+class EmbedderHashing:
+    """
+    Embedder local determinista basado en el "hashing trick" con ponderación TF-IDF.
+
+    Cada token se asigna a una dimensión y un signo mediante un hash estable (blake2b),
+    así que el mismo texto produce el mismo vector en cualquier proceso, a diferencia de
+    hash() de Python, que cambia con PYTHONHASHSEED. La tabla IDF por dimensión se ajusta
+    sobre el corpus y se guarda en disco; su huella forma parte del nombre del modelo para
+    que los vectores de tablas distintas nunca se mezclen en la caché.
+    """
+
+    def __init__(self, dim: int = 1536, ruta_idf: Optional[str] = None):
+        """
+        Inicializar el embedder.
+
+        Args:
+            dim (int): Dimensión de los vectores
+            ruta_idf (str, optional): Archivo .npz donde se guarda la tabla IDF
+        """
+        self.dim = dim
+        self.ruta_idf = ruta_idf
+        self.idf = np.ones(dim, dtype=np.float32)
+        self.documentos_ajuste = 0
+        self.modelo = f"hashing-{dim}"
+        # Vocabulario visto: token -> posición en los arrays de dimensión y signo
+        self._vocab: Dict[str, int] = {}
+        self._dims_vocab = np.empty(1024, dtype=np.int64)
+        self._signos_vocab = np.empty(1024, dtype=np.float32)
+        self._lock = threading.Lock()
+        self._cargar_idf()
+
+    def _cargar_idf(self):
+        if not self.ruta_idf or not os.path.exists(self.ruta_idf):
+            return
+        try:
+            datos = np.load(self.ruta_idf)
+            idf = datos["idf"].astype(np.float32)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Error al cargar la tabla IDF: {e}")
+            return
+        if idf.shape == (self.dim,):
+            self._fijar_idf(idf, int(datos["documentos"]))
+
+    def _fijar_idf(self, idf: np.ndarray, documentos: int):
+        self.idf = idf
+        self.documentos_ajuste = documentos
+        huella = hashlib.blake2b(idf.tobytes(), digest_size=6).hexdigest()
+        self.modelo = f"hashing-{self.dim}-idf{huella}"
+
+    def necesita_ajuste(self, num_documentos: int) -> bool:
+        """Indicar si la tabla IDF falta o el corpus creció al doble desde el último ajuste."""
+        return num_documentos > 0 and (
+            self.documentos_ajuste == 0 or num_documentos >= 2 * self.documentos_ajuste
+        )
+
+    def ajustar(self, textos: List[str]):
+        """
+        Calcular la tabla IDF por dimensión a partir de un corpus y guardarla.
+
+        Cambiar la tabla cambia el nombre del modelo, por lo que los vectores anteriores
+        dejan de usarse (ver EmbeddingsManager.compactar_cache).
+
+        Args:
+            textos (List[str]): Textos del corpus
+        """
+        df = np.zeros(self.dim, dtype=np.int64)
+        for texto in textos:
+            dims, _, _ = self._pesos_tokens(texto)
+            df[np.unique(dims)] += 1
+        n = len(textos)
+        # IDF suavizado (igual que scikit-learn con smooth_idf=True)
+        idf = (np.log((1 + n) / (1 + df)) + 1).astype(np.float32)
+        with self._lock:
+            self._fijar_idf(idf, n)
+        if self.ruta_idf:
+            tmp = self.ruta_idf + ".tmp.npz"
+            np.savez(tmp, idf=idf, documentos=n)
+            os.replace(tmp, self.ruta_idf)
+
+    def _registrar_tokens(self, tokens: List[str]):
+        """Calcular el hash estable de tokens nuevos y añadirlos al vocabulario (con el bloqueo tomado)."""
+        total = len(self._vocab) + len(tokens)
+        if total > self._dims_vocab.shape[0]:
+            capacidad = max(total, 2 * self._dims_vocab.shape[0])
+            self._dims_vocab = np.resize(self._dims_vocab, capacidad)
+            self._signos_vocab = np.resize(self._signos_vocab, capacidad)
+        for token in tokens:
+            valor = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+            posicion = len(self._vocab)
+            self._dims_vocab[posicion] = valor % self.dim
+            self._signos_vocab[posicion] = 1.0 if (valor >> 63) & 1 else -1.0
+            self._vocab[token] = posicion
+
+    def _dims_signos(self, tokens: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Devolver la dimensión y el signo de cada token (distintos), registrando los nuevos.
+
+        El registro y la lectura de las posiciones se hacen con el mismo bloqueo: si el
+        vocabulario se vacía por tamaño, ningún hilo lee posiciones de antes del vaciado.
+        """
+        with self._lock:
+            vocab = self._vocab
+            # El hash solo se calcula la primera vez que aparece cada token
+            nuevos = [t for t in tokens if t not in vocab]
+            if nuevos:
+                if len(vocab) + len(nuevos) > _MAX_VOCABULARIO:
+                    vocab.clear()
+                    nuevos = tokens
+                self._registrar_tokens(nuevos)
+            posiciones = np.fromiter(map(vocab.__getitem__, tokens), dtype=np.int64, count=len(tokens))
+            # La indexación copia: los arrays devueltos no cambian aunque otro hilo registre tokens
+            return self._dims_vocab[posiciones], self._signos_vocab[posiciones]
+
+    def _pesos_tokens(self, texto: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Devolver (dimensión, signo, frecuencia) de cada token distinto del texto."""
+        frecuencias = Counter(_PATRON_TOKEN.findall(texto.lower()))
+        n = len(frecuencias)
+        if not n:
+            vacio = np.zeros(0, dtype=np.int64)
+            return vacio, vacio.astype(np.float32), vacio.astype(np.float32)
+
+        dims, signos = self._dims_signos(list(frecuencias))
+        return dims, signos, np.fromiter(frecuencias.values(), dtype=np.float32, count=n)
+
+    def embed_many(self, textos: List[str]) -> np.ndarray:
+        """
+        Generar los embeddings de varios textos.
+
+        Args:
+            textos (List[str]): Textos a convertir
+
+        Returns:
+            np.ndarray: Matriz float32 (len(textos), dim) con filas de norma 1
+        """
+        matriz = np.zeros((len(textos), self.dim), dtype=np.float32)
+        filas, columnas, valores = [], [], []
+        for fila, texto in enumerate(textos):
+            dims, signos, frecuencias = self._pesos_tokens(texto)
+            if not dims.size:
+                continue
+            filas.append(np.full(dims.size, fila, dtype=np.int64))
+            columnas.append(dims)
+            # TF sublineal por el IDF de la dimensión, con el signo del hash
+            valores.append(signos * (1.0 + np.log(frecuencias)) * self.idf[dims])
+
+        if filas:
+            np.add.at(matriz, (np.concatenate(filas), np.concatenate(columnas)), np.concatenate(valores))
+        normas = np.linalg.norm(matriz, axis=1, keepdims=True)
+        return matriz / np.maximum(normas, 1e-8)
+
+    def embed(self, texto: str) -> np.ndarray:
+        """Generar el embedding de un único texto."""
+        return self.embed_many([texto])[0]
@@ -1,58 +1,142 @@
 import os
-import pickle
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import numpy as np
-from typing import List, Dict, Any, Tuple
-from sklearn.metrics.pairwise import cosine_similarity
-import re
+from typing import TYPE_CHECKING, List, Dict, Any, Tuple, Optional
+
+from .almacen_embeddings import AlmacenEmbeddings
+from .embedder_hashing import EmbedderHashing
+from .indice_vectorial import IndiceVectorial, InstantaneaIndice
+from .metricas import metricas
+from .tokens import contar_tokens, recortar_a_tokens
+
+# Los índices IVF, cuantizado y BM25 y la búsqueda en varios procesos son opcionales (--nprobe,
+# --cuantizacion, --modo-busqueda, --procesos-busqueda): se importan al usarlos
+if TYPE_CHECKING:
+    from .busqueda_paralela import BuscadorParalelo
+    from .indice_bm25 import IndiceBM25
+
+# Límite de tokens por texto de los modelos de embeddings de OpenAI
+MAX_TOKENS_TEXTO = 8191
+
+# vectorial: similitud de embeddings; lexico: BM25; hibrido: ambos fusionados con RRF
+MODOS_BUSQUEDA = ("vectorial", "lexico", "hibrido")
+# Constante de la fusión por rango recíproco (valor habitual en la literatura)
+K_RRF = 60
+
+class ErrorEmbeddings(Exception):
+    """No se pudieron generar los embeddings de algunos documentos al sincronizar el índice."""
+    
+    def __init__(self, mensaje: str, sin_generar: int, total: int):
+        super().__init__(mensaje)
+        self.sin_generar = sin_generar
+        self.total = total
 
 class EmbeddingsManager:
     """Clase para gestionar la generación y búsqueda de embeddings."""
     
-    def __init__(self, api_client=None, model_embedding="text-embedding-ada-002", cache_file="embeddings_cache.pkl"):
+    def __init__(self, api_client=None, model_embedding="text-embedding-ada-002", cache_file="embeddings.sqlite3",
+                 lote_max_textos: int = 128, lote_max_tokens: int = 64000, max_concurrencia: int = 4,
+                 nprobe: Optional[int] = None, umbral_aproximado: int = 20000,
+                 modo_busqueda: str = "vectorial", fraccion_selectiva: float = 0.05,
+                 cuantizacion: Optional[str] = None, factor_candidatos: int = 4,
+                 procesos_busqueda: Optional[int] = None, umbral_paralelo: int = 20000):
         """
         Inicializar el gestor de embeddings.
         
         Args:
-            api_client: Cliente de API para generar embeddings (opcional)
+            api_client: Cliente de API para generar embeddings (opcional, p. ej. ClienteEmbeddings)
             model_embedding (str): Modelo de embeddings a utilizar
-            cache_file (str): Archivo para guardar la caché de embeddings
+            cache_file (str): Archivo SQLite donde se guardan los embeddings (relativo a rag/ o absoluto);
+                los índices se guardan en su mismo directorio
+            lote_max_textos (int): Máximo de textos por petición al API
+            lote_max_tokens (int): Máximo de tokens (sumando todos los textos) por petición al API
+            max_concurrencia (int): Máximo de peticiones de embeddings simultáneas
+            nprobe (int, optional): Si se indica, los corpus grandes se buscan con un índice
+                aproximado IVF explorando `nprobe` listas; sin él la búsqueda es siempre exacta
+            umbral_aproximado (int): Filas a partir de las cuales se usa el índice aproximado
+            modo_busqueda (str): "vectorial", "lexico" (BM25) o "hibrido" (fusión de ambos)
+            fraccion_selectiva (float): En modo híbrido, si los términos de la consulta aparecen
+                en menos de esta fracción de las filas, los vectores solo se comparan con esas filas
+            cuantizacion (str, optional): "float16" o "int8" para preseleccionar candidatos con una
+                copia cuantizada de la matriz (2x o 4x menos memoria) y re-puntuarlos con la exacta
+            factor_candidatos (int): Candidatos re-puntuados por cada resultado con `cuantizacion`
+            procesos_busqueda (int, optional): Si se indica (> 1), la búsqueda exacta en corpus grandes
+                se reparte entre este número de procesos que comparten la matriz mapeada
+            umbral_paralelo (int): Filas a partir de las cuales se busca en varios procesos
         """
+        if modo_busqueda not in MODOS_BUSQUEDA:
+            raise ValueError(f"Modo de búsqueda desconocido: {modo_busqueda} (opciones: {', '.join(MODOS_BUSQUEDA)})")
         self.api_client = api_client
         self.model_embedding = model_embedding
+        self.lote_max_textos = lote_max_textos
+        self.lote_max_tokens = lote_max_tokens
+        self.max_concurrencia = max_concurrencia
         self.cache_path = os.path.join(os.path.dirname(__file__), cache_file)
-        self.embeddings_cache = self._cargar_cache()
-    
-    def _cargar_cache(self) -> Dict[str, np.ndarray]:
-        """Cargar caché de embeddings si existe."""
-        if os.path.exists(self.cache_path):
-            try:
-                with open(self.cache_path, 'rb') as f:
-                    return pickle.load(f)
-            except Exception as e:
-                print(f"Error al cargar cache de embeddings: {e}")
-        return {}
+        self.almacen = AlmacenEmbeddings(self.cache_path)
+        self.embedder_local = EmbedderHashing(ruta_idf=os.path.join(os.path.dirname(self.cache_path), "idf_hashing.npz"))
+        self.indice = IndiceVectorial(os.path.dirname(self.cache_path))
+        self.indice_aproximado = None
+        if nprobe:
+            from .indice_ivf import IndiceIVF
+            self.indice_aproximado = IndiceIVF(os.path.dirname(self.cache_path), nprobe=nprobe)
+        self.umbral_aproximado = umbral_aproximado
+        self.indice_cuantizado = None
+        if cuantizacion:
+            from .indice_cuantizado import IndiceCuantizado
+            self.indice_cuantizado = IndiceCuantizado(os.path.dirname(self.cache_path), tipo=cuantizacion,
+                                                      factor_candidatos=factor_candidatos)
+        self.buscador_paralelo: Optional["BuscadorParalelo"] = None
+        if procesos_busqueda and procesos_busqueda > 1:
+            from . import busqueda_paralela
+            self.buscador_paralelo = busqueda_paralela.BuscadorParalelo(procesos_busqueda)
+        self.umbral_paralelo = umbral_paralelo
+        self.modo_busqueda = modo_busqueda
+        self.fraccion_selectiva = fraccion_selectiva
+        # El índice léxico se abre la primera vez que se usa
+        self.indice_lexico: Optional["IndiceBM25"] = None
+        self._lock_indice = threading.Lock()
+        # modelo -> (versión del corpus, claves de sus textos)
+        self._claves_corpus: Dict[str, Tuple[int, List[str]]] = {}
+    
+    @property
+    def modelo_activo(self) -> str:
+        """Nombre del modelo que produce los vectores (forma parte de la clave de caché)."""
+        return self.model_embedding if self.api_client is not None else self.embedder_local.modelo
     
     def _guardar_cache(self):
-        """Guardar caché de embeddings."""
-        with open(self.cache_path, 'wb') as f:
-            pickle.dump(self.embeddings_cache, f)
+        """Escribir en disco los embeddings nuevos (una transacción por pasada de indexado)."""
+        self.almacen.guardar()
+    
+    def compactar_cache(self, textos: List[str], version_corpus: Optional[int] = None) -> int:
+        """
+        Eliminar de la caché los vectores del modelo activo cuyos textos ya no existen en el corpus.
+        
+        Los vectores de otros modelos no se tocan: pueden ser de otro endpoint que use la misma caché.
+        
+        Args:
+            textos (List[str]): Textos actuales de todos los documentos
+            version_corpus (int, optional): Versión del corpus (reutiliza las claves ya calculadas)
+            
+        Returns:
+            int: Número de vectores eliminados
+        """
+        claves = self._claves_textos(textos, version_corpus)
+        eliminados = self.almacen.compactar(claves, modelo=self.modelo_activo)
+        metricas.contar("embeddings_compactados", eliminados)
+        return eliminados
     
     def _generar_embedding_simple(self, texto: str) -> np.ndarray:
         """
-        Generar embedding simple basado en palabras clave cuando no hay API disponible.
+        Generar embedding local (hashing trick con TF-IDF) cuando no hay API disponible.
         
         Args:
             texto (str): Texto para generar el embedding
             
         Returns:
-            np.ndarray: Vector de embedding simple
+            np.ndarray: Vector de embedding determinista y normalizado
         """
-        palabras = re.findall(r'\b\w+\b', texto.lower())
-        vector = np.zeros(1536)
-        for i, palabra in enumerate(palabras[:1536]):
-            hash_val = hash(palabra) % 1000
-            vector[i % 1536] += hash_val / 1000.0
-        return vector / (np.linalg.norm(vector) + 1e-8)
+        return self.embedder_local.embed(texto)
     
     def generar_embedding(self, texto: str) -> np.ndarray:
         """
@@ -63,24 +147,86 @@ class EmbeddingsManager:
             
         Returns:
             np.ndarray: Vector de embedding
+            
+        Raises:
+            ErrorModelo: Si hay modelo remoto y la llamada falla. No se recurre al embedder
+                local: sus vectores están en otro espacio y no se pueden comparar con el índice
         """
         if self.api_client is None:
             return self._generar_embedding_simple(texto)
         
-        try:
-            response = self.api_client.get_embeddings(
-                input=[texto],
-                model=self.model_embedding
-            )
-            return np.array(response.data[0].embedding)
-        except Exception as e:
-            print(f"Error al generar embedding: {e}")
-            return self._generar_embedding_simple(texto)
+        response = self.api_client.get_embeddings(
+            input=[texto],
+            model=self.model_embedding
+        )
+        return np.asarray(response.data[0].embedding, dtype=np.float32)
+    
+    def _agrupar_en_lotes(self, textos: List[str]) -> List[List[int]]:
+        """Repartir los textos en lotes que respetan el máximo de textos y de tokens por petición."""
+        lotes = []
+        lote, tokens_lote = [], 0
+        for i, texto in enumerate(textos):
+            tokens = contar_tokens(texto)
+            if lote and (len(lote) >= self.lote_max_textos or tokens_lote + tokens > self.lote_max_tokens):
+                lotes.append(lote)
+                lote, tokens_lote = [], 0
+            lote.append(i)
+            tokens_lote += tokens
+        if lote:
+            lotes.append(lote)
+        return lotes
+    
+    @metricas.medir("generar_embeddings")
+    def generar_embeddings(self, textos: List[str]) -> List[Optional[np.ndarray]]:
+        """
+        Generar los embeddings de muchos textos a la vez.
+        
+        Sin API se vectorizan todos juntos en local. Con API se agrupan en lotes (por
+        número de textos y de tokens) que se envían en paralelo con concurrencia limitada.
+        
+        Args:
+            textos (List[str]): Textos a convertir
+            
+        Returns:
+            List[np.ndarray]: Un vector por texto, en el mismo orden. Los textos de los lotes
+            que fallaron quedan como None
+        """
+        if self.api_client is None:
+            return list(self.embedder_local.embed_many(textos))
+        
+        # Los textos que superan el límite del modelo se recortan en lugar de hacer fallar el lote
+        textos = [recortar_a_tokens(texto, MAX_TOKENS_TEXTO) for texto in textos]
+        lotes = self._agrupar_en_lotes(textos)
+        resultado: List[Optional[np.ndarray]] = [None] * len(textos)
+        
+        def enviar(lote: List[int]):
+            return self.api_client.get_embeddings(input=[textos[i] for i in lote], model=self.model_embedding)
+        
+        fallidos = 0
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_concurrencia, len(lotes)))) as executor:
+            futuros = {executor.submit(enviar, lote): lote for lote in lotes}
+            for futuro in as_completed(futuros):
+                lote = futuros[futuro]
+                try:
+                    respuesta = futuro.result()
+                except Exception as e:
+                    fallidos += 1
+                    print(f"Error al generar embeddings de un lote de {len(lote)} textos: {e}")
+                    continue
+                for i, dato in zip(lote, respuesta.data):
+                    resultado[i] = np.asarray(dato.embedding, dtype=np.float32)
+        
+        if len(lotes) > 1:
+            print(f"✅ Embeddings generados: {len(lotes) - fallidos}/{len(lotes)} lotes ({len(textos)} textos)")
+        return resultado
     
     def procesar_documento(self, doc_id: str, texto: str) -> np.ndarray:
         """
         Procesar un documento y generar/recuperar su embedding.
         
+        La caché se indexa por el contenido del texto, así que un documento editado
+        obtiene un vector nuevo. Los vectores nuevos quedan pendientes hasta _guardar_cache().
+        
         Args:
             doc_id (str): Identificador único del documento
             texto (str): Texto del documento
@@ -88,18 +234,23 @@ class EmbeddingsManager:
         Returns:
             np.ndarray: Vector de embedding del documento
         """
-        if doc_id not in self.embeddings_cache:
-            self.embeddings_cache[doc_id] = self.generar_embedding(texto)
-            self._guardar_cache()
+        clave = AlmacenEmbeddings.clave(self.modelo_activo, texto)
+        embedding = self.almacen.obtener(clave)
+        if embedding is None:
+            embedding = self.generar_embedding(texto)
+            self.almacen.agregar(clave, self.modelo_activo, embedding)
         
-        return self.embeddings_cache[doc_id]
+        return embedding
     
     def buscar_documentos_similares(
         self, 
         consulta: str, 
         documentos: List[Dict[str, Any]], 
         textos: List[str], 
-        top_k: int = 3
+        top_k: int = 3,
+        version_corpus: Optional[int] = None,
+        modo: Optional[str] = None,
+        filas: Optional[np.ndarray] = None
     ) -> List[Tuple[Dict[str, Any], float]]:
         """
         Buscar documentos similares a una consulta.
@@ -109,29 +260,237 @@ class EmbeddingsManager:
             documentos (List[Dict]): Lista de documentos
             textos (List[str]): Lista de textos correspondientes a los documentos
             top_k (int): Número de documentos a devolver
+            version_corpus (int, optional): Versión del corpus (DocumentosManager.version);
+                si se indica, las claves de los textos se reutilizan mientras no cambie
+            modo (str, optional): Modo de búsqueda; por defecto self.modo_busqueda
+            filas (np.ndarray, optional): Posiciones (ordenadas) de los únicos documentos candidatos,
+                p. ej. las que cumplen un filtro de metadatos. Solo se puntúan esos documentos
             
         Returns:
-            List[Tuple[Dict, float]]: Lista de (documento, score) ordenados por relevancia
+            List[Tuple[Dict, float]]: Lista de (documento, score) ordenados por relevancia.
+            En modo híbrido el score es la fusión RRF normalizada (1.0 = primero en ambas listas)
         """
+        if not documentos or (filas is not None and len(filas) == 0):
+            return []
+        modo = modo or self.modo_busqueda
+        if modo not in MODOS_BUSQUEDA:
+            raise ValueError(f"Modo de búsqueda desconocido: {modo} (opciones: {', '.join(MODOS_BUSQUEDA)})")
+        
+        if modo == "lexico":
+            # El índice BM25 se sincroniza y se consulta sin soltar el bloqueo: sus filas
+            # son las de `documentos` durante toda la búsqueda
+            with self._lock_indice:
+                indice_lexico = self._actualizar_indice_lexico(textos, version_corpus)
+                with metricas.span("ranking", modo=modo):
+                    resultados = indice_lexico.buscar(consulta, top_k, filas)
+        elif modo == "vectorial":
+            consulta_embedding, (indice, documentos, _) = self._preparar_busqueda_vectorial(
+                consulta, documentos, textos, version_corpus
+            )
+            with metricas.span("ranking", modo=modo):
+                resultados = self._buscar_vectorial(indice, consulta_embedding, top_k, filas)
+        else:
+            resultados = self._buscar_hibrido(consulta, documentos, textos, version_corpus, top_k, filas)
+        return [(documentos[fila], score) for fila, score in resultados]
+    
+    def indexar(self, documentos: List[Dict[str, Any]], textos: List[str], version_corpus: Optional[int] = None):
+        """
+        Poner al día los índices sin buscar nada (p. ej. tras una importación masiva).
+        
+        Los embeddings que faltan se generan en una sola pasada por lotes y se guardan con
+        una única escritura; el índice léxico solo se actualiza si el modo de búsqueda lo usa.
+        
+        Args:
+            documentos (List[Dict]): Lista de documentos
+            textos (List[str]): Lista de textos correspondientes a los documentos
+            version_corpus (int, optional): Versión del corpus (ver buscar_documentos_similares)
+        """
+        if not documentos:
+            return
+        if self.modo_busqueda != "vectorial":
+            with self._lock_indice:
+                self._actualizar_indice_lexico(textos, version_corpus)
+        if self.modo_busqueda != "lexico":
+            self._ajustar_embedder_local(textos)
+            self._actualizar_indice(documentos, textos, self._claves_textos(textos, version_corpus))
+    
+    def _ajustar_embedder_local(self, textos: List[str]):
+        """Ajustar la tabla IDF del embedder local la primera vez (o si el corpus se duplicó)."""
+        if self.api_client is None:
+            with self._lock_indice:
+                if self.embedder_local.necesita_ajuste(len(textos)):
+                    self.embedder_local.ajustar(textos)
+    
+    def _preparar_busqueda_vectorial(
+        self, consulta: str, documentos: List[Dict[str, Any]], textos: List[str], version_corpus: Optional[int]
+    ) -> Tuple[np.ndarray, Tuple[InstantaneaIndice, List[Dict[str, Any]], List[str]]]:
+        """Generar el embedding de la consulta y sincronizar el índice vectorial (ver _actualizar_indice)."""
+        self._ajustar_embedder_local(textos)
+        
         # Generar embedding para la consulta
-        consulta_embedding = self.generar_embedding(consulta)
+        with metricas.span("embedding_consulta"):
+            consulta_embedding = self.generar_embedding(consulta)
         
-        # Preparar embeddings de documentos
-        doc_embeddings = []
-        for idx, doc in enumerate(documentos):
-            doc_id = doc.get('id', f"doc_{idx}")
-            doc_embeddings.append(self.procesar_documento(doc_id, textos[idx]))
+        # Asegurar que el índice corresponde exactamente a estos documentos
+        claves = self._claves_textos(textos, version_corpus)
+        return consulta_embedding, self._actualizar_indice(documentos, textos, claves)
+    
+    def _buscar_vectorial(self, indice: InstantaneaIndice, consulta_embedding: np.ndarray, top_k: int,
+                          filas: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """Buscar las filas más similares, con el índice aproximado si el corpus es grande."""
+        if filas is not None:
+            # Con candidatos acotados la búsqueda exacta sobre ellos ya es proporcional al filtro
+            return indice.buscar(consulta_embedding, top_k, filas)
+        # Los índices derivados se comparten entre hilos: se sincronizan y se consultan sin
+        # soltar el bloqueo para que ningún otro hilo los cambie a mitad de la búsqueda
+        if self.indice_aproximado is not None and len(indice) >= self.umbral_aproximado:
+            # Solo se comparan las filas de las listas IVF más cercanas a la consulta
+            with self._lock_indice:
+                self.indice_aproximado.sincronizar(indice)
+                return self.indice_aproximado.buscar(indice.matriz, consulta_embedding, top_k)
+        if self.indice_cuantizado is not None:
+            # Se recorre la copia cuantizada y solo se leen de la matriz exacta los candidatos
+            with self._lock_indice:
+                self.indice_cuantizado.sincronizar(indice)
+                return self.indice_cuantizado.buscar(indice.matriz, consulta_embedding, top_k)
+        if self.buscador_paralelo is not None and len(indice) >= self.umbral_paralelo:
+            # Cada proceso puntúa un fragmento de la matriz y solo se fusionan sus top-k
+            return self.buscador_paralelo.buscar(indice, consulta_embedding, top_k)
+        # Un producto matriz-vector sobre la matriz mapeada y selección parcial del top-k
+        return indice.buscar(consulta_embedding, top_k)
+    
+    def _buscar_hibrido(
+        self, consulta: str, documentos: List[Dict[str, Any]], textos: List[str], version_corpus: Optional[int],
+        top_k: int, filas: Optional[np.ndarray] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        Fusionar los rankings BM25 y vectorial por rango recíproco (RRF).
         
-        # Convertir a matriz de numpy
-        doc_embeddings_matrix = np.array(doc_embeddings)
+        Cada ranking aporta 1 / (K_RRF + posición) a cada fila, así que no hace falta que
+        los scores de ambos métodos estén en la misma escala. Si la consulta es selectiva
+        (sus términos aparecen en pocas filas), los vectores solo se comparan con esas filas
+        en lugar de con toda la matriz.
+        """
+        consulta_embedding, (indice, _, _) = self._preparar_busqueda_vectorial(
+            consulta, documentos, textos, version_corpus
+        )
+        with metricas.span("ranking", modo="hibrido"):
+            # Las filas del índice BM25 son las de `textos` mientras no se suelte el bloqueo
+            with self._lock_indice:
+                filas_lexicas, scores_lexicos = self._actualizar_indice_lexico(textos, version_corpus).puntuar(
+                    consulta, filas
+                )
+            return self._fusionar_rankings(filas_lexicas, scores_lexicos, indice, consulta_embedding, top_k, filas)
+    
+    def _fusionar_rankings(self, filas_lexicas: np.ndarray, scores_lexicos: np.ndarray, indice: InstantaneaIndice,
+                           consulta_embedding: np.ndarray, top_k: int,
+                           filas: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """Fusionar la puntuación BM25 con el ranking vectorial (ver _buscar_hibrido)."""
+        # Profundidad de cada ranking: más que top_k para que la fusión tenga margen
+        profundidad = max(top_k * 10, 50)
+        
+        total = len(indice) if filas is None else len(filas)
+        if top_k <= filas_lexicas.size <= self.fraccion_selectiva * total:
+            candidatas = filas_lexicas
+        else:
+            candidatas = filas
+        ranking_vectorial = [
+            fila for fila, _ in self._buscar_vectorial(indice, consulta_embedding, profundidad, candidatas)
+        ]
+        ranking_lexico = filas_lexicas[np.argsort(-scores_lexicos, kind="stable")[:profundidad]].tolist()
+        
+        fusion: Dict[int, float] = {}
+        for ranking in (ranking_lexico, ranking_vectorial):
+            for posicion, fila in enumerate(ranking, start=1):
+                fusion[fila] = fusion.get(fila, 0.0) + 1.0 / (K_RRF + posicion)
+        # Normalizar para que una fila primera en ambos rankings tenga score 1.0
+        maximo = 2.0 / (K_RRF + 1)
+        mejores = sorted(fusion.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        return [(fila, score / maximo) for fila, score in mejores]
+    
+    def _actualizar_indice_lexico(self, textos: List[str], version_corpus: Optional[int] = None) -> "IndiceBM25":
+        """Abrir el índice BM25 si hace falta y sincronizarlo con los textos (con _lock_indice tomado)."""
+        # Claves independientes del modelo de embeddings: cambiar de modelo no obliga a reindexar
+        claves = self._claves_textos(textos, version_corpus, modelo="bm25")
+        if self.indice_lexico is None:
+            from .indice_bm25 import IndiceBM25
+            self.indice_lexico = IndiceBM25(os.path.join(os.path.dirname(self.cache_path), "indice_lexico.sqlite3"))
+        self.indice_lexico.sincronizar(claves, textos)
+        return self.indice_lexico
+    
+    def _claves_textos(self, textos: List[str], version_corpus: Optional[int] = None,
+                       modelo: Optional[str] = None) -> List[str]:
+        """Calcular las claves de contenido de los textos, memorizadas por versión del corpus y modelo."""
+        modelo = modelo or self.modelo_activo
+        memoria = self._claves_corpus.get(modelo)
+        if version_corpus is not None and memoria is not None and memoria[0] == version_corpus:
+            return memoria[1]
+        claves = [AlmacenEmbeddings.clave(modelo, texto) for texto in textos]
+        if version_corpus is not None:
+            self._claves_corpus[modelo] = (version_corpus, claves)
+        return claves
+    
+    def _vectores_documentos(self, textos: List[str], claves: List[str]) -> np.ndarray:
+        """
+        Obtener los embeddings de varios documentos (de la caché o generándolos) como matriz.
         
-        # Calcular similitud
-        similitudes = cosine_similarity([consulta_embedding], doc_embeddings_matrix)[0]
+        Raises:
+            ErrorEmbeddings: Si falló la generación de alguno; los demás quedan en caché
+        """
+        en_cache = self.almacen.obtener_varios(claves)
+        
+        # Los documentos que faltan se generan juntos (en lotes si hay API)
+        faltantes = [i for i, clave in enumerate(claves) if clave not in en_cache]
+        if faltantes:
+            nuevos = self.generar_embeddings([textos[i] for i in faltantes])
+            sin_generar = 0
+            for i, embedding in zip(faltantes, nuevos):
+                if embedding is None:
+                    sin_generar += 1
+                    continue
+                self.almacen.agregar(claves[i], self.modelo_activo, embedding)
+                en_cache[claves[i]] = embedding
+            self._guardar_cache()
+            if sin_generar:
+                # Los ya generados quedan en caché: al reintentar solo se piden los que faltan
+                raise ErrorEmbeddings(f"No se pudieron generar {sin_generar} de {len(faltantes)} embeddings; "
+                                      f"los demás se guardaron y se reutilizarán al reintentar",
+                                      sin_generar, len(faltantes))
         
-        # Ordenar índices por similitud (de mayor a menor)
-        indices_ordenados = np.argsort(similitudes)[::-1][:top_k]
+        return np.vstack([en_cache[clave] for clave in claves]).astype(np.float32, copy=False)
+    
+    def _actualizar_indice(
+        self, documentos: List[Dict[str, Any]], textos: List[str], claves: List[str]
+    ) -> Tuple[InstantaneaIndice, List[Dict[str, Any]], List[str]]:
+        """
+        Sincronizar el índice persistente con la lista de documentos.
         
-        # Crear lista de resultados
-        resultados = [(documentos[idx], float(similitudes[idx])) for idx in indices_ordenados]
+        Si solo se añadieron documentos al final se agregan filas. Si se editaron, borraron
+        o reordenaron, los archivos del índice se reescriben (O(N) en disco, ver
+        IndiceVectorial.actualizar) copiando de la matriz actual las filas que no cambiaron:
+        solo se obtienen los embeddings de los textos nuevos. Si cambió el modelo se
+        reconstruye desde la caché de embeddings.
         
-        return resultados
+        Returns:
+            Tuple[InstantaneaIndice, List[Dict], List[str]]: (instantánea del índice, documentos,
+            claves) tomados juntos con el bloqueo: la fila i de la instantánea es documentos[i]
+            aunque otro hilo o proceso escriba después en el índice. La búsqueda solo debe usar esto
+        """
+        with self._lock_indice:
+            indice = self.indice
+            if indice.modelo == self.modelo_activo and indice.claves == claves:
+                return indice.instantanea(), documentos, claves
+            
+            ids = [doc.get('id', f"doc_{idx}") for idx, doc in enumerate(documentos)]
+            n = len(indice)
+            if indice.modelo == self.modelo_activo and 0 < n < len(claves) and claves[:n] == indice.claves:
+                indice.agregar(ids[n:], claves[n:], self._vectores_documentos(textos[n:], claves[n:]))
+            elif indice.modelo == self.modelo_activo and n > 0:
+                conocidas = set(indice.claves)
+                faltan = [i for i, clave in enumerate(claves) if clave not in conocidas]
+                claves_nuevas = [claves[i] for i in faltan]
+                vectores = self._vectores_documentos([textos[i] for i in faltan], claves_nuevas) if faltan else []
+                indice.actualizar(ids, claves, dict(zip(claves_nuevas, vectores)))
+            else:
+                indice.construir(self.modelo_activo, ids, claves, self._vectores_documentos(textos, claves))
+            return indice.instantanea(), documentos, claves
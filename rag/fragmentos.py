@@ -0,0 +1,94 @@
+from typing import List, Dict, Any
+
+# Secciones de contenido que se dividen en pasajes (campo del JSON, etiqueta)
+SECCIONES_CONTENIDO = (
+    ('introduccion', 'Introducción'),
+    ('desarrollo', 'Desarrollo'),
+    ('conclusion', 'Conclusión'),
+)
+
+TAMANO_FRAGMENTO = 1200
+SOLAPAMIENTO_FRAGMENTO = 200
+
+# Separadores preferidos para cortar un pasaje, de mayor a menor preferencia
+_SEPARADORES = ('\n\n', '\n', '. ', ' ')
+
+
+def dividir_texto(texto: str, tamano: int = TAMANO_FRAGMENTO, solapamiento: int = SOLAPAMIENTO_FRAGMENTO) -> List[str]:
+    """
+    Dividir un texto en pasajes de como máximo `tamano` caracteres con solapamiento.
+
+    Los cortes se hacen en un salto de párrafo, fin de frase o espacio de la segunda
+    mitad de la ventana, para no partir frases ni palabras si se puede evitar.
+
+    Args:
+        texto (str): Texto a dividir
+        tamano (int): Longitud máxima de cada pasaje en caracteres
+        solapamiento (int): Caracteres que comparte cada pasaje con el anterior
+
+    Returns:
+        List[str]: Pasajes en orden (vacía si el texto está vacío)
+    """
+    texto = texto.strip()
+    if len(texto) <= tamano:
+        return [texto] if texto else []
+
+    pasajes = []
+    inicio = 0
+    while inicio < len(texto):
+        fin = min(inicio + tamano, len(texto))
+        if fin < len(texto):
+            for separador in _SEPARADORES:
+                corte = texto.rfind(separador, inicio + tamano // 2, fin)
+                if corte != -1:
+                    fin = corte + len(separador)
+                    break
+        pasaje = texto[inicio:fin].strip()
+        if pasaje:
+            pasajes.append(pasaje)
+        if fin >= len(texto):
+            break
+
+        # Retroceder para solapar, empezando en el inicio de una palabra
+        siguiente = max(fin - solapamiento, inicio + 1)
+        espacio = texto.find(' ', siguiente, fin)
+        inicio = espacio + 1 if espacio != -1 else siguiente
+    return pasajes
+
+
+def fragmentar_documento(
+    doc: Dict[str, Any],
+    tamano: int = TAMANO_FRAGMENTO,
+    solapamiento: int = SOLAPAMIENTO_FRAGMENTO
+) -> List[Dict[str, Any]]:
+    """
+    Dividir la introducción, el desarrollo y la conclusión de un documento en pasajes.
+
+    Args:
+        doc (Dict[str, Any]): Documento como diccionario (con 'id')
+        tamano (int): Longitud máxima de cada pasaje en caracteres
+        solapamiento (int): Caracteres que comparte cada pasaje con el anterior
+
+    Returns:
+        List[Dict]: Pasajes con 'id', 'documento' (el documento padre), 'seccion',
+        'etiqueta', 'indice' (posición dentro de la sección) y 'texto'
+    """
+    doc_id = doc.get('id', '')
+    fragmentos = []
+    for campo, etiqueta in SECCIONES_CONTENIDO:
+        for indice, texto in enumerate(dividir_texto(str(doc.get(campo) or ''), tamano, solapamiento)):
+            fragmentos.append({
+                'id': f"{doc_id}#{campo}-{indice}",
+                'documento': doc,
+                'seccion': campo,
+                'etiqueta': etiqueta,
+                'indice': indice,
+                'texto': texto,
+            })
+    return fragmentos
+
+
+def texto_para_embedding(fragmento: Dict[str, Any]) -> str:
+    """Texto de un pasaje que se vectoriza: el título del documento padre da contexto al pasaje."""
+    titulo = fragmento['documento'].get('titulo', '')
+    return f"{titulo}\n{fragmento['etiqueta']}: {fragmento['texto']}"
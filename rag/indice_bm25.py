@@ -0,0 +1,238 @@
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Mismo criterio de tokenización que el embedder local
+_PATRON_TOKEN = re.compile(r'\w+')
+
+
+def tokenizar(texto: str) -> List[str]:
+    """Dividir un texto en términos en minúsculas."""
+    return _PATRON_TOKEN.findall(texto.lower())
+
+
+class IndiceBM25:
+    """
+    Índice invertido persistente (SQLite) con puntuación BM25.
+
+    Cada fila es un texto identificado por su clave de contenido, en el mismo orden
+    que las filas del IndiceVectorial; igual que este, si solo se añadieron textos al
+    final se indexan los nuevos y si cambió cualquier otra cosa se reconstruye. No
+    depende de los embeddings, así que la búsqueda léxica funciona sin API. Las listas
+    de apariciones se mantienen en memoria como arrays para puntuar rápido.
+
+    Varios procesos pueden compartir el archivo: cada escritura comprueba, dentro de la
+    misma transacción BEGIN IMMEDIATE que sus inserciones, si otro proceso cambió las filas
+    y en ese caso vuelve a cargarlas antes de decidir qué escribir.
+    """
+
+    def __init__(self, ruta: str, k1: float = 1.2, b: float = 0.75):
+        """
+        Abrir (o crear) el índice.
+
+        Args:
+            ruta (str): Ruta del archivo SQLite
+            k1 (float): Saturación de la frecuencia de término
+            b (float): Peso de la normalización por longitud
+        """
+        self.ruta = ruta
+        self.k1 = k1
+        self.b = b
+        self.claves: List[str] = []
+        self._longitudes = np.empty(0, dtype=np.float32)
+        # término -> (filas, frecuencias)
+        self._apariciones: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False)
+        self._conexion.execute("PRAGMA journal_mode=WAL")
+        self._conexion.executescript(
+            "CREATE TABLE IF NOT EXISTS filas (fila INTEGER PRIMARY KEY, clave TEXT NOT NULL, longitud INTEGER NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS apariciones (termino TEXT NOT NULL, fila INTEGER NOT NULL, tf INTEGER NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS apariciones_termino ON apariciones (termino);"
+        )
+        self._conexion.commit()
+        self._cargar()
+
+    def _cargar(self):
+        """Cargar en memoria las longitudes y las listas de apariciones."""
+        # Cambia cuando otra conexión confirma una escritura (las propias no la cambian)
+        self._version_datos = self._conexion.execute("PRAGMA data_version").fetchone()[0]
+        filas = self._conexion.execute("SELECT clave, longitud FROM filas ORDER BY fila").fetchall()
+        self.claves = [clave for clave, _ in filas]
+        self._longitudes = np.array([longitud for _, longitud in filas], dtype=np.float32)
+        agrupadas = defaultdict(lambda: ([], []))
+        for termino, fila, tf in self._conexion.execute("SELECT termino, fila, tf FROM apariciones"):
+            filas, tfs = agrupadas[termino]
+            filas.append(fila)
+            tfs.append(tf)
+        self._apariciones = {
+            termino: (np.array(filas, dtype=np.int64), np.array(tfs, dtype=np.float32))
+            for termino, (filas, tfs) in agrupadas.items()
+        }
+
+    def __len__(self) -> int:
+        return int(self._longitudes.shape[0])
+
+    def construir(self, claves: List[str], textos: List[str]):
+        """
+        Reescribir el índice completo.
+
+        Args:
+            claves (List[str]): Clave de contenido de cada fila
+            textos (List[str]): Texto de cada fila
+        """
+        with self._lock, self._conexion:
+            self._conexion.execute("BEGIN IMMEDIATE")
+            self._reconstruir(claves, textos)
+
+    def _reconstruir(self, claves: List[str], textos: List[str]):
+        self._conexion.execute("DELETE FROM apariciones")
+        self._conexion.execute("DELETE FROM filas")
+        self.claves = []
+        self._longitudes = np.empty(0, dtype=np.float32)
+        self._apariciones = {}
+        self._agregar(claves, textos)
+
+    def agregar(self, claves: List[str], textos: List[str]):
+        """
+        Indexar filas nuevas al final del índice.
+
+        Args:
+            claves (List[str]): Clave de contenido de cada fila nueva
+            textos (List[str]): Texto de cada fila nueva
+        """
+        with self._lock, self._conexion:
+            self._conexion.execute("BEGIN IMMEDIATE")
+            self._recargar_si_cambio()
+            self._agregar(claves, textos)
+
+    def _recargar_si_cambio(self):
+        """Volver a cargar las filas si otro proceso las cambió (dentro de la transacción de escritura)."""
+        version = self._conexion.execute("PRAGMA data_version").fetchone()[0]
+        total, maxima = self._conexion.execute("SELECT COUNT(*), MAX(fila) FROM filas").fetchone()
+        if version != self._version_datos or total != len(self) or (maxima if total else -1) != len(self) - 1:
+            self._cargar()
+
+    def _agregar(self, claves: List[str], textos: List[str]):
+        inicio = len(self)
+        longitudes = []
+        nuevas = defaultdict(lambda: ([], []))
+        for fila, texto in enumerate(textos, start=inicio):
+            frecuencias = Counter(tokenizar(texto))
+            longitudes.append(sum(frecuencias.values()))
+            for termino, tf in frecuencias.items():
+                filas, tfs = nuevas[termino]
+                filas.append(fila)
+                tfs.append(tf)
+
+        self._conexion.executemany(
+            "INSERT INTO filas (fila, clave, longitud) VALUES (?, ?, ?)",
+            ((inicio + i, clave, longitud) for i, (clave, longitud) in enumerate(zip(claves, longitudes)))
+        )
+        self._conexion.executemany(
+            "INSERT INTO apariciones (termino, fila, tf) VALUES (?, ?, ?)",
+            ((termino, fila, tf) for termino, (filas, tfs) in nuevas.items() for fila, tf in zip(filas, tfs))
+        )
+
+        self.claves = self.claves + list(claves)
+        self._longitudes = np.concatenate([self._longitudes, np.array(longitudes, dtype=np.float32)])
+        for termino, (filas, tfs) in nuevas.items():
+            filas = np.array(filas, dtype=np.int64)
+            tfs = np.array(tfs, dtype=np.float32)
+            anteriores = self._apariciones.get(termino)
+            if anteriores is not None:
+                filas = np.concatenate([anteriores[0], filas])
+                tfs = np.concatenate([anteriores[1], tfs])
+            self._apariciones[termino] = (filas, tfs)
+
+    def sincronizar(self, claves: List[str], textos: List[str]):
+        """
+        Poner el índice al día con la lista de textos.
+
+        Args:
+            claves (List[str]): Clave de contenido de cada texto
+            textos (List[str]): Textos en el mismo orden que las filas del índice vectorial
+        """
+        if self.claves == claves:
+            return
+        with self._lock, self._conexion:
+            # La comprobación y las inserciones van en la misma transacción: ningún otro
+            # proceso puede escribir filas entre ambas
+            self._conexion.execute("BEGIN IMMEDIATE")
+            self._recargar_si_cambio()
+            if self.claves == claves:
+                return
+            n = len(self)
+            if 0 < n < len(claves) and claves[:n] == self.claves:
+                self._agregar(claves[n:], textos[n:])
+            else:
+                self._reconstruir(claves, textos)
+
+    def puntuar(self, consulta: str, filas: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Puntuar con BM25 las filas que contienen algún término de la consulta.
+
+        Args:
+            consulta (str): Texto de consulta
+            filas (np.ndarray, optional): Filas candidatas (ordenadas); las demás se descartan.
+                El IDF se sigue calculando sobre todo el corpus
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (filas, scores) de las filas candidatas, sin ordenar
+        """
+        n = len(self)
+        if n == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        longitudes = self._longitudes
+        media = max(float(longitudes.mean()), 1e-8)
+
+        todas_filas, todos_pesos = [], []
+        for termino in set(tokenizar(consulta)):
+            apariciones = self._apariciones.get(termino)
+            if apariciones is None:
+                continue
+            filas_termino, tfs = apariciones
+            idf = math.log(1 + (n - filas_termino.shape[0] + 0.5) / (filas_termino.shape[0] + 0.5))
+            if filas is not None:
+                seleccion = np.isin(filas_termino, filas, assume_unique=True)
+                filas_termino, tfs = filas_termino[seleccion], tfs[seleccion]
+            normalizacion = self.k1 * (1 - self.b + self.b * longitudes[filas_termino] / media)
+            todas_filas.append(filas_termino)
+            todos_pesos.append(idf * tfs * (self.k1 + 1) / (tfs + normalizacion))
+
+        if not todas_filas:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        unicas, inverso = np.unique(np.concatenate(todas_filas), return_inverse=True)
+        return unicas, np.bincount(inverso, weights=np.concatenate(todos_pesos)).astype(np.float32)
+
+    def buscar(self, consulta: str, top_k: int = 3, filas: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """
+        Buscar las filas con mayor puntuación BM25.
+
+        Args:
+            consulta (str): Texto de consulta
+            top_k (int): Número de resultados
+            filas (np.ndarray, optional): Filas candidatas (ordenadas)
+
+        Returns:
+            List[Tuple[int, float]]: (fila, score) ordenados de mayor a menor
+        """
+        candidatas, scores = self.puntuar(consulta, filas)
+        if candidatas.size == 0 or top_k <= 0:
+            return []
+        k = min(top_k, candidatas.size)
+        mejores = np.argpartition(-scores, k - 1)[:k]
+        mejores = mejores[np.argsort(-scores[mejores])]
+        return [(int(candidatas[i]), float(scores[i])) for i in mejores]
+
+    def cerrar(self):
+        """Cerrar la conexión."""
+        self._conexion.close()
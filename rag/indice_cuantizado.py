@@ -0,0 +1,291 @@
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .indice_vectorial import IndiceVectorial, InstantaneaIndice, cronometrar_busquedas
+
+# float16: mitad de memoria que float32, sin escalas. int8: una cuarta parte, con una escala por fila
+TIPOS_CUANTIZACION = ("float16", "int8")
+
+# Tamaño del búfer float32 donde se convierte cada bloque de filas para puntuarlo: cabe en la
+# caché L2, así la conversión y el producto leen los mismos datos sin volver a la RAM
+_BYTES_BLOQUE = 512 * 2 ** 10
+
+# float16 -> float32 con operaciones de enteros (el cast de numpy es varias veces más lento):
+# con el signo extendido a 32 bits y desplazado 13 posiciones, la máscara limpia los bits de
+# exponente sobrantes y queda el mismo valor multiplicado por 2^-112 (exacto también para
+# subnormales); ese factor se compensa multiplicando la consulta por 2^112
+_MASCARA_FLOAT16 = np.int32(-0x70000001)
+_ESCALA_FLOAT16 = np.float32(2.0 ** 112)
+
+
+def cuantizar(vectores: np.ndarray, tipo: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Cuantizar filas normalizadas.
+
+    Args:
+        vectores (np.ndarray): Matriz (n, dim) float32
+        tipo (str): "float16" o "int8"
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (matriz cuantizada, escala float32 de cada fila). En int8,
+        cada fila se recupera como fila_int8 * escala, con escala = max|fila| / 127
+    """
+    vectores = np.asarray(vectores, dtype=np.float32)
+    if tipo == "float16":
+        return vectores.astype(np.float16), np.ones(vectores.shape[0], dtype=np.float32)
+    escalas = np.abs(vectores).max(axis=1) / 127.0
+    escalas = np.maximum(escalas, 1e-12).astype(np.float32)
+    return np.clip(np.rint(vectores / escalas[:, None]), -127, 127).astype(np.int8), escalas
+
+
+class IndiceCuantizado:
+    """
+    Copia cuantizada (float16 o int8) de la matriz de un IndiceVectorial para buscar con
+    menos memoria y menos lectura de disco.
+
+    Cada búsqueda puntúa todas las filas con la matriz cuantizada, preselecciona los
+    `top_k * factor_candidatos` mejores y los vuelve a puntuar con sus filas float32 exactas,
+    así que el resultado final usa similitudes exactas y solo se leen del índice exacto las
+    filas candidatas. Se guarda como <nombre>.<tipo> (filas crudas, añadibles al final) y
+    <nombre>.<tipo>.npz (escalas y generación) junto al índice exacto.
+    """
+
+    def __init__(self, directorio: str, nombre: str = "indice_embeddings", tipo: str = "int8",
+                 factor_candidatos: int = 4):
+        """
+        Abrir el índice si existe.
+
+        Args:
+            directorio (str): Directorio del índice exacto
+            nombre (str): Prefijo de los archivos del índice exacto
+            tipo (str): "float16" o "int8"
+            factor_candidatos (int): Candidatos re-puntuados por cada resultado pedido (más
+                candidatos, más recall y más filas exactas leídas)
+        """
+        if tipo not in TIPOS_CUANTIZACION:
+            raise ValueError(f"Cuantización desconocida: {tipo} (opciones: {', '.join(TIPOS_CUANTIZACION)})")
+        self.tipo = tipo
+        self.dtype = np.dtype(np.float16 if tipo == "float16" else np.int8)
+        self.factor_candidatos = factor_candidatos
+        self.ruta_matriz = os.path.join(directorio, f"{nombre}.{tipo}")
+        self.ruta_meta = os.path.join(directorio, f"{nombre}.{tipo}.npz")
+        self.generacion: Optional[str] = None
+        self.dim = 0
+        self.escalas = np.empty(0, dtype=np.float32)
+        self.matriz: Optional[np.ndarray] = None
+        self._abrir()
+
+    def _abrir(self):
+        if not (os.path.exists(self.ruta_meta) and os.path.exists(self.ruta_matriz)):
+            return
+        try:
+            with np.load(self.ruta_meta) as datos:
+                escalas = datos["escalas"]
+                generacion = str(datos["generacion"])
+                dim = int(datos["dim"])
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Error al abrir el índice cuantizado: {e}")
+            return
+        # Las filas se escriben antes que las escalas: si el tamaño no cuadra (escritura
+        # interrumpida) se reconstruye en la próxima sincronización
+        if os.path.getsize(self.ruta_matriz) < escalas.shape[0] * dim * self.dtype.itemsize or dim == 0:
+            return
+        self.generacion, self.dim, self.escalas = generacion, dim, escalas
+        self._mapear()
+
+    def _mapear(self):
+        filas = self.escalas.shape[0]
+        self.matriz = np.memmap(self.ruta_matriz, dtype=self.dtype, mode='r', shape=(filas, self.dim)) if filas else None
+
+    def _guardar_meta(self):
+        tmp = self.ruta_meta + ".tmp.npz"
+        np.savez(tmp, escalas=self.escalas, generacion=np.array(self.generacion), dim=self.dim)
+        os.replace(tmp, self.ruta_meta)
+
+    def __len__(self) -> int:
+        return int(self.escalas.shape[0])
+
+    @property
+    def bytes_por_vector(self) -> int:
+        """Bytes por fila de la matriz cuantizada, incluida su escala."""
+        return self.dim * self.dtype.itemsize + (4 if self.tipo == "int8" else 0)
+
+    def construir(self, matriz: np.ndarray, generacion: Optional[str]):
+        """
+        Cuantizar todas las filas de la matriz exacta.
+
+        Args:
+            matriz (np.ndarray): Matriz (n, dim) con filas normalizadas (puede ser un memmap)
+            generacion (str): Generación del índice exacto del que procede la matriz
+        """
+        self.matriz = None
+        self.dim = int(matriz.shape[1])
+        escalas = []
+        tmp = self.ruta_matriz + ".tmp"
+        with open(tmp, 'wb') as f:
+            for inicio in range(0, matriz.shape[0], 4096):
+                filas, escalas_bloque = cuantizar(matriz[inicio:inicio + 4096], self.tipo)
+                f.write(filas.tobytes())
+                escalas.append(escalas_bloque)
+        os.replace(tmp, self.ruta_matriz)
+        self.escalas = np.concatenate(escalas) if escalas else np.empty(0, dtype=np.float32)
+        self.generacion = generacion
+        self._guardar_meta()
+        self._mapear()
+
+    def agregar(self, vectores: np.ndarray):
+        """
+        Cuantizar y añadir filas nuevas (añadidas al final de la matriz exacta).
+
+        Args:
+            vectores (np.ndarray): Matriz (m, dim) con las filas nuevas normalizadas
+        """
+        filas, escalas = cuantizar(vectores, self.tipo)
+        self.matriz = None
+        # Truncar restos de una escritura interrumpida antes de añadir
+        with open(self.ruta_matriz, 'r+b') as f:
+            f.truncate(len(self) * self.dim * self.dtype.itemsize)
+            f.seek(0, os.SEEK_END)
+            f.write(filas.tobytes())
+        self.escalas = np.concatenate([self.escalas, escalas])
+        self._guardar_meta()
+        self._mapear()
+
+    def sincronizar(self, indice: InstantaneaIndice):
+        """
+        Poner el índice cuantizado al día con el índice exacto: se reconstruye si el exacto
+        se reconstruyó y, si solo se añadieron filas, se cuantizan las nuevas. Si ya tiene
+        filas posteriores a la instantánea (otro hilo lo sincronizó con una más reciente) no se
+        toca: buscar las descarta.
+
+        Args:
+            indice (InstantaneaIndice): Estado del índice exacto (IndiceVectorial.instantanea())
+        """
+        if indice.matriz is None or len(indice) == 0:
+            return
+        n = len(indice)
+        if (self.matriz is None or self.generacion != indice.generacion
+                or self.dim != indice.matriz.shape[1]):
+            self.construir(indice.matriz, indice.generacion)
+        elif len(self) < n:
+            self.agregar(indice.matriz[len(self):])
+
+    def puntuar(self, consulta: np.ndarray) -> np.ndarray:
+        """
+        Similitud aproximada de la consulta con todas las filas.
+
+        Args:
+            consulta (np.ndarray): Vector de consulta normalizado (float32)
+
+        Returns:
+            np.ndarray: Vector float32 con una similitud por fila
+        """
+        similitudes = np.empty(len(self), dtype=np.float32)
+        bloque = max(1, _BYTES_BLOQUE // (self.dim * 4))
+        # La conversión a float32 se hace por bloques para no materializar la matriz completa
+        if self.tipo == "float16":
+            enteros = np.empty((bloque, self.dim), dtype=np.int32)
+            filas_bloque = enteros.view(np.float32)
+            q = np.asarray(consulta, dtype=np.float32) * _ESCALA_FLOAT16
+            datos = self.matriz.view(np.int16)
+        else:
+            filas_bloque = enteros = np.empty((bloque, self.dim), dtype=np.float32)
+            q = np.asarray(consulta, dtype=np.float32)
+            datos = self.matriz
+        for inicio in range(0, len(self), bloque):
+            n = min(bloque, len(self) - inicio)
+            np.copyto(enteros[:n], datos[inicio:inicio + n])
+            if self.tipo == "float16":
+                np.left_shift(enteros[:n], 13, out=enteros[:n])
+                np.bitwise_and(enteros[:n], _MASCARA_FLOAT16, out=enteros[:n])
+            np.matmul(filas_bloque[:n], q, out=similitudes[inicio:inicio + n])
+        if self.tipo == "int8":
+            similitudes *= self.escalas
+        return similitudes
+
+    def buscar(self, matriz: np.ndarray, consulta: np.ndarray, top_k: int = 3,
+               factor_candidatos: Optional[int] = None) -> List[Tuple[int, float]]:
+        """
+        Buscar las filas más similares: preselección con la matriz cuantizada y
+        re-puntuación exacta de los candidatos.
+
+        Args:
+            matriz (np.ndarray): Matriz del índice exacto (la misma usada en sincronizar)
+            consulta (np.ndarray): Vector de consulta
+            top_k (int): Número de resultados
+            factor_candidatos (int, optional): Candidatos por resultado; por defecto self.factor_candidatos
+
+        Returns:
+            List[Tuple[int, float]]: (fila, similitud exacta) ordenados de mayor a menor
+        """
+        if self.matriz is None or len(self) == 0 or top_k <= 0:
+            return []
+        q = np.asarray(consulta, dtype=np.float32)
+        q = q / max(float(np.linalg.norm(q)), 1e-8)
+
+        aproximadas = self.puntuar(q)
+        num_candidatos = min(len(self), max(top_k * (factor_candidatos or self.factor_candidatos), top_k))
+        candidatos = np.argpartition(-aproximadas, num_candidatos - 1)[:num_candidatos]
+        # Leer las filas exactas en orden de disco para aprovechar las páginas del memmap
+        candidatos.sort()
+        # Filas añadidas después de la instantánea con la que se busca (otro hilo ya sincronizó)
+        candidatos = candidatos[candidatos < matriz.shape[0]]
+        if candidatos.size == 0:
+            return []
+
+        similitudes = np.asarray(matriz[candidatos], dtype=np.float32) @ q
+        k = min(top_k, similitudes.shape[0])
+        mejores = np.argpartition(-similitudes, k - 1)[:k]
+        mejores = mejores[np.argsort(-similitudes[mejores])]
+        return [(int(candidatos[i]), float(similitudes[i])) for i in mejores]
+
+
+def medir_recall_cuantizado(
+    indice: IndiceVectorial,
+    cuantizados: Sequence[IndiceCuantizado],
+    consultas: np.ndarray,
+    top_k: int = 10,
+    factores: Sequence[int] = (1, 2, 4, 8)
+) -> List[Dict[str, Any]]:
+    """
+    Comparar la búsqueda cuantizada con la exacta para elegir el tipo y el factor de candidatos.
+
+    Args:
+        indice (IndiceVectorial): Índice exacto (referencia)
+        cuantizados (Sequence[IndiceCuantizado]): Índices cuantizados sincronizados con `indice`
+        consultas (np.ndarray): Matriz (q, dim) de vectores de consulta
+        top_k (int): k del recall@k
+        factores (Sequence[int]): Factores de candidatos a evaluar
+
+    Returns:
+        List[Dict]: Por cada configuración (la exacta primero): tipo, factor, recall medio,
+        recall sin re-puntuar (solo la matriz cuantizada), latencia media y p95 en
+        milisegundos, bytes por vector y memoria frente a la matriz float32
+    """
+    exactos, tiempos = cronometrar_busquedas(lambda q: indice.buscar(q, top_k), consultas)
+    bytes_exacto = indice.matriz.shape[1] * 4
+    informe = [{"tipo": "float32", "factor": None, "recall": 1.0, "recall_sin_reranking": 1.0,
+                "ms_media": float(tiempos.mean()), "ms_p95": float(np.percentile(tiempos, 95)),
+                "bytes_por_vector": bytes_exacto, "memoria_relativa": 1.0}]
+
+    consultas_normalizadas = IndiceVectorial._normalizar(consultas)
+    for cuantizado in cuantizados:
+        # Recall de la matriz cuantizada sola: mide cuánto aporta la re-puntuación exacta
+        sin_reranking = []
+        for q, exacto in zip(consultas_normalizadas, exactos):
+            aproximadas = cuantizado.puntuar(q)
+            k = min(top_k, len(cuantizado))
+            sin_reranking.append(len(set(np.argpartition(-aproximadas, k - 1)[:k].tolist()) & exacto) / max(len(exacto), 1))
+        for factor in factores:
+            resultados, tiempos = cronometrar_busquedas(
+                lambda q: cuantizado.buscar(indice.matriz, q, top_k, factor), consultas
+            )
+            recall = np.mean([len(r & e) / max(len(e), 1) for r, e in zip(resultados, exactos)])
+            informe.append({"tipo": cuantizado.tipo, "factor": factor, "recall": float(recall),
+                            "recall_sin_reranking": float(np.mean(sin_reranking)),
+                            "ms_media": float(tiempos.mean()), "ms_p95": float(np.percentile(tiempos, 95)),
+                            "bytes_por_vector": cuantizado.bytes_por_vector,
+                            "memoria_relativa": cuantizado.bytes_por_vector / bytes_exacto})
+    return informe
@@ -0,0 +1,237 @@
+import math
+import os
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .indice_vectorial import IndiceVectorial, InstantaneaIndice, cronometrar_busquedas
+
+
+def _asignar(matriz: np.ndarray, centroides: np.ndarray, bloque: int = 8192) -> np.ndarray:
+    """Asignar cada fila (normalizada) al centroide más similar, por bloques."""
+    asignaciones = np.empty(matriz.shape[0], dtype=np.int32)
+    for inicio in range(0, matriz.shape[0], bloque):
+        asignaciones[inicio:inicio + bloque] = np.argmax(
+            np.asarray(matriz[inicio:inicio + bloque], dtype=np.float32) @ centroides.T, axis=1
+        )
+    return asignaciones
+
+
+def _kmeans_esferico(datos: np.ndarray, k: int, iteraciones: int, rng: np.random.Generator) -> np.ndarray:
+    """k-means con similitud coseno: los centroides se renormalizan en cada iteración."""
+    centroides = datos[rng.choice(datos.shape[0], size=k, replace=False)].copy()
+    for _ in range(iteraciones):
+        asignaciones = _asignar(datos, centroides)
+        # Sumar los puntos de cada grupo: ordenar por grupo y reducir por tramos
+        orden = np.argsort(asignaciones, kind="stable")
+        conteos = np.bincount(asignaciones, minlength=k)
+        inicios = np.concatenate([[0], np.cumsum(conteos)[:-1]])
+        no_vacios = np.flatnonzero(conteos)
+        sumas = np.zeros_like(centroides)
+        sumas[no_vacios] = np.add.reduceat(datos[orden], inicios[no_vacios], axis=0)
+        vacios = np.flatnonzero(conteos == 0)
+        # Los centroides sin puntos se reinician en puntos al azar
+        sumas[vacios] = datos[rng.choice(datos.shape[0], size=len(vacios), replace=False)]
+        normas = np.linalg.norm(sumas, axis=1, keepdims=True)
+        centroides = sumas / np.maximum(normas, 1e-8)
+    return centroides.astype(np.float32)
+
+
+class IndiceIVF:
+    """
+    Índice aproximado IVF (inverted file) sobre la matriz de un IndiceVectorial.
+
+    Las filas se reparten en listas según su centroide más cercano (k-means esférico);
+    una búsqueda solo compara la consulta con las filas de las `nprobe` listas cuyos
+    centroides son más similares, en lugar de con toda la matriz. Los centroides y las
+    asignaciones se guardan en <nombre>.ivf.npz junto al índice exacto.
+    """
+
+    def __init__(self, directorio: str, nombre: str = "indice_embeddings", nprobe: int = 8):
+        """
+        Abrir el índice si existe.
+
+        Args:
+            directorio (str): Directorio del índice exacto
+            nombre (str): Prefijo de los archivos del índice exacto
+            nprobe (int): Listas que se exploran por búsqueda (más listas, más recall y más coste)
+        """
+        self.ruta = os.path.join(directorio, f"{nombre}.ivf.npz")
+        self.nprobe = nprobe
+        self.centroides: Optional[np.ndarray] = None
+        self.asignaciones = np.empty(0, dtype=np.int32)
+        self.generacion: Optional[str] = None
+        self.filas_entrenamiento = 0
+        self._orden = np.empty(0, dtype=np.int64)
+        self._inicios = np.zeros(1, dtype=np.int64)
+        self._abrir()
+
+    def _abrir(self):
+        if not os.path.exists(self.ruta):
+            return
+        try:
+            with np.load(self.ruta) as datos:
+                self.centroides = datos["centroides"]
+                self.asignaciones = datos["asignaciones"]
+                self.generacion = str(datos["generacion"])
+                self.filas_entrenamiento = int(datos["filas_entrenamiento"])
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Error al abrir el índice IVF: {e}")
+            self.centroides = None
+            return
+        self._actualizar_listas()
+
+    def _guardar(self):
+        tmp = self.ruta + ".tmp.npz"
+        np.savez(tmp, centroides=self.centroides, asignaciones=self.asignaciones,
+                 generacion=np.array(self.generacion), filas_entrenamiento=self.filas_entrenamiento)
+        os.replace(tmp, self.ruta)
+
+    def _actualizar_listas(self):
+        """Reconstruir las listas invertidas (filas ordenadas por centroide) a partir de las asignaciones."""
+        self._orden = np.argsort(self.asignaciones, kind="stable")
+        self._inicios = np.searchsorted(
+            self.asignaciones[self._orden], np.arange(self.centroides.shape[0] + 1)
+        )
+
+    def __len__(self) -> int:
+        return int(self.asignaciones.shape[0])
+
+    def entrenar(self, matriz: np.ndarray, generacion: Optional[str], num_listas: Optional[int] = None,
+                 iteraciones: int = 10, semilla: int = 0):
+        """
+        Calcular los centroides y asignar todas las filas.
+
+        Args:
+            matriz (np.ndarray): Matriz (n, dim) con filas normalizadas (puede ser un memmap)
+            generacion (str): Generación del índice exacto del que procede la matriz
+            num_listas (int, optional): Número de listas; por defecto √n
+            iteraciones (int): Iteraciones de k-means
+            semilla (int): Semilla del muestreo, para que el entrenamiento sea reproducible
+        """
+        n = matriz.shape[0]
+        if num_listas is None:
+            num_listas = int(round(math.sqrt(n)))
+        # Al menos ~40 filas por lista para que los centroides sean representativos
+        num_listas = max(1, min(num_listas, n // 40 or 1))
+
+        # k-means sobre una muestra: con ~64 puntos por centroide basta
+        rng = np.random.default_rng(semilla)
+        tamano_muestra = min(n, num_listas * 64)
+        muestra = np.asarray(matriz[np.sort(rng.choice(n, size=tamano_muestra, replace=False))], dtype=np.float32)
+        self.centroides = _kmeans_esferico(muestra, num_listas, iteraciones, rng)
+        self.asignaciones = _asignar(matriz, self.centroides)
+        self.generacion = generacion
+        self.filas_entrenamiento = n
+        self._actualizar_listas()
+        self._guardar()
+
+    def agregar(self, vectores: np.ndarray):
+        """
+        Asignar filas nuevas (añadidas al final de la matriz) sin volver a entrenar.
+
+        Args:
+            vectores (np.ndarray): Matriz (m, dim) con las filas nuevas normalizadas
+        """
+        self.asignaciones = np.concatenate([self.asignaciones, _asignar(vectores, self.centroides)])
+        self._actualizar_listas()
+        self._guardar()
+
+    def sincronizar(self, indice: InstantaneaIndice):
+        """
+        Poner el índice IVF al día con el índice exacto.
+
+        Se vuelve a entrenar si el índice exacto se reconstruyó o si creció más de 4 veces
+        desde el último entrenamiento (los centroides dejarían de representar el corpus);
+        si solo se añadieron filas, se asignan las nuevas. Si ya tiene filas posteriores a la
+        instantánea (otro hilo lo sincronizó con una más reciente) no se toca: buscar las descarta.
+
+        Args:
+            indice (InstantaneaIndice): Estado del índice exacto (IndiceVectorial.instantanea())
+        """
+        if indice.matriz is None or len(indice) == 0:
+            return
+        n = len(indice)
+        if (self.centroides is None or self.generacion != indice.generacion
+                or self.centroides.shape[1] != indice.matriz.shape[1] or n > 4 * self.filas_entrenamiento):
+            self.entrenar(indice.matriz, indice.generacion)
+        elif len(self) < n:
+            self.agregar(indice.matriz[len(self):])
+
+    def buscar(self, matriz: np.ndarray, consulta: np.ndarray, top_k: int = 3,
+               nprobe: Optional[int] = None) -> List[Tuple[int, float]]:
+        """
+        Buscar las filas más similares explorando solo las listas más prometedoras.
+
+        Args:
+            matriz (np.ndarray): Matriz del índice exacto (la misma usada en sincronizar)
+            consulta (np.ndarray): Vector de consulta
+            top_k (int): Número de resultados
+            nprobe (int, optional): Listas a explorar; por defecto self.nprobe
+
+        Returns:
+            List[Tuple[int, float]]: (fila, similitud) ordenados de mayor a menor
+        """
+        if self.centroides is None or len(self) == 0 or top_k <= 0:
+            return []
+        q = np.asarray(consulta, dtype=np.float32)
+        q = q / max(float(np.linalg.norm(q)), 1e-8)
+
+        num_listas = self.centroides.shape[0]
+        nprobe = min(nprobe or self.nprobe, num_listas)
+        similitudes_centroides = self.centroides @ q
+        listas = np.argpartition(-similitudes_centroides, nprobe - 1)[:nprobe]
+        candidatos = np.concatenate([self._orden[self._inicios[c]:self._inicios[c + 1]] for c in listas])
+        if candidatos.size == 0:
+            return []
+        # Leer las filas en orden de disco para aprovechar las páginas del memmap
+        candidatos.sort()
+        # Filas añadidas después de la instantánea con la que se busca (otro hilo ya sincronizó)
+        candidatos = candidatos[candidatos < matriz.shape[0]]
+        if candidatos.size == 0:
+            return []
+
+        similitudes = np.asarray(matriz[candidatos], dtype=np.float32) @ q
+        k = min(top_k, similitudes.shape[0])
+        mejores = np.argpartition(-similitudes, k - 1)[:k]
+        mejores = mejores[np.argsort(-similitudes[mejores])]
+        return [(int(candidatos[i]), float(similitudes[i])) for i in mejores]
+
+
+def medir_recall(
+    indice: IndiceVectorial,
+    ivf: IndiceIVF,
+    consultas: np.ndarray,
+    top_k: int = 10,
+    nprobes: Sequence[int] = (1, 2, 4, 8, 16, 32)
+) -> List[Dict[str, Any]]:
+    """
+    Comparar el índice IVF con la búsqueda exacta para elegir nprobe con datos.
+
+    Args:
+        indice (IndiceVectorial): Índice exacto (referencia)
+        ivf (IndiceIVF): Índice aproximado sincronizado con `indice`
+        consultas (np.ndarray): Matriz (q, dim) de vectores de consulta
+        top_k (int): k del recall@k
+        nprobes (Sequence[int]): Valores de nprobe a evaluar
+
+    Returns:
+        List[Dict]: Por cada configuración (la exacta primero): nprobe, recall medio,
+        latencia media y p95 en milisegundos y fracción de filas comparadas
+    """
+    exactos, tiempos = cronometrar_busquedas(lambda q: indice.buscar(q, top_k), consultas)
+    informe = [{"nprobe": None, "recall": 1.0, "ms_media": float(tiempos.mean()),
+                "ms_p95": float(np.percentile(tiempos, 95)), "fraccion_explorada": 1.0}]
+
+    tamanos = np.diff(ivf._inicios)
+    similitudes_centroides = np.asarray(consultas, dtype=np.float32) @ ivf.centroides.T
+    for nprobe in nprobes:
+        aproximados, tiempos = cronometrar_busquedas(lambda q: ivf.buscar(indice.matriz, q, top_k, nprobe), consultas)
+        recall = np.mean([len(a & e) / max(len(e), 1) for a, e in zip(aproximados, exactos)])
+        # Filas comparadas por consulta: el tamaño de las listas exploradas
+        p = min(nprobe, tamanos.shape[0])
+        listas = np.argpartition(-similitudes_centroides, p - 1, axis=1)[:, :p]
+        explorada = float(tamanos[listas].sum(axis=1).mean() / max(len(ivf), 1))
+        informe.append({"nprobe": nprobe, "recall": float(recall), "ms_media": float(tiempos.mean()),
+                        "ms_p95": float(np.percentile(tiempos, 95)), "fraccion_explorada": explorada})
+    return informe
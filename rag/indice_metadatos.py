@@ -0,0 +1,100 @@
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+# Campos del encabezado de los documentos por los que se puede filtrar
+CAMPOS_FILTRO = ("tipo", "materia", "profesor")
+
+
+def normalizar_valor(valor: Any) -> str:
+    """Normalizar un valor de metadatos: sin acentos, en minúsculas y con espacios simples."""
+    texto = unicodedata.normalize("NFKD", str(valor))
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return " ".join(texto.casefold().split())
+
+
+class IndiceMetadatos:
+    """
+    Índice de los pasajes del corpus por los campos de su documento (tipo, materia, profesor).
+
+    Para cada campo y valor guarda las filas (ordenadas) de los pasajes cuyo documento lo
+    tiene, así que un filtro se resuelve con intersecciones de arrays sin recorrer el corpus.
+    Las filas de cada combinación de filtros se memorizan; el índice se construye de nuevo
+    cuando cambia la versión del corpus, y con él la memoria de filtros.
+    """
+
+    def __init__(self, fragmentos: List[Dict[str, Any]], max_filtros_cache: int = 128):
+        """
+        Construir el índice.
+
+        Args:
+            fragmentos (List[Dict]): Pasajes del corpus; cada uno enlaza a su documento en 'documento'
+            max_filtros_cache (int): Combinaciones de filtros cuyas filas se memorizan
+        """
+        listas: Dict[str, Dict[str, List[int]]] = {campo: {} for campo in CAMPOS_FILTRO}
+        for fila, fragmento in enumerate(fragmentos):
+            doc = fragmento['documento']
+            for campo in CAMPOS_FILTRO:
+                valor = doc.get(campo)
+                if valor:
+                    listas[campo].setdefault(normalizar_valor(valor), []).append(fila)
+        self._filas = {
+            campo: {valor: np.array(filas, dtype=np.int64) for valor, filas in valores.items()}
+            for campo, valores in listas.items()
+        }
+        self.max_filtros_cache = max_filtros_cache
+        self._cache: "OrderedDict[Tuple[Tuple[str, str], ...], np.ndarray]" = OrderedDict()
+        # El servidor atiende cada petición en un hilo y todas comparten el índice: la memoria
+        # de filtros se lee y se actualiza con el bloqueo (las intersecciones se calculan sin él)
+        self._lock = threading.Lock()
+
+    def valores(self, campo: str) -> List[str]:
+        """Devolver los valores (normalizados) que aparecen en un campo."""
+        return sorted(self._filas.get(campo, {}))
+
+    def filas(self, filtros: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """
+        Obtener las filas de los pasajes que cumplen todos los filtros.
+
+        Args:
+            filtros (Dict, optional): Campo -> valor requerido, p. ej. {"tipo": "practica",
+                "materia": "Programación Visual"}. Se comparan sin distinguir mayúsculas ni acentos;
+                los valores vacíos se ignoran
+
+        Returns:
+            np.ndarray: Filas ordenadas (puede estar vacío), o None si no hay ningún filtro activo
+
+        Raises:
+            ValueError: Si se filtra por un campo que no está en CAMPOS_FILTRO
+        """
+        activos = tuple(sorted(
+            (campo, normalizar_valor(valor)) for campo, valor in (filtros or {}).items() if valor
+        ))
+        if not activos:
+            return None
+        for campo, _ in activos:
+            if campo not in self._filas:
+                raise ValueError(f"No se puede filtrar por '{campo}' (campos: {', '.join(CAMPOS_FILTRO)})")
+
+        with self._lock:
+            filas = self._cache.get(activos)
+            if filas is not None:
+                self._cache.move_to_end(activos)
+                return filas
+
+        vacio = np.empty(0, dtype=np.int64)
+        # Empezar por la lista más corta: las intersecciones siguientes son más baratas
+        listas = sorted((self._filas[campo].get(valor, vacio) for campo, valor in activos), key=len)
+        filas = listas[0]
+        for otra in listas[1:]:
+            filas = np.intersect1d(filas, otra, assume_unique=True)
+
+        with self._lock:
+            self._cache[activos] = filas
+            self._cache.move_to_end(activos)
+            if len(self._cache) > self.max_filtros_cache:
+                self._cache.popitem(last=False)
+        return filas
@@ -0,0 +1,339 @@
+import io
+import json
+import os
+import time
+import uuid
+from typing import Callable, Dict, List, Tuple, Optional
+
+import numpy as np
+
+from .bloqueo_archivo import bloqueo_archivo
+
+
+class InstantaneaIndice:
+    """
+    Estado del índice en un momento dado: modelo, generación, mapa de filas y matriz mapeada.
+
+    No se modifica nunca: cada escritura del índice crea una instantánea nueva (con listas
+    nuevas), así que una búsqueda sobre una instantánea no ve cambios a mitad de camino y
+    sus filas siempre corresponden a sus claves.
+    """
+
+    __slots__ = ("modelo", "generacion", "ids", "claves", "matriz", "ruta_matriz")
+
+    def __init__(self, modelo: Optional[str], generacion: Optional[str], ids: List[str], claves: List[str],
+                 matriz: Optional[np.ndarray], ruta_matriz: str):
+        self.modelo = modelo
+        self.generacion = generacion
+        self.ids = ids
+        self.claves = claves
+        self.matriz = matriz
+        self.ruta_matriz = ruta_matriz
+
+    def __len__(self) -> int:
+        return len(self.claves)
+
+    def buscar(self, consulta: np.ndarray, top_k: int = 3,
+               filas: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """
+        Buscar las filas más similares a un vector de consulta (similitud coseno).
+
+        Args:
+            consulta (np.ndarray): Vector de consulta
+            top_k (int): Número de resultados
+            filas (np.ndarray, optional): Filas candidatas (ordenadas); si se indican, solo
+                se compara la consulta con ellas en lugar de con toda la matriz
+
+        Returns:
+            List[Tuple[int, float]]: (fila, similitud) ordenados de mayor a menor
+        """
+        if self.matriz is None or len(self) == 0 or top_k <= 0:
+            return []
+        q = np.asarray(consulta, dtype=np.float32)
+        q = q / max(float(np.linalg.norm(q)), 1e-8)
+
+        # Las filas ya están normalizadas: el coseno es un único producto matriz-vector
+        if filas is None:
+            filas = np.arange(len(self))
+            similitudes = self.matriz @ q
+        else:
+            if len(filas) == 0:
+                return []
+            # Filas ordenadas: lectura secuencial del memmap
+            similitudes = np.asarray(self.matriz[filas], dtype=np.float32) @ q
+        k = min(top_k, similitudes.shape[0])
+        mejores = np.argpartition(-similitudes, k - 1)[:k]
+        mejores = mejores[np.argsort(-similitudes[mejores])]
+        return [(int(filas[i]), float(similitudes[i])) for i in mejores]
+
+
+class IndiceVectorial:
+    """
+    Índice persistente de embeddings: matriz float32 normalizada por filas en un .npy
+    abierto con np.memmap, más el mapa fila ↔ documento en JSON (.mapa).
+
+    La matriz no se copia ni se carga entera en memoria: el sistema operativo trae
+    las páginas que cada búsqueda necesita.
+
+    Varios procesos pueden compartir los archivos (p. ej. el servidor RAG y
+    agregar_documento.py): las escrituras toman un bloqueo de archivo (<nombre>.lock) y
+    vuelven a leer el estado del disco antes de escribir, y las búsquedas trabajan sobre
+    una instantánea (ver instantanea()).
+    """
+
+    def __init__(self, directorio: str, nombre: str = "indice_embeddings"):
+        """
+        Abrir el índice si existe.
+
+        Args:
+            directorio (str): Directorio donde se guardan los archivos del índice
+            nombre (str): Prefijo de los archivos (<nombre>.npy, <nombre>.mapa y <nombre>.lock)
+        """
+        self.ruta_matriz = os.path.join(directorio, f"{nombre}.npy")
+        # Sin extensión .json: el directorio rag/ también se recorre en busca de documentos
+        self.ruta_mapa = os.path.join(directorio, f"{nombre}.mapa")
+        self.ruta_bloqueo = os.path.join(directorio, f"{nombre}.lock")
+        self._estado = InstantaneaIndice(None, None, [], [], None, self.ruta_matriz)
+        if os.path.exists(self.ruta_matriz) and os.path.exists(self.ruta_mapa):
+            with bloqueo_archivo(self.ruta_bloqueo, exclusivo=False):
+                estado = self._leer_disco()
+            if estado is not None:
+                self._estado = estado
+
+    def instantanea(self) -> InstantaneaIndice:
+        """Estado actual del índice; no cambia aunque después se escriba en el índice."""
+        return self._estado
+
+    # Atajos al estado actual. La generación cambia cada vez que el índice se reconstruye
+    # (no al añadir filas); los índices derivados (ver IndiceIVF) la usan para saber si
+    # siguen siendo válidos
+    @property
+    def modelo(self) -> Optional[str]:
+        return self._estado.modelo
+
+    @property
+    def generacion(self) -> Optional[str]:
+        return self._estado.generacion
+
+    @property
+    def ids(self) -> List[str]:
+        return self._estado.ids
+
+    @property
+    def claves(self) -> List[str]:
+        return self._estado.claves
+
+    @property
+    def matriz(self) -> Optional[np.ndarray]:
+        return self._estado.matriz
+
+    def __len__(self) -> int:
+        return len(self._estado)
+
+    def _leer_disco(self) -> Optional[InstantaneaIndice]:
+        """Leer el mapa de filas y mapear la matriz tal como están en disco (con el bloqueo tomado)."""
+        if not (os.path.exists(self.ruta_matriz) and os.path.exists(self.ruta_mapa)):
+            return None
+        try:
+            with open(self.ruta_mapa, 'r', encoding='utf-8') as f:
+                mapa = json.load(f)
+            matriz = np.load(self.ruta_matriz, mmap_mode='r')
+        except (OSError, ValueError) as e:
+            print(f"Error al abrir el índice de embeddings: {e}")
+            return None
+        if matriz.shape[0] != len(mapa.get("claves", [])):
+            # Archivos de versiones distintas (escritura interrumpida): se reconstruirá
+            return None
+        return InstantaneaIndice(mapa.get("modelo"), mapa.get("generacion"), mapa["ids"], mapa["claves"],
+                                 matriz, self.ruta_matriz)
+
+    @staticmethod
+    def _normalizar(vectores: np.ndarray) -> np.ndarray:
+        vectores = np.asarray(vectores, dtype=np.float32)
+        normas = np.linalg.norm(vectores, axis=1, keepdims=True)
+        return vectores / np.maximum(normas, 1e-8)
+
+    @staticmethod
+    def _guardar_mapa(ruta: str, estado: InstantaneaIndice):
+        with open(ruta, 'w', encoding='utf-8') as f:
+            json.dump({"modelo": estado.modelo, "generacion": estado.generacion, "ids": estado.ids,
+                       "claves": estado.claves}, f, ensure_ascii=False)
+
+    def construir(self, modelo: str, ids: List[str], claves: List[str], vectores: np.ndarray):
+        """
+        Reescribir el índice completo.
+
+        Args:
+            modelo (str): Modelo de embeddings de los vectores
+            ids (List[str]): Identificador del documento de cada fila
+            claves (List[str]): Clave de contenido de cada fila
+            vectores (np.ndarray): Matriz (n, dim) de embeddings
+        """
+        with bloqueo_archivo(self.ruta_bloqueo):
+            self._reescribir(modelo, list(ids), list(claves), vectores)
+
+    def _reescribir(self, modelo: str, ids: List[str], claves: List[str], vectores: np.ndarray):
+        """Escribir el índice completo en archivos temporales y sustituir los actuales (con el bloqueo tomado)."""
+        vectores = np.asarray(vectores, dtype=np.float32).reshape(len(claves), -1)
+        # Normalizar por bloques para no duplicar en memoria matrices grandes
+        self._sustituir(modelo, ids, claves, vectores.shape[1],
+                        lambda inicio, fin: self._normalizar(vectores[inicio:fin]))
+
+    def _sustituir(self, modelo: str, ids: List[str], claves: List[str], dim: int,
+                   bloque: Callable[[int, int], np.ndarray]):
+        """
+        Escribir una matriz nueva por bloques de filas y sustituir los archivos actuales (con el bloqueo tomado).
+
+        Args:
+            bloque (Callable): Devuelve las filas [inicio, fin) ya normalizadas
+        """
+        tmp_matriz = self.ruta_matriz + ".tmp"
+        tmp_mapa = self.ruta_mapa + ".tmp"
+
+        destino = np.lib.format.open_memmap(tmp_matriz, mode='w+', dtype=np.float32, shape=(len(claves), dim))
+        for inicio in range(0, len(claves), 4096):
+            destino[inicio:inicio + 4096] = bloque(inicio, min(inicio + 4096, len(claves)))
+        destino.flush()
+        del destino
+
+        estado = InstantaneaIndice(modelo, uuid.uuid4().hex, ids, claves, None, self.ruta_matriz)
+        self._guardar_mapa(tmp_mapa, estado)
+        os.replace(tmp_matriz, self.ruta_matriz)
+        os.replace(tmp_mapa, self.ruta_mapa)
+        estado.matriz = np.load(self.ruta_matriz, mmap_mode='r')
+        self._estado = estado
+
+    def agregar(self, ids: List[str], claves: List[str], vectores: np.ndarray):
+        """
+        Añadir filas al final del índice sin reescribir las existentes.
+
+        Si otro proceso cambió los archivos desde que este los leyó, el índice se reescribe
+        entero a partir del estado propio más las filas nuevas (o se adopta el del disco si
+        ya es exactamente ese).
+
+        Args:
+            ids (List[str]): Identificador del documento de cada fila nueva
+            claves (List[str]): Clave de contenido de cada fila nueva
+            vectores (np.ndarray): Matriz (m, dim) de embeddings nuevos
+        """
+        if not claves:
+            return
+        with bloqueo_archivo(self.ruta_bloqueo):
+            base = self._estado
+            ids_destino, claves_destino = base.ids + list(ids), base.claves + list(claves)
+            disco = self._leer_disco()
+            if disco is not None and disco.modelo == base.modelo and disco.claves == claves_destino:
+                # Otro proceso ya añadió exactamente estas filas
+                self._estado = disco
+                return
+            if base.matriz is None:
+                self._reescribir(base.modelo, list(ids), list(claves), vectores)
+                return
+
+            nuevos = self._normalizar(np.asarray(vectores).reshape(len(claves), -1))
+            filas, dim = base.matriz.shape
+            forma = (filas + nuevos.shape[0], dim)
+
+            # La cabecera .npy guarda la forma; solo se puede reescribir en su sitio si
+            # conserva la misma longitud (normalmente sí: va rellenada a 64 bytes)
+            cabecera_actual, cabecera_nueva = io.BytesIO(), io.BytesIO()
+            descriptor = {'descr': np.lib.format.dtype_to_descr(np.dtype(np.float32)), 'fortran_order': False}
+            np.lib.format.write_array_header_1_0(cabecera_actual, dict(descriptor, shape=(filas, dim)))
+            np.lib.format.write_array_header_1_0(cabecera_nueva, dict(descriptor, shape=forma))
+            cambiado = disco is None or disco.generacion != base.generacion or len(disco) != filas
+            if cambiado or len(cabecera_actual.getvalue()) != len(cabecera_nueva.getvalue()):
+                # La instantánea propia sigue siendo válida aunque el archivo se haya sustituido
+                # (el mapeo apunta al archivo anterior): se reescribe todo a partir de ella
+                todos = np.concatenate([np.asarray(base.matriz), nuevos])
+                self._reescribir(base.modelo, ids_destino, claves_destino, todos)
+                return
+
+            with open(self.ruta_matriz, 'r+b') as f:
+                f.seek(0, os.SEEK_END)
+                f.write(nuevos.tobytes())
+                f.seek(0)
+                f.write(cabecera_nueva.getvalue())
+            estado = InstantaneaIndice(base.modelo, base.generacion, ids_destino, claves_destino, None,
+                                       self.ruta_matriz)
+            tmp_mapa = self.ruta_mapa + ".tmp"
+            self._guardar_mapa(tmp_mapa, estado)
+            os.replace(tmp_mapa, self.ruta_mapa)
+            estado.matriz = np.load(self.ruta_matriz, mmap_mode='r')
+            self._estado = estado
+
+    def actualizar(self, ids: List[str], claves: List[str], nuevos: Dict[str, np.ndarray]):
+        """
+        Reescribir el índice con otra lista de filas (documentos editados, borrados o reordenados).
+
+        Las filas cuyas claves ya están en el índice se copian de la matriz actual por bloques,
+        sin cargarla entera; solo las claves que no tiene necesitan su vector en `nuevos`.
+
+        Los archivos se sustituyen enteros (O(N) en disco) en lugar de sobrescribir las filas
+        en su sitio: las instantáneas en uso y los procesos de búsqueda tienen mapeado el
+        archivo actual y sus filas no deben cambiar bajo ellos, y la generación nueva avisa a
+        los índices derivados (IVF, cuantizado) de que ya no son válidos.
+
+        Args:
+            ids (List[str]): Identificador del documento de cada fila
+            claves (List[str]): Clave de contenido de cada fila
+            nuevos (Dict[str, np.ndarray]): Embedding de cada clave que el índice no tiene
+
+        Raises:
+            KeyError: Si falta el embedding de una clave que no está en el índice
+        """
+        with bloqueo_archivo(self.ruta_bloqueo):
+            # La instantánea propia sigue siendo válida aunque otro proceso haya sustituido los archivos
+            base = self._estado
+            filas_base = {clave: fila for fila, clave in enumerate(base.claves)} if base.matriz is not None else {}
+            faltan = [clave for clave in claves if clave not in filas_base]
+            for clave in faltan:
+                if clave not in nuevos:
+                    raise KeyError(f"Falta el embedding de la clave {clave}")
+            if not filas_base:
+                self._reescribir(base.modelo, list(ids), list(claves), np.vstack([nuevos[c] for c in claves]))
+                return
+            dim = base.matriz.shape[1]
+
+            def bloque(inicio: int, fin: int) -> np.ndarray:
+                filas = np.empty((fin - inicio, dim), dtype=np.float32)
+                copiadas = [(i, filas_base[clave]) for i, clave in enumerate(claves[inicio:fin]) if clave in filas_base]
+                if copiadas:
+                    destino, origen = (list(columna) for columna in zip(*copiadas))
+                    filas[destino] = base.matriz[origen]
+                generadas = [i for i, clave in enumerate(claves[inicio:fin]) if clave not in filas_base]
+                if generadas:
+                    filas[generadas] = self._normalizar(np.vstack([nuevos[claves[inicio + i]] for i in generadas]))
+                return filas
+
+            self._sustituir(base.modelo, list(ids), list(claves), dim, bloque)
+
+    def buscar(self, consulta: np.ndarray, top_k: int = 3,
+               filas: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """
+        Buscar sobre el estado actual del índice (ver InstantaneaIndice.buscar).
+
+        Returns:
+            List[Tuple[int, float]]: (fila, similitud) ordenados de mayor a menor
+        """
+        return self._estado.buscar(consulta, top_k, filas)
+
+
+def cronometrar_busquedas(buscar: Callable[[np.ndarray], List[Tuple[int, float]]],
+                          consultas: np.ndarray) -> Tuple[List[set], np.ndarray]:
+    """
+    Ejecutar una búsqueda por consulta midiendo su latencia (para los informes de recall).
+
+    Args:
+        buscar (Callable): Función que recibe un vector de consulta y devuelve (fila, similitud)
+        consultas (np.ndarray): Matriz (q, dim) de vectores de consulta
+
+    Returns:
+        Tuple[List[set], np.ndarray]: (conjunto de filas devueltas por consulta, milisegundos por consulta)
+    """
+    resultados, tiempos = [], []
+    for q in consultas:
+        inicio = time.perf_counter()
+        filas = buscar(q)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+        resultados.append({fila for fila, _ in filas})
+    return resultados, np.array(tiempos)
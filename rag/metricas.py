@@ -0,0 +1,438 @@
+import atexit
+import contextlib
+import contextvars
+import functools
+import itertools
+import json
+import sys
+import threading
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, TextIO, Tuple
+
+# Solo usa la biblioteca estándar: secciones.py (y con él los scripts) lo importa al arrancar.
+
+# Un evento es un diccionario con:
+#   tipo: "span" (duración de una etapa) o "contador"
+#   nombre: etapa o contador (p. ej. "buscar", "cache_respuestas")
+#   duracion_ms / valor: duración de la etapa o incremento del contador
+#   etiquetas: dimensiones adicionales (p. ej. {"resultado": "acierto"})
+#   operacion, id_operacion: operación (generar_documento, transformar_texto...) dentro de
+#       la que ocurrió, para agrupar los eventos de una misma petición
+#   error: nombre de la excepción si la etapa falló (solo spans)
+#   primer_fragmento_ms: en las etapas en streaming, tiempo hasta el primer fragmento
+Evento = Dict[str, Any]
+
+# Operación en curso en este hilo o tarea: (nombre, id)
+_operacion_actual: contextvars.ContextVar[Optional[Tuple[str, int]]] = contextvars.ContextVar(
+    "operacion_actual", default=None
+)
+_ids_operacion = itertools.count(1)
+_NULO = contextlib.nullcontext()
+
+
+class _Span:
+    """Context manager que mide una etapa y emite su evento al salir."""
+
+    __slots__ = ("metricas", "nombre", "etiquetas", "inicio")
+
+    def __init__(self, metricas: "Metricas", nombre: str, etiquetas: Dict[str, Any]):
+        self.metricas = metricas
+        self.nombre = nombre
+        self.etiquetas = etiquetas
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo_error, error, traza):
+        self.metricas.emitir_span(self.nombre, self.inicio, self.etiquetas,
+                                  error=tipo_error.__name__ if tipo_error is not None else None)
+        return False
+
+
+class Metricas:
+    """
+    Registro de métricas del proceso: spans de tiempo por etapa y contadores.
+
+    Los eventos se entregan a los hooks suscritos (ver EscritorJSONL y AgregadorMetricas).
+    Sin ningún hook las llamadas vuelven de inmediato: span() devuelve un context manager
+    nulo compartido y contar() no construye ningún evento.
+    """
+
+    def __init__(self):
+        # Lista inmutable que se sustituye al suscribir: emitir no necesita el lock
+        self._hooks: Tuple[Callable[[Evento], None], ...] = ()
+        self._lock = threading.Lock()
+
+    @property
+    def activas(self) -> bool:
+        """Si hay algún hook suscrito."""
+        return bool(self._hooks)
+
+    def suscribir(self, hook: Callable[[Evento], None]) -> Callable[[Evento], None]:
+        """
+        Suscribir un hook que recibirá cada evento.
+
+        El hook se llama en el hilo que produce el evento, así que debe ser rápido y
+        seguro entre hilos; si lanza una excepción se ignora.
+
+        Returns:
+            Callable: El propio hook (para poder cancelarlo después)
+        """
+        with self._lock:
+            self._hooks = self._hooks + (hook,)
+        return hook
+
+    def cancelar(self, hook: Callable[[Evento], None]):
+        """Dejar de enviar eventos a un hook."""
+        with self._lock:
+            self._hooks = tuple(h for h in self._hooks if h is not hook)
+
+    def emitir(self, evento: Evento):
+        """Completar un evento con la operación en curso y entregarlo a los hooks."""
+        evento["ts"] = time.time()
+        operacion = _operacion_actual.get()
+        if operacion is not None:
+            evento["operacion"], evento["id_operacion"] = operacion
+        for hook in self._hooks:
+            try:
+                hook(evento)
+            except Exception:
+                pass
+
+    def span(self, nombre: str, **etiquetas) -> contextlib.AbstractContextManager:
+        """Medir el bloque `with` como la etapa `nombre`."""
+        if not self._hooks:
+            return _NULO
+        return _Span(self, nombre, etiquetas)
+
+    def emitir_span(self, nombre: str, inicio: float, etiquetas: Optional[Dict[str, Any]] = None,
+                    error: Optional[str] = None, primer_fragmento: Optional[float] = None):
+        """Emitir una etapa que empezó en `inicio` (time.perf_counter) y termina ahora."""
+        if not self._hooks:
+            return
+        ahora = time.perf_counter()
+        evento = {"tipo": "span", "nombre": nombre, "duracion_ms": round((ahora - inicio) * 1000, 3),
+                  "etiquetas": etiquetas or {}, "error": error}
+        if primer_fragmento is not None:
+            evento["primer_fragmento_ms"] = round((primer_fragmento - inicio) * 1000, 3)
+        self.emitir(evento)
+
+    def contar(self, nombre: str, valor: float = 1, **etiquetas):
+        """Incrementar el contador `nombre` en `valor`."""
+        if not self._hooks:
+            return
+        self.emitir({"tipo": "contador", "nombre": nombre, "valor": valor, "etiquetas": etiquetas})
+
+    def iterar(self, nombre: str, iterador: Iterator[str], inicio: Optional[float] = None,
+               etiquetas: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+        """
+        Medir una etapa en streaming: desde `inicio` (o el primer next) hasta agotar el iterador.
+
+        El evento incluye el tiempo hasta el primer fragmento. Si el consumidor abandona el
+        iterador antes del final, la etapa se emite con error "GeneratorExit".
+        """
+        if not self._hooks:
+            return iterador
+        return self._iterar(nombre, iterador, inicio, etiquetas or {}, _operacion_actual.get())
+
+    def _iterar(self, nombre: str, iterador: Iterator[str], inicio: Optional[float],
+                etiquetas: Dict[str, Any], operacion: Optional[Tuple[str, int]]) -> Iterator[str]:
+        # El iterador se consume fuera de la llamada que lo creó: cada next se ejecuta con la
+        # operación de entonces para que sus eventos internos sigan agrupados
+        inicio = inicio if inicio is not None else time.perf_counter()
+        primer_fragmento = None
+        error = None
+        try:
+            while True:
+                token = _operacion_actual.set(operacion)
+                try:
+                    fragmento = next(iterador)
+                except StopIteration:
+                    break
+                finally:
+                    _operacion_actual.reset(token)
+                if primer_fragmento is None:
+                    primer_fragmento = time.perf_counter()
+                yield fragmento
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            token = _operacion_actual.set(operacion)
+            try:
+                self.emitir_span(nombre, inicio, etiquetas, error, primer_fragmento)
+            finally:
+                _operacion_actual.reset(token)
+
+    def aiterar(self, nombre: str, iterador: AsyncIterator[str], inicio: Optional[float] = None,
+                etiquetas: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        """Como iterar(), para iteradores asíncronos (las funciones a* de RAGSistema)."""
+        if not self._hooks:
+            return iterador
+        return self._aiterar(nombre, iterador, inicio, etiquetas or {}, _operacion_actual.get())
+
+    async def _aiterar(self, nombre: str, iterador: AsyncIterator[str], inicio: Optional[float],
+                       etiquetas: Dict[str, Any], operacion: Optional[Tuple[str, int]]) -> AsyncIterator[str]:
+        inicio = inicio if inicio is not None else time.perf_counter()
+        primer_fragmento = None
+        error = None
+        try:
+            while True:
+                token = _operacion_actual.set(operacion)
+                try:
+                    fragmento = await iterador.__anext__()
+                except StopAsyncIteration:
+                    break
+                finally:
+                    _operacion_actual.reset(token)
+                if primer_fragmento is None:
+                    primer_fragmento = time.perf_counter()
+                yield fragmento
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            token = _operacion_actual.set(operacion)
+            try:
+                self.emitir_span(nombre, inicio, etiquetas, error, primer_fragmento)
+            finally:
+                _operacion_actual.reset(token)
+            # Cerrar el iterador interno si se abandona antes del final (p. ej. para cortar la
+            # petición al modelo): async for no lo hace
+            if hasattr(iterador, "aclose"):
+                await iterador.aclose()
+
+    def operacion(self, nombre: str) -> Callable[[Callable], Callable]:
+        """
+        Decorador que mide una operación completa y agrupa bajo ella los eventos internos.
+
+        Si la función devuelve un iterador (modo streaming), la operación termina cuando
+        se agota. Sin hooks la función se llama directamente.
+        """
+        def decorador(funcion: Callable) -> Callable:
+            @functools.wraps(funcion)
+            def envoltura(*args, **kwargs):
+                if not self._hooks:
+                    return funcion(*args, **kwargs)
+                inicio = time.perf_counter()
+                token = _operacion_actual.set((nombre, next(_ids_operacion)))
+                try:
+                    try:
+                        resultado = funcion(*args, **kwargs)
+                    except BaseException as e:
+                        self.emitir_span(nombre, inicio, error=type(e).__name__)
+                        raise
+                    if isinstance(resultado, Iterator):
+                        return self.iterar(nombre, resultado, inicio)
+                    self.emitir_span(nombre, inicio)
+                    return resultado
+                finally:
+                    _operacion_actual.reset(token)
+            return envoltura
+        return decorador
+
+    def operacion_async(self, nombre: str) -> Callable[[Callable], Callable]:
+        """Como operacion(), para funciones async; si devuelven un iterador asíncrono, la operación termina al agotarlo."""
+        def decorador(funcion: Callable) -> Callable:
+            @functools.wraps(funcion)
+            async def envoltura(*args, **kwargs):
+                if not self._hooks:
+                    return await funcion(*args, **kwargs)
+                inicio = time.perf_counter()
+                token = _operacion_actual.set((nombre, next(_ids_operacion)))
+                try:
+                    try:
+                        resultado = await funcion(*args, **kwargs)
+                    except BaseException as e:
+                        self.emitir_span(nombre, inicio, error=type(e).__name__)
+                        raise
+                    if isinstance(resultado, AsyncIterator):
+                        return self.aiterar(nombre, resultado, inicio)
+                    self.emitir_span(nombre, inicio)
+                    return resultado
+                finally:
+                    _operacion_actual.reset(token)
+            return envoltura
+        return decorador
+
+    def medir(self, nombre: str) -> Callable[[Callable], Callable]:
+        """Decorador que mide cada llamada a la función como la etapa `nombre`."""
+        def decorador(funcion: Callable) -> Callable:
+            @functools.wraps(funcion)
+            def envoltura(*args, **kwargs):
+                if not self._hooks:
+                    return funcion(*args, **kwargs)
+                with _Span(self, nombre, {}):
+                    return funcion(*args, **kwargs)
+            return envoltura
+        return decorador
+
+    def en_contexto(self, funcion: Callable) -> Callable:
+        """
+        Preparar una función para ejecutarla en otro hilo (p. ej. con un ThreadPoolExecutor)
+        conservando la operación en curso, de modo que sus eventos queden agrupados con ella.
+        """
+        if not self._hooks:
+            return funcion
+        contexto = contextvars.copy_context()
+        return lambda *args, **kwargs: contexto.copy().run(funcion, *args, **kwargs)
+
+
+# Registro compartido por todos los módulos de rag/ (como logging.getLogger())
+metricas = Metricas()
+
+
+class EscritorJSONL:
+    """Hook que escribe cada evento como una línea JSON."""
+
+    def __init__(self, destino: Optional[TextIO] = None):
+        """
+        Args:
+            destino (TextIO, optional): Archivo abierto en modo texto; por defecto sys.stderr,
+                para no mezclar los eventos con el documento que se imprime en stdout
+        """
+        self.destino = destino if destino is not None else sys.stderr
+        self._lock = threading.Lock()
+
+    def __call__(self, evento: Evento):
+        linea = json.dumps(evento, ensure_ascii=False)
+        with self._lock:
+            self.destino.write(linea + "\n")
+            self.destino.flush()
+
+
+# Límites (en segundos) de los buckets de los histogramas de Prometheus
+LIMITES_HISTOGRAMA = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+_Clave = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+def _clave(nombre: str, etiquetas: Dict[str, Any]) -> _Clave:
+    # Los booleanos se escriben como en JSON (stream="true")
+    return nombre, tuple(sorted((k, str(v).lower() if isinstance(v, bool) else str(v)) for k, v in etiquetas.items()))
+
+
+def _formatear_etiquetas(etiquetas: Tuple[Tuple[str, str], ...], extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pares = etiquetas + extra
+    if not pares:
+        return ""
+    escapar = lambda valor: valor.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    return "{" + ",".join(f'{k}="{escapar(v)}"' for k, v in pares) + "}"
+
+
+class AgregadorMetricas:
+    """
+    Hook que acumula los eventos en memoria: histogramas de duración por etapa y totales
+    de los contadores. Se exporta en el formato de texto de Prometheus o como resumen.
+    """
+
+    def __init__(self, prefijo: str = "scriptorium"):
+        self.prefijo = prefijo
+        self._lock = threading.Lock()
+        # (histograma, etiquetas) -> [cuentas por bucket, suma en segundos, total]
+        self._histogramas: Dict[_Clave, List[Any]] = {}
+        self._contadores: Dict[_Clave, float] = {}
+
+    def __call__(self, evento: Evento):
+        with self._lock:
+            if evento["tipo"] == "contador":
+                clave = _clave(evento["nombre"], evento["etiquetas"])
+                self._contadores[clave] = self._contadores.get(clave, 0) + evento["valor"]
+                return
+            etiquetas = dict(evento["etiquetas"], etapa=evento["nombre"])
+            self._observar(_clave("etapa_segundos", etiquetas), evento["duracion_ms"] / 1000)
+            if evento.get("primer_fragmento_ms") is not None:
+                self._observar(_clave("primer_fragmento_segundos", etiquetas), evento["primer_fragmento_ms"] / 1000)
+            if evento.get("error"):
+                clave = _clave("etapa_errores", dict(etiquetas, error=evento["error"]))
+                self._contadores[clave] = self._contadores.get(clave, 0) + 1
+
+    def _observar(self, clave: _Clave, segundos: float):
+        histograma = self._histogramas.get(clave)
+        if histograma is None:
+            histograma = self._histogramas[clave] = [[0] * len(LIMITES_HISTOGRAMA), 0.0, 0]
+        for i, limite in enumerate(LIMITES_HISTOGRAMA):
+            if segundos <= limite:
+                histograma[0][i] += 1
+        histograma[1] += segundos
+        histograma[2] += 1
+
+    def prometheus(self) -> str:
+        """Exportar las métricas en el formato de texto de Prometheus (versión 0.0.4)."""
+        lineas = []
+        with self._lock:
+            declarados = set()
+            for (nombre, etiquetas), (cuentas, suma, total) in sorted(self._histogramas.items()):
+                metrica = f"{self.prefijo}_{nombre}"
+                if metrica not in declarados:
+                    declarados.add(metrica)
+                    lineas.append(f"# TYPE {metrica} histogram")
+                for limite, cuenta in zip(LIMITES_HISTOGRAMA, cuentas):
+                    lineas.append(f"{metrica}_bucket{_formatear_etiquetas(etiquetas, (('le', f'{limite:g}'),))} {cuenta}")
+                lineas.append(f"{metrica}_bucket{_formatear_etiquetas(etiquetas, (('le', '+Inf'),))} {total}")
+                lineas.append(f"{metrica}_sum{_formatear_etiquetas(etiquetas)} {suma:.6f}")
+                lineas.append(f"{metrica}_count{_formatear_etiquetas(etiquetas)} {total}")
+            for (nombre, etiquetas), valor in sorted(self._contadores.items()):
+                metrica = f"{self.prefijo}_{nombre}_total"
+                if metrica not in declarados:
+                    declarados.add(metrica)
+                    lineas.append(f"# TYPE {metrica} counter")
+                lineas.append(f"{metrica}{_formatear_etiquetas(etiquetas)} {valor:g}")
+        return "\n".join(lineas) + "\n"
+
+    def resumen(self) -> Dict[str, Any]:
+        """
+        Resumen de las métricas acumuladas.
+
+        Returns:
+            Dict: "etapas" (llamadas, total y media en ms por etapa) y "contadores"
+            (total por contador y etiquetas, p. ej. "cache_respuestas{resultado=acierto}")
+        """
+        def nombre_con_etiquetas(nombre: str, etiquetas: Tuple[Tuple[str, str], ...]) -> str:
+            return nombre + ("{" + ",".join(f"{k}={v}" for k, v in etiquetas) + "}" if etiquetas else "")
+
+        with self._lock:
+            etapas = {}
+            for (nombre, etiquetas), (_, suma, total) in sorted(self._histogramas.items()):
+                if nombre != "etapa_segundos":
+                    continue
+                etapa = dict(etiquetas).pop("etapa")
+                resto = tuple((k, v) for k, v in etiquetas if k != "etapa")
+                etapas[nombre_con_etiquetas(etapa, resto)] = {
+                    "llamadas": total, "total_ms": round(suma * 1000, 3), "media_ms": round(suma * 1000 / total, 3)
+                }
+            contadores = {nombre_con_etiquetas(nombre, etiquetas): valor
+                          for (nombre, etiquetas), valor in sorted(self._contadores.items())}
+        return {"etapas": etapas, "contadores": contadores}
+
+
+FORMATOS = ("jsonl", "prometheus")
+
+
+def activar_salida(formato: str, archivo: Optional[str] = None) -> Callable[[Evento], None]:
+    """
+    Suscribir al registro la salida de métricas de un script.
+
+    Con "jsonl" cada evento se escribe según ocurre; con "prometheus" las métricas se
+    acumulan y se escriben al terminar el proceso.
+
+    Args:
+        formato (str): "jsonl" o "prometheus"
+        archivo (str, optional): Archivo de destino (se añade al final); por defecto sys.stderr
+
+    Returns:
+        Callable: El hook suscrito
+    """
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato de métricas desconocido: {formato} (opciones: {', '.join(FORMATOS)})")
+    destino = open(archivo, "a", encoding="utf-8") if archivo else sys.stderr
+    if archivo:
+        # atexit ejecuta en orden inverso: el archivo se cierra después de escribir
+        atexit.register(destino.close)
+    if formato == "jsonl":
+        hook = EscritorJSONL(destino)
+    else:
+        hook = AgregadorMetricas()
+        atexit.register(lambda: (destino.write(hook.prometheus()), destino.flush()))
+    return metricas.suscribir(hook)
@@ -1,85 +1,485 @@
 import os
-from typing import List, Dict, Any, Tuple
-import requests
+import json
+import asyncio
+import functools
+from concurrent.futures import Executor, ThreadPoolExecutor, as_completed
+from typing import TYPE_CHECKING, List, Dict, Any, Tuple, Optional, Union, Iterator, AsyncIterator, Callable
 
+from .cache_respuestas import CacheRespuestas
+from .cliente_embeddings import ClienteEmbeddings
+from .cliente_http import ClienteHTTPModelo, ErrorRespuesta
 from .documentos_manager import DocumentosManager
 from .embeddings_manager import EmbeddingsManager
+from .fragmentos import fragmentar_documento, texto_para_embedding
+from .indice_metadatos import IndiceMetadatos
+from .metricas import metricas
+from .secciones import dividir_en_bloques
+from .tokens import PRESUPUESTO_ENTRADA, contar_tokens, contador_tokens, recortar_a_tokens
+
+if TYPE_CHECKING:
+    from .cliente_http_async import ClienteHTTPAsync
+
+
+async def _fragmentos(*textos: str) -> AsyncIterator[str]:
+    """Iterador asíncrono sobre textos ya disponibles (respuestas en caché, avisos)."""
+    for texto in textos:
+        yield texto
 
 class RAGSistema:
     """Sistema de Retrieval-Augmented Generation para generar documentos personalizados."""
     
-    def __init__(self, token: str, endpoint: str = "https://models.github.ai/inference"):
+    def __init__(self, token: str, endpoint: str = "https://models.github.ai/inference",
+                 cliente_http: ClienteHTTPModelo = None, cache_respuestas: CacheRespuestas = None,
+                 modelo_embeddings: Optional[str] = None, nprobe: Optional[int] = None,
+                 modo_busqueda: str = "vectorial", doc_manager: DocumentosManager = None,
+                 directorio_indices: Optional[str] = None, cliente_http_async: "ClienteHTTPAsync" = None,
+                 executor: Optional[Executor] = None, cuantizacion: Optional[str] = None,
+                 procesos_busqueda: Optional[int] = None):
         """
         Inicializar el sistema RAG.
         
         Args:
             token (str): Token de autenticación para GitHub AI
             endpoint (str): Endpoint de GitHub AI
+            cliente_http (ClienteHTTPModelo, optional): Cliente HTTP con pool de conexiones y reintentos.
+                Si no se indica se crea uno con la configuración por defecto
+            cache_respuestas (CacheRespuestas, optional): Caché de respuestas del modelo. Sin ella
+                (por defecto) cada petición llama al modelo
+            modelo_embeddings (str, optional): Modelo de embeddings del endpoint (p. ej.
+                "openai/text-embedding-3-small"). Sin él se usa el embedder local
+            nprobe (int, optional): Listas IVF exploradas por búsqueda en corpus grandes. Sin él
+                la búsqueda es exacta (ver EmbeddingsManager)
+            modo_busqueda (str): "vectorial" (embeddings), "lexico" (BM25) o "hibrido" (ambos
+                fusionados); el léxico encuentra mejor términos técnicos exactos
+            doc_manager (DocumentosManager, optional): Gestor de los documentos de ejemplo. Si no
+                se indica se usan documentos/ y rag/
+            directorio_indices (str, optional): Directorio de los embeddings y los índices de
+                búsqueda (por defecto rag/); permite trabajar con un corpus aislado, p. ej. en benchmarks
+            cliente_http_async (ClienteHTTPAsync, optional): Cliente de las funciones asíncronas
+                (agenerar_documento, atransformar_texto), con su límite de peticiones por endpoint.
+                Si no se indica se crea uno al usarlas por primera vez
+            executor (Executor, optional): Executor donde las funciones asíncronas hacen la
+                recuperación y la construcción del prompt (por defecto, el del bucle de eventos)
+            cuantizacion (str, optional): "float16" o "int8" para buscar sobre una copia cuantizada
+                de los embeddings y re-puntuar los candidatos con la matriz exacta (ver EmbeddingsManager)
+            procesos_busqueda (int, optional): Procesos entre los que se reparte la búsqueda exacta
+                en corpus grandes (sin él, un solo proceso)
         """
         self.token = token
         self.endpoint = endpoint
         self.model_name = "openai/gpt-4.1"
+        self.cliente_http = cliente_http or ClienteHTTPModelo()
+        self._cliente_http_async = cliente_http_async
+        self.executor = executor
+        self.cache_respuestas = cache_respuestas
+        
+        self.doc_manager = doc_manager or DocumentosManager()
+        opciones_indices = {"nprobe": nprobe, "modo_busqueda": modo_busqueda, "cuantizacion": cuantizacion,
+                            "procesos_busqueda": procesos_busqueda}
+        if directorio_indices:
+            os.makedirs(directorio_indices, exist_ok=True)
+            opciones_indices["cache_file"] = os.path.join(os.path.abspath(directorio_indices), "embeddings.sqlite3")
+        if modelo_embeddings:
+            self.embeddings_manager = EmbeddingsManager(
+                api_client=ClienteEmbeddings(token, endpoint, self.cliente_http),
+                model_embedding=modelo_embeddings,
+                **opciones_indices
+            )
+        else:
+            self.embeddings_manager = EmbeddingsManager(api_client=None, **opciones_indices)
+        self._corpus_cache = None
+    
+    @property
+    def cliente_http_async(self) -> "ClienteHTTPAsync":
+        """Cliente HTTP de las funciones asíncronas; se crea al usarlo por primera vez."""
+        if self._cliente_http_async is None:
+            from .cliente_http_async import ClienteHTTPAsync
+            self._cliente_http_async = ClienteHTTPAsync()
+        return self._cliente_http_async
+    
+    def _obtener_corpus(self) -> Tuple[List[Dict[str, Any]], List[str], int]:
+        """
+        Obtener los pasajes del corpus, sus textos para embeddings y la versión del corpus.
+        
+        Los pasajes (y su índice de metadatos) solo se vuelven a construir cuando cambia
+        la versión del corpus.
+        
+        Returns:
+            Tuple[List[Dict], List[str], int]: (pasajes, textos, versión)
+        """
+        return self._obtener_corpus_indexado()[:3]
+    
+    def _obtener_corpus_indexado(self) -> Tuple[List[Dict[str, Any]], List[str], int, IndiceMetadatos]:
+        """Como _obtener_corpus, añadiendo el índice de metadatos de los pasajes."""
+        with metricas.span("cargar_documentos"):
+            documentos, version = self.doc_manager.cargar_corpus()
+        cache = self._corpus_cache
+        if cache is None or cache[0] != version:
+            metricas.contar("cache_corpus", resultado="fallo")
+            with metricas.span("fragmentar"):
+                fragmentos = [fragmento for doc in documentos for fragmento in fragmentar_documento(doc)]
+                textos = [texto_para_embedding(fragmento) for fragmento in fragmentos]
+                cache = self._corpus_cache = (version, fragmentos, textos, IndiceMetadatos(fragmentos))
+        else:
+            metricas.contar("cache_corpus", resultado="acierto")
+        return cache[1], cache[2], version, cache[3]
+    
+    def indexar(self, compactar: bool = False) -> Tuple[int, int]:
+        """
+        Cargar el corpus y actualizar los índices de búsqueda sin hacer ninguna consulta.
+        
+        Args:
+            compactar (bool): Después de indexar, eliminar de la caché de embeddings los vectores
+                del modelo activo de pasajes que ya no están en el corpus (documentos editados o borrados)
+        
+        Returns:
+            Tuple[int, int]: (documentos, pasajes) indexados
+        """
+        fragmentos, textos, version = self._obtener_corpus()
+        self.embeddings_manager.indexar(fragmentos, textos, version_corpus=version)
+        if compactar and fragmentos:
+            eliminados = self.embeddings_manager.compactar_cache(textos, version_corpus=version)
+            print(f"🧹 Caché de embeddings compactada: {eliminados} vectores obsoletos eliminados")
+        return len({id(fragmento['documento']) for fragmento in fragmentos}), len(fragmentos)
+    
+    def buscar_pasajes(self, consulta: str, top_k: int = 8,
+                       filtros: Optional[Dict[str, str]] = None) -> List[Tuple[Dict[str, Any], float]]:
+        """
+        Buscar los pasajes del corpus más similares a una consulta.
+        
+        Args:
+            consulta (str): Texto de consulta
+            top_k (int): Número de pasajes a devolver
+            filtros (Dict, optional): Solo se buscan pasajes de documentos con estos valores de
+                tipo, materia y/o profesor (sin distinguir mayúsculas ni acentos), p. ej.
+                {"tipo": "practica", "materia": "programacion visual"}
+            
+        Returns:
+            List[Tuple[Dict, float]]: Lista de (pasaje, score) ordenados por relevancia;
+            cada pasaje enlaza a su documento en pasaje['documento']
+        """
+        fragmentos, textos, version, metadatos = self._obtener_corpus_indexado()
+        if not fragmentos:
+            return []
         
-        self.doc_manager = DocumentosManager()
-        self.embeddings_manager = EmbeddingsManager(api_client=None)
+        # Los candidatos se acotan antes de calcular ninguna similitud
+        with metricas.span("buscar"):
+            return self.embeddings_manager.buscar_documentos_similares(
+                consulta, fragmentos, textos, top_k=top_k, version_corpus=version, filas=metadatos.filas(filtros)
+            )
+    
+    def _filtros_busqueda(self, parametros_adicionales: Dict, incluir_tipo: bool = False) -> Dict[str, str]:
+        """Extraer los filtros de metadatos de los parámetros (el tipo a generar también filtra)."""
+        filtros = {campo: valor for campo, valor in (parametros_adicionales.get('filtros') or {}).items() if valor}
+        if incluir_tipo and parametros_adicionales.get('tipo') and 'tipo' not in filtros:
+            filtros['tipo'] = parametros_adicionales['tipo']
+        return filtros
+    
+    def _agrupar_pasajes_filtrados(
+        self, consulta: str, filtros: Dict[str, str], num_documentos: int = 3
+    ) -> List[Tuple[Dict[str, Any], float, List[Dict[str, Any]]]]:
+        """Agrupar pasajes con filtros; si ningún documento los cumple, buscar en todo el corpus."""
+        docs_similares = self._agrupar_pasajes(consulta, num_documentos=num_documentos, filtros=filtros)
+        if not docs_similares and filtros:
+            descripcion = ", ".join(f"{campo}={valor}" for campo, valor in filtros.items())
+            print(f"⚠️ Ningún documento cumple los filtros ({descripcion}); se usan ejemplos de todo el corpus")
+            docs_similares = self._agrupar_pasajes(consulta, num_documentos=num_documentos)
+        return docs_similares
+    
+    def _agrupar_pasajes(
+        self,
+        consulta: str,
+        num_documentos: int = 3,
+        pasajes_por_documento: int = 2,
+        filtros: Optional[Dict[str, str]] = None
+    ) -> List[Tuple[Dict[str, Any], float, List[Dict[str, Any]]]]:
+        """
+        Buscar pasajes y agruparlos por documento.
+        
+        Args:
+            consulta (str): Texto de consulta
+            num_documentos (int): Número máximo de documentos
+            pasajes_por_documento (int): Pasajes que se conservan de cada documento
+            filtros (Dict, optional): Filtros de metadatos (ver buscar_pasajes)
+            
+        Returns:
+            List[Tuple[Dict, float, List[Dict]]]: (documento, mejor score, pasajes) ordenados por
+            relevancia; los pasajes de cada documento van en su orden dentro del documento
+            y llevan su propio score en pasaje['score']
+        """
+        # Se piden más pasajes de los necesarios porque varios pueden ser del mismo documento
+        candidatos = self.buscar_pasajes(consulta, top_k=num_documentos * pasajes_por_documento * 4, filtros=filtros)
+        
+        grupos: Dict[str, Tuple[Dict[str, Any], float, List[Dict[str, Any]]]] = {}
+        for fragmento, score in candidatos:
+            doc = fragmento['documento']
+            grupo = grupos.get(doc.get('id'))
+            if grupo is None:
+                if len(grupos) == num_documentos:
+                    continue
+                grupo = grupos[doc.get('id')] = (doc, score, [])
+            if len(grupo[2]) < pasajes_por_documento:
+                grupo[2].append(dict(fragmento, score=score))
+        
+        orden_secciones = {'introduccion': 0, 'desarrollo': 1, 'conclusion': 2}
+        for _, _, pasajes in grupos.values():
+            pasajes.sort(key=lambda f: (orden_secciones.get(f['seccion'], 3), f['indice']))
+        return list(grupos.values())
+    
+    def buscar_documentos(self, consulta: str, top_k: int = 3,
+                          filtros: Optional[Dict[str, str]] = None) -> List[Tuple[Dict[str, Any], float]]:
+        """
+        Buscar los documentos del usuario más similares a una consulta.
+        
+        El score de cada documento es el de su pasaje más similar.
+        
+        Args:
+            consulta (str): Texto de consulta
+            top_k (int): Número de documentos a devolver
+            filtros (Dict, optional): Filtros de metadatos (ver buscar_pasajes)
+            
+        Returns:
+            List[Tuple[Dict, float]]: Lista de (documento, score) ordenados por relevancia
+        """
+        return [(doc, score) for doc, score, _ in self._agrupar_pasajes(consulta, num_documentos=top_k, filtros=filtros)]
+    
+    def _formatear_ejemplo(self, doc: Dict[str, Any], pasajes: List[Dict[str, Any]]) -> str:
+        """Convertir un documento en texto de ejemplo: su encabezado y los pasajes recuperados."""
+        partes = [self.doc_manager.get_encabezado(doc)]
+        for fragmento in pasajes:
+            partes.append(self._formatear_pasaje(fragmento))
+        return "\n\n".join(partes)
+    
+    def _formatear_pasaje(self, fragmento: Dict[str, Any]) -> str:
+        return f"{fragmento['etiqueta']} (extracto): {fragmento['texto']}"
+    
+    def _formatear_ejemplos(self, docs_similares: List[Tuple[Dict[str, Any], float, List[Dict[str, Any]]]],
+                            etiqueta: str = "EJEMPLO") -> str:
+        """Unir los ejemplos recuperados en el bloque de contexto del prompt."""
+        return "\n".join(
+            f"{etiqueta} (relevancia: {score:.2f}):\n{self._formatear_ejemplo(doc, pasajes)}\n"
+            for doc, score, pasajes in docs_similares
+        )
+    
+    @metricas.medir("construir_prompt")
+    def _ajustar_prompt(
+        self,
+        plantilla: Callable[[str, str], str],
+        docs_similares: List[Tuple[Dict[str, Any], float, List[Dict[str, Any]]]],
+        contexto_adicional: Optional[str] = None,
+        presupuesto: int = PRESUPUESTO_ENTRADA,
+        etiqueta: str = "EJEMPLO"
+    ) -> Tuple[str, Dict[str, Any]]:
+        """
+        Construir un prompt que quepa en un presupuesto de tokens de entrada.
+        
+        El contexto adicional se limita a la mitad del espacio que deja la parte fija del
+        prompt; en el resto se meten los ejemplos, descartando primero los pasajes de menor
+        score (y el encabezado de un documento cuando se queda sin pasajes).
+        
+        Args:
+            plantilla (Callable[[str, str], str]): Recibe (ejemplos, sección de contexto adicional)
+                y devuelve el prompt completo
+            docs_similares (List[Tuple[Dict, float, List[Dict]]]): Documentos similares con score y pasajes
+            contexto_adicional (str, optional): Texto plano adicional como contexto
+            presupuesto (int): Máximo de tokens de entrada del prompt
+            etiqueta (str): Encabezado de cada ejemplo
+            
+        Returns:
+            Tuple[str, Dict]: (prompt final, recuento de tokens y pasajes incluidos). El recuento
+            se devuelve en lugar de guardarse en la instancia, que comparten varios hilos
+        """
+        def seccion(contexto: str) -> str:
+            return f"\n\nCONTEXTO ADICIONAL:\n{contexto}\n" if contexto else ""
+        
+        tokens_fijos = contar_tokens(plantilla("", ""))
+        disponible = presupuesto - tokens_fijos
+        
+        contexto_recortado = False
+        if contexto_adicional:
+            limite = disponible // 2 if docs_similares else disponible
+            if contar_tokens(seccion(contexto_adicional)) > limite:
+                contexto_adicional = recortar_a_tokens(contexto_adicional, limite - contar_tokens(seccion(" ")))
+                contexto_recortado = True
+        tokens_contexto = contar_tokens(seccion(contexto_adicional))
+        disponible -= tokens_contexto
+        
+        # Coste de cada ejemplo: su encabezado más cada uno de sus pasajes
+        encabezados = [
+            contar_tokens(f"{etiqueta} (relevancia: {score:.2f}):\n{self.doc_manager.get_encabezado(doc)}\n")
+            for doc, score, _ in docs_similares
+        ]
+        pasajes = [
+            (fragmento['score'], g, i, contar_tokens(self._formatear_pasaje(fragmento)) + 1)
+            for g, (_, _, fragmentos) in enumerate(docs_similares)
+            for i, fragmento in enumerate(fragmentos)
+        ]
+        total = sum(encabezados) + sum(tokens for _, _, _, tokens in pasajes)
+        restantes = [len(fragmentos) for _, _, fragmentos in docs_similares]
+        descartados = set()
+        for _, g, i, tokens in sorted(pasajes, key=lambda p: p[0]):
+            if total <= disponible:
+                break
+            descartados.add((g, i))
+            total -= tokens
+            restantes[g] -= 1
+            if restantes[g] == 0:
+                total -= encabezados[g]
+        
+        ajustados = [
+            (doc, score, [f for i, f in enumerate(fragmentos) if (g, i) not in descartados])
+            for g, (doc, score, fragmentos) in enumerate(docs_similares)
+            if restantes[g] > 0
+        ]
+        prompt = plantilla(self._formatear_ejemplos(ajustados, etiqueta), seccion(contexto_adicional))
+        tokens_prompt = contar_tokens(prompt)
+        
+        informe = {
+            'tokens_prompt': tokens_prompt,
+            'tokens_fijos': tokens_fijos,
+            'tokens_ejemplos': total,
+            'tokens_contexto': tokens_contexto,
+            'presupuesto': presupuesto,
+            'pasajes_incluidos': len(pasajes) - len(descartados),
+            'pasajes_descartados': len(descartados),
+            'documentos_incluidos': len(ajustados),
+            'contexto_recortado': contexto_recortado,
+            'contador': contador_tokens()
+        }
+        if tokens_prompt > presupuesto:
+            print(f"⚠️ La parte fija del prompt ({tokens_fijos} tokens) ya supera el presupuesto de {presupuesto}")
+        return prompt, informe
+    
+    def _registrar_informe_prompt(self, informe: Dict[str, Any]):
+        """Emitir como métricas el recuento de un prompt construido (ver _ajustar_prompt)."""
+        for parte in ('prompt', 'fijos', 'ejemplos', 'contexto'):
+            metricas.contar("tokens_prompt", informe[f'tokens_{parte}'], parte=parte)
+        metricas.contar("pasajes_prompt", informe['pasajes_incluidos'], resultado="incluido")
+        metricas.contar("pasajes_prompt", informe['pasajes_descartados'], resultado="descartado")
+        if informe['contexto_recortado']:
+            metricas.contar("contexto_recortado")
+    
+    @staticmethod
+    def _acumular_informe(destino: Optional[Dict[str, Any]], informe: Dict[str, Any]):
+        """
+        Añadir el recuento de un prompt al informe que pidió quien llama (ver generar_documento).
+        
+        Con varios prompts (transformación por bloques) los tokens y los pasajes se suman, el
+        presupuesto es el de cada prompt y basta un contexto recortado para marcarlo.
+        """
+        if destino is None:
+            return
+        for clave, valor in informe.items():
+            if clave == 'contexto_recortado':
+                destino[clave] = destino.get(clave, False) or valor
+            elif isinstance(valor, int) and clave != 'presupuesto':
+                destino[clave] = destino.get(clave, 0) + valor
+            else:
+                destino[clave] = valor
+        destino['prompts'] = destino.get('prompts', 0) + 1
     
     def _construir_prompt_con_contexto(
         self, 
         consulta: str, 
-        docs_similares: List[Tuple[Dict[str, Any], float]],
+        docs_similares: List[Tuple[Dict[str, Any], float, List[Dict[str, Any]]]],
         tipo_documento: str = None,
         contexto_adicional: str = None,
-        num_ejemplos: int = 3
-    ) -> str:
+        num_ejemplos: int = 3,
+        presupuesto: int = PRESUPUESTO_ENTRADA
+    ) -> Tuple[str, Dict[str, Any]]:
         """
         Construir prompt con contexto para enviar al modelo.
         
         Args:
             consulta (str): Consulta del usuario
-            docs_similares (List[Tuple[Dict, float]]): Documentos similares con score
+            docs_similares (List[Tuple[Dict, float, List[Dict]]]): Documentos similares con score y pasajes
             tipo_documento (str, optional): Tipo de documento a generar
             contexto_adicional (str, optional): Texto plano adicional como contexto
             num_ejemplos (int): Número máximo de ejemplos a incluir
+            presupuesto (int): Máximo de tokens de entrada del prompt
             
         Returns:
-            str: Prompt completo con contexto
+            Tuple[str, Dict]: (prompt completo con contexto, recuento de tokens; ver _ajustar_prompt)
         """
         # Limitar el número de ejemplos
         docs_similares = docs_similares[:min(num_ejemplos, len(docs_similares))]
         
-        # Construir prompt
-        ejemplos_texto = []
-        for doc, score in docs_similares:
-            ejemplo = self.doc_manager.get_documento_completo(doc)
-            ejemplos_texto.append(f"EJEMPLO (relevancia: {score:.2f}):\n{ejemplo}\n")
-        
-        contexto = "\n".join(ejemplos_texto)
-        
-        # Agregar contexto adicional si se proporcionó
-        seccion_contexto = ""
-        if contexto_adicional:
-            seccion_contexto = f"\n\nCONTEXTO ADICIONAL:\n{contexto_adicional}\n"
-        
         # Agregar instrucción específica sobre el tipo de documento si se especificó
         tipo_instruccion = ""
         if tipo_documento:
             tipo_instruccion = f"\nEl documento debe ser específicamente del tipo: {tipo_documento}."
         
-        prompt_template = (
-            "Quiero que entiendas mi estilo de escritura a partir de los siguientes ejemplos "
-            "y generes un nuevo documento con estructura similar. Estos ejemplos son documentos que yo he escrito.\n\n"
-            "EJEMPLOS DE MI ESTILO:\n"
-            f"{contexto}{seccion_contexto}\n"
-            "Ahora quiero que escribas un nuevo documento siguiendo exactamente mi estilo y estructura, incluyendo "
-            "las mismas secciones (título, tipo, materia, presenta, profesor, introducción, desarrollo y conclusión). "
-            f"El tema es: {consulta}{tipo_instruccion}\n\n"
-            "Tu respuesta debe mantener la estructura vista en los ejemplos, con secciones claramente delimitadas y escrita con mi mismo estilo."
-        )
+        def plantilla(contexto: str, seccion_contexto: str) -> str:
+            return (
+                "Quiero que entiendas mi estilo de escritura a partir de los siguientes ejemplos "
+                "y generes un nuevo documento con estructura similar. Estos ejemplos son extractos de documentos que yo he escrito.\n\n"
+                "EJEMPLOS DE MI ESTILO:\n"
+                f"{contexto}{seccion_contexto}\n"
+                "Ahora quiero que escribas un nuevo documento siguiendo exactamente mi estilo y estructura, incluyendo "
+                "las mismas secciones (título, tipo, materia, presenta, profesor, introducción, desarrollo y conclusión). "
+                f"El tema es: {consulta}{tipo_instruccion}\n\n"
+                "Tu respuesta debe mantener la estructura vista en los ejemplos, con secciones claramente delimitadas y escrita con mi mismo estilo."
+            )
         
-        return prompt_template
+        return self._ajustar_prompt(plantilla, docs_similares, contexto_adicional, presupuesto)
+    
+    def _construir_peticion(self, messages: List[Dict[str, str]], temperature: float = 0.7, max_tokens: int = 32768,
+                            top_p: float = 1.0, frequency_penalty: float = 0.0, presence_penalty: float = 0.0,
+                            seed: Optional[int] = None, stream: bool = False) -> Tuple[str, Dict[str, str], Dict[str, Any]]:
+        """Construir URL, cabeceras y cuerpo de una petición de chat completions."""
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.token}"
+        }
+        
+        data = {
+            "model": self.model_name,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": min(max_tokens, 32768),
+            "top_p": top_p,
+            "frequency_penalty": frequency_penalty,
+            "presence_penalty": presence_penalty
+        }
+        if seed is not None:
+            data["seed"] = seed
+        if stream:
+            data["stream"] = True
+        
+        return f"{self.endpoint}/v1/chat/completions", headers, data
+    
+    def _consultar_cache(self, endpoint_url: str, data: Dict[str, Any], usar_cache: bool,
+                         variante: Optional[int]) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Buscar la petición en la caché de respuestas.
+
+        Con usar_cache=False no se lee la caché, pero la respuesta nueva se guarda igualmente
+        (sirve para refrescar una entrada).
+
+        Returns:
+            Tuple[str, str]: (clave, respuesta en caché); la clave es None si no hay caché configurada
+        """
+        if self.cache_respuestas is None:
+            return None, None
+        clave = CacheRespuestas.clave(endpoint_url, data, variante)
+        if not usar_cache:
+            metricas.contar("cache_respuestas", resultado="omitida")
+            return clave, None
+        en_cache = self.cache_respuestas.obtener(clave)
+        metricas.contar("cache_respuestas", resultado="fallo" if en_cache is None else "acierto")
+        return clave, en_cache
+    
+    def _registrar_uso(self, uso: Optional[Dict[str, Any]]):
+        """Sumar a las métricas los tokens que el API indica en el campo usage."""
+        if not uso or not metricas.activas:
+            return
+        for tipo in ("prompt", "completion"):
+            if uso.get(f"{tipo}_tokens") is not None:
+                metricas.contar("tokens", uso[f"{tipo}_tokens"], tipo=tipo, modelo=self.model_name)
     
     def _llamar_modelo(self, messages: List[Dict[str, str]], temperature: float = 0.7, max_tokens: int = 32768,
-                        top_p: float = 1.0, frequency_penalty: float = 0.0, presence_penalty: float = 0.0) -> str:
+                        top_p: float = 1.0, frequency_penalty: float = 0.0, presence_penalty: float = 0.0,
+                        seed: Optional[int] = None, usar_cache: bool = True, variante: Optional[int] = None) -> str:
         """
         Llamar al modelo de GitHub AI.
         
@@ -90,200 +490,405 @@ class RAGSistema:
             top_p (float): Nucleus sampling (0.0-1.0)
             frequency_penalty (float): Penalización de frecuencia (-2.0 a 2.0)
             presence_penalty (float): Penalización de presencia (-2.0 a 2.0)
+            seed (int, optional): Semilla para respuestas reproducibles
+            usar_cache (bool): Si es False no se lee la caché de respuestas (la respuesta se guarda igualmente)
+            variante (int, optional): Índice de la versión, para que varias versiones con los mismos
+                parámetros no compartan entrada en la caché
             
         Returns:
             str: Respuesta del modelo
+            
+        Raises:
+            ErrorModelo: Subclase según el tipo de fallo (autenticación, límite de tasa, timeout...)
         """
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.token}"
-        }
-        
-        data = {
-            "model": self.model_name,
-            "messages": messages,
-            "temperature": temperature,
-            "max_tokens": min(max_tokens, 32768),
-            "top_p": top_p,
-            "frequency_penalty": frequency_penalty,
-            "presence_penalty": presence_penalty
-        }
+        endpoint_url, headers, data = self._construir_peticion(
+            messages, temperature, max_tokens, top_p, frequency_penalty, presence_penalty, seed
+        )
         
-        endpoint_url = f"{self.endpoint}/v1/chat/completions"
+        clave, en_cache = self._consultar_cache(endpoint_url, data, usar_cache, variante)
+        if en_cache is not None:
+            return en_cache
         
-        try:
-            response = requests.post(endpoint_url, json=data, headers=headers, timeout=120)
+        with metricas.span("modelo", stream=False):
+            response = self.cliente_http.post(endpoint_url, data, headers)
             
-            if response.status_code == 200:
+            try:
                 result = response.json()
-                if "choices" in result and len(result["choices"]) > 0:
-                    return result["choices"][0]["message"]["content"]
-                else:
-                    raise Exception(f"Respuesta inesperada del API: {result}")
-            elif response.status_code == 401:
-                raise Exception(f"Error de autenticación (401). Verifica que el token GITHUB_TOKEN sea válido.\n"
-                              f"Endpoint: {endpoint_url}\n"
-                              f"Respuesta: {response.text[:200]}")
-            elif response.status_code == 403:
-                raise Exception(f"Acceso denegado (403). Verifica los permisos del token.\n"
-                              f"Endpoint: {endpoint_url}\n"
-                              f"Respuesta: {response.text[:200]}")
-            elif response.status_code == 404:
-                raise Exception(f"Endpoint no encontrado (404). Verifica que el endpoint sea correcto.\n"
-                              f"Endpoint usado: {endpoint_url}\n"
-                              f"Endpoint base: {self.endpoint}\n"
-                              f"Respuesta: {response.text[:200]}")
-            else:
-                response.raise_for_status()
-        except requests.exceptions.Timeout:
-            raise Exception(f"Timeout al conectar con el endpoint. El servidor tardó demasiado en responder.\n"
-                          f"Endpoint: {endpoint_url}\n"
-                          f"Intenta nuevamente o verifica tu conexión a internet.")
-        except requests.exceptions.HTTPError as e:
-            error_msg = f"Error HTTP {e.response.status_code}"
-            raise Exception(f"{error_msg} para {endpoint_url}:\n{e.response.text[:500]}")
-        except requests.exceptions.RequestException as e:
-            raise Exception(f"Error de conexión: {str(e)}\n"
-                          f"Endpoint: {endpoint_url}\n"
-                          f"Verifica tu conexión a internet y que el servicio esté disponible.")
-        except Exception as e:
-            raise Exception(f"Error inesperado: {str(e)}\n"
-                          f"Endpoint: {endpoint_url}")
-    
-    def generar_documento(self, tema: str, parametros_adicionales: Dict = None) -> str:
+            except ValueError:
+                raise ErrorRespuesta(f"Respuesta no JSON del API: {response.text[:200]}", endpoint_url, response.status_code)
+        return self._contenido_respuesta(result, endpoint_url, response.status_code, clave)
+    
+    def _contenido_respuesta(self, result: Any, endpoint_url: str, status_code: int, clave: Optional[str]) -> str:
+        """Extraer el texto de una respuesta de chat completions, registrar su uso y guardarlo en caché."""
+        self._registrar_uso(result.get("usage") if isinstance(result, dict) else None)
+        if "choices" in result and len(result["choices"]) > 0:
+            contenido = result["choices"][0]["message"]["content"]
+            if clave is not None:
+                self.cache_respuestas.guardar(clave, contenido)
+            return contenido
+        raise ErrorRespuesta(f"Respuesta inesperada del API: {result}", endpoint_url, status_code)
+    
+    def _llamar_modelo_stream(self, messages: List[Dict[str, str]], temperature: float = 0.7, max_tokens: int = 32768,
+                              top_p: float = 1.0, frequency_penalty: float = 0.0,
+                              presence_penalty: float = 0.0, seed: Optional[int] = None,
+                              usar_cache: bool = True, variante: Optional[int] = None) -> Iterator[str]:
         """
-        Generar un documento nuevo basado en ejemplos similares.
+        Llamar al modelo en modo streaming (server-sent events).
+        
+        Recibe los mismos argumentos que _llamar_modelo. La petición se envía al pedir
+        el primer fragmento. Si la respuesta está en caché se entrega en un único fragmento;
+        si no, se guarda en caché solo cuando el stream termina completo.
+        
+        Yields:
+            str: Fragmentos de texto en el orden en que llegan
+        """
+        endpoint_url, headers, data = self._construir_peticion(
+            messages, temperature, max_tokens, top_p, frequency_penalty, presence_penalty, seed, stream=True
+        )
+        
+        clave, en_cache = self._consultar_cache(endpoint_url, data, usar_cache, variante)
+        if en_cache is not None:
+            yield en_cache
+            return
+        
+        yield from metricas.iterar("modelo", self._leer_stream(endpoint_url, headers, data, clave),
+                                   etiquetas={"stream": True})
+    
+    def _leer_stream(self, endpoint_url: str, headers: Dict[str, str], data: Dict[str, Any],
+                     clave: Optional[str]) -> Iterator[str]:
+        """Enviar la petición en streaming y entregar el texto de cada evento; al terminar, guardarlo en caché."""
+        response = self.cliente_http.post(endpoint_url, data, headers, stream=True)
+        fragmentos = []
+        
+        with response:
+            for linea in self.cliente_http.iterar_lineas(response, endpoint_url):
+                fin, texto = self._leer_evento(linea)
+                if fin:
+                    break
+                if texto:
+                    fragmentos.append(texto)
+                    yield texto
+        
+        if clave is not None:
+            self.cache_respuestas.guardar(clave, "".join(fragmentos))
+    
+    def _leer_evento(self, linea: bytes) -> Tuple[bool, Optional[str]]:
+        """
+        Interpretar una línea de la respuesta en streaming (server-sent events).
+        
+        Returns:
+            Tuple[bool, str]: (fin del stream, texto del evento o None)
+        """
+        if not linea.startswith(b"data:"):
+            return False, None
+        contenido = linea[5:].strip()
+        if contenido == b"[DONE]":
+            return True, None
+        evento = json.loads(contenido)
+        # Algunos endpoints envían el recuento de tokens en el último evento
+        self._registrar_uso(evento.get("usage"))
+        if not evento.get("choices"):
+            return False, None
+        return False, (evento["choices"][0].get("delta") or {}).get("content")
+    
+    async def _en_executor(self, funcion: Callable, *args) -> Any:
+        """Ejecutar trabajo síncrono de CPU (recuperación, construcción del prompt) sin bloquear el bucle de eventos."""
+        bucle = asyncio.get_running_loop()
+        return await bucle.run_in_executor(self.executor, metricas.en_contexto(functools.partial(funcion, *args)))
+    
+    async def _allamar_modelo(self, messages: List[Dict[str, str]], temperature: float = 0.7, max_tokens: int = 32768,
+                              top_p: float = 1.0, frequency_penalty: float = 0.0, presence_penalty: float = 0.0,
+                              seed: Optional[int] = None, usar_cache: bool = True,
+                              variante: Optional[int] = None) -> str:
+        """Versión asíncrona de _llamar_modelo (mismos argumentos); la petición no ocupa ningún hilo."""
+        endpoint_url, headers, data = self._construir_peticion(
+            messages, temperature, max_tokens, top_p, frequency_penalty, presence_penalty, seed
+        )
+        
+        clave, en_cache = self._consultar_cache(endpoint_url, data, usar_cache, variante)
+        if en_cache is not None:
+            return en_cache
+        
+        with metricas.span("modelo", stream=False):
+            response = await self.cliente_http_async.post(endpoint_url, data, headers)
+            result = await response.json()
+        return self._contenido_respuesta(result, endpoint_url, response.status_code, clave)
+    
+    def _allamar_modelo_stream(self, messages: List[Dict[str, str]], temperature: float = 0.7,
+                               max_tokens: int = 32768, top_p: float = 1.0, frequency_penalty: float = 0.0,
+                               presence_penalty: float = 0.0, seed: Optional[int] = None,
+                               usar_cache: bool = True, variante: Optional[int] = None) -> AsyncIterator[str]:
+        """
+        Versión asíncrona de _llamar_modelo_stream (mismos argumentos).
+        
+        La petición se envía al pedir el primer fragmento. Cerrar el iterador antes del final
+        (aclose) o cancelar la tarea que lo consume corta la conexión con el endpoint.
+        """
+        endpoint_url, headers, data = self._construir_peticion(
+            messages, temperature, max_tokens, top_p, frequency_penalty, presence_penalty, seed, stream=True
+        )
+        
+        clave, en_cache = self._consultar_cache(endpoint_url, data, usar_cache, variante)
+        if en_cache is not None:
+            return _fragmentos(en_cache)
+        
+        return metricas.aiterar("modelo", self._aleer_stream(endpoint_url, headers, data, clave),
+                                etiquetas={"stream": True})
+    
+    async def _aleer_stream(self, endpoint_url: str, headers: Dict[str, str], data: Dict[str, Any],
+                            clave: Optional[str]) -> AsyncIterator[str]:
+        """Versión asíncrona de _leer_stream."""
+        fragmentos = []
+        
+        async with await self.cliente_http_async.post(endpoint_url, data, headers) as response:
+            async for linea in response.lineas():
+                fin, texto = self._leer_evento(linea)
+                if fin:
+                    # Terminar de leer el cuerpo para devolver la conexión al pool
+                    await response.leer()
+                    break
+                if texto:
+                    fragmentos.append(texto)
+                    yield texto
+        
+        if clave is not None:
+            self.cache_respuestas.guardar(clave, "".join(fragmentos))
+    
+    def _preparar_prompt_generacion(self, tema: str, parametros_adicionales: Dict,
+                                    informe: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """
+        Recuperar ejemplos similares y construir el prompt de generación.
         
         Args:
             tema (str): Tema para el nuevo documento
-            parametros_adicionales (Dict, optional): Parámetros adicionales para la generación
-                - tipo: Tipo de documento
-                - contexto_adicional: Contexto adicional como texto
-                - prompt_personalizado: Prompt personalizado (si se proporciona, se usa en lugar del automático)
-                - temperatura: Temperatura para la generación
-                - max_tokens: Máximo de tokens
+            parametros_adicionales (Dict): Parámetros de generación (tipo, filtros, contexto_adicional,
+                prompt_personalizado, presupuesto_tokens). El tipo también limita los ejemplos a ese tipo
+            informe (Dict, optional): Si se pasa, se le añade el recuento de tokens del prompt
             
         Returns:
-            str: Documento generado
+            str: Prompt listo para el modelo, o None si no hay documentos de ejemplo
         """
-        if parametros_adicionales is None:
-            parametros_adicionales = {}
+        # Buscar los pasajes más similares al tema, agrupados por documento
+        filtros = self._filtros_busqueda(parametros_adicionales, incluir_tipo=True)
+        docs_similares = self._agrupar_pasajes_filtrados(tema, filtros, num_documentos=3)
         
-        # Cargar documentos
-        documentos = self.doc_manager.cargar_documentos()
+        if not docs_similares:
+            return None
         
-        if not documentos:
-            return "No hay documentos de ejemplo disponibles. Por favor, agrega algunos documentos primero."
+        presupuesto = parametros_adicionales.get('presupuesto_tokens', PRESUPUESTO_ENTRADA)
         
         # Obtener prompt personalizado si se proporcionó
         prompt_personalizado = parametros_adicionales.get('prompt_personalizado')
         
         if prompt_personalizado:
             # Si hay prompt personalizado, construir prompt con ejemplos pero usando el prompt personalizado
-            textos = [self.doc_manager.get_documento_completo(doc) for doc in documentos]
-            docs_similares = self.embeddings_manager.buscar_documentos_similares(
-                tema, documentos, textos, top_k=3
-            )
             
-            ejemplos_texto = []
-            for doc, score in docs_similares[:3]:
-                ejemplo = self.doc_manager.get_documento_completo(doc)
-                ejemplos_texto.append(f"EJEMPLO DE MI ESTILO (relevancia: {score:.2f}):\n{ejemplo}\n")
-            
-            contexto = "\n".join(ejemplos_texto)
             contexto_adicional = parametros_adicionales.get('contexto_adicional', '')
             
-            seccion_contexto = ""
-            if contexto_adicional:
-                seccion_contexto = f"\n\nCONTEXTO ADICIONAL:\n{contexto_adicional}\n"
+            def plantilla(contexto: str, seccion_contexto: str) -> str:
+                return (
+                    "Quiero que entiendas mi estilo de escritura a partir de los siguientes ejemplos "
+                    "y sigas las instrucciones del prompt personalizado que te proporciono.\n\n"
+                    "EJEMPLOS DE MI ESTILO:\n"
+                    f"{contexto}{seccion_contexto}\n"
+                    "PROMPT PERSONALIZADO:\n"
+                    f"{prompt_personalizado}\n\n"
+                    "Genera el documento siguiendo exactamente mi estilo de escritura y estructura, "
+                    "pero cumpliendo con las instrucciones del prompt personalizado."
+                )
             
-            prompt = (
-                "Quiero que entiendas mi estilo de escritura a partir de los siguientes ejemplos "
-                "y sigas las instrucciones del prompt personalizado que te proporciono.\n\n"
-                "EJEMPLOS DE MI ESTILO:\n"
-                f"{contexto}{seccion_contexto}\n"
-                "PROMPT PERSONALIZADO:\n"
-                f"{prompt_personalizado}\n\n"
-                "Genera el documento siguiendo exactamente mi estilo de escritura y estructura, "
-                "pero cumpliendo con las instrucciones del prompt personalizado."
-            )
+            prompt, recuento = self._ajustar_prompt(plantilla, docs_similares, contexto_adicional, presupuesto,
+                                                    "EJEMPLO DE MI ESTILO")
         else:
             # Usar el método normal de generación
-            textos = [self.doc_manager.get_documento_completo(doc) for doc in documentos]
-            docs_similares = self.embeddings_manager.buscar_documentos_similares(
-                tema, documentos, textos, top_k=3
-            )
-            
             tipo_documento = parametros_adicionales.get('tipo')
             contexto_adicional = parametros_adicionales.get('contexto_adicional')
             
-            prompt = self._construir_prompt_con_contexto(tema, docs_similares, tipo_documento, contexto_adicional)
+            prompt, recuento = self._construir_prompt_con_contexto(
+                tema, docs_similares, tipo_documento, contexto_adicional, presupuesto=presupuesto
+            )
         
-        # Configuración de parámetros para el modelo
-        temperatura = parametros_adicionales.get('temperatura', 0.7)
-        max_tokens = parametros_adicionales.get('max_tokens', 32768)
-        top_p = parametros_adicionales.get('top_p', 1.0)
-        frequency_penalty = parametros_adicionales.get('frequency_penalty', 0.0)
-        presence_penalty = parametros_adicionales.get('presence_penalty', 0.0)
+        self._registrar_informe_prompt(recuento)
+        self._acumular_informe(informe, recuento)
+        return prompt
+    
+    def _parametros_modelo(self, parametros_adicionales: Dict) -> Dict[str, Any]:
+        """Extraer los parámetros de la llamada al modelo con sus valores por defecto."""
+        return {
+            'temperature': parametros_adicionales.get('temperatura', 0.7),
+            'max_tokens': parametros_adicionales.get('max_tokens', 32768),
+            'top_p': parametros_adicionales.get('top_p', 1.0),
+            'frequency_penalty': parametros_adicionales.get('frequency_penalty', 0.0),
+            'presence_penalty': parametros_adicionales.get('presence_penalty', 0.0),
+            'seed': parametros_adicionales.get('seed'),
+            'usar_cache': not parametros_adicionales.get('refrescar_cache', False)
+        }
+    
+    def _mensajes_generacion(self, prompt: str) -> List[Dict[str, str]]:
+        """Construir los mensajes de chat para una generación."""
+        return [
+            {"role": "system", "content": "Eres un asistente que imita perfectamente el estilo de escritura del usuario."},
+            {"role": "user", "content": prompt}
+        ]
+    
+    @metricas.operacion("generar_documento")
+    def generar_documento(self, tema: str, parametros_adicionales: Dict = None,
+                          stream: bool = False, informe: Optional[Dict[str, Any]] = None) -> Union[str, Iterator[str]]:
+        """
+        Generar un documento nuevo basado en ejemplos similares.
+        
+        Args:
+            tema (str): Tema para el nuevo documento
+            parametros_adicionales (Dict, optional): Parámetros adicionales para la generación
+                - tipo: Tipo de documento (los ejemplos se toman de documentos de ese tipo si los hay)
+                - filtros: Dict con tipo, materia y/o profesor de los documentos de ejemplo
+                - contexto_adicional: Contexto adicional como texto
+                - prompt_personalizado: Prompt personalizado (si se proporciona, se usa en lugar del automático)
+                - temperatura: Temperatura para la generación
+                - max_tokens: Máximo de tokens
+                - seed: Semilla para respuestas reproducibles
+                - refrescar_cache: Ignorar la respuesta en caché y volver a pedirla al modelo
+            stream (bool): Si es True, devuelve un generador con los fragmentos según llegan
+            informe (Dict, optional): Si se pasa, se rellena con el recuento de tokens y pasajes del
+                prompt (ver _ajustar_prompt) antes de llamar al modelo, también en modo streaming
+            
+        Returns:
+            str | Iterator[str]: Documento generado, o sus fragmentos en modo streaming
+        """
+        if parametros_adicionales is None:
+            parametros_adicionales = {}
+        
+        prompt = self._preparar_prompt_generacion(tema, parametros_adicionales, informe)
+        if prompt is None:
+            mensaje = "No hay documentos de ejemplo disponibles. Por favor, agrega algunos documentos primero."
+            return iter([mensaje]) if stream else mensaje
         
         # Llamar al modelo
-        response = self._llamar_modelo(
-            messages=[
-                {"role": "system", "content": "Eres un asistente que imita perfectamente el estilo de escritura del usuario."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=temperatura,
-            max_tokens=max_tokens,
-            top_p=top_p,
-            frequency_penalty=frequency_penalty,
-            presence_penalty=presence_penalty
+        llamada = self._llamar_modelo_stream if stream else self._llamar_modelo
+        return llamada(
+            messages=self._mensajes_generacion(prompt),
+            **self._parametros_modelo(parametros_adicionales)
         )
+    
+    @metricas.operacion("generar_variantes")
+    def generar_variantes(
+        self,
+        tema: str,
+        n: int = 3,
+        parametros_adicionales: Union[Dict, List[Dict]] = None,
+        max_concurrencia: int = 5
+    ) -> Iterator[Tuple[int, Union[str, Exception]]]:
+        """
+        Generar varias versiones de un documento compartiendo la recuperación y el prompt.
+        
+        Los ejemplos se buscan y el prompt se construye una sola vez; las N llamadas al
+        modelo se lanzan en paralelo y cada resultado se entrega en cuanto termina.
+        
+        Args:
+            tema (str): Tema para el nuevo documento
+            n (int): Número de versiones (se ignora si se pasa una lista de parámetros)
+            parametros_adicionales (Dict | List[Dict], optional): Parámetros comunes a todas las
+                versiones, o una lista con los parámetros de cada versión. Con una lista, el tipo,
+                el contexto y el prompt personalizado se toman del primer elemento; de los demás
+                solo se usan los parámetros de muestreo (temperatura, top_p, penalizaciones...)
+            max_concurrencia (int): Máximo de llamadas simultáneas al modelo
+            
+        Yields:
+            Tuple[int, str | Exception]: (índice de la versión, documento generado). Si una llamada
+            falla se entrega la excepción en lugar del texto, sin interrumpir las demás.
+        """
+        if isinstance(parametros_adicionales, list):
+            lista_parametros = [p or {} for p in parametros_adicionales]
+        else:
+            lista_parametros = [parametros_adicionales or {}] * n
+        
+        if not lista_parametros:
+            return
         
-        return response
+        prompt = self._preparar_prompt_generacion(tema, lista_parametros[0])
+        if prompt is None:
+            mensaje = "No hay documentos de ejemplo disponibles. Por favor, agrega algunos documentos primero."
+            for indice in range(len(lista_parametros)):
+                yield indice, mensaje
+            return
+        
+        messages = self._mensajes_generacion(prompt)
+        
+        with ThreadPoolExecutor(max_workers=max(1, min(max_concurrencia, len(lista_parametros)))) as executor:
+            futuros = {
+                executor.submit(metricas.en_contexto(self._llamar_modelo), messages=messages, variante=indice,
+                                **self._parametros_modelo(parametros)): indice
+                for indice, parametros in enumerate(lista_parametros)
+            }
+            for futuro in as_completed(futuros):
+                try:
+                    yield futuros[futuro], futuro.result()
+                except Exception as e:
+                    yield futuros[futuro], e
 
-    def transformar_texto(self, texto_original: str, parametros_adicionales: Dict = None) -> str:
+    @metricas.operacion_async("generar_documento")
+    async def agenerar_documento(self, tema: str, parametros_adicionales: Dict = None, stream: bool = False,
+                                 informe: Optional[Dict[str, Any]] = None) -> Union[str, AsyncIterator[str]]:
         """
-        Transformar un texto existente para que se ajuste al estilo del usuario.
+        Versión asíncrona de generar_documento, para atender muchas peticiones desde un solo bucle de eventos.
+        
+        La recuperación y la construcción del prompt se ejecutan en el executor; la llamada al
+        modelo no ocupa ningún hilo y espera su turno en el límite de su endpoint (ver
+        ClienteHTTPAsync). Cancelar la tarea, o cerrar el iterador en modo streaming, corta la
+        petición al endpoint.
         
         Args:
-            texto_original (str): Texto que se desea transformar
-            parametros_adicionales (Dict, optional): Parámetros adicionales para la transformación
+            tema (str): Tema para el nuevo documento
+            parametros_adicionales (Dict, optional): Los mismos que generar_documento
+            stream (bool): Si es True, devuelve un iterador asíncrono con los fragmentos según llegan
+            informe (Dict, optional): Si se pasa, se rellena con el recuento del prompt (ver generar_documento)
             
         Returns:
-            str: Texto transformado en el estilo del usuario
+            str | AsyncIterator[str]: Documento generado, o sus fragmentos en modo streaming
         """
         if parametros_adicionales is None:
             parametros_adicionales = {}
         
-        # Cargar documentos
-        documentos = self.doc_manager.cargar_documentos()
-        
-        if not documentos:
-            return "No hay documentos de ejemplo disponibles. Por favor, agrega algunos documentos primero."
+        prompt = await self._en_executor(self._preparar_prompt_generacion, tema, parametros_adicionales, informe)
+        if prompt is None:
+            mensaje = "No hay documentos de ejemplo disponibles. Por favor, agrega algunos documentos primero."
+            return _fragmentos(mensaje) if stream else mensaje
         
-        # Convertir documentos a texto para búsqueda
-        textos = [self.doc_manager.get_documento_completo(doc) for doc in documentos]
+        llamada = self._allamar_modelo_stream if stream else self._allamar_modelo
+        resultado = llamada(
+            messages=self._mensajes_generacion(prompt),
+            **self._parametros_modelo(parametros_adicionales)
+        )
+        return resultado if stream else await resultado
+
+    def _preparar_prompt_transformacion(self, texto_original: str, parametros_adicionales: Dict,
+                                        bloque: Optional[Tuple[int, int]] = None,
+                                        informe: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """
+        Recuperar ejemplos similares al texto y construir el prompt de transformación.
         
+        Args:
+            texto_original (str): Texto que se desea transformar
+            parametros_adicionales (Dict): Parámetros de la transformación (filtros, contexto_adicional, presupuesto_tokens)
+            bloque (Tuple[int, int], optional): (índice, total) si el texto es un bloque de un texto más
+                largo; el prompt pide entonces continuar el documento en lugar de empezarlo
+            informe (Dict, optional): Si se pasa, se le añade el recuento de tokens del prompt
+            
+        Returns:
+            str: Prompt listo para el modelo, o None si no hay documentos de ejemplo
+        """
         # Buscar documentos similares basados en el texto original
         # Usamos un extracto del texto original si es muy largo para la búsqueda de similitud
         texto_para_busqueda = texto_original[:3000] if len(texto_original) > 3000 else texto_original
-        docs_similares = self.embeddings_manager.buscar_documentos_similares(
-            texto_para_busqueda, documentos, textos, top_k=3
+        docs_similares = self._agrupar_pasajes_filtrados(
+            texto_para_busqueda, self._filtros_busqueda(parametros_adicionales), num_documentos=3
         )
         
-        # Crear prompt para transformar el texto
-        ejemplos_texto = []
-        for doc, score in docs_similares:
-            ejemplo = self.doc_manager.get_documento_completo(doc)
-            ejemplos_texto.append(f"EJEMPLO DE MI ESTILO (relevancia: {score:.2f}):\n{ejemplo}\n")
-        
-        contexto = "\n".join(ejemplos_texto)
+        if not docs_similares:
+            return None
         
         # Obtener contexto adicional si se proporcionó
         contexto_adicional = parametros_adicionales.get('contexto_adicional')
-        seccion_contexto = ""
-        if contexto_adicional:
-            seccion_contexto = f"\n\nCONTEXTO ADICIONAL:\n{contexto_adicional}\n"
         
         # Determinar si estamos procesando texto combinado
         es_texto_combinado = "--- Contenido del segundo archivo ---" in texto_original
@@ -295,33 +900,284 @@ class RAGSistema:
                 "que mantenga mi estilo de escritura y estructura."
             )
         
-        prompt = (
-            "Quiero que reformules el siguiente texto para que se adapte a mi estilo de escritura, "
-            "basándote en los ejemplos proporcionados. Mantén la estructura de secciones como título, "
-            "tipo, materia, etc. según los ejemplos, pero adapta el contenido del texto original. "
-            "Los ejemplos muestran mi forma de escribir y estructurar documentos.\n\n"
-            f"EJEMPLOS DE MI ESTILO:\n{contexto}{seccion_contexto}\n"
-            f"TEXTO A TRANSFORMAR:\n{texto_original}\n\n"
-            f"{instruccion_adicional}\n\n"
-            "Reformula este texto para que parezca escrito por mí, manteniendo el mismo contenido y mensaje, "
-            "pero con mi estilo de redacción y estructura de documento."
+        instruccion_estructura = (
+            "Mantén la estructura de secciones como título, tipo, materia, etc. según los ejemplos, "
+            "pero adapta el contenido del texto original. "
         )
+        if bloque is not None:
+            indice, total = bloque
+            instruccion_estructura = (
+                f"El texto es la parte {indice + 1} de {total} de un documento más largo; las demás partes "
+                "se reformulan por separado y después se unen en orden. "
+            )
+            if indice == 0:
+                instruccion_estructura += (
+                    "Empieza con el encabezado del documento (título, tipo, materia, presenta, profesor) "
+                    "según los ejemplos y reformula solo el contenido de esta parte. "
+                )
+            else:
+                instruccion_estructura += (
+                    "No escribas encabezado ni título ni añadas conclusiones que no estén en el texto: continúa con "
+                    "el contenido de "
+                    "esta parte, usando los encabezados de sección (introducción, desarrollo, conclusión) "
+                    "solo si aparecen en ella. "
+                )
         
-        # Configuración de parámetros para el modelo
-        temperatura = parametros_adicionales.get('temperatura', 0.7)
-        max_tokens = parametros_adicionales.get('max_tokens', 32768)
+        # Crear prompt para transformar el texto; el texto original nunca se recorta
+        def plantilla(contexto: str, seccion_contexto: str) -> str:
+            return (
+                "Quiero que reformules el siguiente texto para que se adapte a mi estilo de escritura, "
+                f"basándote en los ejemplos proporcionados. {instruccion_estructura}"
+                "Los ejemplos muestran mi forma de escribir y estructurar documentos.\n\n"
+                f"EJEMPLOS DE MI ESTILO:\n{contexto}{seccion_contexto}\n"
+                f"TEXTO A TRANSFORMAR:\n{texto_original}\n\n"
+                f"{instruccion_adicional}\n\n"
+                "Reformula este texto para que parezca escrito por mí, manteniendo el mismo contenido y mensaje, "
+                "pero con mi estilo de redacción y estructura de documento."
+            )
+        
+        presupuesto = parametros_adicionales.get('presupuesto_tokens', PRESUPUESTO_ENTRADA)
+        prompt, recuento = self._ajustar_prompt(plantilla, docs_similares, contexto_adicional, presupuesto,
+                                                "EJEMPLO DE MI ESTILO")
+        self._registrar_informe_prompt(recuento)
+        self._acumular_informe(informe, recuento)
+        return prompt
+    
+    def _mensajes_transformacion(self, prompt: str) -> List[Dict[str, str]]:
+        """Construir los mensajes de chat para una transformación."""
+        return [
+            {"role": "system", "content": "Eres un experto en adaptar textos al estilo de escritura de otros autores."},
+            {"role": "user", "content": prompt}
+        ]
+    
+    def _parametros_transformacion(self, parametros_adicionales: Dict) -> Dict[str, Any]:
+        """Extraer los parámetros de la llamada al modelo de una transformación."""
+        return {
+            'temperature': parametros_adicionales.get('temperatura', 0.7),
+            'max_tokens': parametros_adicionales.get('max_tokens', 32768),
+            'seed': parametros_adicionales.get('seed'),
+            'usar_cache': not parametros_adicionales.get('refrescar_cache', False)
+        }
+    
+    @metricas.operacion("transformar_texto")
+    def transformar_texto(self, texto_original: str, parametros_adicionales: Dict = None,
+                          stream: bool = False, informe: Optional[Dict[str, Any]] = None) -> Union[str, Iterator[str]]:
+        """
+        Transformar un texto existente para que se ajuste al estilo del usuario.
+        
+        Args:
+            texto_original (str): Texto que se desea transformar
+            parametros_adicionales (Dict, optional): Parámetros adicionales para la transformación
+                - tamano_bloque: Si el texto supera estos caracteres se transforma por bloques
+                  (ver _transformar_por_bloques)
+                - max_concurrencia: Máximo de bloques transformándose a la vez (4 por defecto)
+                - revision_final: Tras unir los bloques, pedir al modelo una pasada de coherencia
+            stream (bool): Si es True, devuelve un generador con los fragmentos según llegan
+            informe (Dict, optional): Si se pasa, se rellena con el recuento de tokens y pasajes del
+                prompt antes de llamar al modelo (por bloques, la suma de los de todos los bloques y
+                'bloques' con su número; sin contar el prompt de la revisión final)
+            
+        Returns:
+            str | Iterator[str]: Texto transformado en el estilo del usuario, o sus fragmentos en modo streaming
+        """
+        if parametros_adicionales is None:
+            parametros_adicionales = {}
+        
+        tamano_bloque = parametros_adicionales.get('tamano_bloque')
+        if tamano_bloque and len(texto_original) > tamano_bloque:
+            bloques = dividir_en_bloques(texto_original, tamano_bloque)
+            if len(bloques) > 1:
+                return self._transformar_por_bloques(bloques, parametros_adicionales, stream, informe)
+        
+        prompt = self._preparar_prompt_transformacion(texto_original, parametros_adicionales, informe=informe)
+        if prompt is None:
+            mensaje = "No hay documentos de ejemplo disponibles. Por favor, agrega algunos documentos primero."
+            return iter([mensaje]) if stream else mensaje
         
         # Llamar al modelo
-        response = self._llamar_modelo(
-            messages=[
-                {"role": "system", "content": "Eres un experto en adaptar textos al estilo de escritura de otros autores."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=temperatura,
-            max_tokens=max_tokens
+        llamada = self._llamar_modelo_stream if stream else self._llamar_modelo
+        return llamada(
+            messages=self._mensajes_transformacion(prompt),
+            **self._parametros_transformacion(parametros_adicionales)
+        )
+    
+    def _transformar_por_bloques(self, bloques: List[str], parametros_adicionales: Dict, stream: bool = False,
+                                 informe: Optional[Dict[str, Any]] = None) -> Union[str, Iterator[str]]:
+        """
+        Transformar un texto largo bloque a bloque (map-reduce).
+        
+        Cada bloque recupera sus propios ejemplos de estilo y se transforma en una llamada
+        independiente; las llamadas se lanzan en paralelo con concurrencia limitada y los
+        resultados se unen en el orden original. Así la latencia depende del tamaño de los
+        bloques y no de la longitud total. La revisión final opcional vuelve a enviar el
+        texto completo en una sola llamada, por lo que su latencia sí crece con la longitud.
+        
+        Args:
+            bloques (List[str]): Bloques del texto en orden (ver dividir_en_bloques)
+            parametros_adicionales (Dict): Parámetros de la transformación (ver transformar_texto)
+            stream (bool): Si es True, devuelve un generador que entrega cada bloque en cuanto
+                están listos todos los anteriores (o la revisión final según se genera)
+            informe (Dict, optional): Si se pasa, se rellena con la suma de los recuentos de los bloques
+            
+        Returns:
+            str | Iterator[str]: Texto transformado, o sus fragmentos en modo streaming
+        """
+        # La recuperación es local y rápida: se hace antes de lanzar las llamadas al modelo
+        prompts = []
+        if informe is not None:
+            informe['bloques'] = len(bloques)
+        for indice, bloque in enumerate(bloques):
+            prompt = self._preparar_prompt_transformacion(bloque, parametros_adicionales, (indice, len(bloques)),
+                                                          informe)
+            if prompt is None:
+                mensaje = "No hay documentos de ejemplo disponibles. Por favor, agrega algunos documentos primero."
+                return iter([mensaje]) if stream else mensaje
+            prompts.append(prompt)
+        
+        max_concurrencia = max(1, min(parametros_adicionales.get('max_concurrencia', 4), len(bloques)))
+        metricas.contar("bloques_transformacion", len(bloques))
+        parametros_modelo = self._parametros_transformacion(parametros_adicionales)
+        revision_final = parametros_adicionales.get('revision_final', False)
+        
+        def transformar() -> Iterator[str]:
+            with ThreadPoolExecutor(max_workers=max_concurrencia) as executor:
+                # map entrega los resultados en orden; si un bloque falla se propaga su excepción
+                resultados = executor.map(
+                    metricas.en_contexto(lambda prompt: self._llamar_modelo(
+                        messages=self._mensajes_transformacion(prompt), **parametros_modelo
+                    )),
+                    prompts
+                )
+                for indice, resultado in enumerate(resultados):
+                    yield ("\n\n" if indice else "") + resultado.strip()
+        
+        if not revision_final:
+            return transformar() if stream else "".join(transformar())
+        
+        def prompt_revision() -> str:
+            return self._prompt_revision("".join(transformar()), len(bloques))
+        
+        if stream:
+            def revisar() -> Iterator[str]:
+                # Los bloques no se piden hasta que se consume el primer fragmento
+                yield from self._llamar_modelo_stream(
+                    messages=self._mensajes_transformacion(prompt_revision()), **parametros_modelo
+                )
+            return revisar()
+        return self._llamar_modelo(messages=self._mensajes_transformacion(prompt_revision()), **parametros_modelo)
+    
+    @metricas.operacion_async("transformar_texto")
+    async def atransformar_texto(self, texto_original: str, parametros_adicionales: Dict = None, stream: bool = False,
+                                 informe: Optional[Dict[str, Any]] = None) -> Union[str, AsyncIterator[str]]:
+        """
+        Versión asíncrona de transformar_texto (ver agenerar_documento).
+        
+        Args:
+            texto_original (str): Texto que se desea transformar
+            parametros_adicionales (Dict, optional): Los mismos que transformar_texto
+            stream (bool): Si es True, devuelve un iterador asíncrono con los fragmentos según llegan
+            informe (Dict, optional): Si se pasa, se rellena con el recuento del prompt (ver transformar_texto)
+            
+        Returns:
+            str | AsyncIterator[str]: Texto transformado, o sus fragmentos en modo streaming
+        """
+        if parametros_adicionales is None:
+            parametros_adicionales = {}
+        
+        tamano_bloque = parametros_adicionales.get('tamano_bloque')
+        if tamano_bloque and len(texto_original) > tamano_bloque:
+            bloques = dividir_en_bloques(texto_original, tamano_bloque)
+            if len(bloques) > 1:
+                return await self._atransformar_por_bloques(bloques, parametros_adicionales, stream, informe)
+        
+        prompt = await self._en_executor(self._preparar_prompt_transformacion, texto_original, parametros_adicionales,
+                                         None, informe)
+        if prompt is None:
+            mensaje = "No hay documentos de ejemplo disponibles. Por favor, agrega algunos documentos primero."
+            return _fragmentos(mensaje) if stream else mensaje
+        
+        llamada = self._allamar_modelo_stream if stream else self._allamar_modelo
+        resultado = llamada(
+            messages=self._mensajes_transformacion(prompt),
+            **self._parametros_transformacion(parametros_adicionales)
         )
+        return resultado if stream else await resultado
+    
+    async def _atransformar_por_bloques(self, bloques: List[str], parametros_adicionales: Dict, stream: bool = False,
+                                        informe: Optional[Dict[str, Any]] = None) -> Union[str, AsyncIterator[str]]:
+        """
+        Versión asíncrona de _transformar_por_bloques: cada bloque es una tarea y los bloques
+        pendientes se cancelan (cortando sus peticiones) si el resultado se abandona.
+        """
+        def preparar_prompts() -> List[Optional[str]]:
+            if informe is not None:
+                informe['bloques'] = len(bloques)
+            return [
+                self._preparar_prompt_transformacion(bloque, parametros_adicionales, (indice, len(bloques)), informe)
+                for indice, bloque in enumerate(bloques)
+            ]
+        
+        prompts = await self._en_executor(preparar_prompts)
+        if any(prompt is None for prompt in prompts):
+            mensaje = "No hay documentos de ejemplo disponibles. Por favor, agrega algunos documentos primero."
+            return _fragmentos(mensaje) if stream else mensaje
         
-        return response
+        max_concurrencia = max(1, min(parametros_adicionales.get('max_concurrencia', 4), len(bloques)))
+        metricas.contar("bloques_transformacion", len(bloques))
+        parametros_modelo = self._parametros_transformacion(parametros_adicionales)
+        revision_final = parametros_adicionales.get('revision_final', False)
+        limite = asyncio.Semaphore(max_concurrencia)
+        
+        async def transformar_bloque(prompt: str) -> str:
+            async with limite:
+                return await self._allamar_modelo(messages=self._mensajes_transformacion(prompt), **parametros_modelo)
+        
+        async def transformar() -> AsyncIterator[str]:
+            # Las tareas se crean al pedir el primer fragmento y se entregan en orden; si un
+            # bloque falla se propaga su excepción y se cancelan los demás
+            tareas = [asyncio.ensure_future(transformar_bloque(prompt)) for prompt in prompts]
+            try:
+                for indice, tarea in enumerate(tareas):
+                    yield ("\n\n" if indice else "") + (await tarea).strip()
+            finally:
+                for tarea in tareas:
+                    tarea.cancel()
+        
+        async def unir() -> str:
+            return "".join([fragmento async for fragmento in transformar()])
+        
+        if not revision_final:
+            return transformar() if stream else await unir()
+        
+        if stream:
+            async def revisar() -> AsyncIterator[str]:
+                # Los bloques no se piden hasta que se consume el primer fragmento
+                iterador = self._allamar_modelo_stream(
+                    messages=self._mensajes_transformacion(self._prompt_revision(await unir(), len(bloques))),
+                    **parametros_modelo
+                )
+                try:
+                    async for fragmento in iterador:
+                        yield fragmento
+                finally:
+                    await iterador.aclose()
+            return revisar()
+        return await self._allamar_modelo(
+            messages=self._mensajes_transformacion(self._prompt_revision(await unir(), len(bloques))),
+            **parametros_modelo
+        )
+    
+    def _prompt_revision(self, texto_unido: str, num_bloques: int) -> str:
+        """Prompt de la pasada de coherencia sobre un texto transformado por bloques."""
+        return (
+            f"El siguiente documento está escrito en mi estilo, pero se reformuló en {num_bloques} partes "
+            "por separado que después se unieron en orden. Revísalo para que se lea como un único documento: "
+            "deja un solo encabezado (título, tipo, materia, presenta, profesor) al principio, elimina "
+            "encabezados o conclusiones repetidos en las uniones entre partes, suaviza las transiciones y "
+            "unifica la terminología. No resumas ni omitas contenido y conserva mi estilo de redacción "
+            "y la estructura de secciones.\n\n"
+            f"DOCUMENTO:\n{texto_unido}"
+        )
 
 # Ejemplo de uso
 if __name__ == "__main__":
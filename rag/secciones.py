@@ -0,0 +1,139 @@
+import re
+from typing import Dict, List
+
+from .fragmentos import dividir_texto
+from .metricas import metricas
+
+# Solo usa la biblioteca estándar: lo importan los scripts antes de cargar el sistema RAG.
+
+# Campos de una sola línea (encabezado del documento) y secciones de contenido
+CAMPOS_LINEA = ('titulo', 'tipo', 'materia', 'presenta', 'profesor')
+CAMPOS_SECCION = ('introduccion', 'desarrollo', 'conclusion')
+CAMPOS = CAMPOS_LINEA + CAMPOS_SECCION
+
+# Tamaño por defecto (en caracteres) de los bloques de la transformación por bloques
+TAMANO_BLOQUE = 6000
+
+_NOMBRES = {
+    'titulo': r't[ií]tulo',
+    'tipo': r'tipo',
+    'materia': r'materia',
+    'presenta': r'presenta',
+    'profesor': r'profesor',
+    'introduccion': r'introducci[oó]n',
+    'desarrollo': r'desarrollo',
+    'conclusion': r'conclusi[oó]n',
+}
+
+# Un encabezado es una línea que empieza (tras marcas de Markdown como #, ** o -) por el
+# nombre de un campo seguido de ':' o del final de la línea. Una sola alternación compilada
+# encuentra todos los encabezados en un recorrido lineal del texto.
+_PATRON_ENCABEZADO = re.compile(
+    r'^[ \t>#*_-]*(?:' + '|'.join(f'(?P<{campo}>{nombre})' for campo, nombre in _NOMBRES.items()) +
+    r')\b[ \t*_]*(?::|$)[ \t*_]*',
+    re.IGNORECASE | re.MULTILINE
+)
+
+# Cortes preferidos para dividir un texto largo: el encabezado de una sección o una línea
+# separadora ("---", como la que une los dos archivos de transformar_texto.py)
+_PATRON_CORTE = re.compile(
+    r'^[ \t>#*_-]*(?:' + '|'.join(_NOMBRES[campo] for campo in CAMPOS_SECCION) +
+    r')\b[ \t*_]*(?::|$)|^[ \t]*-{3,}',
+    re.IGNORECASE | re.MULTILINE
+)
+_PATRON_PARRAFO = re.compile(r'\n[ \t]*\n')
+
+
+@metricas.medir("parsear_secciones")
+def parsear_secciones(texto: str) -> Dict[str, str]:
+    """
+    Extraer los campos y las secciones de un documento en texto plano.
+
+    Los campos de encabezado (título, tipo, materia, presenta, profesor) toman el resto
+    de su línea, o la siguiente línea no vacía si el encabezado está solo. Cada sección
+    (introducción, desarrollo, conclusión) abarca desde su encabezado hasta el siguiente
+    encabezado o el final del texto. Si un campo de encabezado aparece varias veces cuenta
+    la primera aparición con contenido; si se repite una sección, sus partes se unen.
+
+    Args:
+        texto (str): Texto del documento (archivo .txt o respuesta del modelo)
+
+    Returns:
+        Dict[str, str]: Valor de cada campo de CAMPOS ("" si no se encontró)
+    """
+    lineas: Dict[str, str] = {}
+    partes: Dict[str, list] = {campo: [] for campo in CAMPOS_SECCION}
+    encabezados = [(m.lastgroup, m.start(), m.end()) for m in _PATRON_ENCABEZADO.finditer(texto)]
+
+    for i, (campo, _, fin) in enumerate(encabezados):
+        if campo in lineas:
+            continue
+        siguiente = encabezados[i + 1][1] if i + 1 < len(encabezados) else len(texto)
+        if campo in CAMPOS_LINEA:
+            valor = _primera_linea(texto, fin, siguiente)
+            if valor:
+                lineas[campo] = valor
+        else:
+            contenido = texto[fin:siguiente].strip()
+            if contenido:
+                partes[campo].append(contenido)
+
+    doc_dict = {campo: lineas.get(campo, "") for campo in CAMPOS_LINEA}
+    doc_dict.update({campo: "\n\n".join(partes[campo]) for campo in CAMPOS_SECCION})
+    return doc_dict
+
+
+def _primera_linea(texto: str, inicio: int, fin: int) -> str:
+    """Primera línea no vacía de texto[inicio:fin], sin copiar el resto del tramo."""
+    while inicio < fin:
+        salto = texto.find("\n", inicio, fin)
+        if salto == -1:
+            salto = fin
+        linea = texto[inicio:salto].strip(" \t\r*_")
+        if linea:
+            return linea
+        inicio = salto + 1
+    return ""
+
+
+def dividir_en_bloques(texto: str, tamano: int = TAMANO_BLOQUE) -> List[str]:
+    """
+    Dividir un texto largo en bloques de como máximo `tamano` caracteres, en orden.
+
+    Los bloques se forman juntando párrafos completos. Un bloque se cierra antes de tiempo
+    al empezar una sección (introducción, desarrollo, conclusión) o tras una línea "---"
+    si ya va por la mitad de su tamaño, para que las secciones no queden repartidas sin
+    necesidad. Solo los párrafos más largos que `tamano` se cortan por frases o palabras.
+
+    Args:
+        texto (str): Texto a dividir
+        tamano (int): Longitud máxima de cada bloque en caracteres
+
+    Returns:
+        List[str]: Bloques sin solapamiento (vacía si el texto está vacío)
+    """
+    texto = texto.strip()
+    if len(texto) <= tamano:
+        return [texto] if texto else []
+
+    cortes = [m.start() for m in _PATRON_CORTE.finditer(texto) if m.start() > 0] + [len(texto)]
+    bloques: List[str] = []
+    actual: List[str] = []
+    longitud = 0
+    inicio = 0
+    for fin in cortes:
+        # Una sección nueva cierra el bloque actual si ya va por la mitad
+        if longitud > tamano // 2:
+            bloques.append("\n\n".join(actual))
+            actual, longitud = [], 0
+        for parrafo in _PATRON_PARRAFO.split(texto[inicio:fin]):
+            for parte in dividir_texto(parrafo, tamano, 0):
+                if actual and longitud + 2 + len(parte) > tamano:
+                    bloques.append("\n\n".join(actual))
+                    actual, longitud = [], 0
+                longitud += len(parte) + (2 if actual else 0)
+                actual.append(parte)
+        inicio = fin
+    if actual:
+        bloques.append("\n\n".join(actual))
+    return bloques
@@ -0,0 +1,326 @@
+import hmac
+import itertools
+import json
+import os
+import secrets
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, Iterator, List, Optional, Tuple, Union
+
+from .cache_respuestas import CacheRespuestas
+from .cliente import CABECERA_INFORME, CABECERA_SECRETO, HOST_POR_DEFECTO, PUERTO_POR_DEFECTO, RUTA_SECRETO, VARIABLE_SECRETO
+from .cliente_http import ErrorModelo
+from .documentos_manager import DocumentosManager
+from .embeddings_manager import MODOS_BUSQUEDA
+from .metricas import AgregadorMetricas
+from .rag_sistema import RAGSistema
+
+
+def preparar_secreto(ruta: str = RUTA_SECRETO) -> str:
+    """
+    Obtener el secreto que el servidor exige a los clientes.
+
+    Usa SCRIPTORIUM_SECRETO si está definida; si no, genera uno nuevo y lo guarda en
+    `ruta` con permisos solo para el usuario, donde lo leen los scripts y la GUI.
+
+    Returns:
+        str: Secreto compartido
+    """
+    secreto = os.environ.get(VARIABLE_SECRETO)
+    if secreto:
+        return secreto
+    secreto = secrets.token_urlsafe(32)
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    tmp = ruta + ".tmp"
+    descriptor = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(descriptor, "w", encoding="utf-8") as f:
+        f.write(secreto)
+    os.replace(tmp, ruta)
+    return secreto
+
+
+class ServidorRAG(ThreadingHTTPServer):
+    """
+    Servidor HTTP local que mantiene un RAGSistema caliente entre peticiones.
+
+    Las peticiones POST deben traer el secreto compartido en la cabecera X-Scriptorium-Secreto
+    y un cuerpo application/json (un navegador no puede enviar ninguna de las dos cosas a otro
+    origen sin permiso), y solo pueden usar los endpoints del modelo configurados al arrancar:
+    el token del servidor nunca se envía a una URL elegida por el cliente.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, token: str, secreto: str, host: str = HOST_POR_DEFECTO, puerto: int = PUERTO_POR_DEFECTO,
+                 endpoint: Optional[str] = None, endpoints_permitidos: Optional[List[str]] = None,
+                 cache_respuestas: Optional[CacheRespuestas] = None,
+                 modelo_embeddings: Optional[str] = None, nprobe: Optional[int] = None,
+                 modo_busqueda: str = "vectorial", agregador_metricas: Optional[AgregadorMetricas] = None,
+                 cuantizacion: Optional[str] = None, procesos_busqueda: Optional[int] = None,
+                 doc_manager: Optional[DocumentosManager] = None, directorio_indices: Optional[str] = None):
+        """
+        Inicializar el servidor.
+
+        Args:
+            token (str): Token de autenticación para GitHub AI
+            secreto (str): Secreto que deben enviar los clientes (ver preparar_secreto)
+            host (str): Dirección en la que escuchar (solo local por defecto)
+            puerto (int): Puerto TCP en el que escuchar
+            endpoint (str, optional): Endpoint por defecto del modelo
+            endpoints_permitidos (List[str], optional): Otros endpoints que pueden pedir los clientes
+            cache_respuestas (CacheRespuestas, optional): Caché de respuestas compartida por todos los endpoints
+            modelo_embeddings (str, optional): Modelo de embeddings remoto; sin él se usa el embedder local
+            nprobe (int, optional): Listas IVF exploradas por búsqueda en corpus grandes (sin él, búsqueda exacta)
+            modo_busqueda (str): "vectorial", "lexico" o "hibrido"
+            agregador_metricas (AgregadorMetricas, optional): Hook suscrito al registro de métricas;
+                si se indica, GET /metricas las devuelve en formato Prometheus
+            cuantizacion (str, optional): "float16" o "int8" para buscar sobre una copia cuantizada
+                de los embeddings con re-puntuación exacta (sin él, solo la matriz float32)
+            procesos_busqueda (int, optional): Procesos entre los que se reparte la búsqueda exacta
+                en corpus grandes (sin él, se busca en el proceso del servidor)
+            doc_manager (DocumentosManager, optional): Gestor de documentos compartido por los sistemas
+            directorio_indices (str, optional): Directorio de los índices (ver RAGSistema)
+        """
+        if not secreto:
+            raise ValueError("El servidor RAG necesita un secreto compartido")
+        super().__init__((host, puerto), _ManejadorRAG)
+        self.token = token
+        self.secreto = secreto
+        self.endpoint_por_defecto = endpoint
+        self.endpoints_permitidos = set(endpoints_permitidos or [])
+        self.doc_manager = doc_manager
+        self.directorio_indices = directorio_indices
+        self.cache_respuestas = cache_respuestas
+        self.modelo_embeddings = modelo_embeddings
+        self.nprobe = nprobe
+        self.modo_busqueda = modo_busqueda
+        self.cuantizacion = cuantizacion
+        self.procesos_busqueda = procesos_busqueda
+        self.agregador_metricas = agregador_metricas
+        self._sistemas: Dict[Tuple[Optional[str], str], RAGSistema] = {}
+        self._lock = threading.Lock()
+        # Crear el sistema por defecto (y su sesión HTTP) y cargar el corpus, los pasajes y la
+        # matriz de embeddings al arrancar para que la primera petición no pague la carga
+        sistema = self.obtener_sistema(None)
+        sistema.cliente_http.session
+        self.documentos_indexados: Optional[Tuple[int, int]] = None
+        try:
+            self.documentos_indexados = sistema.indexar()
+        except ErrorModelo as e:
+            # Sin el API de embeddings el servidor arranca igual; la primera petición lo reintentará
+            print(f"⚠️ No se pudo indexar el corpus al arrancar: {e}")
+
+    def obtener_sistema(self, endpoint: Optional[str], modo_busqueda: Optional[str] = None,
+                        modelo_embeddings: Optional[str] = None, cache: bool = False) -> RAGSistema:
+        """
+        Obtener (o crear una sola vez) el RAGSistema asociado a un endpoint y modo de búsqueda.
+
+        Los sistemas de distintos modos comparten los archivos de los índices. El endpoint debe
+        ser el del servidor o uno de endpoints_permitidos, y el modelo de embeddings y la caché
+        son los del servidor: si la petición pide otros se rechaza en lugar de ignorarlos.
+
+        Args:
+            endpoint (str, optional): Endpoint solicitado; None usa el del servidor
+            modo_busqueda (str, optional): Modo de búsqueda solicitado; None usa el del servidor
+            modelo_embeddings (str, optional): Modelo de embeddings que espera el cliente
+            cache (bool): El cliente pidió reutilizar respuestas en caché
+
+        Returns:
+            RAGSistema: Instancia reutilizada entre peticiones
+
+        Raises:
+            ValueError: Si la petición pide opciones que el servidor no puede atender
+        """
+        if endpoint == self.endpoint_por_defecto:
+            endpoint = None
+        if endpoint is not None and endpoint not in self.endpoints_permitidos:
+            raise ValueError(f"Endpoint no permitido: {endpoint}; arranca el servidor con "
+                             f"servidor_rag.py --endpoint o --permitir-endpoint para usarlo")
+        endpoint = endpoint or self.endpoint_por_defecto
+        modo_busqueda = modo_busqueda or self.modo_busqueda
+        if modo_busqueda not in MODOS_BUSQUEDA:
+            raise ValueError(f"Modo de búsqueda desconocido: {modo_busqueda} (opciones: {', '.join(MODOS_BUSQUEDA)})")
+        if modelo_embeddings and modelo_embeddings != self.modelo_embeddings:
+            raise ValueError(f"El servidor usa el modelo de embeddings {self.modelo_embeddings or 'local'}; "
+                             f"arráncalo con servidor_rag.py --modelo-embeddings {modelo_embeddings}")
+        if cache and self.cache_respuestas is None:
+            raise ValueError("El servidor no tiene caché de respuestas; arráncalo con servidor_rag.py --cache")
+        with self._lock:
+            sistema = self._sistemas.get((endpoint, modo_busqueda))
+            if sistema is None:
+                opciones = {"cache_respuestas": self.cache_respuestas, "modelo_embeddings": self.modelo_embeddings,
+                            "nprobe": self.nprobe, "modo_busqueda": modo_busqueda,
+                            "cuantizacion": self.cuantizacion, "procesos_busqueda": self.procesos_busqueda,
+                            "doc_manager": self.doc_manager, "directorio_indices": self.directorio_indices}
+                if endpoint:
+                    sistema = RAGSistema(token=self.token, endpoint=endpoint, **opciones)
+                else:
+                    sistema = RAGSistema(token=self.token, **opciones)
+                self._sistemas[(endpoint, modo_busqueda)] = sistema
+            return sistema
+
+
+class _ManejadorRAG(BaseHTTPRequestHandler):
+    """Atiende las rutas JSON del servidor RAG."""
+
+    server: ServidorRAG
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path == "/salud":
+            salud: Dict[str, Any] = {"estado": "ok"}
+            if self.server.cache_respuestas is not None:
+                salud["cache"] = self.server.cache_respuestas.estadisticas()
+            self._responder(200, salud)
+        elif self.path == "/metricas" and self.server.agregador_metricas is not None:
+            cuerpo = self.server.agregador_metricas.prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+        else:
+            self._responder(404, {"error": f"Ruta no encontrada: {self.path}"})
+
+    def do_POST(self):
+        rutas = {
+            "/generar": self._generar,
+            "/variantes": self._variantes,
+            "/transformar": self._transformar,
+            "/buscar": self._buscar,
+            "/indexar": self._indexar,
+        }
+        # Los rechazos no leen el cuerpo: la conexión se cierra para que no se tome por otra petición
+        accion = rutas.get(self.path)
+        if accion is None:
+            self.close_connection = True
+            self._responder(404, {"error": f"Ruta no encontrada: {self.path}"})
+            return
+        secreto = self.headers.get(CABECERA_SECRETO, "")
+        if not hmac.compare_digest(secreto.encode("utf-8"), self.server.secreto.encode("utf-8")):
+            self.close_connection = True
+            self._responder(401, {"error": f"Falta la cabecera {CABECERA_SECRETO} o no es válida "
+                                           f"(ver {VARIABLE_SECRETO} o {RUTA_SECRETO})"})
+            return
+        if self.headers.get_content_type() != "application/json":
+            self.close_connection = True
+            self._responder(415, {"error": "El cuerpo debe ser application/json"})
+            return
+
+        try:
+            longitud = int(self.headers.get("Content-Length", 0))
+            cuerpo = json.loads(self.rfile.read(longitud) or b"{}")
+        except (ValueError, json.JSONDecodeError) as e:
+            self._responder(400, {"error": f"JSON inválido: {e}"})
+            return
+
+        try:
+            resultado = accion(cuerpo)
+        except KeyError as e:
+            self._responder(400, {"error": f"Falta el campo requerido: {e}"})
+            return
+        except ValueError as e:
+            self._responder(400, {"error": str(e)})
+            return
+        except Exception as e:
+            self._responder(500, {"error": str(e)})
+            return
+
+        if isinstance(resultado, dict):
+            self._responder(200, resultado)
+        else:
+            self._responder_stream(*resultado)
+
+    def _sistema(self, cuerpo: Dict[str, Any]) -> RAGSistema:
+        return self.server.obtener_sistema(cuerpo.get("endpoint"), cuerpo.get("modo_busqueda"),
+                                           cuerpo.get("modelo_embeddings"), bool(cuerpo.get("cache")))
+
+    def _generar(self, cuerpo: Dict[str, Any]) -> Union[Dict[str, Any], Tuple[Iterator[str], Dict[str, Any]]]:
+        sistema = self._sistema(cuerpo)
+        informe: Dict[str, Any] = {}
+        resultado = sistema.generar_documento(cuerpo["tema"], cuerpo.get("parametros"),
+                                              stream=bool(cuerpo.get("stream")), informe=informe)
+        return (resultado, informe) if cuerpo.get("stream") else {"resultado": resultado, "informe": informe}
+
+    def _variantes(self, cuerpo: Dict[str, Any]) -> Tuple[Iterator[str], Dict[str, Any], str]:
+        # Una línea JSON por versión en cuanto termina (NDJSON): el cliente muestra la primera
+        # sin esperar a la más lenta
+        sistema = self._sistema(cuerpo)
+        variantes = sistema.generar_variantes(cuerpo["tema"], int(cuerpo.get("n", 3)), cuerpo.get("parametros"))
+        lineas = (
+            json.dumps({"indice": indice, "error": str(resultado)} if isinstance(resultado, Exception)
+                       else {"indice": indice, "resultado": resultado}, ensure_ascii=False) + "\n"
+            for indice, resultado in variantes
+        )
+        return lineas, {}, "application/x-ndjson; charset=utf-8"
+
+    def _transformar(self, cuerpo: Dict[str, Any]) -> Union[Dict[str, Any], Tuple[Iterator[str], Dict[str, Any]]]:
+        sistema = self._sistema(cuerpo)
+        informe: Dict[str, Any] = {}
+        resultado = sistema.transformar_texto(cuerpo["texto"], cuerpo.get("parametros"),
+                                              stream=bool(cuerpo.get("stream")), informe=informe)
+        return (resultado, informe) if cuerpo.get("stream") else {"resultado": resultado, "informe": informe}
+
+    def _buscar(self, cuerpo: Dict[str, Any]) -> Dict[str, Any]:
+        sistema = self._sistema(cuerpo)
+        resultados = sistema.buscar_documentos(cuerpo["consulta"], top_k=int(cuerpo.get("top_k", 3)),
+                                               filtros=cuerpo.get("filtros"))
+        return {
+            "resultados": [
+                {
+                    "id": doc.get("id"),
+                    "titulo": doc.get("titulo", ""),
+                    "tipo": doc.get("tipo", ""),
+                    "materia": doc.get("materia", ""),
+                    "score": score,
+                }
+                for doc, score in resultados
+            ]
+        }
+
+    def _indexar(self, cuerpo: Dict[str, Any]) -> Dict[str, Any]:
+        # Las importaciones masivas piden aquí el indexado para no escribir los índices desde
+        # otro proceso mientras el servidor los tiene abiertos
+        documentos, pasajes = self._sistema(cuerpo).indexar(compactar=bool(cuerpo.get("compactar")))
+        return {"documentos": documentos, "pasajes": pasajes}
+
+    def _responder(self, estado: int, datos: Dict[str, Any]):
+        cuerpo = json.dumps(datos, ensure_ascii=False).encode("utf-8")
+        self.send_response(estado)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def _responder_stream(self, fragmentos: Iterator[str], informe: Dict[str, Any],
+                          tipo: str = "text/plain; charset=utf-8"):
+        # Pedir el primer fragmento antes de enviar cabeceras: así los errores de la
+        # llamada al modelo todavía pueden devolverse con su código HTTP
+        try:
+            primero = next(fragmentos, "")
+        except Exception as e:
+            self._responder(500, {"error": str(e)})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Transfer-Encoding", "chunked")
+        if informe:
+            # JSON con ensure_ascii: una sola línea ASCII, válida como valor de cabecera
+            self.send_header(CABECERA_INFORME, json.dumps(informe))
+        self.end_headers()
+        try:
+            for fragmento in itertools.chain([primero], fragmentos):
+                datos = fragmento.encode("utf-8")
+                if datos:
+                    self.wfile.write(f"{len(datos):X}\r\n".encode("ascii") + datos + b"\r\n")
+                    self.wfile.flush()
+        except Exception as e:
+            # Sin el bloque final el cliente detecta la respuesta incompleta
+            print(f"❌ Error durante el streaming: {e}")
+            self.close_connection = True
+            return
+        self.wfile.write(b"0\r\n\r\n")
+
+    def log_message(self, formato, *args):
+        print(f"🌐 {self.address_string()} {formato % args}")
@@ -0,0 +1,114 @@
+import re
+from typing import Any, Dict
+
+# Presupuesto de tokens de entrada por defecto (prompt completo, sin contar la respuesta)
+PRESUPUESTO_ENTRADA = 12000
+
+# Piezas que el estimador cuenta por separado: palabras y signos sueltos
+_PATRON_PIEZA = re.compile(r'\w+|[^\w\s]')
+
+_codificador = None
+_codificador_cargado = False
+
+
+def _obtener_codificador():
+    """Cargar el codificador de tiktoken la primera vez; None si no está instalado."""
+    global _codificador, _codificador_cargado
+    if not _codificador_cargado:
+        _codificador_cargado = True
+        try:
+            import tiktoken
+            try:
+                # Codificación de los modelos gpt-4o / gpt-4.1
+                _codificador = tiktoken.get_encoding("o200k_base")
+            except ValueError:
+                _codificador = tiktoken.get_encoding("cl100k_base")
+        except ImportError:
+            _codificador = None
+    return _codificador
+
+
+def contador_tokens() -> str:
+    """Indicar qué contador se está usando: 'tiktoken' o 'estimado'."""
+    return "tiktoken" if _obtener_codificador() is not None else "estimado"
+
+
+def _estimar_tokens(texto: str) -> int:
+    # Aproximación a un BPE sobre texto en español: las palabras de hasta 6 caracteres
+    # suelen ser un token y las más largas se parten cada ~4 caracteres; cada signo
+    # de puntuación es un token. Tiende a sobreestimar ligeramente, que es lo seguro
+    # para respetar un presupuesto.
+    return sum(1 + max(0, len(pieza) - 3) // 4 for pieza in _PATRON_PIEZA.findall(texto))
+
+
+def contar_tokens(texto: str) -> int:
+    """
+    Contar los tokens de un texto.
+
+    Usa tiktoken si está instalado; si no, un estimador rápido.
+
+    Args:
+        texto (str): Texto a medir
+
+    Returns:
+        int: Número de tokens
+    """
+    if not texto:
+        return 0
+    codificador = _obtener_codificador()
+    if codificador is not None:
+        return len(codificador.encode(texto, disallowed_special=()))
+    return _estimar_tokens(texto)
+
+
+def recortar_a_tokens(texto: str, max_tokens: int) -> str:
+    """
+    Recortar un texto por el final para que no supere `max_tokens`.
+
+    Args:
+        texto (str): Texto a recortar
+        max_tokens (int): Número máximo de tokens
+
+    Returns:
+        str: El texto original si ya cabe, o su prefijo más largo que cabe
+    """
+    if max_tokens <= 0:
+        return ""
+    if contar_tokens(texto) <= max_tokens:
+        return texto
+    codificador = _obtener_codificador()
+    if codificador is not None:
+        return codificador.decode(codificador.encode(texto, disallowed_special=())[:max_tokens])
+
+    # Búsqueda binaria sobre la longitud del prefijo
+    bajo, alto = 0, len(texto)
+    while bajo < alto:
+        medio = (bajo + alto + 1) // 2
+        if _estimar_tokens(texto[:medio]) <= max_tokens:
+            bajo = medio
+        else:
+            alto = medio - 1
+    return texto[:bajo]
+
+
+def resumen_informe(informe: Dict[str, Any]) -> str:
+    """
+    Resumir en una línea el recuento de tokens de un prompt (ver RAGSistema.generar_documento).
+
+    Args:
+        informe (Dict[str, Any]): Recuento devuelto en el parámetro `informe`
+
+    Returns:
+        str: Tokens del prompt frente al presupuesto, pasajes incluidos y lo que se descartó
+    """
+    if informe.get('bloques'):
+        resumen = (f"Prompt: {informe['tokens_prompt']} tokens en {informe['bloques']} bloques "
+                   f"(presupuesto de {informe['presupuesto']} por bloque)")
+    else:
+        resumen = f"Prompt: {informe['tokens_prompt']} de {informe['presupuesto']} tokens ({informe['contador']})"
+    resumen += f", {informe['pasajes_incluidos']} pasajes de {informe['documentos_incluidos']} ejemplos"
+    if informe.get('pasajes_descartados'):
+        resumen += f", {informe['pasajes_descartados']} descartados por el presupuesto"
+    if informe.get('contexto_recortado'):
+        resumen += ", contexto adicional recortado"
+    return resumen
@@ -0,0 +1,86 @@
+import os
+import argparse
+from rag.cliente import HOST_POR_DEFECTO, PUERTO_POR_DEFECTO, RUTA_SECRETO, VARIABLE_SECRETO
+from rag.metricas import FORMATOS as FORMATOS_METRICAS
+
+def main():
+    parser = argparse.ArgumentParser(description='Servidor RAG persistente para la GUI y los scripts de línea de comandos')
+    parser.add_argument('--host', type=str, default=HOST_POR_DEFECTO,
+                        help=f'Dirección en la que escuchar (por defecto: {HOST_POR_DEFECTO})')
+    parser.add_argument('--puerto', type=int, default=PUERTO_POR_DEFECTO,
+                        help=f'Puerto en el que escuchar (por defecto: {PUERTO_POR_DEFECTO})')
+    parser.add_argument('--endpoint', type=str, default=None,
+                        help='Endpoint personalizado para la API (por defecto: https://models.github.ai/inference)')
+    parser.add_argument('--permitir-endpoint', type=str, action='append', default=None,
+                        help='Otro endpoint que los clientes pueden pedir con --endpoint (se puede repetir); '
+                             'el servidor rechaza cualquier otro para no enviar el token a URLs desconocidas')
+    parser.add_argument('--cache', action='store_true',
+                        help='Reutilizar la respuesta guardada cuando se repite exactamente la misma petición')
+    parser.add_argument('--modelo-embeddings', type=str, default=None,
+                        help='Modelo de embeddings del endpoint (p. ej. openai/text-embedding-3-small); '
+                             'por defecto se usa el embedder local')
+    parser.add_argument('--nprobe', type=int, default=None,
+                        help='Usar el índice aproximado IVF en corpus grandes explorando N listas por búsqueda '
+                             '(ver evaluar_indice.py para elegir el valor)')
+    parser.add_argument('--cuantizacion', type=str, choices=['float16', 'int8'], default=None,
+                        help='Buscar sobre una copia float16 (2x menos memoria) o int8 (4x) de los embeddings '
+                             'y re-puntuar los candidatos con la matriz exacta (ver evaluar_indice.py --cuantizacion)')
+    parser.add_argument('--procesos-busqueda', type=int, default=None,
+                        help='Repartir la búsqueda exacta en corpus grandes entre N procesos que comparten '
+                             'la matriz de embeddings en memoria (por ejemplo, uno por núcleo)')
+    parser.add_argument('--modo-busqueda', type=str, choices=['vectorial', 'lexico', 'hibrido'], default='vectorial',
+                        help='Búsqueda de ejemplos: vectorial (embeddings), lexico (BM25) o hibrido (ambos fusionados)')
+    parser.add_argument('--metricas', '--metrics', type=str, choices=list(FORMATOS_METRICAS), default=None,
+                        help='Medir cada etapa, la caché, los tokens y los reintentos: prometheus las expone en '
+                             'GET /metricas; jsonl escribe cada evento en stderr o en --archivo-metricas')
+    parser.add_argument('--archivo-metricas', type=str, default=None,
+                        help='Archivo donde añadir los eventos con --metricas jsonl')
+
+    args = parser.parse_args()
+
+    # Obtener token desde variable de entorno
+    token = os.environ.get("GITHUB_TOKEN")
+    if not token:
+        print("Error: La variable de entorno GITHUB_TOKEN no está configurada")
+        return
+
+    # El sistema RAG (numpy, requests...) se importa solo tras validar los argumentos y el token
+    from rag.cache_respuestas import CacheRespuestas
+    from rag.metricas import AgregadorMetricas, activar_salida, metricas
+    from rag.servidor import ServidorRAG, preparar_secreto
+
+    cache = CacheRespuestas() if args.cache else None
+    agregador = None
+    if args.metricas == "prometheus":
+        agregador = metricas.suscribir(AgregadorMetricas())
+    elif args.metricas:
+        activar_salida(args.metricas, args.archivo_metricas)
+    # Los clientes leen el secreto de SCRIPTORIUM_SECRETO o del archivo que se escribe aquí
+    secreto = preparar_secreto()
+    servidor = ServidorRAG(token=token, secreto=secreto, host=args.host, puerto=args.puerto,
+                           endpoint=args.endpoint, endpoints_permitidos=args.permitir_endpoint,
+                           cache_respuestas=cache, modelo_embeddings=args.modelo_embeddings, nprobe=args.nprobe,
+                           modo_busqueda=args.modo_busqueda, agregador_metricas=agregador,
+                           cuantizacion=args.cuantizacion, procesos_busqueda=args.procesos_busqueda)
+    url = f"http://{args.host}:{args.puerto}"
+    if servidor.documentos_indexados:
+        documentos, pasajes = servidor.documentos_indexados
+        print(f"📚 Corpus cargado: {documentos} documentos, {pasajes} pasajes")
+    print(f"🚀 Servidor RAG escuchando en {url}")
+    print(f"Para usarlo desde los scripts: export SCRIPTORIUM_SERVIDOR={url}")
+    if not os.environ.get(VARIABLE_SECRETO):
+        print(f"🔑 Secreto para los clientes guardado en {RUTA_SECRETO}")
+    if agregador is not None:
+        print(f"📈 Métricas en formato Prometheus: {url}/metricas")
+
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        print("\nDeteniendo servidor...")
+        if cache:
+            print(f"💾 {cache.resumen()}")
+    finally:
+        servidor.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import argparse
+import json
+import os
+
+import pytest
+
+import agregar_documento
+from agregar_documento import expandir_rutas, importar_en_lote
+from rag.documentos_manager import DocumentosManager
+
+
+def texto_documento(titulo: str, desarrollo: str) -> str:
+    """Documento en texto plano con las secciones que reconoce parsear_secciones."""
+    return (f"Título: {titulo}\nTipo: Ensayo\nMateria: Redes\n\n"
+            f"Introducción:\nIntroducción de {titulo}.\n\n"
+            f"Desarrollo:\n{desarrollo}\n\n"
+            "Conclusión:\nFin.\n")
+
+
+class TestImportarEnLote:
+    """Tests para la importación masiva de agregar_documento.py."""
+
+    @pytest.fixture
+    def directorio_docs(self, tmp_path, monkeypatch):
+        """Hacer que la importación guarde en un directorio temporal en lugar de documentos/."""
+        directorio = tmp_path / "documentos"
+        monkeypatch.setattr(agregar_documento, "DocumentosManager",
+                            lambda: DocumentosManager(directorio_docs=str(directorio), buscar_en_rag=False))
+        monkeypatch.delenv("SCRIPTORIUM_SERVIDOR", raising=False)
+        return directorio
+
+    @pytest.fixture
+    def archivos(self, tmp_path):
+        """Dos documentos distintos con el mismo título y un archivo vacío."""
+        entrada = tmp_path / "entrada"
+        entrada.mkdir()
+        (entrada / "a.txt").write_text(texto_documento("Hosting IIS", "Primera versión."), encoding="utf-8")
+        (entrada / "b.txt").write_text(texto_documento("Hosting IIS", "Segunda versión."), encoding="utf-8")
+        (entrada / "vacio.txt").write_text("", encoding="utf-8")
+        return sorted(str(ruta) for ruta in entrada.iterdir())
+
+    @staticmethod
+    def argumentos(**cambios) -> argparse.Namespace:
+        """Argumentos de la línea de comandos para una importación sin indexar y sin preguntas."""
+        valores = dict(procesos=1, yes=True, sobrescribir=False, sin_indexar=True, compactar_cache=False,
+                       servidor=None, modo_busqueda=None, modelo_embeddings=None)
+        valores.update(cambios)
+        return argparse.Namespace(**valores)
+
+    @staticmethod
+    def guardados(directorio) -> dict:
+        """Nombre de archivo -> desarrollo de cada documento guardado."""
+        return {nombre: json.loads((directorio / nombre).read_text(encoding="utf-8"))["desarrollo"]
+                for nombre in sorted(os.listdir(directorio))}
+
+    def test_colision_de_nombres_se_renombra(self, directorio_docs, archivos, capsys):
+        """Verificar que dos documentos con el mismo título se guardan sin sobrescribirse y el vacío se omite."""
+        importar_en_lote(archivos, self.argumentos())
+
+        assert self.guardados(directorio_docs) == {"hosting_iis.json": "Primera versión.",
+                                                   "hosting_iis_2.json": "Segunda versión."}
+        salida = capsys.readouterr().out
+        assert "vacio.txt: el archivo está vacío" in salida
+        assert "hosting_iis_2.json" in salida
+
+    def test_repetir_la_importacion_omite_duplicados(self, directorio_docs, archivos, capsys):
+        """Verificar que importar de nuevo los mismos archivos no crea copias."""
+        importar_en_lote(archivos, self.argumentos())
+        capsys.readouterr()
+
+        importar_en_lote(archivos, self.argumentos())
+
+        assert len(self.guardados(directorio_docs)) == 2
+        salida = capsys.readouterr().out
+        assert "Guardados: 0" in salida
+        assert "Duplicados omitidos: 2" in salida
+
+    def test_sobrescribir(self, directorio_docs, archivos):
+        """Verificar que con --sobrescribir el segundo documento reemplaza al primero."""
+        importar_en_lote(archivos, self.argumentos(sobrescribir=True))
+
+        assert self.guardados(directorio_docs) == {"hosting_iis.json": "Segunda versión."}
+
+    def test_sin_yes_pregunta_una_vez(self, directorio_docs, archivos, monkeypatch):
+        """Verificar que sin --yes se pregunta una sola vez y que responder 'n' no guarda nada."""
+        preguntas = []
+        monkeypatch.setattr("builtins.input", lambda texto: preguntas.append(texto) or "n")
+
+        importar_en_lote(archivos, self.argumentos(yes=False))
+
+        assert len(preguntas) == 1
+        assert "2 documentos" in preguntas[0]
+        assert not directorio_docs.exists() or not os.listdir(directorio_docs)
+
+    def test_con_yes_no_pregunta(self, directorio_docs, archivos, monkeypatch):
+        """Verificar que con --yes no se llama a input."""
+        monkeypatch.setattr("builtins.input", lambda texto: pytest.fail("no debería preguntar"))
+
+        importar_en_lote(archivos, self.argumentos())
+
+        assert len(self.guardados(directorio_docs)) == 2
+
+
+class TestExpandirRutas:
+    """Tests para expandir_rutas."""
+
+    def test_directorios_y_patrones_sin_repetir(self, tmp_path):
+        """Verificar que se recorren directorios y patrones y que cada archivo aparece una sola vez."""
+        (tmp_path / "sub").mkdir()
+        for nombre in ("a.txt", "b.md", "sub/c.txt"):
+            (tmp_path / nombre).write_text("x", encoding="utf-8")
+
+        rutas = expandir_rutas([str(tmp_path / "a.txt"), str(tmp_path), str(tmp_path / "*.txt")])
+
+        assert rutas == [str(tmp_path / "a.txt"), str(tmp_path / "sub" / "c.txt")]
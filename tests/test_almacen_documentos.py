@@ -0,0 +1,128 @@
+import argparse
+import json
+import os
+import shutil
+
+import pytest
+
+from empaquetar_documentos import exportar, importar
+from rag.almacen_documentos import AlmacenDocumentos
+from rag.documentos_manager import ARCHIVO_ALMACEN, DocumentosManager
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "documentos_ejemplo")
+
+
+def documento(titulo: str, tipo: str = "Ensayo") -> dict:
+    """Documento mínimo con los campos indexados."""
+    return {"titulo": titulo, "tipo": tipo, "materia": "Redes", "profesor": "Ana", "desarrollo": f"Texto de {titulo}"}
+
+
+class TestAlmacenDocumentos:
+    """Tests para AlmacenDocumentos."""
+
+    @pytest.fixture
+    def almacen(self, tmp_path):
+        """Crear almacén vacío en un directorio temporal."""
+        almacen = AlmacenDocumentos(str(tmp_path / ARCHIVO_ALMACEN))
+        yield almacen
+        almacen.cerrar()
+
+    def test_transaccion_confirma_junto(self, almacen):
+        """Verificar que las escrituras de una transacción anidada comparten una sola versión."""
+        with almacen.transaccion():
+            almacen.guardar("a.json", documento("A"))
+            with almacen.transaccion():
+                almacen.guardar("b.json", documento("B"))
+
+        assert almacen.version() == 1
+        assert almacen.ids() == ["a.json", "b.json"]
+
+    def test_transaccion_revierte_si_falla(self, almacen):
+        """Verificar que una excepción dentro de la transacción no deja ninguna escritura ni cambia la versión."""
+        almacen.guardar("a.json", documento("A"))
+
+        with pytest.raises(RuntimeError):
+            with almacen.transaccion():
+                almacen.guardar("b.json", documento("B"))
+                almacen.eliminar("a.json")
+                raise RuntimeError("fallo")
+
+        assert almacen.version() == 1
+        assert almacen.ids() == ["a.json"]
+        assert almacen.obtener("a.json")["titulo"] == "A"
+
+    def test_evitar_colision(self, almacen):
+        """Verificar que con evitar_colision un id repetido se guarda como nombre_2, nombre_3..."""
+        ids = [almacen.guardar("a.json", documento(f"A{i}"), evitar_colision=True) for i in range(3)]
+
+        assert ids == ["a.json", "a_2.json", "a_3.json"]
+        assert almacen.obtener("a_3.json") == dict(documento("A2"), id="a_3.json")
+
+    def test_cambios_incrementales(self, almacen):
+        """Verificar que cambios() devuelve solo lo escrito y eliminado desde la versión indicada."""
+        almacen.importar([("a.json", documento("A")), ("b.json", documento("B"))])
+        _, _, version = almacen.cambios()
+
+        almacen.guardar("c.json", documento("C"))
+        almacen.eliminar("a.json")
+        documentos, eliminados, nueva_version = almacen.cambios(version)
+
+        assert [doc["id"] for doc in documentos] == ["c.json"]
+        assert eliminados == ["a.json"]
+        assert nueva_version == version + 2
+        assert almacen.cambios(nueva_version)[:2] == ([], [])
+
+    def test_listar_por_columnas(self, almacen):
+        """Verificar los filtros de listar() y que rechaza campos no indexados."""
+        almacen.importar([("a.json", documento("A", tipo="Práctica")), ("b.json", documento("B"))])
+
+        assert [fila["id"] for fila in almacen.listar(tipo="Práctica")] == ["a.json"]
+        assert len(almacen.listar()) == 2
+        with pytest.raises(ValueError):
+            almacen.listar(desarrollo="x")
+
+
+class TestEmpaquetarDocumentos:
+    """Tests de ida y vuelta entre JSON sueltos y el almacén (empaquetar_documentos.py)."""
+
+    def test_importar_y_exportar(self, tmp_path):
+        """Verificar que importar y después exportar devuelve los mismos archivos JSON."""
+        ruta_almacen = str(tmp_path / ARCHIVO_ALMACEN)
+        importar(argparse.Namespace(origen=[FIXTURES], almacen=ruta_almacen, eliminar_json=False))
+        destino = tmp_path / "exportados"
+
+        exportar(argparse.Namespace(almacen=ruta_almacen, destino=str(destino), sobrescribir=False))
+
+        assert sorted(os.listdir(destino)) == sorted(os.listdir(FIXTURES))
+        for nombre in os.listdir(FIXTURES):
+            with open(os.path.join(FIXTURES, nombre), encoding="utf-8") as original, \
+                    open(destino / nombre, encoding="utf-8") as exportado:
+                assert json.load(exportado) == {k: v for k, v in json.load(original).items() if k != "id"}
+
+    def test_exportar_no_sobrescribe(self, tmp_path, capsys):
+        """Verificar que sin --sobrescribir los archivos existentes se conservan."""
+        ruta_almacen = str(tmp_path / ARCHIVO_ALMACEN)
+        importar(argparse.Namespace(origen=[FIXTURES], almacen=ruta_almacen, eliminar_json=False))
+        destino = tmp_path / "exportados"
+        destino.mkdir()
+        (destino / "hosting_iis.json").write_text("{}", encoding="utf-8")
+
+        exportar(argparse.Namespace(almacen=ruta_almacen, destino=str(destino), sobrescribir=False))
+
+        assert (destino / "hosting_iis.json").read_text(encoding="utf-8") == "{}"
+        assert "1 ya existían" in capsys.readouterr().out
+
+    def test_documentos_manager_lee_el_almacen(self, tmp_path):
+        """Verificar que DocumentosManager carga del almacén los mismos documentos que de los JSON."""
+        directorio = tmp_path / "documentos"
+        shutil.copytree(FIXTURES, directorio)
+        desde_json = DocumentosManager(directorio_docs=str(directorio), buscar_en_rag=False).cargar_documentos()
+        importar(argparse.Namespace(origen=[str(directorio)], almacen=str(directorio / ARCHIVO_ALMACEN),
+                                    eliminar_json=True))
+
+        manager = DocumentosManager(directorio_docs=str(directorio), buscar_en_rag=False)
+        desde_almacen = manager.cargar_documentos()
+
+        assert not any(nombre.endswith(".json") for nombre in os.listdir(directorio))
+        assert sorted(doc["titulo"] for doc in desde_almacen) == sorted(doc["titulo"] for doc in desde_json)
+        assert manager.almacen is not None
@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+from rag.almacen_embeddings import AlmacenEmbeddings
+
+
+class TestAlmacenEmbeddings:
+    """Tests para AlmacenEmbeddings."""
+
+    @pytest.fixture
+    def ruta(self, tmp_path):
+        """Ruta del archivo SQLite en un directorio temporal."""
+        return str(tmp_path / "embeddings.sqlite3")
+
+    def test_guardar_y_reabrir(self, ruta):
+        """Verificar que los vectores guardados se recuperan iguales, como float32, desde otro almacén."""
+        almacen = AlmacenEmbeddings(ruta)
+        vectores = {AlmacenEmbeddings.clave("modelo", f"texto {i}"): np.random.default_rng(i).standard_normal(8)
+                    for i in range(3)}
+        for clave, vector in vectores.items():
+            almacen.agregar(clave, "modelo", vector)
+
+        # Antes de guardar, otro almacén no los ve
+        assert AlmacenEmbeddings(ruta).obtener_varios(vectores) == {}
+        assert almacen.guardar() == 3
+        assert almacen.guardar() == 0
+
+        reabierto = AlmacenEmbeddings(ruta)
+        recuperados = reabierto.obtener_varios(list(vectores) + ["ausente"])
+        assert set(recuperados) == set(vectores)
+        for clave, vector in vectores.items():
+            assert recuperados[clave].dtype == np.float32
+            np.testing.assert_array_equal(recuperados[clave], vector.astype(np.float32))
+        assert reabierto.obtener("ausente") is None
+
+    def test_obtener_varios_en_lotes(self, ruta):
+        """Verificar que se recuperan más claves que el límite de parámetros de una consulta."""
+        almacen = AlmacenEmbeddings(ruta)
+        claves = [AlmacenEmbeddings.clave("modelo", str(i)) for i in range(1200)]
+        for i, clave in enumerate(claves):
+            almacen.agregar(clave, "modelo", np.full(4, i, dtype=np.float32))
+        almacen.cerrar()
+
+        recuperados = AlmacenEmbeddings(ruta).obtener_varios(claves)
+
+        assert len(recuperados) == 1200
+        assert recuperados[claves[1100]][0] == 1100
+
+    def test_clave_depende_del_modelo(self):
+        """Verificar que el mismo texto con otro modelo tiene otra clave."""
+        assert AlmacenEmbeddings.clave("a", "texto") != AlmacenEmbeddings.clave("b", "texto")
+        assert AlmacenEmbeddings.clave("a", "texto") == AlmacenEmbeddings.clave("a", "texto")
+
+    def test_compactar(self, ruta):
+        """Verificar que compactar elimina solo las claves no vigentes, también de memoria."""
+        almacen = AlmacenEmbeddings(ruta)
+        for clave in ("a", "b", "c"):
+            almacen.agregar(clave, "modelo", np.ones(4))
+
+        assert almacen.compactar(["a"]) == 2
+        assert almacen.claves() == ["a"]
+        assert almacen.obtener("b") is None
+
+    def test_memoria_acotada(self, ruta):
+        """Verificar que la memoria descarta los vectores usados hace más tiempo sin perder los pendientes."""
+        almacen = AlmacenEmbeddings(ruta, max_memoria=2)
+        for clave in ("a", "b", "c"):
+            almacen.agregar(clave, "modelo", np.full(4, ord(clave), dtype=np.float32))
+
+        assert list(almacen._memoria) == ["b", "c"]
+        # "a" ya no está en memoria pero sigue pendiente de guardar
+        assert almacen.obtener("a")[0] == ord("a")
+        almacen.guardar()
+        almacen.obtener("b")
+        assert almacen.obtener("a")[0] == ord("a")
+        assert list(almacen._memoria) == ["b", "a"]
+
+    def test_compactar_solo_el_modelo_indicado(self, ruta):
+        """Verificar que compactar con un modelo conserva los vectores de los demás modelos."""
+        almacen = AlmacenEmbeddings(ruta)
+        almacen.agregar("a", "modelo", np.ones(4))
+        almacen.agregar("b", "modelo", np.ones(4))
+        almacen.agregar("c", "otro", np.ones(4))
+
+        assert almacen.compactar(["a"], modelo="modelo") == 1
+        assert sorted(almacen.claves()) == ["a", "c"]
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from rag.busqueda_paralela import BuscadorParalelo
+from rag.indice_vectorial import IndiceVectorial
+
+
+@pytest.fixture(scope="module")
+def buscador():
+    """Buscador con tres procesos, compartido por los tests del módulo (arrancar procesos es caro)."""
+    buscador = BuscadorParalelo(procesos=3)
+    yield buscador
+    buscador.cerrar()
+
+
+class TestBuscadorParalelo:
+    """Tests para BuscadorParalelo frente a la búsqueda exacta en un solo proceso."""
+
+    @pytest.fixture
+    def indice(self, tmp_path):
+        """Crear índice exacto con 3001 filas (no divisible entre los procesos)."""
+        indice = IndiceVectorial(str(tmp_path))
+        claves = [str(i) for i in range(3001)]
+        indice.construir("modelo", claves, claves, np.random.default_rng(0).standard_normal((3001, 32)))
+        return indice
+
+    @pytest.mark.parametrize("top_k", [1, 10, 50])
+    def test_fusion_igual_a_busqueda_exacta(self, indice, buscador, top_k):
+        """Verificar que la fusión de los top-k de cada fragmento da el mismo resultado que indice.buscar."""
+        consultas = np.random.default_rng(1).standard_normal((5, 32))
+
+        for consulta in consultas:
+            paralelos = buscador.buscar(indice.instantanea(), consulta, top_k)
+            exactos = indice.buscar(consulta, top_k)
+
+            assert [fila for fila, _ in paralelos] == [fila for fila, _ in exactos]
+            np.testing.assert_allclose([s for _, s in paralelos], [s for _, s in exactos], rtol=1e-6)
+
+    def test_filas_agregadas_y_reconstruccion(self, indice, buscador):
+        """Verificar que los procesos ven las filas añadidas y una reconstrucción del índice."""
+        nuevos = np.random.default_rng(2).standard_normal((5, 32))
+        buscador.buscar(indice.instantanea(), nuevos[0], 1)
+        indice.agregar([f"n{i}" for i in range(5)], [f"n{i}" for i in range(5)], nuevos)
+
+        assert buscador.buscar(indice.instantanea(), nuevos[4], 1)[0][0] == 3005
+
+        indice.construir("modelo", ["a", "b"], ["a", "b"], nuevos[:2])
+        assert [fila for fila, _ in buscador.buscar(indice.instantanea(), nuevos[1], 5)] == [1, 0]
+
+    def test_mas_procesos_que_filas(self, tmp_path):
+        """Verificar que un índice con menos filas que procesos devuelve todas sus filas."""
+        indice = IndiceVectorial(str(tmp_path))
+        indice.construir("modelo", ["a", "b"], ["a", "b"], np.eye(2, 8))
+        buscador = BuscadorParalelo(procesos=4)
+        try:
+            resultados = buscador.buscar(indice.instantanea(), np.eye(2, 8)[1], top_k=5)
+        finally:
+            buscador.cerrar()
+
+        assert [fila for fila, _ in resultados] == [1, 0]
@@ -0,0 +1,63 @@
+import pytest
+
+from rag.cache_respuestas import CacheRespuestas
+
+PETICION = {"model": "openai/gpt-4.1", "messages": [{"role": "user", "content": "Hola"}], "temperature": 0.7}
+
+
+class TestCacheRespuestas:
+    """Tests para CacheRespuestas."""
+
+    @pytest.fixture
+    def reloj(self):
+        """Reloj simulado que se adelanta a mano."""
+        return [1000.0]
+
+    @pytest.fixture
+    def cache(self, tmp_path, reloj):
+        """Crear caché con TTL de una hora en un directorio temporal."""
+        return CacheRespuestas(str(tmp_path / "respuestas.sqlite3"), ttl=3600, reloj=lambda: reloj[0])
+
+    def test_fallo_y_acierto(self, cache, tmp_path, reloj):
+        """Verificar que la primera consulta falla, la segunda acierta y la respuesta persiste."""
+        clave = CacheRespuestas.clave("http://api", PETICION)
+
+        assert cache.obtener(clave) is None
+        cache.guardar(clave, "respuesta")
+        assert cache.obtener(clave) == "respuesta"
+        assert (cache.aciertos, cache.fallos) == (1, 1)
+        reabierta = CacheRespuestas(str(tmp_path / "respuestas.sqlite3"), reloj=lambda: reloj[0])
+        assert reabierta.obtener(clave) == "respuesta"
+
+    def test_clave(self):
+        """Verificar que "stream" no cambia la clave y que el endpoint, los parámetros y la variante sí."""
+        clave = CacheRespuestas.clave("http://api", PETICION)
+
+        assert CacheRespuestas.clave("http://api", {**PETICION, "stream": True}) == clave
+        assert CacheRespuestas.clave("http://otra", PETICION) != clave
+        assert CacheRespuestas.clave("http://api", {**PETICION, "temperature": 0.2}) != clave
+        assert CacheRespuestas.clave("http://api", PETICION, variante=1) != clave
+
+    def test_caducidad(self, cache, reloj):
+        """Verificar que una respuesta más antigua que el TTL cuenta como fallo y se elimina."""
+        cache.guardar("clave", "respuesta")
+        reloj[0] += 3601
+
+        assert cache.obtener("clave") is None
+        assert cache.estadisticas()["entradas"] == 0
+
+    def test_desalojo_lru(self, tmp_path, reloj):
+        """Verificar que al superar max_bytes se desaloja la respuesta usada hace más tiempo."""
+        cache = CacheRespuestas(str(tmp_path / "respuestas.sqlite3"), max_bytes=25, reloj=lambda: reloj[0])
+        cache.guardar("a", "x" * 10)
+        reloj[0] += 1
+        cache.guardar("b", "x" * 10)
+        reloj[0] += 1
+        cache.obtener("a")
+        reloj[0] += 1
+        cache.guardar("c", "x" * 10)
+
+        assert cache.obtener("b") is None
+        assert cache.obtener("a") is not None
+        assert cache.obtener("c") is not None
+        assert cache.desalojos == 1
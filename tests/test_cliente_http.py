@@ -0,0 +1,147 @@
+import json
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from rag.cliente_http import (ClienteHTTPModelo, ErrorAutenticacion, ErrorConexion, ErrorLimiteTasa, ErrorPeticion,
+                              ErrorServidorModelo, calcular_espera)
+
+
+class _Manejador(BaseHTTPRequestHandler):
+    """Responde a cada POST con la siguiente respuesta del guion del servidor."""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        codigo, cabeceras = self.server.siguiente()
+        cuerpo = json.dumps({"codigo": codigo}).encode("utf-8")
+        self.send_response(codigo)
+        for nombre, valor in cabeceras.items():
+            self.send_header(nombre, valor)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, *args):
+        pass
+
+
+class ServidorGuion(ThreadingHTTPServer):
+    """Servidor local que devuelve una secuencia fija de (código, cabeceras); la última se repite."""
+
+    daemon_threads = True
+
+    def __init__(self, guion):
+        super().__init__(("127.0.0.1", 0), _Manejador)
+        self.guion = list(guion)
+        self.peticiones = 0
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, puerto = self.server_address[:2]
+        return f"http://{host}:{puerto}/v1/chat/completions"
+
+    def siguiente(self):
+        with self._lock:
+            respuesta = self.guion[min(self.peticiones, len(self.guion) - 1)]
+            self.peticiones += 1
+            return respuesta
+
+
+class TestClienteHTTPModelo:
+    """Tests para ClienteHTTPModelo contra un servidor local."""
+
+    @pytest.fixture
+    def esperas(self):
+        """Esperas pedidas por el cliente entre reintentos (sin dormir de verdad)."""
+        return []
+
+    @pytest.fixture
+    def cliente(self, esperas):
+        """Cliente con tres reintentos y espera simulada."""
+        cliente = ClienteHTTPModelo(timeout_conexion=2.0, timeout_lectura=2.0, max_reintentos=3,
+                                    backoff_base=1.0, backoff_max=30.0, dormir=esperas.append)
+        yield cliente
+        cliente.cerrar()
+
+    @pytest.fixture
+    def servidor(self, request):
+        """Arrancar un ServidorGuion con el guion del parámetro del test."""
+        servidor = ServidorGuion(request.param)
+        hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+        hilo.start()
+        yield servidor
+        servidor.shutdown()
+        servidor.server_close()
+
+    @pytest.mark.parametrize("servidor", [[(429, {"Retry-After": "2"}), (200, {})]], indirect=True)
+    def test_429_respeta_retry_after(self, cliente, servidor, esperas):
+        """Verificar que tras un 429 se espera lo indicado en Retry-After y se repite la petición."""
+        response = cliente.post(servidor.url, {}, {})
+
+        assert response.json() == {"codigo": 200}
+        assert esperas == [2.0]
+        assert cliente.reintentos == 1
+        assert servidor.peticiones == 2
+
+    @pytest.mark.parametrize("servidor", [[(429, {"Retry-After": "3600"}), (200, {})]], indirect=True)
+    def test_retry_after_limitado_por_backoff_max(self, cliente, servidor, esperas):
+        """Verificar que un Retry-After mayor que backoff_max se limita."""
+        cliente.post(servidor.url, {}, {})
+
+        assert esperas == [30.0]
+
+    @pytest.mark.parametrize("servidor", [[(503, {})]], indirect=True)
+    def test_5xx_agota_los_reintentos(self, cliente, servidor, esperas):
+        """Verificar que un 5xx persistente se reintenta con backoff y termina en ErrorServidorModelo."""
+        with pytest.raises(ErrorServidorModelo) as error:
+            cliente.post(servidor.url, {}, {})
+
+        assert error.value.status_code == 503
+        assert servidor.peticiones == 4
+        assert len(esperas) == 3
+        # Jitter completo: cada espera está entre 0 y backoff_base * 2^intento
+        assert all(0 <= espera <= 2 ** intento for intento, espera in enumerate(esperas))
+
+    @pytest.mark.parametrize("servidor,error", [
+        ([(429, {"Retry-After": "1"})], ErrorLimiteTasa),
+        ([(400, {})], ErrorPeticion),
+        ([(401, {})], ErrorAutenticacion),
+    ], indirect=["servidor"])
+    def test_errores_tipados(self, cliente, servidor, esperas, error):
+        """Verificar el tipo de error de cada código y que solo se reintentan los transitorios."""
+        with pytest.raises(error) as capturado:
+            cliente.post(servidor.url, {}, {})
+
+        transitorio = error is ErrorLimiteTasa
+        assert servidor.peticiones == (4 if transitorio else 1)
+        assert len(esperas) == (3 if transitorio else 0)
+        if transitorio:
+            assert capturado.value.retry_after == 1.0
+
+    def test_error_de_conexion_se_reintenta(self, cliente, esperas):
+        """Verificar que un puerto sin servidor produce ErrorConexion tras los reintentos."""
+        with socket.socket() as libre:
+            libre.bind(("127.0.0.1", 0))
+            puerto = libre.getsockname()[1]
+
+        with pytest.raises(ErrorConexion):
+            cliente.post(f"http://127.0.0.1:{puerto}/v1/chat/completions", {}, {})
+        assert len(esperas) == 3
+
+
+class TestCalcularEspera:
+    """Tests para calcular_espera."""
+
+    def test_retry_after_tiene_prioridad(self):
+        """Verificar que Retry-After se usa tal cual hasta backoff_max."""
+        assert calcular_espera(0, 5.0, 1.0, 30.0) == 5.0
+        assert calcular_espera(0, 60.0, 1.0, 30.0) == 30.0
+
+    def test_backoff_exponencial_acotado(self):
+        """Verificar que sin Retry-After la espera no supera backoff_base * 2^intento ni backoff_max."""
+        for intento in range(10):
+            assert 0 <= calcular_espera(intento, None, 1.0, 8.0) <= min(8.0, 2 ** intento)
@@ -0,0 +1,348 @@
+import asyncio
+import base64
+import json
+
+import pytest
+
+from rag.cliente_http import ErrorConexion, ErrorLimiteTasa, ErrorPeticion
+from rag.cliente_http_async import ClienteHTTPAsync
+
+# pytest-asyncio no es una dependencia: cada escenario se ejecuta con asyncio.run
+
+
+async def leer_peticion(lector: asyncio.StreamReader) -> bytes:
+    """Leer una petición HTTP completa (cabeceras y cuerpo); lanza IncompleteReadError si se cerró la conexión."""
+    cabeceras = await lector.readuntil(b"\r\n\r\n")
+    longitud = 0
+    for linea in cabeceras.split(b"\r\n"):
+        nombre, _, valor = linea.partition(b":")
+        if nombre.strip().lower() == b"content-length":
+            longitud = int(valor)
+    return cabeceras + await lector.readexactly(longitud)
+
+
+def respuesta(codigo: int, cuerpo: bytes, **cabeceras: str) -> bytes:
+    """Respuesta HTTP/1.1 con Content-Length."""
+    lineas = [f"HTTP/1.1 {codigo} X", f"Content-Length: {len(cuerpo)}"]
+    lineas += [f"{nombre.replace('_', '-')}: {valor}" for nombre, valor in cabeceras.items()]
+    return ("\r\n".join(lineas) + "\r\n\r\n").encode("latin-1") + cuerpo
+
+
+class ServidorPrueba:
+    """
+    Servidor HTTP mínimo sobre asyncio en el mismo bucle que el cliente.
+
+    `atender(lector, escritor, conexion, peticion)` responde a cada petición; `conexion`
+    y `peticion` cuentan desde 0 para poder variar la respuesta de cada una. Las peticiones
+    recibidas (completas, en bytes) se guardan en `peticiones`.
+    """
+
+    def __init__(self, atender):
+        self.atender = atender
+        self.conexiones = 0
+        self.peticiones = []
+        self.cerradas = asyncio.Event()
+        self._servidor = None
+
+    async def __aenter__(self) -> "ServidorPrueba":
+        self._servidor = await asyncio.start_server(self._manejar, "127.0.0.1", 0)
+        return self
+
+    async def __aexit__(self, tipo_error, error, traza):
+        self._servidor.close()
+        return False
+
+    @property
+    def url(self) -> str:
+        host, puerto = self._servidor.sockets[0].getsockname()[:2]
+        return f"http://{host}:{puerto}/v1/chat/completions"
+
+    async def _manejar(self, lector: asyncio.StreamReader, escritor: asyncio.StreamWriter):
+        conexion = self.conexiones
+        self.conexiones += 1
+        peticion = 0
+        try:
+            while True:
+                try:
+                    self.peticiones.append(await leer_peticion(lector))
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                if not await self.atender(lector, escritor, conexion, peticion):
+                    break
+                peticion += 1
+        finally:
+            escritor.close()
+            self.cerradas.set()
+
+
+async def responder_json(lector, escritor, conexion, peticion) -> bool:
+    """Responder {"conexion", "peticion"} con Content-Length y mantener la conexión."""
+    escritor.write(respuesta(200, json.dumps({"conexion": conexion, "peticion": peticion}).encode()))
+    await escritor.drain()
+    return True
+
+
+class TestClienteHTTPAsync:
+    """Tests para ClienteHTTPAsync contra servidores locales."""
+
+    @pytest.fixture
+    def esperas(self):
+        """Esperas pedidas por el cliente entre reintentos (sin dormir de verdad)."""
+        return []
+
+    @pytest.fixture
+    def cliente(self, esperas):
+        """Cliente con tiempos cortos y espera simulada."""
+        async def dormir(segundos: float):
+            esperas.append(segundos)
+
+        return ClienteHTTPAsync(max_concurrencia_endpoint=1, timeout_conexion=2.0, timeout_lectura=2.0,
+                                max_reintentos=2, dormir=dormir, proxies={})
+
+    def test_cuerpo_content_length_reutiliza_conexion(self, cliente):
+        """Verificar que un cuerpo con Content-Length se lee completo y la conexión vuelve al pool."""
+        async def escenario():
+            async with ServidorPrueba(responder_json) as servidor:
+                primera = await (await cliente.post(servidor.url, {}, {})).json()
+                segunda = await (await cliente.post(servidor.url, {}, {})).json()
+                await cliente.cerrar()
+                return primera, segunda, servidor.conexiones
+
+        primera, segunda, conexiones = asyncio.run(escenario())
+
+        assert primera == {"conexion": 0, "peticion": 0}
+        assert segunda == {"conexion": 0, "peticion": 1}
+        assert conexiones == 1
+
+    def test_cuerpo_chunked_por_lineas(self, cliente):
+        """Verificar que un cuerpo chunked se decodifica y se itera por líneas aunque corten los bloques."""
+        bloques = [b"data: uno\n", b"data: do", b"s\r\ndata: tres\n"]
+
+        async def atender(lector, escritor, conexion, peticion):
+            escritor.write(b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n")
+            for bloque in bloques:
+                escritor.write(b"%x\r\n%s\r\n" % (len(bloque), bloque))
+                await escritor.drain()
+            escritor.write(b"0\r\n\r\n")
+            await escritor.drain()
+            return True
+
+        async def escenario():
+            async with ServidorPrueba(atender) as servidor:
+                async with await cliente.post(servidor.url, {}, {}) as response:
+                    lineas = [linea async for linea in response.lineas()]
+                # La segunda petición usa la misma conexión: el final del cuerpo se detectó bien
+                async with await cliente.post(servidor.url, {}, {}) as response:
+                    await response.leer()
+                await cliente.cerrar()
+                return lineas, servidor.conexiones
+
+        lineas, conexiones = asyncio.run(escenario())
+
+        assert lineas == [b"data: uno", b"data: dos", b"data: tres"]
+        assert conexiones == 1
+
+    def test_conexion_del_pool_cerrada_por_el_servidor(self, cliente, esperas):
+        """Verificar que si el servidor cierra una conexión libre se repite con otra sin contar reintento."""
+        async def atender(lector, escritor, conexion, peticion):
+            if conexion == 0 and peticion == 1:
+                # Cierra al recibir la segunda petición, como un keep-alive caducado
+                return False
+            return await responder_json(lector, escritor, conexion, peticion)
+
+        async def escenario():
+            async with ServidorPrueba(atender) as servidor:
+                await (await cliente.post(servidor.url, {}, {})).json()
+                segunda = await (await cliente.post(servidor.url, {}, {})).json()
+                await cliente.cerrar()
+                return segunda, servidor.conexiones
+
+        segunda, conexiones = asyncio.run(escenario())
+
+        assert segunda == {"conexion": 1, "peticion": 0}
+        assert conexiones == 2
+        assert cliente.reintentos == 0
+        assert esperas == []
+
+    def test_cancelacion_corta_la_peticion(self, cliente):
+        """Verificar que cancelar una petición cierra la conexión con el servidor y libera el hueco."""
+        recibida = None
+
+        async def atender(lector, escritor, conexion, peticion):
+            # No responde: espera a que el cliente corte la conexión
+            recibida.set()
+            await lector.read()
+            return False
+
+        async def escenario():
+            nonlocal recibida
+            recibida = asyncio.Event()
+            async with ServidorPrueba(atender) as servidor:
+                tarea = asyncio.create_task(cliente.post(servidor.url, {}, {}))
+                await asyncio.wait_for(recibida.wait(), 2.0)
+                tarea.cancel()
+                with pytest.raises(asyncio.CancelledError):
+                    await tarea
+                await asyncio.wait_for(servidor.cerradas.wait(), 2.0)
+                return cliente.semaforo(servidor.url).locked()
+
+        assert asyncio.run(escenario()) is False
+
+    def test_429_reintenta_sin_soltar_el_semaforo(self, cliente, esperas):
+        """Verificar que se respeta Retry-After y que el hueco del endpoint sigue ocupado durante la espera."""
+        ocupado = []
+
+        async def atender(lector, escritor, conexion, peticion):
+            if peticion == 0:
+                escritor.write(respuesta(429, b"lento", Retry_After="2"))
+                await escritor.drain()
+                return True
+            return await responder_json(lector, escritor, conexion, peticion)
+
+        async def escenario():
+            async with ServidorPrueba(atender) as servidor:
+                semaforo = cliente.semaforo(servidor.url)
+
+                async def dormir(segundos: float):
+                    ocupado.append(semaforo.locked())
+                    esperas.append(segundos)
+
+                cliente.dormir = dormir
+                cuerpo = await (await cliente.post(servidor.url, {}, {})).json()
+                await cliente.cerrar()
+                return cuerpo, semaforo.locked()
+
+        cuerpo, bloqueado = asyncio.run(escenario())
+
+        assert cuerpo == {"conexion": 0, "peticion": 1}
+        assert esperas == [2.0]
+        assert ocupado == [True]
+        assert bloqueado is False
+        assert cliente.reintentos == 1
+
+    @pytest.mark.parametrize("codigo,error", [(429, ErrorLimiteTasa), (400, ErrorPeticion)])
+    def test_errores_tipados(self, cliente, esperas, codigo, error):
+        """Verificar que un 429 persistente se reintenta hasta el límite y un 4xx no se reintenta."""
+        async def atender(lector, escritor, conexion, peticion):
+            escritor.write(respuesta(codigo, b"fallo"))
+            await escritor.drain()
+            return True
+
+        async def escenario():
+            async with ServidorPrueba(atender) as servidor:
+                try:
+                    await cliente.post(servidor.url, {}, {})
+                finally:
+                    await cliente.cerrar()
+
+        with pytest.raises(error):
+            asyncio.run(escenario())
+        assert cliente.reintentos == (2 if codigo == 429 else 0)
+        assert len(esperas) == cliente.reintentos
+
+    @pytest.mark.parametrize("ruta,headers", [
+        ("/v1/chat/completions", {"Authorization": "Bearer x\r\nX-Inyectada: 1"}),
+        ("/v1/chat/completions", {"X Cabecera": "1"}),
+        ("/v1/chat completions", {}),
+    ])
+    def test_rechaza_cabeceras_y_url_que_alteran_la_peticion(self, cliente, ruta, headers):
+        """Verificar que los saltos de línea en cabeceras o espacios en la URL se rechazan sin enviar nada."""
+        async def escenario():
+            async with ServidorPrueba(responder_json) as servidor:
+                url = servidor.url.replace("/v1/chat/completions", ruta)
+                with pytest.raises(ValueError):
+                    await cliente.post(url, {}, headers)
+                return servidor.conexiones, cliente.semaforo(url).locked()
+
+        assert asyncio.run(escenario()) == (0, False)
+
+
+class TestProxy:
+    """Tests de ClienteHTTPAsync a través de un proxy HTTP."""
+
+    def test_proxy_http_recibe_la_url_completa(self):
+        """Verificar que por un proxy http:// se envía la URL absoluta con Proxy-Authorization."""
+        async def escenario():
+            async with ServidorPrueba(responder_json) as proxy:
+                host, puerto = proxy._servidor.sockets[0].getsockname()[:2]
+                cliente = ClienteHTTPAsync(proxies={"http": f"http://ana:s%40l@{host}:{puerto}"})
+                cuerpo = await (await cliente.post("http://modelo.invalid:8080/v1/chat/completions", {}, {})).json()
+                await cliente.cerrar()
+                return cuerpo, proxy.peticiones[0]
+
+        cuerpo, peticion = asyncio.run(escenario())
+
+        assert cuerpo == {"conexion": 0, "peticion": 0}
+        lineas = peticion.split(b"\r\n")
+        assert lineas[0] == b"POST http://modelo.invalid:8080/v1/chat/completions HTTP/1.1"
+        assert b"Host: modelo.invalid:8080" in lineas
+        assert b"Proxy-Authorization: Basic " + base64.b64encode(b"ana:s@l") in lineas
+
+    def test_no_proxy_conecta_directamente(self):
+        """Verificar que un host incluido en NO_PROXY no pasa por el proxy."""
+        async def escenario():
+            async with ServidorPrueba(responder_json) as servidor:
+                cliente = ClienteHTTPAsync(proxies={"http": "http://127.0.0.1:9", "no": "127.0.0.1"})
+                cuerpo = await (await cliente.post(servidor.url, {}, {})).json()
+                await cliente.cerrar()
+                return cuerpo
+
+        assert asyncio.run(escenario()) == {"conexion": 0, "peticion": 0}
+
+    @pytest.mark.parametrize("estado", [b"200 Connection established", b"407 Proxy Authentication Required"])
+    def test_tunel_connect(self, estado):
+        """Verificar que el túnel envía CONNECT al proxy y que un rechazo del proxy es un error de conexión."""
+        recibidas = []
+
+        async def proxy(lector, escritor):
+            recibidas.append(await lector.readuntil(b"\r\n\r\n"))
+            escritor.write(b"HTTP/1.1 " + estado + b"\r\n\r\n")
+            # Una vez abierto el túnel, lo que llega se devuelve tal cual
+            escritor.write(await lector.read(100))
+            await escritor.drain()
+            escritor.close()
+
+        async def escenario():
+            servidor = await asyncio.start_server(proxy, "127.0.0.1", 0)
+            host, puerto = servidor.sockets[0].getsockname()[:2]
+            cliente = ClienteHTTPAsync(proxies={"https": f"http://{host}:{puerto}"})
+            try:
+                sock = await cliente._tunel(cliente._proxy_de(("https", "modelo.invalid", 443)),
+                                            "modelo.invalid", 443)
+                lector, escritor = await asyncio.open_connection(sock=sock)
+                escritor.write(b"hola")
+                eco = await lector.read(100)
+                escritor.close()
+                return eco
+            finally:
+                servidor.close()
+
+        if estado.startswith(b"200"):
+            assert asyncio.run(escenario()) == b"hola"
+        else:
+            with pytest.raises(ConnectionRefusedError):
+                asyncio.run(escenario())
+        assert recibidas[0] == b"CONNECT modelo.invalid:443 HTTP/1.1\r\nHost: modelo.invalid:443\r\n\r\n"
+
+    def test_rechazo_del_proxy_https(self):
+        """Verificar que si el proxy rechaza el túnel, post() lanza ErrorConexion tras los reintentos."""
+        async def proxy(lector, escritor):
+            await lector.readuntil(b"\r\n\r\n")
+            escritor.write(b"HTTP/1.1 403 Forbidden\r\n\r\n")
+            await escritor.drain()
+            escritor.close()
+
+        async def dormir(segundos: float):
+            pass
+
+        async def escenario():
+            servidor = await asyncio.start_server(proxy, "127.0.0.1", 0)
+            host, puerto = servidor.sockets[0].getsockname()[:2]
+            cliente = ClienteHTTPAsync(max_reintentos=1, dormir=dormir, proxies={"https": f"{host}:{puerto}"})
+            try:
+                await cliente.post("https://modelo.invalid/v1/chat/completions", {}, {})
+            finally:
+                servidor.close()
+
+        with pytest.raises(ErrorConexion, match="rechazó el túnel"):
+            asyncio.run(escenario())
@@ -0,0 +1,65 @@
+import threading
+
+import numpy as np
+import pytest
+
+from rag import embedder_hashing
+from rag.embedder_hashing import EmbedderHashing
+
+TEXTOS = [
+    "Práctica de programación visual con JMenuBar en Swing",
+    "Configuración de IIS y servicios web",
+    "Algoritmo de Dijkstra para caminos mínimos",
+]
+
+
+class TestEmbedderHashing:
+    """Tests para EmbedderHashing."""
+
+    @pytest.fixture
+    def embedder(self):
+        """Crear embedder sin tabla IDF en disco."""
+        return EmbedderHashing(dim=256)
+
+    def test_determinista_entre_instancias(self, embedder):
+        """Verificar que el mismo texto produce el mismo vector en cualquier instancia."""
+        otro = EmbedderHashing(dim=256)
+
+        np.testing.assert_array_equal(embedder.embed_many(TEXTOS), otro.embed_many(TEXTOS))
+        np.testing.assert_allclose(np.linalg.norm(embedder.embed_many(TEXTOS), axis=1), 1.0, rtol=1e-5)
+
+    def test_texto_vacio(self, embedder):
+        """Verificar que un texto sin tokens produce el vector cero."""
+        assert not embedder.embed("¿?").any()
+
+    def test_vocabulario_lleno_no_cambia_los_vectores(self, embedder, monkeypatch):
+        """Verificar que vaciar el vocabulario al superar el máximo no falla ni cambia los vectores."""
+        esperados = EmbedderHashing(dim=256).embed_many(TEXTOS + ["t5 nuevo_token"])
+        monkeypatch.setattr(embedder_hashing, "_MAX_VOCABULARIO", 6)
+
+        embedder.embed_many([f"t{i}" for i in range(6)])
+        obtenidos = embedder.embed_many(TEXTOS + ["t5 nuevo_token"])
+
+        np.testing.assert_array_equal(obtenidos, esperados)
+
+    def test_hilos_con_vocabulario_lleno(self, embedder, monkeypatch):
+        """Verificar que varios hilos pueden registrar tokens mientras el vocabulario se vacía."""
+        monkeypatch.setattr(embedder_hashing, "_MAX_VOCABULARIO", 50)
+        esperado = EmbedderHashing(dim=256).embed(TEXTOS[0])
+        errores = []
+
+        def embeber(hilo: int):
+            try:
+                for i in range(200):
+                    embedder.embed(f"h{hilo}_{i} otro{i} token{hilo}")
+                    np.testing.assert_array_equal(embedder.embed(TEXTOS[0]), esperado)
+            except Exception as e:
+                errores.append(e)
+
+        hilos = [threading.Thread(target=embeber, args=(hilo,)) for hilo in range(4)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        assert errores == []
@@ -0,0 +1,137 @@
+import threading
+
+import numpy as np
+import pytest
+
+from rag.cliente_http import ErrorModelo, ErrorServidorModelo
+from rag.embeddings_manager import K_RRF, EmbeddingsManager, ErrorEmbeddings
+from rag.indice_vectorial import IndiceVectorial
+
+
+def corpus(n: int, etiqueta: str):
+    """Documentos con un término propio cada uno, para saber cuál debe encontrarse."""
+    documentos = [{"id": f"{etiqueta}{i}", "contenido": f"tema{i} {etiqueta} práctica de programación"}
+                  for i in range(n)]
+    return documentos, [doc["contenido"] for doc in documentos]
+
+
+class TestEmbeddingsManager:
+    """Tests para EmbeddingsManager con el embedder local."""
+
+    @pytest.fixture(params=["vectorial", "lexico", "hibrido"])
+    def manager(self, request, tmp_path):
+        """Crear manager con sus índices en un directorio temporal."""
+        return EmbeddingsManager(cache_file=str(tmp_path / "embeddings.sqlite3"), modo_busqueda=request.param)
+
+    def test_buscar_encuentra_el_documento(self, manager):
+        """Verificar que la consulta con el término propio de un documento lo devuelve primero."""
+        documentos, textos = corpus(20, "a")
+        resultados = manager.buscar_documentos_similares("tema7", documentos, textos, top_k=3)
+
+        assert resultados[0][0]["id"] == "a7"
+
+    def test_busquedas_concurrentes_con_dos_versiones_del_corpus(self, manager):
+        """Verificar que cada búsqueda devuelve documentos de su corpus aunque otro hilo reindexe."""
+        versiones = [corpus(15, "a"), corpus(40, "b")]
+        errores = []
+
+        def buscar(hilo: int):
+            try:
+                for i in range(15):
+                    documentos, textos = versiones[(hilo + i) % 2]
+                    resultados = manager.buscar_documentos_similares(f"tema{i}", documentos, textos, top_k=3)
+                    ids = {doc["id"] for doc in documentos}
+                    assert all(doc["id"] in ids for doc, _ in resultados)
+                    assert resultados[0][0]["id"] == documentos[i]["id"]
+            except Exception as e:
+                errores.append(e)
+
+        hilos = [threading.Thread(target=buscar, args=(hilo,)) for hilo in range(6)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        assert errores == []
+
+
+    def test_editar_un_documento_solo_genera_su_embedding(self, tmp_path, monkeypatch):
+        """Verificar que una edición reescribe el índice pidiendo solo el embedding del texto nuevo."""
+        manager = EmbeddingsManager(cache_file=str(tmp_path / "embeddings.sqlite3"))
+        documentos, textos = corpus(20, "a")
+        manager.buscar_documentos_similares("tema1", documentos, textos)
+        generados = []
+        original = manager.generar_embeddings
+        monkeypatch.setattr(manager, "generar_embeddings", lambda lote: generados.extend(lote) or original(lote))
+
+        textos[3] = "tema3 editado con otra práctica"
+        del documentos[7], textos[7]
+        resultados = manager.buscar_documentos_similares("tema3 editado", documentos, textos, top_k=1)
+
+        assert generados == ["tema3 editado con otra práctica"]
+        assert resultados[0][0]["id"] == "a3"
+        assert manager.indice.claves == manager._claves_textos(textos)
+
+
+class TestEmbeddingsRemotos:
+    """Tests para EmbeddingsManager con un modelo de embeddings remoto."""
+
+    class ClienteFallido:
+        """Cliente de embeddings cuyo endpoint siempre falla."""
+
+        def get_embeddings(self, input, model):
+            raise ErrorServidorModelo("503 Service Unavailable", "http://api/v1/embeddings", 503)
+
+    def test_error_remoto_no_usa_el_embedder_local(self, tmp_path):
+        """Verificar que un fallo del modelo remoto se propaga en lugar de mezclar espacios vectoriales."""
+        manager = EmbeddingsManager(api_client=self.ClienteFallido(), model_embedding="remoto",
+                                    cache_file=str(tmp_path / "embeddings.sqlite3"))
+
+        with pytest.raises(ErrorModelo):
+            manager.generar_embedding("consulta")
+
+    def test_fallo_parcial_lanza_error_embeddings(self, tmp_path, monkeypatch):
+        """Verificar que si faltan embeddings del corpus se lanza ErrorEmbeddings y los demás quedan en caché."""
+        manager = EmbeddingsManager(cache_file=str(tmp_path / "embeddings.sqlite3"))
+        documentos, textos = corpus(4, "a")
+        monkeypatch.setattr(manager, "generar_embeddings",
+                            lambda lote: [None if "tema2" in texto else np.ones(8, np.float32) for texto in lote])
+
+        with pytest.raises(ErrorEmbeddings) as error:
+            manager.indexar(documentos, textos)
+
+        assert (error.value.sin_generar, error.value.total) == (1, 4)
+        assert len(manager.almacen.obtener_varios(manager._claves_textos(textos))) == 3
+
+
+class TestFusionRRF:
+    """Tests para la fusión por rango recíproco del modo híbrido."""
+
+    def test_prioriza_las_filas_de_ambos_rankings(self, tmp_path):
+        """Verificar el orden y los scores RRF de dos rankings conocidos."""
+        manager = EmbeddingsManager(cache_file=str(tmp_path / "embeddings.sqlite3"), modo_busqueda="hibrido")
+        indice = IndiceVectorial(str(tmp_path))
+        # Ranking vectorial de la consulta [1, 0]: 2, 0, 1, 3
+        vectores = np.array([[0.9, 0.3], [0.5, 0.5], [1.0, 0.0], [-1.0, 0.2]], dtype=np.float32)
+        indice.construir("modelo", ["d0", "d1", "d2", "d3"], ["c0", "c1", "c2", "c3"], vectores)
+        # Ranking léxico: 0, 3
+        filas_lexicas = np.array([0, 3])
+        scores_lexicos = np.array([2.0, 1.0], dtype=np.float32)
+
+        resultados = manager._fusionar_rankings(filas_lexicas, scores_lexicos, indice.instantanea(),
+                                                np.array([1.0, 0.0], dtype=np.float32), top_k=3)
+
+        maximo = 2 / (K_RRF + 1)
+        assert [fila for fila, _ in resultados] == [0, 3, 2]
+        assert resultados[0][1] == pytest.approx((1 / (K_RRF + 1) + 1 / (K_RRF + 2)) / maximo)
+        assert resultados[2][1] == pytest.approx((1 / (K_RRF + 1)) / maximo)
+
+    def test_hibrido_encuentra_el_termino_exacto(self, tmp_path):
+        """Verificar que una fila primera en ambos rankings tiene score 1.0."""
+        manager = EmbeddingsManager(cache_file=str(tmp_path / "embeddings.sqlite3"), modo_busqueda="hibrido")
+        documentos, textos = corpus(30, "a")
+
+        resultados = manager.buscar_documentos_similares("tema12", documentos, textos, top_k=3)
+
+        assert resultados[0][0]["id"] == "a12"
+        assert resultados[0][1] == pytest.approx(1.0)
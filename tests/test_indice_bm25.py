@@ -0,0 +1,55 @@
+import pytest
+
+from rag.indice_bm25 import IndiceBM25
+
+TEXTOS = [
+    "menús con JMenuBar en Swing",
+    "configuración de IIS en Windows Server",
+    "algoritmo de Dijkstra",
+    "eventos de ratón en Swing",
+    "servidor web IIS y ASP",
+    "árboles binarios de búsqueda",
+]
+CLAVES = [f"c{i}" for i in range(len(TEXTOS))]
+
+
+class TestIndiceBM25:
+    """Tests para IndiceBM25."""
+
+    @pytest.fixture
+    def ruta(self, tmp_path):
+        """Ruta del archivo SQLite en un directorio temporal."""
+        return str(tmp_path / "indice_lexico.sqlite3")
+
+    def test_buscar_por_termino_exacto(self, ruta):
+        """Verificar que las filas con el término se ordenan por BM25."""
+        indice = IndiceBM25(ruta)
+        indice.sincronizar(CLAVES, TEXTOS)
+
+        resultados = indice.buscar("IIS", top_k=5)
+
+        assert {fila for fila, _ in resultados} == {1, 4}
+        assert indice.buscar("inexistente") == []
+
+    def test_sincronizar_agrega_y_reconstruye(self, ruta):
+        """Verificar que añadir al final no reindexa y que un cambio intermedio reconstruye."""
+        indice = IndiceBM25(ruta)
+        indice.sincronizar(CLAVES[:3], TEXTOS[:3])
+        indice.sincronizar(CLAVES, TEXTOS)
+        assert IndiceBM25(ruta).claves == CLAVES
+
+        indice.sincronizar(["x"] + CLAVES[1:], ["Dijkstra otra vez"] + TEXTOS[1:])
+        assert [fila for fila, _ in indice.buscar("Dijkstra", top_k=5)] in ([0, 2], [2, 0])
+
+    def test_dos_procesos_escriben_el_mismo_archivo(self, ruta):
+        """Verificar que las filas escritas por otra conexión se recargan antes de añadir."""
+        primero, segundo = IndiceBM25(ruta), IndiceBM25(ruta)
+        primero.sincronizar(CLAVES[:3], TEXTOS[:3])
+        segundo.sincronizar(CLAVES[:5], TEXTOS[:5])
+
+        # El primero solo conoce 3 filas: antes intentaba insertar la fila 3 otra vez
+        primero.sincronizar(CLAVES, TEXTOS)
+
+        assert primero.claves == CLAVES
+        assert IndiceBM25(ruta).claves == CLAVES
+        assert {fila for fila, _ in primero.buscar("IIS", top_k=5)} == {1, 4}
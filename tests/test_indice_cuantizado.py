@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+from rag.indice_cuantizado import IndiceCuantizado, medir_recall_cuantizado
+from rag.indice_vectorial import IndiceVectorial
+
+
+def vectores_agrupados(n: int, dim: int = 32, grupos: int = 20, semilla: int = 0) -> np.ndarray:
+    """Vectores alrededor de unos pocos centros, como los pasajes de un corpus con temas repetidos."""
+    rng = np.random.default_rng(semilla)
+    centros = rng.standard_normal((grupos, dim)).astype(np.float32)
+    return centros[rng.integers(0, grupos, n)] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+
+
+class TestIndiceCuantizado:
+    """Tests para IndiceCuantizado frente a la búsqueda exacta."""
+
+    @pytest.fixture
+    def indice(self, tmp_path):
+        """Crear índice exacto con 2000 filas agrupadas."""
+        indice = IndiceVectorial(str(tmp_path))
+        claves = [str(i) for i in range(2000)]
+        indice.construir("modelo", claves, claves, vectores_agrupados(2000))
+        return indice
+
+    @pytest.fixture(params=["float16", "int8"])
+    def cuantizado(self, request, indice, tmp_path):
+        """Índice cuantizado de cada tipo, sincronizado con el exacto."""
+        cuantizado = IndiceCuantizado(str(tmp_path), tipo=request.param)
+        cuantizado.sincronizar(indice.instantanea())
+        return cuantizado
+
+    def test_puntuar_aproxima_la_similitud_exacta(self, indice, cuantizado):
+        """Verificar que las similitudes cuantizadas se desvían poco de las exactas."""
+        consulta = IndiceVectorial._normalizar(vectores_agrupados(1, semilla=1))[0]
+
+        aproximadas = cuantizado.puntuar(consulta)
+
+        tolerancia = 1e-3 if cuantizado.tipo == "float16" else 2e-2
+        np.testing.assert_allclose(aproximadas, np.asarray(indice.matriz) @ consulta, atol=tolerancia)
+
+    def test_reranking_devuelve_similitudes_exactas(self, indice, cuantizado):
+        """Verificar que los resultados llevan la similitud float32 exacta y coinciden con los exactos."""
+        consulta = vectores_agrupados(1, semilla=2)[0]
+
+        resultados = cuantizado.buscar(indice.matriz, consulta, top_k=10)
+
+        exactos = indice.buscar(consulta, top_k=10)
+        assert [fila for fila, _ in resultados] == [fila for fila, _ in exactos]
+        np.testing.assert_allclose([s for _, s in resultados], [s for _, s in exactos], rtol=1e-6)
+
+    def test_recall_con_reranking(self, indice, cuantizado):
+        """Verificar que la re-puntuación exacta no empeora el recall y que con factor 4 es casi exacto."""
+        consultas = vectores_agrupados(50, semilla=3)
+
+        informe = medir_recall_cuantizado(indice, [cuantizado], consultas, top_k=10, factores=[1, 4])
+
+        sin_reranking, factor_1, factor_4 = informe[1]["recall_sin_reranking"], informe[1], informe[2]
+        assert factor_1["recall"] >= sin_reranking - 1e-9
+        assert factor_4["recall"] >= 0.98
+        assert factor_4["memoria_relativa"] < 1.0
+
+    def test_sincronizar_agrega_y_reabre(self, indice, cuantizado, tmp_path):
+        """Verificar que las filas añadidas se cuantizan al final y que el índice se reabre desde disco."""
+        nuevos = vectores_agrupados(10, semilla=4)
+        indice.agregar([f"n{i}" for i in range(10)], [f"n{i}" for i in range(10)], nuevos)
+
+        cuantizado.sincronizar(indice.instantanea())
+
+        reabierto = IndiceCuantizado(str(tmp_path), tipo=cuantizado.tipo)
+        assert len(cuantizado) == len(reabierto) == 2010
+        assert reabierto.generacion == indice.generacion
+        assert reabierto.buscar(indice.matriz, nuevos[3], top_k=1)[0][0] == 2003
+
+    def test_descarta_filas_posteriores_a_la_instantanea(self, indice, cuantizado):
+        """Verificar que al buscar con una instantánea anterior no se devuelven filas que aún no tiene."""
+        antes = indice.instantanea()
+        nuevos = vectores_agrupados(10, semilla=5)
+        indice.agregar([f"n{i}" for i in range(10)], [f"n{i}" for i in range(10)], nuevos)
+        cuantizado.sincronizar(indice.instantanea())
+
+        resultados = cuantizado.buscar(antes.matriz, nuevos[0], top_k=20)
+
+        assert resultados and all(fila < 2000 for fila, _ in resultados)
+
+    def test_tipo_desconocido(self, tmp_path):
+        """Verificar que un tipo de cuantización desconocido se rechaza."""
+        with pytest.raises(ValueError):
+            IndiceCuantizado(str(tmp_path), tipo="int4")
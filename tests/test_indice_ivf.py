@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+from rag.indice_ivf import IndiceIVF, medir_recall
+from rag.indice_vectorial import IndiceVectorial
+
+
+def vectores_agrupados(n: int, dim: int = 32, grupos: int = 20, semilla: int = 0) -> np.ndarray:
+    """Vectores alrededor de unos pocos centros, como los pasajes de un corpus con temas repetidos."""
+    rng = np.random.default_rng(semilla)
+    centros = rng.standard_normal((grupos, dim)).astype(np.float32)
+    return centros[rng.integers(0, grupos, n)] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+
+
+class TestIndiceIVF:
+    """Tests para IndiceIVF frente a la búsqueda exacta."""
+
+    @pytest.fixture
+    def indice(self, tmp_path):
+        """Crear índice exacto con 4000 filas agrupadas."""
+        indice = IndiceVectorial(str(tmp_path))
+        claves = [str(i) for i in range(4000)]
+        indice.construir("modelo", claves, claves, vectores_agrupados(4000))
+        return indice
+
+    @pytest.fixture
+    def ivf(self, indice, tmp_path):
+        """IVF sincronizado con el índice exacto."""
+        ivf = IndiceIVF(str(tmp_path))
+        ivf.sincronizar(indice.instantanea())
+        return ivf
+
+    def test_recall_frente_a_busqueda_exacta(self, indice, ivf):
+        """Verificar que el recall crece con nprobe y es 1.0 al explorar todas las listas."""
+        consultas = vectores_agrupados(50, semilla=1)
+        num_listas = ivf.centroides.shape[0]
+
+        informe = medir_recall(indice, ivf, consultas, top_k=10, nprobes=[1, 4, 16, num_listas])
+
+        recalls = [fila["recall"] for fila in informe[1:]]
+        assert recalls == sorted(recalls)
+        assert recalls[-1] == 1.0
+        assert recalls[2] >= 0.9
+        fracciones = [fila["fraccion_explorada"] for fila in informe[1:]]
+        assert fracciones[0] < 0.1 and fracciones[-1] == 1.0
+
+    def test_todas_las_listas_equivale_a_exacto(self, indice, ivf):
+        """Verificar que con nprobe igual al número de listas los resultados coinciden con los exactos."""
+        consulta = vectores_agrupados(1, semilla=2)[0]
+
+        aproximados = ivf.buscar(indice.matriz, consulta, top_k=5, nprobe=ivf.centroides.shape[0])
+
+        exactos = indice.buscar(consulta, top_k=5)
+        assert [fila for fila, _ in aproximados] == [fila for fila, _ in exactos]
+        np.testing.assert_allclose([s for _, s in aproximados], [s for _, s in exactos], rtol=1e-5)
+
+    def test_sincronizar_agrega_y_reentrena(self, indice, ivf, tmp_path):
+        """Verificar que las filas añadidas se asignan sin reentrenar y que una reconstrucción reentrena."""
+        centroides = ivf.centroides.copy()
+        nuevos = vectores_agrupados(100, semilla=3)
+        indice.agregar([f"n{i}" for i in range(100)], [f"n{i}" for i in range(100)], nuevos)
+
+        ivf.sincronizar(indice.instantanea())
+
+        assert len(ivf) == 4100
+        assert ivf.filas_entrenamiento == 4000
+        np.testing.assert_array_equal(ivf.centroides, centroides)
+        reabierto = IndiceIVF(str(tmp_path))
+        assert len(reabierto) == 4100
+        assert reabierto.buscar(indice.matriz, nuevos[7], top_k=1, nprobe=4)[0][0] == 4007
+
+        indice.construir("modelo", ["a"] * 50, [str(i) for i in range(50)], vectores_agrupados(50, semilla=4))
+        ivf.sincronizar(indice.instantanea())
+        assert len(ivf) == 50
+        assert ivf.generacion == indice.generacion
+
+    def test_descarta_filas_posteriores_a_la_instantanea(self, indice, ivf):
+        """Verificar que al buscar con una instantánea anterior no se devuelven filas que aún no tiene."""
+        antes = indice.instantanea()
+        nuevos = vectores_agrupados(10, semilla=5)
+        indice.agregar([f"n{i}" for i in range(10)], [f"n{i}" for i in range(10)], nuevos)
+        ivf.sincronizar(indice.instantanea())
+
+        resultados = ivf.buscar(antes.matriz, nuevos[0], top_k=20, nprobe=ivf.centroides.shape[0])
+
+        assert all(fila < 4000 for fila, _ in resultados)
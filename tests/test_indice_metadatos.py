@@ -0,0 +1,54 @@
+import threading
+
+import numpy as np
+import pytest
+
+from rag.indice_metadatos import IndiceMetadatos
+
+
+def fragmentos_de_prueba(n: int = 300):
+    """Pasajes de documentos con tipos y materias alternados."""
+    documentos = [{"tipo": ["Práctica", "Ensayo", "Reporte"][i % 3], "materia": ["Redes", "Java"][i % 2]}
+                  for i in range(n)]
+    return [{"documento": documento} for documento in documentos]
+
+
+class TestIndiceMetadatos:
+    """Tests para IndiceMetadatos."""
+
+    def test_filas_que_cumplen_los_filtros(self):
+        """Verificar la intersección de filtros, sin distinguir acentos ni mayúsculas."""
+        indice = IndiceMetadatos(fragmentos_de_prueba())
+
+        filas = indice.filas({"tipo": "practica", "materia": "REDES", "profesor": ""})
+
+        np.testing.assert_array_equal(filas, np.arange(0, 300, 6))
+        assert indice.filas({}) is None
+        assert indice.filas({"tipo": "tesis"}).size == 0
+        with pytest.raises(ValueError):
+            indice.filas({"titulo": "x"})
+
+    def test_cache_compartida_entre_hilos(self):
+        """Verificar que muchos hilos con más combinaciones que la memoria de filtros obtienen filas correctas."""
+        indice = IndiceMetadatos(fragmentos_de_prueba(), max_filtros_cache=2)
+        combinaciones = [{"tipo": tipo, "materia": materia}
+                         for tipo in ("Práctica", "Ensayo", "Reporte") for materia in ("Redes", "Java")]
+        esperadas = [IndiceMetadatos(fragmentos_de_prueba()).filas(filtros) for filtros in combinaciones]
+        errores = []
+
+        def consultar(desplazamiento: int):
+            try:
+                for i in range(500):
+                    j = (i + desplazamiento) % len(combinaciones)
+                    np.testing.assert_array_equal(indice.filas(combinaciones[j]), esperadas[j])
+            except Exception as e:
+                errores.append(e)
+
+        hilos = [threading.Thread(target=consultar, args=(desplazamiento,)) for desplazamiento in range(8)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        assert errores == []
+        assert len(indice._cache) <= 2
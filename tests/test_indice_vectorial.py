@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+
+from rag.indice_vectorial import IndiceVectorial
+
+
+def vectores(n: int, dim: int = 16, semilla: int = 0) -> np.ndarray:
+    """Vectores aleatorios reproducibles."""
+    return np.random.default_rng(semilla).standard_normal((n, dim)).astype(np.float32)
+
+
+class TestIndiceVectorial:
+    """Tests para IndiceVectorial."""
+
+    @pytest.fixture
+    def indice(self, tmp_path):
+        """Crear índice con cinco filas en un directorio temporal."""
+        indice = IndiceVectorial(str(tmp_path))
+        claves = [f"c{i}" for i in range(5)]
+        indice.construir("modelo", [f"doc{i}" for i in range(5)], claves, vectores(5))
+        return indice
+
+    def test_construir_y_reabrir(self, indice, tmp_path):
+        """Verificar que el índice se persiste normalizado y se reabre igual."""
+        reabierto = IndiceVectorial(str(tmp_path))
+
+        assert len(reabierto) == 5
+        assert reabierto.modelo == "modelo"
+        assert reabierto.generacion == indice.generacion
+        assert reabierto.claves == indice.claves
+        np.testing.assert_allclose(np.linalg.norm(reabierto.matriz, axis=1), 1.0, rtol=1e-5)
+
+    def test_buscar_devuelve_la_fila_de_la_consulta(self, indice):
+        """Verificar que cada vector encuentra su propia fila primero, ordenado por similitud."""
+        datos = vectores(5)
+        for fila in range(5):
+            resultados = indice.buscar(datos[fila] * 3.0, top_k=3)
+            assert resultados[0][0] == fila
+            assert resultados[0][1] == pytest.approx(1.0, abs=1e-5)
+            assert [s for _, s in resultados] == sorted((s for _, s in resultados), reverse=True)
+
+    def test_buscar_solo_en_filas_candidatas(self, indice):
+        """Verificar que con filas candidatas no se devuelven otras."""
+        resultados = indice.buscar(vectores(5)[0], top_k=5, filas=np.array([2, 4]))
+
+        assert {fila for fila, _ in resultados} == {2, 4}
+
+    def test_agregar_conserva_generacion(self, indice, tmp_path):
+        """Verificar que añadir filas no reconstruye el índice y que se persisten."""
+        generacion = indice.generacion
+        nuevos = vectores(2, semilla=1)
+        indice.agregar(["doc5", "doc6"], ["c5", "c6"], nuevos)
+
+        assert indice.generacion == generacion
+        assert len(indice) == 7
+        assert indice.buscar(nuevos[1], top_k=1)[0][0] == 6
+        reabierto = IndiceVectorial(str(tmp_path))
+        assert reabierto.claves == [f"c{i}" for i in range(7)]
+        assert reabierto.buscar(nuevos[1], top_k=1)[0][0] == 6
+
+    def test_instantanea_no_cambia_al_escribir(self, indice):
+        """Verificar que una instantánea tomada antes de escribir sigue siendo coherente."""
+        antes = indice.instantanea()
+        indice.agregar(["doc5"], ["c5"], vectores(1, semilla=1))
+        indice.construir("otro", ["x"], ["cx"], vectores(1, semilla=2))
+
+        assert len(antes) == 5
+        assert antes.matriz.shape[0] == 5
+        assert antes.buscar(vectores(5)[3], top_k=1)[0][0] == 3
+
+    def test_actualizar_reutiliza_las_filas_existentes(self, indice, tmp_path):
+        """Verificar que al editar, borrar y reordenar se copian las filas conocidas y solo se usan los vectores nuevos."""
+        antes = indice.instantanea()
+        editado = vectores(1, semilla=1)
+
+        indice.actualizar(["doc4", "doc2", "doc1b", "doc0"], ["c4", "c2", "c1b", "c0"], {"c1b": editado[0]})
+
+        assert indice.generacion != antes.generacion
+        np.testing.assert_allclose(indice.matriz[[0, 1, 3]], antes.matriz[[4, 2, 0]])
+        np.testing.assert_allclose(indice.matriz[2], IndiceVectorial._normalizar(editado)[0], rtol=1e-6)
+        assert IndiceVectorial(str(tmp_path)).claves == ["c4", "c2", "c1b", "c0"]
+        # La instantánea anterior conserva sus filas: el archivo se sustituyó, no se sobrescribió
+        assert antes.buscar(vectores(5)[3], top_k=1)[0][0] == 3
+        with pytest.raises(KeyError):
+            indice.actualizar(["doc9"], ["c9"], {})
+
+    def test_dos_instancias_agregan_sobre_el_mismo_archivo(self, indice, tmp_path):
+        """Verificar que dos procesos que comparten el índice no lo corrompen al añadir filas."""
+        otro = IndiceVectorial(str(tmp_path))
+        nuevos = vectores(2, semilla=1)
+
+        # Ambos añaden el mismo documento: el segundo adopta lo que ya escribió el primero
+        indice.agregar(["doc5"], ["c5"], nuevos[:1])
+        otro.agregar(["doc5"], ["c5"], nuevos[:1])
+        assert len(otro) == 6
+
+        # El primero, con su estado de 6 filas, añade otro
+        indice.agregar(["doc6"], ["c6"], nuevos[1:])
+        otro.agregar(["doc7"], ["c7"], vectores(1, semilla=2))
+
+        reabierto = IndiceVectorial(str(tmp_path))
+        assert reabierto.matriz.shape[0] == len(reabierto.claves)
+        assert reabierto.claves == [f"c{i}" for i in range(6)] + ["c7"]
+        assert reabierto.buscar(vectores(1, semilla=2)[0], top_k=1)[0][0] == 6
+        # La instancia desactualizada conserva un estado coherente consigo mismo
+        assert indice.buscar(nuevos[1], top_k=1)[0][0] == 6
@@ -0,0 +1,182 @@
+import asyncio
+import json
+import os
+import shutil
+import threading
+import time
+
+import pytest
+
+from rag.documentos_manager import DocumentosManager
+from rag.rag_sistema import RAGSistema
+from rag.secciones import dividir_en_bloques
+from rag.tokens import contar_tokens
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "documentos_ejemplo")
+
+
+class TestRAGSistema:
+    """Tests para RAGSistema sin llamadas al modelo."""
+
+    @pytest.fixture
+    def sistema(self, tmp_path):
+        """Crear sistema con los documentos de ejemplo y sus índices en un directorio temporal."""
+        directorio = tmp_path / "documentos"
+        shutil.copytree(FIXTURES, directorio)
+        doc_manager = DocumentosManager(directorio_docs=str(directorio), buscar_en_rag=False)
+        return RAGSistema(token="", doc_manager=doc_manager, directorio_indices=str(tmp_path / "indices"))
+
+    def test_buscar_documentos(self, sistema):
+        """Verificar que la búsqueda devuelve el documento del tema."""
+        resultados = sistema.buscar_documentos("JMenuBar JMenu JMenuItem", top_k=2)
+
+        assert "JMenuBar" in resultados[0][0]["titulo"]
+
+    def test_indexar_compacta_la_cache(self, sistema, tmp_path, capsys):
+        """Verificar que indexar con compactar elimina los embeddings de los pasajes editados."""
+        sistema.indexar()
+        ruta = tmp_path / "documentos" / "hosting_iis.json"
+        documento = json.loads(ruta.read_text(encoding="utf-8"))
+        documento["desarrollo"] = "Un desarrollo completamente nuevo."
+        ruta.write_text(json.dumps(documento, ensure_ascii=False), encoding="utf-8")
+        almacen = sistema.embeddings_manager.almacen
+        antes = set(almacen.claves())
+
+        sistema.indexar(compactar=True)
+
+        vigentes = set(sistema.embeddings_manager.indice.claves)
+        assert antes - vigentes
+        assert set(almacen.claves()) == vigentes
+        assert "vectores obsoletos eliminados" in capsys.readouterr().out
+
+    def test_ajustar_prompt_devuelve_su_informe(self, sistema):
+        """Verificar que el recuento de tokens acompaña al prompt y respeta el presupuesto."""
+        docs_similares = sistema._agrupar_pasajes("programación en Java", num_documentos=3)
+        completo, informe_completo = sistema._construir_prompt_con_contexto("tema", docs_similares)
+        recortado, informe = sistema._construir_prompt_con_contexto("tema", docs_similares, presupuesto=400)
+
+        assert informe_completo["pasajes_descartados"] == 0
+        assert informe["tokens_prompt"] == contar_tokens(recortado) <= 400
+        assert informe["pasajes_descartados"] > 0
+        assert len(recortado) < len(completo)
+        assert not hasattr(sistema, "ultimo_informe_prompt")
+
+    def test_informes_de_hilos_concurrentes(self, sistema):
+        """Verificar que cada hilo recibe el informe de su propio prompt."""
+        docs_similares = sistema._agrupar_pasajes("programación en Java", num_documentos=3)
+        errores = []
+
+        def construir(presupuesto: int):
+            try:
+                for _ in range(20):
+                    prompt, informe = sistema._construir_prompt_con_contexto("tema", docs_similares,
+                                                                             presupuesto=presupuesto)
+                    assert informe["presupuesto"] == presupuesto
+                    assert informe["tokens_prompt"] == contar_tokens(prompt)
+            except Exception as e:
+                errores.append(e)
+
+        hilos = [threading.Thread(target=construir, args=(presupuesto,)) for presupuesto in (300, 600, 12000)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        assert errores == []
+
+
+def bloque_del_prompt(messages) -> str:
+    """Extraer del prompt de transformación el texto que se pide reformular."""
+    return messages[-1]["content"].split("TEXTO A TRANSFORMAR:\n", 1)[1].split("\n\n\n\n", 1)[0]
+
+
+class TestTransformarPorBloques:
+    """Tests para la transformación por bloques con un modelo simulado."""
+
+    @pytest.fixture
+    def sistema(self, tmp_path):
+        """Crear sistema con los documentos de ejemplo y sus índices en un directorio temporal."""
+        directorio = tmp_path / "documentos"
+        shutil.copytree(FIXTURES, directorio)
+        doc_manager = DocumentosManager(directorio_docs=str(directorio), buscar_en_rag=False)
+        return RAGSistema(token="", doc_manager=doc_manager, directorio_indices=str(tmp_path / "indices"))
+
+    @pytest.fixture
+    def texto(self):
+        """Texto largo formado por las secciones de un documento de ejemplo."""
+        with open(os.path.join(FIXTURES, "hosting_iis.json"), encoding="utf-8") as f:
+            documento = json.load(f)
+        return (f"Introducción:\n{documento['introduccion']}\n\nDesarrollo:\n{documento['desarrollo']}\n\n"
+                f"Conclusión:\n{documento['conclusion']}")
+
+    @pytest.fixture
+    def llamadas(self, sistema, monkeypatch):
+        """Simular el modelo: cada bloque vuelve entre corchetes y los primeros tardan más."""
+        registro = {"bloques": [], "activas": 0, "max_activas": 0}
+        lock = threading.Lock()
+
+        def llamar(messages, **kwargs):
+            bloque = bloque_del_prompt(messages)
+            with lock:
+                registro["bloques"].append(bloque)
+                registro["activas"] += 1
+                registro["max_activas"] = max(registro["max_activas"], registro["activas"])
+            # Los primeros bloques terminan los últimos: el orden de la unión no depende del de llegada
+            time.sleep(0.05 / len(registro["bloques"]))
+            with lock:
+                registro["activas"] -= 1
+            return f"  [{bloque}]\n"
+
+        async def allamar(messages, **kwargs):
+            bloque = bloque_del_prompt(messages)
+            registro["bloques"].append(bloque)
+            await asyncio.sleep(0.05 / len(registro["bloques"]))
+            return f"  [{bloque}]\n"
+
+        monkeypatch.setattr(sistema, "_llamar_modelo", llamar)
+        monkeypatch.setattr(sistema, "_allamar_modelo", allamar)
+        return registro
+
+    def test_une_los_bloques_en_orden(self, sistema, texto, llamadas):
+        """Verificar que cada bloque se transforma una vez y que se unen en el orden original."""
+        bloques = dividir_en_bloques(texto, 400)
+
+        resultado = sistema.transformar_texto(texto, {"tamano_bloque": 400, "max_concurrencia": 2})
+
+        assert len(bloques) > 2
+        assert sorted(llamadas["bloques"]) == sorted(bloques)
+        assert resultado == "\n\n".join(f"[{bloque}]" for bloque in bloques)
+        assert llamadas["max_activas"] <= 2
+
+    def test_stream_entrega_bloques_en_orden(self, sistema, texto, llamadas):
+        """Verificar que en streaming cada fragmento es un bloque completo y en orden."""
+        bloques = dividir_en_bloques(texto, 400)
+
+        fragmentos = list(sistema.transformar_texto(texto, {"tamano_bloque": 400}, stream=True))
+
+        assert [fragmento.strip() for fragmento in fragmentos] == [f"[{bloque}]" for bloque in bloques]
+
+    def test_texto_corto_no_se_divide(self, sistema, llamadas):
+        """Verificar que un texto menor que tamano_bloque se transforma en una sola llamada."""
+        sistema.transformar_texto("Un texto breve sobre Java.", {"tamano_bloque": 400})
+
+        assert llamadas["bloques"] == ["Un texto breve sobre Java."]
+
+    def test_informe_suma_los_bloques(self, sistema, texto, llamadas):
+        """Verificar que el informe pedido suma los prompts de todos los bloques."""
+        bloques = dividir_en_bloques(texto, 400)
+        informe = {}
+
+        sistema.transformar_texto(texto, {"tamano_bloque": 400, "presupuesto_tokens": 3000}, informe=informe)
+
+        assert informe["bloques"] == informe["prompts"] == len(bloques)
+        assert informe["presupuesto"] == 3000
+        assert 0 < informe["tokens_prompt"] <= 3000 * len(bloques)
+
+    def test_version_asincrona(self, sistema, texto, llamadas):
+        """Verificar que atransformar_texto une los bloques igual que la versión síncrona."""
+        bloques = dividir_en_bloques(texto, 400)
+
+        resultado = asyncio.run(sistema.atransformar_texto(texto, {"tamano_bloque": 400}))
+
+        assert resultado == "\n\n".join(f"[{bloque}]" for bloque in bloques)
@@ -0,0 +1,102 @@
+import json
+import os
+
+import pytest
+
+from benchmarks.bench_secciones import parsear_anterior
+from rag.secciones import CAMPOS, dividir_en_bloques, parsear_secciones
+
+DIRECTORIO_FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "documentos_ejemplo")
+FIXTURES = sorted(os.listdir(DIRECTORIO_FIXTURES))
+
+
+def cargar_fixture(nombre: str):
+    """Devolver el documento de ejemplo y su versión en texto plano (como un .txt o una respuesta del modelo)."""
+    with open(os.path.join(DIRECTORIO_FIXTURES, nombre), encoding="utf-8") as f:
+        documento = json.load(f)
+    texto = (f"Título: {documento['titulo']}\nTipo: {documento['tipo']}\nMateria: {documento['materia']}\n"
+             f"Presenta: {documento['presenta']}\nProfesor: {documento['profesor']}\n\n"
+             f"Introducción:\n{documento['introduccion']}\n\nDesarrollo:\n{documento['desarrollo']}\n\n"
+             f"Conclusión:\n{documento['conclusion']}\n")
+    return {campo: documento[campo].strip() for campo in CAMPOS}, texto
+
+
+class TestParsearSecciones:
+    """Tests para parsear_secciones frente al parser anterior (un re.search por campo)."""
+
+    @pytest.mark.parametrize("nombre", FIXTURES)
+    def test_recupera_el_documento(self, nombre):
+        """Verificar que el texto plano de cada documento de ejemplo se parsea a sus campos originales."""
+        documento, texto = cargar_fixture(nombre)
+
+        assert parsear_secciones(texto) == documento
+
+    @pytest.mark.parametrize("nombre", FIXTURES)
+    def test_coincide_con_el_parser_anterior(self, nombre):
+        """Verificar que los campos que el parser anterior extraía bien no cambian."""
+        documento, texto = cargar_fixture(nombre)
+        anterior = parsear_anterior(texto)
+        nuevo = parsear_secciones(texto)
+
+        correctos = [campo for campo in CAMPOS if anterior[campo] == documento[campo]]
+        assert correctos
+        assert {campo: nuevo[campo] for campo in correctos} == {campo: anterior[campo] for campo in correctos}
+
+    def test_palabra_clave_en_la_prosa(self):
+        """Verificar que "desarrollo" dentro de la introducción no abre la sección, como hacía el parser anterior."""
+        documento, texto = cargar_fixture("hosting_iis.json")
+
+        assert parsear_anterior(texto)["desarrollo"] != documento["desarrollo"]
+        assert parsear_secciones(texto)["desarrollo"] == documento["desarrollo"]
+
+    def test_markdown_y_palabras_que_contienen_un_campo(self):
+        """Verificar que se toleran encabezados en Markdown y que "prototipo" no es el campo tipo."""
+        texto = ("# Título: Un prototipo de menús\n**Tipo:** practica\n\n## Introducción\nTexto inicial.\n\n"
+                 "## Desarrollo\nPrimera parte.\n\n**Conclusión:**\nCierre.\n")
+
+        resultado = parsear_secciones(texto)
+
+        assert resultado["titulo"] == "Un prototipo de menús"
+        assert resultado["tipo"] == "practica"
+        assert resultado["introduccion"] == "Texto inicial."
+        assert resultado["desarrollo"] == "Primera parte."
+        assert resultado["conclusion"] == "Cierre."
+        assert parsear_anterior(texto)["tipo"] != "practica"
+
+    def test_secciones_repetidas_se_unen(self):
+        """Verificar que una sección repetida se concatena y un campo de línea conserva la primera aparición."""
+        texto = "Tipo: practica\nTipo: ensayo\nDesarrollo:\nuno\nDesarrollo:\ndos\n"
+
+        resultado = parsear_secciones(texto)
+
+        assert resultado["tipo"] == "practica"
+        assert resultado["desarrollo"] == "uno\n\ndos"
+        assert resultado["conclusion"] == ""
+
+
+class TestDividirEnBloques:
+    """Tests para dividir_en_bloques."""
+
+    def test_bloques_sin_perder_texto(self):
+        """Verificar que los bloques respetan el tamaño y conservan todos los párrafos en orden."""
+        _, texto = cargar_fixture("hosting_iis.json")
+
+        bloques = dividir_en_bloques(texto, 400)
+
+        assert len(bloques) > 1
+        assert all(len(bloque) <= 400 for bloque in bloques)
+        assert "".join("".join(bloques).split()) == "".join(texto.split())
+
+    def test_secciones_empiezan_bloque(self):
+        """Verificar que cada sección empieza un bloque nuevo cuando el anterior ya va por la mitad."""
+        _, texto = cargar_fixture("hosting_iis.json")
+
+        bloques = dividir_en_bloques(texto, 400)
+
+        for encabezado in ("Desarrollo:", "Conclusión:"):
+            assert any(bloque.startswith(encabezado) for bloque in bloques)
+
+    def test_texto_corto_o_vacio(self):
+        """Verificar que un texto que cabe en un bloque no se divide y que uno vacío no da bloques."""
+        assert dividir_en_bloques("  Un párrafo.  ", 400) == ["Un párrafo."]
+        assert dividir_en_bloques("   ", 400) == []
@@ -0,0 +1,155 @@
+import json
+import os
+import shutil
+import stat
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from rag.cliente import CABECERA_SECRETO, VARIABLE_SECRETO, ClienteRAG
+from rag.documentos_manager import DocumentosManager
+from rag.servidor import ServidorRAG, preparar_secreto
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "documentos_ejemplo")
+SECRETO = "secreto-de-prueba"
+
+
+def enviar(url: str, datos, cabeceras) -> int:
+    """Hacer un POST y devolver el código HTTP."""
+    peticion = urllib.request.Request(url, data=datos, headers=cabeceras, method="POST")
+    try:
+        with urllib.request.urlopen(peticion, timeout=10) as respuesta:
+            return respuesta.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+class TestServidorRAG:
+    """Tests para ServidorRAG con los documentos de ejemplo."""
+
+    @pytest.fixture
+    def servidor(self, tmp_path):
+        """Arrancar un servidor con los documentos de ejemplo en un puerto libre."""
+        directorio = tmp_path / "documentos"
+        shutil.copytree(FIXTURES, directorio)
+        doc_manager = DocumentosManager(directorio_docs=str(directorio), buscar_en_rag=False)
+        servidor = ServidorRAG(token="token", secreto=SECRETO, puerto=0,
+                               endpoints_permitidos=["http://127.0.0.1:1/permitido"],
+                               doc_manager=doc_manager, directorio_indices=str(tmp_path / "indices"))
+        hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+        hilo.start()
+        yield servidor
+        servidor.shutdown()
+        servidor.server_close()
+
+    @staticmethod
+    def url(servidor: ServidorRAG) -> str:
+        host, puerto = servidor.server_address[:2]
+        return f"http://{host}:{puerto}"
+
+    def test_arranca_con_el_corpus_indexado(self, servidor):
+        """Verificar que el corpus y la matriz de embeddings se cargan antes de la primera petición."""
+        assert servidor.documentos_indexados == (3, len(servidor.obtener_sistema(None)._corpus_cache[1]))
+        assert len(servidor.obtener_sistema(None).embeddings_manager.indice) > 0
+
+    def test_buscar_con_secreto(self, servidor):
+        """Verificar que el cliente con el secreto obtiene resultados."""
+        cliente = ClienteRAG(self.url(servidor), secreto=SECRETO)
+
+        resultados = cliente.buscar_documentos("JMenuBar JMenu JMenuItem", top_k=1)
+
+        assert "JMenuBar" in resultados[0]["titulo"]
+
+    @pytest.mark.parametrize("secreto", [None, "otro"])
+    def test_rechaza_sin_secreto_valido(self, servidor, secreto):
+        """Verificar que sin el secreto correcto se responde 401."""
+        cabeceras = {"Content-Type": "application/json"}
+        if secreto:
+            cabeceras[CABECERA_SECRETO] = secreto
+
+        assert enviar(self.url(servidor) + "/buscar", b'{"consulta": "IIS"}', cabeceras) == 401
+
+    def test_rechaza_cuerpo_que_no_es_json(self, servidor):
+        """Verificar que un POST text/plain (como el de un formulario o fetch sin preflight) se rechaza."""
+        cabeceras = {"Content-Type": "text/plain", CABECERA_SECRETO: SECRETO}
+
+        assert enviar(self.url(servidor) + "/buscar", b'{"consulta": "IIS"}', cabeceras) == 415
+
+    def test_solo_endpoints_permitidos(self, servidor):
+        """Verificar que un endpoint no configurado se rechaza sin crear otro sistema."""
+        cabeceras = {"Content-Type": "application/json", CABECERA_SECRETO: SECRETO}
+        sistemas = len(servidor._sistemas)
+
+        for endpoint, esperado in (("http://atacante.example", 400), ("http://127.0.0.1:1/permitido", 200)):
+            datos = json.dumps({"consulta": "IIS", "endpoint": endpoint}).encode("utf-8")
+            assert enviar(self.url(servidor) + "/buscar", datos, cabeceras) == esperado
+        assert len(servidor._sistemas) == sistemas + 1
+
+    @pytest.mark.parametrize("stream", [False, True])
+    def test_generar_devuelve_el_informe(self, servidor, monkeypatch, stream):
+        """Verificar que el recuento de tokens del prompt llega al cliente, también en streaming."""
+        sistema = servidor.obtener_sistema(None)
+        monkeypatch.setattr(sistema, "_llamar_modelo", lambda messages, **kwargs: "documento")
+        monkeypatch.setattr(sistema, "_llamar_modelo_stream", lambda messages, **kwargs: iter(["docu", "mento"]))
+        cliente = ClienteRAG(self.url(servidor), secreto=SECRETO)
+        informe = {}
+
+        resultado = cliente.generar_documento("Menús en Java", {"presupuesto_tokens": 3000}, stream=stream,
+                                              informe=informe)
+
+        assert "".join(resultado) == "documento"
+        assert informe["presupuesto"] == 3000
+        assert 0 < informe["tokens_prompt"] <= 3000
+        assert informe["pasajes_incluidos"] > 0
+
+
+    def test_variantes_llegan_segun_terminan(self, servidor, monkeypatch):
+        """Verificar que el cliente recibe cada versión sin esperar a la más lenta, y los errores por versión."""
+        sistema = servidor.obtener_sistema(None)
+        liberar = threading.Event()
+
+        def llamar_modelo(messages, variante=None, **kwargs):
+            # La versión 0 solo termina cuando el cliente ya ha recibido las otras dos
+            if variante == 0 and not liberar.wait(10):
+                return "sin liberar"
+            if variante == 2:
+                raise RuntimeError("fallo del modelo")
+            return f"versión {variante}"
+
+        monkeypatch.setattr(sistema, "_llamar_modelo", llamar_modelo)
+        cliente = ClienteRAG(self.url(servidor), secreto=SECRETO)
+
+        variantes = cliente.generar_variantes("Menús en Java", 3)
+        primeras = dict([next(variantes), next(variantes)])
+        liberar.set()
+        resto = list(variantes)
+
+        assert primeras[1] == "versión 1"
+        assert isinstance(primeras[2], Exception) and "fallo del modelo" in str(primeras[2])
+        assert resto == [(0, "versión 0")]
+
+
+class TestPrepararSecreto:
+    """Tests para preparar_secreto."""
+
+    def test_genera_archivo_privado(self, tmp_path, monkeypatch):
+        """Verificar que sin variable de entorno se genera un secreto legible solo por el usuario."""
+        monkeypatch.delenv(VARIABLE_SECRETO, raising=False)
+        ruta = str(tmp_path / "scriptorium" / "servidor.secreto")
+
+        secreto = preparar_secreto(ruta)
+
+        with open(ruta, encoding="utf-8") as f:
+            assert f.read() == secreto
+        assert stat.S_IMODE(os.stat(ruta).st_mode) == 0o600
+        assert preparar_secreto(ruta) != secreto
+
+    def test_usa_la_variable_de_entorno(self, tmp_path, monkeypatch):
+        """Verificar que SCRIPTORIUM_SECRETO tiene prioridad y no se escribe archivo."""
+        monkeypatch.setenv(VARIABLE_SECRETO, "fijo")
+        ruta = str(tmp_path / "servidor.secreto")
+
+        assert preparar_secreto(ruta) == "fijo"
+        assert not os.path.exists(ruta)
@@ -1,6 +1,9 @@
 import os
 import argparse
-from rag.rag_sistema import RAGSistema
+from rag.cliente import ClienteRAG
+from rag.metricas import FORMATOS as FORMATOS_METRICAS, activar_salida as activar_salida_metricas
+from rag.secciones import TAMANO_BLOQUE, parsear_secciones
+from rag.tokens import PRESUPUESTO_ENTRADA, resumen_informe
 
 def main():
     parser = argparse.ArgumentParser(description='Transformar un texto al estilo de escritura personal')
@@ -11,10 +14,47 @@ def main():
                         help='Archivo de texto plano con contexto adicional para el RAG')
     parser.add_argument('--contexto-texto', type=str, default=None,
                         help='Texto plano directo como contexto adicional para el RAG')
+    parser.add_argument('--tipo', type=str, default=None,
+                        help='Usar como ejemplos solo documentos de este tipo (practica, investigacion, ensayo, etc.)')
+    parser.add_argument('--materia', type=str, default=None,
+                        help='Usar como ejemplos solo documentos de esta materia')
+    parser.add_argument('--profesor', type=str, default=None,
+                        help='Usar como ejemplos solo documentos de este profesor')
     parser.add_argument('--temperatura', type=float, default=0.7, help='Temperatura para la generación (0.0-1.0)')
     parser.add_argument('--max-tokens', type=int, default=32768, help='Longitud máxima del documento (máximo 32768)')
+    parser.add_argument('--presupuesto-tokens', type=int, default=PRESUPUESTO_ENTRADA,
+                        help='Máximo de tokens de entrada del prompt; se descartan primero los ejemplos menos relevantes')
+    parser.add_argument('--por-bloques', action='store_true',
+                        help='Transformar los textos largos por bloques en paralelo y unirlos en orden')
+    parser.add_argument('--tamano-bloque', type=int, default=TAMANO_BLOQUE,
+                        help=f'Caracteres máximos por bloque con --por-bloques (por defecto {TAMANO_BLOQUE})')
+    parser.add_argument('--concurrencia', type=int, default=4,
+                        help='Máximo de bloques transformándose a la vez con --por-bloques')
+    parser.add_argument('--revision-final', action='store_true',
+                        help='Con --por-bloques, pedir al modelo una pasada final de coherencia sobre el texto unido')
     parser.add_argument('--guardar', action='store_true', help='Guardar el documento generado')
     parser.add_argument('--salida', type=str, help='Archivo de salida donde guardar el resultado')
+    parser.add_argument('--sin-streaming', action='store_true',
+                        help='Esperar la respuesta completa en lugar de mostrarla según se genera')
+    parser.add_argument('--cache', action='store_true',
+                        help='Reutilizar la respuesta guardada si se repite exactamente la misma petición '
+                             '(con servidor, requiere arrancarlo con servidor_rag.py --cache)')
+    parser.add_argument('--refrescar-cache', action='store_true',
+                        help='Ignorar la respuesta en caché y volver a pedirla al modelo')
+    parser.add_argument('--seed', type=int, default=None, help='Semilla para respuestas reproducibles')
+    parser.add_argument('--modelo-embeddings', type=str, default=None,
+                        help='Modelo de embeddings del endpoint (p. ej. openai/text-embedding-3-small); '
+                             'por defecto se usa el embedder local (con servidor, debe ser el suyo)')
+    parser.add_argument('--modo-busqueda', type=str, choices=['vectorial', 'lexico', 'hibrido'], default=None,
+                        help='Búsqueda de ejemplos: vectorial (embeddings), lexico (BM25) o hibrido (ambos fusionados); '
+                             'por defecto vectorial, o el modo del servidor')
+    parser.add_argument('--servidor', type=str, default=None,
+                        help='URL del servidor RAG (servidor_rag.py). Por defecto se usa SCRIPTORIUM_SERVIDOR si está definida')
+    parser.add_argument('--metricas', '--metrics', type=str, choices=list(FORMATOS_METRICAS), default=None,
+                        help='Emitir el tiempo de cada etapa, los aciertos de caché, los tokens y los reintentos '
+                             'como líneas JSON (según ocurren) o en formato Prometheus (al terminar)')
+    parser.add_argument('--archivo-metricas', type=str, default=None,
+                        help='Archivo donde añadir las métricas (por defecto se escriben en stderr)')
     
     args = parser.parse_args()
     
@@ -78,14 +118,36 @@ def main():
             print(f"Error al leer el archivo de contexto: {e}")
             return
     
-    # Obtener token desde variable de entorno
+    # Usar el servidor RAG persistente si está configurado y responde
+    cliente = ClienteRAG.desde_entorno(args.servidor, modo_busqueda=args.modo_busqueda,
+                                       modelo_embeddings=args.modelo_embeddings, cache=args.cache)
+    if cliente and not cliente.disponible():
+        print(f"Advertencia: el servidor RAG en {cliente.url} no responde, se usará el sistema local")
+        cliente = None
+    
+    # Obtener token desde variable de entorno (solo necesario sin servidor)
     token = os.environ.get("GITHUB_TOKEN")
-    if not token:
+    if not cliente and not token:
         print("Error: La variable de entorno GITHUB_TOKEN no está configurada")
         return
     
+    # Métricas por etapa; con servidor, la recuperación y el modelo se miden en el servidor
+    if args.metricas:
+        activar_salida_metricas(args.metricas, args.archivo_metricas)
+        if cliente:
+            print("Aviso: con servidor RAG las etapas de búsqueda y modelo se miden en el servidor "
+                  "(servidor_rag.py --metricas)")
+    
     # Inicializar sistema RAG
-    rag = RAGSistema(token=token)
+    cache = None
+    if cliente:
+        print(f"Usando servidor RAG: {cliente.url}")
+    else:
+        from rag.cache_respuestas import CacheRespuestas
+        from rag.rag_sistema import RAGSistema
+        cache = CacheRespuestas() if args.cache else None
+        rag = RAGSistema(token=token, cache_respuestas=cache, modelo_embeddings=args.modelo_embeddings,
+                         modo_busqueda=args.modo_busqueda or 'vectorial')
     
     # Transformar texto
     print("Transformando texto a tu estilo de escritura...")
@@ -104,15 +166,42 @@ def main():
     parametros = {
         'temperatura': args.temperatura,
         'max_tokens': args.max_tokens,
-        'contexto_adicional': contexto_adicional
+        'filtros': {'tipo': args.tipo, 'materia': args.materia, 'profesor': args.profesor},
+        'contexto_adicional': contexto_adicional,
+        'presupuesto_tokens': args.presupuesto_tokens,
+        'seed': args.seed,
+        'refrescar_cache': args.refrescar_cache
     }
+    if args.por_bloques:
+        parametros.update({
+            'tamano_bloque': args.tamano_bloque,
+            'max_concurrencia': args.concurrencia,
+            'revision_final': args.revision_final
+        })
+    
+    streaming = not args.sin_streaming
+    informe = {}
+    if cliente:
+        texto_transformado = cliente.transformar_texto(texto_original, parametros, stream=streaming, informe=informe)
+    else:
+        texto_transformado = rag.transformar_texto(texto_original, parametros, stream=streaming, informe=informe)
     
-    texto_transformado = rag.transformar_texto(texto_original, parametros)
-    
-    # Mostrar texto transformado
+    # Mostrar texto transformado (fragmento a fragmento en modo streaming)
     print("\n=============== TEXTO TRANSFORMADO ===============\n")
-    print(texto_transformado)
+    if streaming:
+        fragmentos = []
+        for fragmento in texto_transformado:
+            print(fragmento, end="", flush=True)
+            fragmentos.append(fragmento)
+        texto_transformado = "".join(fragmentos)
+        print()
+    else:
+        print(texto_transformado)
     print("\n=================================================\n")
+    if informe:
+        print(f"🧮 {resumen_informe(informe)}")
+    if cache:
+        print(f"💾 {cache.resumen()}")
     
     # Guardar resultado si se solicitó
     if args.guardar or args.salida:
@@ -124,33 +213,10 @@ def main():
             
             # Intentar guardar como documento estructurado JSON si tiene el formato adecuado
             from rag.documentos_manager import DocumentosManager
-            import json
-            import re
             
             # Intentar parsear el documento generado
-            doc_dict = {}
-            
-            # Patrones para extraer secciones
-            patrones = {
-                'titulo': r'T[ií]tulo:?\s*(.+?)(?:\n|$)',
-                'tipo': r'Tipo:?\s*(.+?)(?:\n|$)',
-                'materia': r'Materia:?\s*(.+?)(?:\n|$)',
-                'presenta': r'Presenta:?\s*(.+?)(?:\n|$)',
-                'profesor': r'Profesor:?\s*(.+?)(?:\n|$)',
-                'introduccion': r'Introducci[oó]n:?\s*([\s\S]+?)(?=Desarrollo:|Conclusi[oó]n:|$)',
-                'desarrollo': r'Desarrollo:?\s*([\s\S]+?)(?=Conclusi[oó]n:|$)',
-                'conclusion': r'Conclusi[oó]n:?\s*([\s\S]+)$'
-            }
-            
-            tiene_estructura = True
-            for campo, patron in patrones.items():
-                match = re.search(patron, texto_transformado, re.IGNORECASE)
-                if match:
-                    doc_dict[campo] = match.group(1).strip()
-                else:
-                    doc_dict[campo] = ""
-                    if campo in ['titulo', 'tipo', 'materia']:
-                        tiene_estructura = False
+            doc_dict = parsear_secciones(texto_transformado)
+            tiene_estructura = all(doc_dict[campo] for campo in ['titulo', 'tipo', 'materia'])
             
             if tiene_estructura:
                 # Guardar documento estructurado